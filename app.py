@@ -16,6 +16,7 @@ from src.query_executor.poller import execute_category_queries
 from src.analytics.orchestrator import run_analysis
 from src.reporting.pdf_generator import generate_pdf
 from src.utils.cost_tracker import cost_tracker
+from src.analytics.agents.quantitative_agent import QuantitativeAgent
 
 # Configuración de la página
 st.set_page_config(
@@ -88,7 +89,7 @@ with st.sidebar:
 if page == "🏠 Dashboard":
     st.markdown('<p class="main-header">Dashboard Principal</p>', unsafe_allow_html=True)
     
-    with get_session() as session:
+    with get_session(read_only=True) as session:
         # Métricas principales
         col1, col2, col3, col4 = st.columns(4)
         
@@ -216,7 +217,7 @@ if page == "🏠 Dashboard":
 elif page == "📊 Mercados & Categorías":
     st.markdown('<p class="main-header">Mercados & Categorías</p>', unsafe_allow_html=True)
     
-    with get_session() as session:
+    with get_session(read_only=True) as session:
         mercados = session.query(Mercado).filter_by(activo=True).all()
         
         for mercado in mercados:
@@ -261,7 +262,7 @@ elif page == "📊 Mercados & Categorías":
 elif page == "❓ Queries":
     st.markdown('<p class="main-header">Queries Configuradas</p>', unsafe_allow_html=True)
     
-    with get_session() as session:
+    with get_session(read_only=True) as session:
         # Filtros
         col1, col2 = st.columns(2)
         
@@ -334,7 +335,7 @@ elif page == "❓ Queries":
 elif page == "🏷️ Marcas":
     st.markdown('<p class="main-header">Marcas Monitoreadas</p>', unsafe_allow_html=True)
     
-    with get_session() as session:
+    with get_session(read_only=True) as session:
         # Filtros
         mercados = session.query(Mercado).filter_by(activo=True).all()
         mercado_names = ["Todos"] + [m.nombre for m in mercados]
@@ -451,7 +452,7 @@ elif page == "🧪 Candidatos":
 elif page == "🤖 Ejecuciones":
     st.markdown('<p class="main-header">Historial de Ejecuciones</p>', unsafe_allow_html=True)
     
-    with get_session() as session:
+    with get_session(read_only=True) as session:
         # Filtros
         col1, col2, col3 = st.columns(3)
         
@@ -527,7 +528,7 @@ elif page == "🤖 Ejecuciones":
 elif page == "📈 Análisis":
     st.markdown('<p class="main-header">Resultados de Análisis</p>', unsafe_allow_html=True)
     
-    with get_session() as session:
+    with get_session(read_only=True) as session:
         # Filtros
         col1, col2 = st.columns(2)
         
@@ -595,6 +596,29 @@ elif page == "📈 Análisis":
                                         columns=['Marca', 'SOV %']
                                     ).sort_values('SOV %', ascending=False)
                                     st.dataframe(sov_df, use_container_width=True)
+                                
+                                # Cortes del cubo de menciones (sin recalcular el agente; se
+                                # reconstruye si el guardado no corresponde a las ejecuciones actuales)
+                                cube = QuantitativeAgent(session).cube(categoria.id, periodo)
+                                if cube is not None:
+                                    c1, c2 = st.columns(2)
+                                    with c1:
+                                        proveedores = st.multiselect(
+                                            "Proveedores", cube.labels['provider'], key=f"cube_prov_{periodo}"
+                                        )
+                                    with c2:
+                                        desglose = st.selectbox(
+                                            "Desglose", ["provider", "query", "day"], key=f"cube_by_{periodo}"
+                                        )
+                                    corte = cube.slice(providers=proveedores or None)
+                                    st.caption(f"SOV del corte ({corte.total_executions} ejecuciones):")
+                                    st.bar_chart(pd.Series(corte.sov(), name='SOV %'))
+                                    por_dim = corte.by(desglose)
+                                    if por_dim:
+                                        st.dataframe(
+                                            pd.DataFrame(por_dim).T.fillna(0).round(1),
+                                            use_container_width=True
+                                        )
                             
                             elif agente_name == 'sentiment':
                                 st.metric("Sentimiento Global", f"{result.resultado.get('sentimiento_global', 0):.2f}")
@@ -617,7 +641,7 @@ elif page == "📈 Análisis":
 elif page == "📄 Informes":
     st.markdown('<p class="main-header">Informes Generados</p>', unsafe_allow_html=True)
     
-    with get_session() as session:
+    with get_session(read_only=True) as session:
         reports = session.query(Report).order_by(Report.timestamp.desc()).all()
         
         if reports:
@@ -681,7 +705,7 @@ elif page == "📄 Informes":
 elif page == "💰 Costes":
     st.markdown('<p class="main-header">Gestión de Costes</p>', unsafe_allow_html=True)
     
-    with get_session() as session:
+    with get_session(read_only=True) as session:
         # Costes del mes actual
         st.subheader("📅 Mes Actual")
         
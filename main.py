@@ -41,7 +41,10 @@ def test_db():
     """Test de conexión a base de datos"""
     click.echo("🔍 Probando conexión a base de datos...")
     if test_connection():
+        from src.database.connection import get_pool_stats
         click.echo("✓ Conexión exitosa")
+        stats = get_pool_stats()
+        click.echo(f"  Pool: {stats['mode']} | capacidad={stats['capacity']} | {stats['pool_status']}")
     else:
         click.echo("✗ Conexión fallida", err=True)
         raise click.Abort()
@@ -111,26 +114,88 @@ def start_poller(interval, once):
 
 
 @cli.command()
-@click.option('--category', '-c', required=True, help='Categoría (formato: Mercado/Categoría)')
-@click.option('--period', '-p', required=True, help='Periodo (formato: YYYY-MM)')
+@click.option('--once', is_flag=True, help='Procesar ya todo lo pendiente (sin debounce) y salir')
+@click.option('--debounce', type=float, help='Segundos sin ejecuciones nuevas antes de recalcular (por defecto analytics.incremental)')
+def analysis_worker(once, debounce):
+    """
+    Iniciar worker de análisis incremental
+    
+    Recalcula solo los agentes sin LLM (analytics.incremental.agents) de las
+    categorías/periodos con ejecuciones nuevas, agrupando las ráfagas de ingesta.
+    Corre indefinidamente a menos que se use --once
+    """
+    from src.analytics.incremental import IncrementalWorker
+    
+    try:
+        worker = IncrementalWorker(debounce_seconds=debounce)
+    except ValueError as e:
+        click.echo(f"✗ {e}", err=True)
+        raise click.Abort()
+    
+    if once:
+        click.echo(f"📊 Procesando eventos pendientes ({', '.join(worker.agents)})...")
+    else:
+        click.echo(
+            f"🤖 Iniciando worker incremental ({', '.join(worker.agents)}; debounce {worker.debounce:.0f}s)"
+        )
+        click.echo("   Presiona Ctrl+C para detener")
+    
+    try:
+        worker.run(once=once, echo=click.echo)
+    except KeyboardInterrupt:
+        click.echo("\n⏹  Worker detenido por el usuario")
+    except Exception as e:
+        click.echo(f"\n✗ Error en worker incremental: {e}", err=True)
+        logger.error(f"Error en analysis_worker: {e}", exc_info=True)
+        raise click.Abort()
+
+
+@cli.command()
+@click.option('--category', '-c', help='Categoría (formato: Mercado/Categoría)')
+@click.option('--period', '-p', help='Periodo (formato: YYYY-MM)')
 @click.option('--output', '-o', help='Ruta de salida del PDF (opcional)')
-def generate_report(category, period, output):
+@click.option('--force', is_flag=True, help='Recalcular todos los agentes aunque sus entradas no hayan cambiado')
+@click.option('--resume', 'resume_run_id', type=int, help='Reanudar una ejecución fallida (ID de list-runs)')
+def generate_report(category, period, output, force, resume_run_id):
     """
     Generar informe consultivo en PDF
     
     Ejemplo: python main.py generate-report -c "FMCG/Cervezas" -p "2025-10"
+    Reanudar: python main.py generate-report --resume 42
     """
-    from src.analytics.orchestrator import run_analysis
+    from src.analytics.orchestrator import run_analysis, resume_analysis, AnalysisRunFailed
     from src.reporting.pdf_generator import generate_pdf
     
-    click.echo(f"📊 Generando informe para: {category} - {period}")
+    if resume_run_id is None and not (category and period):
+        click.echo("✗ Debes indicar categoría (-c) y periodo (-p), o --resume <run_id>", err=True)
+        raise click.Abort()
+    
+    if resume_run_id is not None:
+        click.echo(f"📊 Reanudando ejecución {resume_run_id}")
+    else:
+        click.echo(f"📊 Generando informe para: {category} - {period}")
     
     try:
         # 1. Ejecutar análisis multi-agente
         click.echo("🤖 Ejecutando análisis multi-agente...")
-        report_id, agents_stats = run_analysis(category, period)
-        click.echo(f"  ✓ Análisis completado (report_id: {report_id})")
+        if resume_run_id is not None:
+            report_id, agents_stats = resume_analysis(resume_run_id, force=force)
+        else:
+            report_id, agents_stats = run_analysis(category, period, force=force)
+        click.echo(f"  ✓ Análisis completado (report_id: {report_id}, run: {agents_stats['run_id']})")
         click.echo(f"  ✓ Agentes ejecutados: {agents_stats['agents_executed']['successful']}/{agents_stats['agents_executed']['total']}")
+        cache = agents_stats.get('cache') or {}
+        click.echo(
+            f"  ♻ Reutilizados: {len(cache.get('hits', []))} · recalculados: {len(cache.get('misses', []))}"
+            + (f" · reanudados: {len(cache['resumed'])}" if cache.get('resumed') else "")
+        )
+        for agent_name, detail in (agents_stats.get('results_detail') or {}).items():
+            if detail.get('cache'):
+                click.echo(f"     {agent_name:<20} {detail['cache']}")
+        if agents_stats.get('degraded'):
+            click.echo("  ⚠ Presupuesto agotado: " + ", ".join(
+                f"{name} ({tipo})" for name, tipo in sorted(agents_stats['degraded'].items())
+            ))
         
         # 2. Generar PDF
         click.echo("📄 Generando PDF...")
@@ -139,24 +204,176 @@ def generate_report(category, period, output):
         click.echo(f"\n✅ Informe generado exitosamente:")
         click.echo(f"  📁 {pdf_path}")
         
+    except AnalysisRunFailed as e:
+        click.echo(f"✗ Error al generar informe: {e}", err=True)
+        click.echo(f"  ↻ Reanudar: python main.py generate-report --resume {e.run_id}", err=True)
+        logger.error(f"Error en generate_report: {e}", exc_info=True)
+        raise click.Abort()
     except Exception as e:
         click.echo(f"✗ Error al generar informe: {e}", err=True)
         logger.error(f"Error en generate_report: {e}", exc_info=True)
         raise click.Abort()
 
 
+@cli.command()
+@click.option('--category', '-c', help='Filtrar por categoría (formato: Mercado/Categoría)')
+@click.option('--status', 'estado', type=click.Choice(['running', 'completed', 'failed']), help='Filtrar por estado')
+@click.option('--limit', '-n', default=20, show_default=True, help='Nº de ejecuciones')
+@click.option('--run', 'run_id', type=int, help='Detalle por agente de una ejecución')
+def list_runs(category, estado, limit, run_id):
+    """
+    Listar ejecuciones del orquestador (analysis_runs) y su estado por agente
+    
+    Ejemplo: python main.py list-runs --status failed
+    """
+    from src.database.connection import get_session
+    from src.database.models import AnalysisRun, Categoria, Mercado
+    
+    with get_session() as session:
+        query = session.query(AnalysisRun, Categoria, Mercado).join(
+            Categoria, AnalysisRun.categoria_id == Categoria.id
+        ).join(Mercado, Categoria.mercado_id == Mercado.id)
+        if run_id is not None:
+            query = query.filter(AnalysisRun.id == run_id)
+        if category:
+            try:
+                market_name, cat_name = category.split('/')
+            except ValueError:
+                click.echo("✗ Formato de categoría inválido. Usa: Mercado/Categoría", err=True)
+                raise click.Abort()
+            query = query.filter(Mercado.nombre == market_name, Categoria.nombre == cat_name)
+        if estado:
+            query = query.filter(AnalysisRun.estado == estado)
+        rows = query.order_by(AnalysisRun.id.desc()).limit(limit).all()
+        
+        if not rows:
+            click.echo("Sin ejecuciones registradas")
+            return
+        
+        icons = {'completed': '✓', 'failed': '✗', 'running': '…'}
+        for run, categoria, mercado in rows:
+            agentes = run.agentes or {}
+            ok = sum(1 for a in agentes.values() if a.get('status') in ('success', 'skipped'))
+            click.echo(
+                f"{icons.get(run.estado, '?')} run {run.id:<5} {mercado.nombre}/{categoria.nombre:<25} {run.periodo:<10} "
+                f"{run.estado:<10} agentes {ok}/{len(agentes)}  "
+                f"{run.started_at:%Y-%m-%d %H:%M}"
+                + (f"  report {run.report_id}" if run.report_id else "")
+                + (f"  reanudada x{run.reanudaciones}" if run.reanudaciones else "")
+            )
+            if run.error:
+                click.echo(f"    error: {run.error[:200]}")
+            if run_id is not None:
+                for name, entry in sorted(agentes.items(), key=lambda kv: kv[1].get('finished_at') or ''):
+                    click.echo(
+                        f"    {name:<20} {entry.get('status', '?'):<8} "
+                        f"{entry.get('execution_time') or 0:>7.1f}s  {entry.get('cache') or '':<8} "
+                        f"result_id={entry.get('result_id')}"
+                        + (f"  error: {entry['error'][:120]}" if entry.get('error') else "")
+                    )
+
+
+@cli.command()
+@click.argument('run_id', type=int, required=False)
+@click.option('--file', 'path', type=click.Path(exists=True, dir_okay=False), help='Fichero OTLP/JSON (por defecto logs/traces/run_<run_id>.jsonl)')
+@click.option('--depth', default=2, show_default=True, help='Niveles del camino crítico a mostrar')
+def trace_report(run_id, path, depth):
+    """
+    Resumir la traza de una ejecución: camino crítico y reparto del tiempo de cada agente
+    (LLM, espera de hueco LLM, BD, embedding, búsqueda vectorial, reparación de JSON...)
+    
+    Ejemplo: python main.py trace-report 42
+    """
+    from src.utils.tracing import load_trace, critical_path, time_breakdown, trace_path, BUCKETS
+    
+    if run_id is None and not path:
+        click.echo("✗ Indica el ID de la ejecución (list-runs) o --file", err=True)
+        raise click.Abort()
+    try:
+        spans = load_trace(run_id, path=path)
+    except FileNotFoundError:
+        click.echo(f"✗ Sin traza para la ejecución {run_id} ({trace_path(run_id)})", err=True)
+        raise click.Abort()
+    if not spans:
+        click.echo("Traza vacía")
+        return
+    
+    path_steps = critical_path(spans)
+    root = path_steps[0]
+    attrs = root['span']['attributes']
+    errors = sum(1 for s in spans if s['error'])
+    click.echo(
+        f"\n🔎 Run {attrs.get('analysis.run_id', run_id)} · {attrs.get('analysis.categoria', root['span']['name'])} "
+        f"{attrs.get('analysis.periodo', '')} · {root['end'] - root['start']:.1f}s · {len(spans):,} spans"
+        + (f" ({errors} con error)" if errors else "")
+    )
+    
+    def _label(span):
+        a = span['attributes']
+        if span['name'] == 'agent':
+            return f"agent {a.get('agent.name', '?')}" + (" (abandonado)" if a.get('agent.abandoned') else "")
+        if span['name'] == 'llm.call':
+            return f"llm.call {a.get('llm.provider', '')}/{a.get('llm.model', '')}"
+        return span['name']
+    
+    # Camino crítico; los hermanos consecutivos iguales (p. ej. consultas) se agrupan
+    click.echo(f"\nCamino crítico ({root['end'] - root['start']:.1f}s):")
+    lines = []
+    for step in path_steps:
+        if step['depth'] > depth:
+            continue
+        label = _label(step['span'])
+        seconds = step['end'] - step['start']
+        last = lines[-1] if lines else None
+        if last and last['depth'] == step['depth'] and last['label'] == label and step['depth'] > 0:
+            last['count'] += 1
+            last['seconds'] += seconds
+            continue
+        lines.append({
+            'depth': step['depth'], 'label': label, 'seconds': seconds, 'count': 1,
+            'offset': step['start'] - root['start'], 'error': step['span']['error']
+        })
+    for line in lines:
+        name = "  " * line['depth'] + line['label'] + (f" ×{line['count']}" if line['count'] > 1 else "")
+        click.echo(
+            f"  {name:<48} {line['seconds']:>8.2f}s  @{line['offset']:>7.1f}s"
+            + (f"  ✗ {line['error'][:80]}" if line['error'] else "")
+        )
+    
+    breakdown = time_breakdown(spans)
+    if breakdown:
+        headers = {
+            'llm': 'llm', 'llm_wait': 'espera', 'db': 'bd', 'embedding': 'embed',
+            'vector_search': 'vector', 'json_repair': 'json', 'save_results': 'guardar',
+            'extraction': 'extrac', 'other': 'otro'
+        }
+        click.echo("\nTiempo por agente (s, exclusivo):")
+        click.echo(f"  {'agente':<20} {'total':>7} " + " ".join(f"{headers[b]:>7}" for b in BUCKETS))
+        rows = sorted(breakdown.items(), key=lambda kv: kv[1]['total'], reverse=True)
+        for name, totals in rows:
+            click.echo(f"  {name:<20} {totals['total']:>7.1f} " + " ".join(f"{totals[b]:>7.1f}" for b in BUCKETS))
+        click.echo(
+            f"  {'Σ':<20} {sum(t['total'] for _, t in rows):>7.1f} "
+            + " ".join(f"{sum(t[b] for _, t in rows):>7.1f}" for b in BUCKETS)
+        )
+
+
 @cli.command()
 @click.option('--categories', '-c', multiple=True, help='Categorías específicas')
 @click.option('--all', 'all_categories', is_flag=True, help='Todas las categorías activas')
 @click.option('--period', '-p', required=True, help='Periodo (formato: YYYY-MM)')
-def generate_batch(categories, all_categories, period):
+@click.option('--force', is_flag=True, help='Recalcular todos los agentes aunque sus entradas no hayan cambiado')
+@click.option('--parallel', type=int, help='Categorías analizadas a la vez (por defecto analytics.batch.max_parallel_categories)')
+def generate_batch(categories, all_categories, period, force, parallel):
     """
     Generar informes en lote para múltiples categorías
     
-    Ejemplo: python main.py generate-batch --all -p "2025-10"
+    Las categorías se analizan en paralelo (límites LLM compartidos) y cada PDF se
+    genera en cuanto termina su análisis.
+    
+    Ejemplo: python main.py generate-batch --all -p "2025-10" --parallel 4
     """
-    from src.analytics.orchestrator import run_analysis
-    from src.reporting.pdf_generator import generate_pdf
+    from src.analytics.batch import BatchScheduler
     from src.database.connection import get_session
     from src.database.models import Categoria
     
@@ -172,20 +389,18 @@ def generate_batch(categories, all_categories, period):
         else:
             categories_to_process = [tuple(c.split('/')) for c in categories]
     
-    click.echo(f"📊 Generando {len(categories_to_process)} informes para periodo: {period}\n")
+    scheduler = BatchScheduler(max_parallel=parallel)
+    click.echo(
+        f"📊 Generando {len(categories_to_process)} informes para periodo: {period} "
+        f"({scheduler.max_parallel} en paralelo)\n"
+    )
     
-    results = []
-    for mercado, categoria in categories_to_process:
-        category_full = f"{mercado}/{categoria}"
-        try:
-            click.echo(f"🔄 Procesando: {category_full}")
-            report_id, agents_stats = run_analysis(category_full, period)
-            pdf_path = generate_pdf(report_id, agents_stats=agents_stats)
-            results.append({'category': category_full, 'status': 'success', 'path': pdf_path})
-            click.echo(f"  ✓ {pdf_path}\n")
-        except Exception as e:
-            results.append({'category': category_full, 'status': 'error', 'error': str(e)})
-            click.echo(f"  ✗ Error: {e}\n")
+    results = scheduler.run(
+        [f"{mercado}/{categoria}" for mercado, categoria in categories_to_process],
+        period,
+        force=force,
+        echo=click.echo
+    )
     
     # Resumen
     successful = sum(1 for r in results if r['status'] == 'success')
@@ -195,6 +410,107 @@ def generate_batch(categories, all_categories, period):
     click.echo(f"  ✓ Exitosos: {successful}")
     if failed:
         click.echo(f"  ✗ Fallidos: {failed}")
+        for r in results:
+            if r['status'] == 'error':
+                click.echo(f"    - {r['category']}: {r['error']}")
+
+
+@cli.command()
+@click.option('--category', '-c', 'categories', multiple=True, help='Categoría (formato: Mercado/Categoría)')
+@click.option('--all', 'all_categories', is_flag=True, help='Todas las categorías activas (como generate-batch --all)')
+@click.option('--period', '-p', required=True, help='Periodo (formato: YYYY-MM)')
+@click.option('--force', is_flag=True, help='Estimar recalculando todos los agentes')
+@click.option('--parallel', type=int, help='Categorías analizadas a la vez (por defecto analytics.batch.max_parallel_categories)')
+@click.option('--detail', is_flag=True, help='Desglose por agente también con varias categorías')
+def estimate(categories, all_categories, period, force, parallel, detail):
+    """
+    Estimar llamadas LLM, tokens, coste y duración sin llamar a ningún LLM
+
+    Usa los datos del periodo, las huellas de los agentes (qué se reutilizaría) y el
+    histórico de consumo de analysis_runs.
+
+    Ejemplo: python main.py estimate --all -p "2025-10"
+    """
+    from src.analytics.estimator import AnalysisEstimator
+    from src.database.connection import get_session
+    from src.database.models import Categoria, Mercado
+
+    if not categories and not all_categories:
+        click.echo("✗ Debes especificar categorías (-c) o usar --all", err=True)
+        raise click.Abort()
+
+    with get_session() as session:
+        if all_categories:
+            categoria_ids = [c.id for c in session.query(Categoria).filter_by(activo=True).order_by(Categoria.id).all()]
+        else:
+            categoria_ids = []
+            for path in categories:
+                try:
+                    market_name, cat_name = path.split('/')
+                except ValueError:
+                    click.echo("✗ Formato de categoría inválido. Usa: Mercado/Categoría", err=True)
+                    raise click.Abort()
+                categoria = session.query(Categoria).join(Mercado).filter(
+                    Mercado.nombre == market_name, Categoria.nombre == cat_name
+                ).first()
+                if not categoria:
+                    click.echo(f"✗ Categoría '{path}' no encontrada", err=True)
+                    raise click.Abort()
+                categoria_ids.append(categoria.id)
+
+    def _duration(seconds: float) -> str:
+        minutes, secs = divmod(int(round(seconds)), 60)
+        hours, minutes = divmod(minutes, 60)
+        return f"{hours}h {minutes:02d}m" if hours else f"{minutes}m {secs:02d}s"
+
+    estimator = AnalysisEstimator()
+    if len(categoria_ids) == 1:
+        result = estimator.estimate_category(categoria_ids[0], period, force=force)
+        categories_estimated = [result]
+    else:
+        result = estimator.estimate_batch(categoria_ids, period, force=force, max_parallel=parallel)
+        categories_estimated = result['categories']
+
+    for cat in categories_estimated:
+        data = cat['data']
+        click.echo(
+            f"\n📊 {cat['categoria']} · {period} · {data['executions']} ejecuciones "
+            f"(~{data['avg_chars']:.0f} caracteres/respuesta)"
+        )
+        if detail or len(categories_estimated) == 1:
+            for name, agent in cat['agents'].items():
+                if agent['status'] != 'recalcular':
+                    click.echo(f"    {name:<20} {agent['status']}")
+                    continue
+                click.echo(
+                    f"    {name:<20} {agent['calls']:>5g} llamadas  {agent['tokens_input']:>8,} in  "
+                    f"{agent['tokens_output']:>7,} out  ${agent['cost_usd']:>7.3f}  {agent['seconds']:>6.0f}s  "
+                    + (f"{agent['provider']}/{agent['model']}  " if agent['calls'] else "")
+                    + f"({agent['source']})"
+                )
+        reused = sum(1 for a in cat['agents'].values() if a['status'] == 'reutilizar')
+        click.echo(
+            f"  → {cat['calls']:g} llamadas · {cat['tokens_input'] + cat['tokens_output']:,} tokens · "
+            f"${cat['cost_usd']:.2f} · {_duration(cat['wall_seconds'])}"
+            + (f" · {reused} agentes reutilizados" if reused else "")
+        )
+
+    if len(categories_estimated) > 1:
+        click.echo(f"\n📊 Total ({len(categories_estimated)} categorías, {result['max_parallel_categories']} en paralelo):")
+        click.echo(f"  Llamadas LLM: {result['calls']:g}")
+        click.echo(f"  Tokens: {result['tokens_input']:,} in / {result['tokens_output']:,} out")
+        click.echo(f"  Coste: ${result['cost_usd']:.2f}")
+        click.echo(f"  Duración: {_duration(result['wall_seconds'])} (limita: {result['bound']})")
+    else:
+        click.echo(f"  Limita: {result['bound']}")
+    
+    unpriced = sorted({
+        f"{a['provider']}/{a['model']}"
+        for cat in categories_estimated for a in cat['agents'].values()
+        if a['status'] == 'recalcular' and a['calls'] and not a['cost_usd']
+    })
+    if unpriced:
+        click.echo(f"\n⚠️  Sin precio en llm_providers.cost_per_1k_tokens (coste 0): {', '.join(unpriced)}")
 
 
 @cli.command()
@@ -315,7 +631,9 @@ cli.add_command(admin)
 @click.option('--agents', '-a', multiple=True, help='Agentes a previsualizar (ej: quantitative, qualitative, competitive, trends, channel_analysis, esg_analysis, packaging_analysis, pricing_power, customer_journey, scenario_planning, strategic)')
 @click.option('--run-missing', is_flag=True, help='Ejecuta el agente si no hay resultado previo')
 @click.option('--rerun', is_flag=True, help='Fuerza re-ejecución del agente (ignora resultados previos)')
-def preview_agents(category, period, agents, run_missing, rerun):
+@click.option('--slice', 'cube_filters', multiple=True, help='Corte del cubo de menciones: provider=perplexity, query=12, brand=X, from=YYYY-MM-DD, to=YYYY-MM-DD')
+@click.option('--by', 'cube_by', type=click.Choice(['provider', 'query', 'day']), help='Desglose del cubo de menciones por dimensión')
+def preview_agents(category, period, agents, run_missing, rerun, cube_filters, cube_by):
     """Previsualiza en terminal la salida por agente sin generar el PDF."""
     import json
     from src.database.connection import get_session
@@ -724,6 +1042,32 @@ def preview_agents(category, period, agents, run_missing, rerun):
             'executive': _print_executive,
         }
 
+        def _print_cube():
+            from src.analytics.mention_cube import parse_slice
+            try:
+                filtros = parse_slice(cube_filters)
+            except ValueError as e:
+                click.echo(f"✗ {e}", err=True)
+                return
+            cube = QuantitativeAgent(session).cube(categoria.id, period)
+            click.echo(f"— Cubo de menciones {' '.join(cube_filters) or '(completo)'}")
+            if cube is None:
+                click.echo("  ✗ Sin marcas configuradas")
+                return
+            corte = cube.slice(**filtros)
+            click.echo(f"  Ejecuciones: {corte.total_executions}")
+            tasa = corte.mention_rate()
+            for marca, sov in sorted(corte.sov().items(), key=lambda x: x[1], reverse=True)[:10]:
+                click.echo(f"   · {marca}: SOV {sov:.1f}% | presente en {tasa.get(marca, 0):.1f}% de respuestas")
+            if cube_by:
+                for label, valores in corte.by(cube_by).items():
+                    top = ', '.join(f"{m} {v:.1f}%" for m, v in sorted(valores.items(), key=lambda x: x[1], reverse=True)[:5])
+                    click.echo(f"   [{label}] {top}")
+
+        if cube_filters or cube_by:
+            click.echo("")
+            _print_cube()
+
         for key in selected:
             click.echo("")
             res = _ensure_result(key)
@@ -736,6 +1080,53 @@ def preview_agents(category, period, agents, run_missing, rerun):
                 click.echo(f"— {key}")
                 click.echo(f"  {txt}")
 
+
+@cli.command()
+@click.option('--category', '-c', required=True, help='Categoría (formato: Mercado/Categoría)')
+@click.option('--from', 'date_from', required=True, type=click.DateTime(formats=['%Y-%m-%d']), help='Fecha inicial (YYYY-MM-DD)')
+@click.option('--to', 'date_to', required=True, type=click.DateTime(formats=['%Y-%m-%d']), help='Fecha final incluida (YYYY-MM-DD)')
+@click.option('--granularity', '-g', type=click.Choice(['daily', 'weekly', 'monthly']), default='monthly', show_default=True, help='Granularidad de los periodos')
+def backfill_quantitative(category, date_from, date_to, granularity):
+    """
+    Calcular SOV de muchos periodos en una sola pasada por las ejecuciones
+    
+    Ejemplo: python main.py backfill-quantitative -c "FMCG/Cervezas" --from 2025-01-01 --to 2025-10-31 -g weekly
+    """
+    from src.database.connection import get_session
+    from src.database.models import Mercado, Categoria
+    from src.analytics.agents import QuantitativeAgent
+    
+    try:
+        market_name, cat_name = category.split('/')
+    except ValueError:
+        click.echo("✗ Formato de categoría inválido. Usa Mercado/Categoría", err=True)
+        raise click.Abort()
+    if date_to < date_from:
+        click.echo("✗ --to debe ser posterior o igual a --from", err=True)
+        raise click.Abort()
+    
+    with get_session() as session, get_session(read_only=True) as read_session:
+        mercado = session.query(Mercado).filter_by(nombre=market_name).first()
+        categoria = session.query(Categoria).filter_by(
+            mercado_id=mercado.id, nombre=cat_name
+        ).first() if mercado else None
+        if not categoria:
+            click.echo(f"✗ Categoría '{category}' no encontrada", err=True)
+            raise click.Abort()
+        
+        click.echo(f"📈 Backfill cuantitativo | {category} | {date_from:%Y-%m-%d} → {date_to:%Y-%m-%d} ({granularity})")
+        agent = QuantitativeAgent(session, read_session=read_session)
+        summary = agent.backfill(categoria.id, date_from, date_to, granularity)
+    
+    if 'error' in summary:
+        click.echo(f"✗ {summary['error']}", err=True)
+        raise click.Abort()
+    click.echo(f"  ✓ Ejecuciones leídas: {summary['total_executions']}")
+    click.echo(f"  ✓ Periodos guardados: {summary['guardados']}")
+    if summary['sin_datos']:
+        click.echo(f"  · Sin datos: {', '.join(summary['sin_datos'])}")
+
+
 if __name__ == "__main__":
     cli()
 
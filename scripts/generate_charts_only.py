@@ -266,6 +266,7 @@ def main():
             "sov_chart": "SOV - Barras Horizontales",
             "sov_pie_chart": "SOV - Gráfico de Pastel",
             "sov_trend_chart": "SOV - Evolución Temporal",
+            "sov_provider_chart": "SOV - Por Proveedor de IA",
             "sentiment_chart": "Sentimiento - Barras Apiladas",
             "sentiment_trend_chart": "Sentimiento - Evolución Temporal",
             "opportunity_matrix": "Matriz de Oportunidades (Impacto vs Esfuerzo)",
@@ -9,7 +9,7 @@ from datetime import datetime
 from sqlalchemy import extract
 from tabulate import tabulate
 from src.database.connection import get_session
-from src.database.models import Mercado, Categoria, Query, Marca, QueryExecution, BrandCandidate, Embedding, AnalysisResult, Report
+from src.database.models import Mercado, Categoria, Query, Marca, QueryExecution, BrandCandidate, Embedding, AnalysisResult, Report, BrandMentionDaily
 from src.utils.cost_tracker import cost_tracker
 from src.utils.logger import setup_logger
 
@@ -201,6 +201,7 @@ def add_brand(category, name, type, aliases):
         click.echo(f"✓ Marca creada: {name} (ID: {marca.id})")
         click.echo(f"  Tipo: {type}")
         click.echo(f"  Aliases: {', '.join(aliases_list)}")
+        _rebuild_mentions_for(session, categoria)
         
         logger.info("marca_creada", marca_id=marca.id, nombre=name, categoria=category)
 
@@ -304,6 +305,43 @@ def show_queries(category, show_all):
             click.echo("")
 
 
+def _rebuild_mentions_for(session, categoria) -> None:
+    """Re-popula execution_mentions y el rollup diario tras cambiar marcas/aliases"""
+    from src.analytics.mention_rollup import rebuild_rollup
+
+    stats = rebuild_rollup(session, categoria.id)
+    session.commit()
+    click.echo(
+        f"✓ Menciones {categoria.nombre}: {stats['executions']} ejecuciones → "
+        f"{stats['mentions']} menciones, {stats['rows']} filas diarias"
+    )
+
+
+@admin.command()
+@click.option('--category', '-c', help='Categoría (formato: Mercado/Categoría); sin valor = todas')
+def rebuild_mentions(category):
+    """Reconstruir índice de menciones y rollup diario (tras cambiar marcas o aliases)"""
+    with get_session() as session:
+        categorias = session.query(Categoria).filter_by(activo=True).all()
+        if category:
+            try:
+                market_name, cat_name = category.split('/')
+            except ValueError:
+                click.echo("✗ Formato de categoría inválido. Usa: Mercado/Categoría", err=True)
+                return
+            mercado = session.query(Mercado).filter_by(nombre=market_name).first()
+            categorias = [] if not mercado else session.query(Categoria).filter_by(
+                mercado_id=mercado.id,
+                nombre=cat_name
+            ).all()
+            if not categorias:
+                click.echo(f"✗ Categoría '{category}' no encontrada", err=True)
+                return
+
+        for categoria in categorias:
+            _rebuild_mentions_for(session, categoria)
+
+
 @admin.command()
 @click.option('--category', '-c', required=True, help='Categoría (formato: Mercado/Categoría)')
 @click.option('--period', '-p', required=True, help='Periodo específico (YYYY-MM)')
@@ -374,6 +412,15 @@ def clean_period(category, period):
                 QueryExecution.id.in_(exec_ids)
             ).delete(synchronize_session=False)
 
+        # 4) Rollup diario de menciones del periodo
+        start = datetime(year, month, 1)
+        end = datetime(year + 1, 1, 1) if month == 12 else datetime(year, month + 1, 1)
+        session.query(BrandMentionDaily).filter(
+            BrandMentionDaily.categoria_id == categoria.id,
+            BrandMentionDaily.day >= start.date(),
+            BrandMentionDaily.day < end.date()
+        ).delete(synchronize_session=False)
+
         session.commit()
 
         click.echo("✅ Limpieza de periodo completada:")
@@ -705,6 +752,8 @@ def approve_candidate(category, name, type):
         bc.estado = 'approved'
         session.commit()
         click.echo("✓ Candidato aprobado")
+        if not existing:
+            _rebuild_mentions_for(session, categoria)
 
 
 @candidates.command("reject")
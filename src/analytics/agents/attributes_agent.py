@@ -20,8 +20,8 @@ class AttributesAgent(BaseAgent):
     Identifica atributos asociados a marcas (sabor, precio, calidad, etc.)
     """
     
-    def __init__(self, session, version: str = "1.0.0"):
-        super().__init__(session, version)
+    def __init__(self, session, version: str = "1.0.0", read_session=None):
+        super().__init__(session, version, read_session)
         self.client = AnthropicClient()
     
     def analyze(self, categoria_id: int, periodo: str) -> Dict[str, Any]:
@@ -38,7 +38,7 @@ class AttributesAgent(BaseAgent):
         year, month = map(int, periodo.split('-'))
         
         # Obtener marcas
-        marcas = self.session.query(Marca).filter_by(
+        marcas = self.read_session.query(Marca).filter_by(
             categoria_id=categoria_id
         ).all()
         
@@ -48,7 +48,7 @@ class AttributesAgent(BaseAgent):
         marca_nombres = [m.nombre for m in marcas]
         
         # Obtener ejecuciones (muestra)
-        executions = self.session.query(QueryExecution).join(
+        executions = self.read_session.query(QueryExecution).join(
             Query
         ).filter(
             Query.categoria_id == categoria_id,
@@ -4,8 +4,10 @@ Clase base abstracta para todos los agentes de análisis
 """
 
 from abc import ABC, abstractmethod
+import hashlib
+import json
 from typing import Dict, Any
-from typing import Optional, Type
+from typing import Iterator, Optional, Sequence, Tuple, Type
 from pydantic import BaseModel, ValidationError
 from pathlib import Path
 import yaml
@@ -14,26 +16,159 @@ from collections import defaultdict
 import random
 from sqlalchemy.orm import Session
 from src.database.models import AnalysisResult
+from src.database.connection import route_read
+from src.query_executor.api_clients.usage import BudgetExceeded
+from src.utils import tracing
 from src.utils.logger import setup_logger
 
 logger = setup_logger(__name__)
 
+DEFAULT_STREAM_BATCH_SIZE = 500
+
+
+def _load_stream_batch_size(config_path: str = "config/settings.yaml") -> int:
+    """Lee analytics.streaming.batch_size de settings (filas por lote del cursor)"""
+    try:
+        with open(config_path, "r", encoding="utf-8") as f:
+            cfg = yaml.safe_load(f) or {}
+        stream_cfg = ((cfg.get("analytics") or {}).get("streaming") or {})
+        return max(1, int(stream_cfg.get("batch_size", DEFAULT_STREAM_BATCH_SIZE)))
+    except Exception:
+        return DEFAULT_STREAM_BATCH_SIZE
+
+
+STREAM_BATCH_SIZE = _load_stream_batch_size()
+
+
+# Claves de settings.yaml que cambian el resultado de los agentes (umbrales, parámetros de
+# análisis y del LLM); pool, paralelismo, presupuestos, rutas o trazas no invalidan la huella
+FINGERPRINT_SETTINGS = (
+    ('llm_providers', 'temperature'),
+    ('llm_providers', 'max_tokens'),
+    ('analytics', 'top_keywords'),
+    ('analytics', 'min_keyword_frequency'),
+    ('analytics', 'sentiment_scale'),
+    ('analytics', 'sov'),
+    ('analytics', 'rag', 'enabled'),
+    ('analytics', 'rag', 'top_k_similar'),
+    ('analytics', 'rag', 'similarity_threshold'),
+    ('analytics', 'rag', 'embedding_model'),
+    ('analytics', 'trends'),
+    ('analytics', 'drivers', 'window_chars'),
+    ('analytics', 'drivers', 'min_keywords'),
+    ('analytics', 'significance'),
+    ('analytics', 'campaign_analysis'),
+    ('analytics', 'channel_analysis'),
+    ('analytics', 'market_context'),
+)
+
+
+def _settings_digest(config_path: str = "config/settings.yaml") -> Optional[str]:
+    """SHA-1 de las claves de FINGERPRINT_SETTINGS (None si no se puede leer settings)"""
+    try:
+        with open(config_path, "r", encoding="utf-8") as f:
+            cfg = yaml.safe_load(f) or {}
+    except Exception:
+        return None
+    selected = {}
+    for path in FINGERPRINT_SETTINGS:
+        value = cfg
+        for key in path:
+            value = value.get(key) if isinstance(value, dict) else None
+        selected['.'.join(path)] = value
+    return hashlib.sha1(
+        json.dumps(selected, sort_keys=True, default=str).encode("utf-8")
+    ).hexdigest()
+
+
+def parse_periodo(periodo: str):
+    """
+    Convierte un periodo en ventana [start, end) y devuelve la granularidad.
+    Soporta:
+      - YYYY-MM-DD  -> 'daily'
+      - YYYY-Www    -> 'weekly' (ISO semana, lunes-domingo)
+      - YYYY-MM     -> 'monthly'
+      - YYYY-MM-DD..YYYY-MM-DD -> 'range' (end exclusivo al día siguiente 00:00)
+    """
+    import re
+    from datetime import datetime, timedelta
+    p = (periodo or "").strip()
+    # Rango arbitrario: YYYY-MM-DD..YYYY-MM-DD
+    if '..' in p:
+        start_s, end_s = p.split('..', 1)
+        start = datetime.strptime(start_s.strip(), '%Y-%m-%d')
+        end = datetime.strptime(end_s.strip(), '%Y-%m-%d') + timedelta(days=1)  # fin exclusivo
+        return start, end, 'range'
+
+    if re.match(r'^\d{4}-\d{2}-\d{2}$', p):  # diario
+        start = datetime.strptime(p, '%Y-%m-%d')
+        end = start + timedelta(days=1)
+        return start, end, 'daily'
+    if re.match(r'^\d{4}-W\d{2}$', p):       # semanal ISO
+        y, w = p.split('-W')
+        start = datetime.fromisocalendar(int(y), int(w), 1)  # lunes
+        end = start + timedelta(days=7)
+        return start, end, 'weekly'
+    if re.match(r'^\d{4}-\d{2}$', p):        # mensual
+        start = datetime.strptime(p, '%Y-%m')
+        y, m = start.year, start.month
+        end = (datetime(y+1, 1, 1) if m == 12 else datetime(y, m+1, 1))
+        return start, end, 'monthly'
+    raise ValueError(f"Formato de periodo no soportado: {periodo}")
+
+
+def last_periods(periodo: str, n: int = 6):
+    """Devuelve últimos n periodos según granularidad del periodo dado (incluye actual)."""
+    from datetime import timedelta
+    start, _, gran = parse_periodo(periodo)
+    periods = []
+    for i in range(n-1, -1, -1):
+        if gran == 'daily':
+            d = start - timedelta(days=i)
+            periods.append(d.strftime('%Y-%m-%d'))
+        elif gran == 'weekly':
+            d = start - timedelta(weeks=i)
+            iso = d.isocalendar()
+            periods.append(f"{iso.year}-W{iso.week:02d}")
+        else:  # monthly
+            y, m = start.year, start.month - i
+            while m <= 0:
+                y -= 1
+                m += 12
+            periods.append(f"{y}-{m:02d}")
+    return periods
+
 
 class BaseAgent(ABC):
     """
     Clase base para agentes de análisis
     """
     
-    def __init__(self, session: Session, version: str = "1.0.0"):
+    # Agentes (claves del orquestador) cuyos resultados del mismo periodo lee analyze();
+    # el orquestador no lo lanza hasta que todos han terminado
+    depends_on: Tuple[str, ...] = ()
+    # Bloques de agent_prompts.yaml que usa el agente (huella de entradas);
+    # vacío = '<agent_name>_agent'
+    prompt_keys: Tuple[str, ...] = ()
+    
+    def __init__(self, session: Session, version: str = "1.0.0", read_session: Optional[Session] = None):
         """
         Initialize agent
         
         Args:
             session: Sesión de SQLAlchemy
             version: Versión del agente
+            read_session: Sesión de solo lectura (réplica) para cargar ejecuciones y marcas
         """
         self.session = session
+        self._read_session = read_session
         self.version = version
+        # Huella de entradas de esta ejecución (la asigna el orquestador; se guarda con el resultado)
+        self.fingerprint: Optional[str] = None
+        # Contexto de la ejecución (AnalysisContext): resultados de otros agentes en memoria
+        self.context = None
+        # Presupuesto de la ejecución (LLMUsage con límites; lo asigna el orquestador)
+        self.budget = None
         self.agent_name = self.__class__.__name__.replace('Agent', '').lower()
         # Logger específico del agente
         # Usamos el nombre de la clase para separar logs por agente
@@ -45,6 +180,14 @@ class BaseAgent(ABC):
         # Carga de system prompt común
         self._load_system_prompt()
     
+    @property
+    def read_session(self) -> Session:
+        """
+        Sesión para lecturas pesadas (ejecuciones, marcas)
+        Usa la réplica si está al día con las escrituras de este proceso; si no, el primario
+        """
+        return route_read(self.session, self._read_session)
+    
     @abstractmethod
     def analyze(self, categoria_id: int, periodo: str) -> Dict[str, Any]:
         """
@@ -59,11 +202,14 @@ class BaseAgent(ABC):
         """
         pass
     
+    @tracing.traced('agent.save_results')
     def save_results(
         self,
         categoria_id: int,
         periodo: str,
-        resultado: Dict[str, Any]
+        resultado: Dict[str, Any],
+        cacheable: bool = True,
+        estado: Optional[Dict[str, Any]] = None
     ) -> int:
         """
         Guarda los resultados del análisis en la base de datos
@@ -72,10 +218,25 @@ class BaseAgent(ABC):
             categoria_id: ID de la categoría
             periodo: Periodo
             resultado: Dict con resultados
+            cacheable: False para resultados de fallback (el siguiente run no los reutiliza)
+            estado: Estado interno del agente para la siguiente ejecución (no se expone a otros agentes)
         
         Returns:
             ID del AnalysisResult creado
         """
+        if self.budget is not None:
+            if self.budget.abandoned:
+                # El orquestador ya guardó el resultado de sustitución
+                raise BudgetExceeded('abandonado')
+            if self.budget.exhausted:
+                # Resultado parcial: marcado y sin huella (el siguiente run lo recalcula)
+                resultado = {
+                    **resultado,
+                    '_degradado': resultado.get('_degradado') or {'tipo': 'parcial', 'motivo': self.budget.exhausted}
+                }
+                cacheable = False
+        fingerprint = self.fingerprint if cacheable else None
+        
         # Verificar si ya existe un análisis para este periodo/agente
         existing = self.session.query(AnalysisResult).filter_by(
             categoria_id=categoria_id,
@@ -88,6 +249,8 @@ class BaseAgent(ABC):
             existing.resultado = resultado
             existing.timestamp = datetime.utcnow()
             existing.version_agente = self.version
+            existing.fingerprint = fingerprint
+            existing.estado = estado
             self.session.flush()
             analysis_id = existing.id
         else:
@@ -98,13 +261,17 @@ class BaseAgent(ABC):
                 agente=self.agent_name,
                 resultado=resultado,
                 timestamp=datetime.utcnow(),
-                version_agente=self.version
+                version_agente=self.version,
+                fingerprint=fingerprint,
+                estado=estado
             )
             self.session.add(analysis)
             self.session.flush()
             analysis_id = analysis.id
         
         self.session.commit()
+        if self.context is not None and self.context.categoria_id == categoria_id:
+            self.context.put(self.agent_name, periodo, resultado)
         
         logger.info(
             "analysis_saved",
@@ -116,6 +283,167 @@ class BaseAgent(ABC):
         
         return analysis_id
 
+    @tracing.traced('agent.save_results')
+    def save_results_bulk(
+        self,
+        categoria_id: int,
+        resultados: Dict[str, Dict[str, Any]],
+        estados: Optional[Dict[str, Dict[str, Any]]] = None
+    ) -> int:
+        """
+        Guarda resultados de varios periodos en una sola transacción
+        (una consulta para los existentes, inserciones en bloque, un commit)
+
+        Args:
+            categoria_id: ID de la categoría
+            resultados: {periodo: resultado}
+            estados: {periodo: estado interno} (ver save_results)
+
+        Returns:
+            Nº de resultados guardados
+        """
+        if not resultados:
+            return 0
+        now = datetime.utcnow()
+        existing = {
+            r.periodo: r for r in self.session.query(AnalysisResult).filter(
+                AnalysisResult.categoria_id == categoria_id,
+                AnalysisResult.agente == self.agent_name,
+                AnalysisResult.periodo.in_(list(resultados))
+            )
+        }
+        estados = estados or {}
+        nuevos = []
+        for periodo, resultado in resultados.items():
+            row = existing.get(periodo)
+            if row:
+                row.resultado = resultado
+                row.timestamp = now
+                row.version_agente = self.version
+                row.fingerprint = None
+                row.estado = estados.get(periodo)
+            else:
+                nuevos.append(AnalysisResult(
+                    categoria_id=categoria_id,
+                    periodo=periodo,
+                    agente=self.agent_name,
+                    resultado=resultado,
+                    timestamp=now,
+                    version_agente=self.version,
+                    estado=estados.get(periodo)
+                ))
+        self.session.add_all(nuevos)
+        self.session.commit()
+        if self.context is not None and self.context.categoria_id == categoria_id:
+            for periodo, resultado in resultados.items():
+                self.context.put(self.agent_name, periodo, resultado)
+
+        logger.info(
+            "analysis_saved_bulk",
+            agent=self.agent_name,
+            categoria_id=categoria_id,
+            periodos=len(resultados),
+            actualizados=len(resultados) - len(nuevos),
+            creados=len(nuevos)
+        )
+        return len(resultados)
+
+    # =============================
+    # Input Fingerprint (reutilización entre ejecuciones)
+    # =============================
+    def input_fingerprint(self, categoria_id: int, periodo: str) -> str:
+        """
+        Huella de todo lo que determina el resultado del agente para el periodo:
+        conjunto de ejecuciones de la ventana, marcas/aliases, tipo de mercado,
+        versiones de los resultados de `depends_on` (y de sus otros periodos) en los periodos que lee,
+        prompts, settings que afectan al resultado (FINGERPRINT_SETTINGS) y versión del agente
+        
+        Returns:
+            SHA-256 hex
+        """
+        from sqlalchemy import func
+        from src.database.models import Categoria, Mercado, Query, QueryExecution
+        from src.analytics.brand_matcher import get_brand_matcher
+        
+        start, end, _ = self._parse_periodo(periodo)
+        # Huella del conjunto de ids sin traerlos: nº, suma y máximo
+        executions = self.read_session.query(
+            func.count(QueryExecution.id),
+            func.coalesce(func.sum(QueryExecution.id), 0),
+            func.max(QueryExecution.id)
+        ).join(
+            Query, QueryExecution.query_id == Query.id
+        ).filter(
+            Query.categoria_id == categoria_id,
+            QueryExecution.timestamp >= start,
+            QueryExecution.timestamp < end
+        ).one()
+        tipo_mercado = self.session.query(Mercado.tipo_mercado).join(
+            Categoria, Categoria.mercado_id == Mercado.id
+        ).filter(Categoria.id == categoria_id).scalar()
+        
+        # Resultados que el agente puede leer: los de sus dependencias y los suyos de otros
+        # periodos, solo en los periodos que lee (actual e historial reciente, como mucho 6
+        # con su granularidad); re-guardar otros periodos no invalida la huella
+        periodos = {periodo}
+        try:
+            periodos.update(self._get_last_periods_generic(periodo, n=6))
+        except ValueError:
+            pass
+        upstream = self.session.query(
+            AnalysisResult.agente,
+            AnalysisResult.periodo,
+            AnalysisResult.timestamp,
+            AnalysisResult.version_agente
+        ).filter(
+            AnalysisResult.categoria_id == categoria_id,
+            AnalysisResult.agente.in_(list(self.depends_on) + [self.agent_name]),
+            AnalysisResult.periodo.in_(sorted(periodos))
+        ).order_by(AnalysisResult.agente, AnalysisResult.periodo).all()
+        upstream = [
+            (r.agente, r.periodo, r.timestamp.isoformat() if r.timestamp else None, r.version_agente)
+            for r in upstream if not (r.agente == self.agent_name and r.periodo == periodo)
+        ]
+        
+        payload = {
+            'agente': self.agent_name,
+            'clase': self.__class__.__name__,
+            'version': self.version,
+            'periodo': periodo,
+            'ejecuciones': [int(v or 0) for v in executions],
+            'marcas': get_brand_matcher(self.read_session, categoria_id).fingerprint,
+            'tipo_mercado': tipo_mercado,
+            'upstream': upstream,
+            'prompts': self._prompt_fingerprint(),
+            'system_prompt': self.system_prompt,
+            'settings': _settings_digest(),
+        }
+        return hashlib.sha256(
+            json.dumps(payload, sort_keys=True, default=str, ensure_ascii=False).encode("utf-8")
+        ).hexdigest()
+    
+    def _prompt_fingerprint(self) -> Dict[str, Any]:
+        """Bloques de agent_prompts.yaml del agente (todas las variantes por mercado)"""
+        prompt_path = Path("config/prompts/agent_prompts.yaml")
+        if not prompt_path.exists():
+            return {}
+        with open(prompt_path, 'r', encoding='utf-8') as f:
+            prompts_yaml = yaml.safe_load(f) or {}
+        keys = self.prompt_keys or (f"{self.agent_name}_agent",)
+        return {key: prompts_yaml.get(key) for key in keys}
+    
+    def cached_result(self, categoria_id: int, periodo: str, fingerprint: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Resultado guardado del periodo si se calculó con la misma huella de entradas"""
+        if not fingerprint:
+            return None
+        row = self.session.query(AnalysisResult).filter_by(
+            categoria_id=categoria_id,
+            periodo=periodo,
+            agente=self.agent_name,
+            fingerprint=fingerprint
+        ).first()
+        return row.resultado if row else None
+
     # =============================
     # Prompt Loading Helpers
     # =============================
@@ -170,6 +498,20 @@ class BaseAgent(ABC):
 
         self.task_prompt = variant_task or base_task or self.task_prompt
     
+    def _get_analysis(self, agent_name: str, categoria_id: int, periodo: str) -> Dict[str, Any]:
+        """
+        Resultado de otro agente (o de este en otro periodo); {} si no existe
+        Dentro del orquestador se sirve del contexto de la ejecución (sin consulta por llamada)
+        """
+        if self.context is not None and self.context.categoria_id == categoria_id:
+            return self.context.get(self.session, agent_name, periodo)
+        result = self.session.query(AnalysisResult).filter_by(
+            categoria_id=categoria_id,
+            periodo=periodo,
+            agente=agent_name
+        ).first()
+        return result.resultado if result else {}
+    
     def get_previous_analysis(
         self,
         categoria_id: int,
@@ -177,6 +519,7 @@ class BaseAgent(ABC):
     ) -> Dict[str, Any]:
         """
         Obtiene análisis previo del mismo agente (si existe)
+        Solo el periodo inmediatamente anterior con la misma granularidad (ver _previous_periods)
         
         Args:
             categoria_id: ID de categoría
@@ -185,84 +528,245 @@ class BaseAgent(ABC):
         Returns:
             Dict con resultados o None
         """
-        # TODO: Implementar lógica para obtener periodo anterior
-        previous = self.session.query(AnalysisResult).filter_by(
-            categoria_id=categoria_id,
-            agente=self.agent_name
-        ).filter(
-            AnalysisResult.periodo < periodo
-        ).order_by(
-            AnalysisResult.periodo.desc()
-        ).first()
-        
-        if previous:
-            return previous.resultado
+        previos = self._previous_periods(periodo, n=1)
+        if not previos:
+            return None
+        return self._get_analysis(self.agent_name, categoria_id, previos[0]) or None
+    
+    def save_previous_period_fallback(
+        self,
+        categoria_id: int,
+        periodo: str,
+        motivo: str
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Guarda como resultado del periodo el último de un periodo anterior, marcado como
+        degradado y sin huella (presupuesto agotado sin resultado propio)
+        Solo periodos anteriores de la misma granularidad, y nunca otro resultado degradado
         
-        return None
+        Returns:
+            Resultado guardado o None si no hay periodo anterior
+        """
+        previos = self._previous_periods(periodo)
+        rows = {
+            r.periodo: r for r in self.session.query(AnalysisResult).filter(
+                AnalysisResult.categoria_id == categoria_id,
+                AnalysisResult.agente == self.agent_name,
+                AnalysisResult.periodo.in_(previos)
+            )
+        } if previos else {}
+        previous = next(
+            (rows[p] for p in previos if p in rows and not (rows[p].resultado or {}).get('_degradado')),
+            None
+        )
+        if not previous:
+            return None
+        resultado = {
+            **previous.resultado,
+            '_degradado': {'tipo': 'periodo_anterior', 'motivo': motivo, 'periodo_origen': previous.periodo}
+        }
+        self.save_results(categoria_id, periodo, resultado, cacheable=False)
+        return resultado
     
     # =============================
     # Period Helpers (daily/weekly/monthly)
     # =============================
     def _parse_periodo(self, periodo: str):
-        """
-        Convierte un periodo en ventana [start, end) y devuelve la granularidad.
-        Soporta:
-          - YYYY-MM-DD  -> 'daily'
-          - YYYY-Www    -> 'weekly' (ISO semana, lunes-domingo)
-          - YYYY-MM     -> 'monthly'
-          - YYYY-MM-DD..YYYY-MM-DD -> 'range' (end exclusivo al día siguiente 00:00)
-        """
-        import re
-        from datetime import datetime, timedelta
-        p = (periodo or "").strip()
-        # Rango arbitrario: YYYY-MM-DD..YYYY-MM-DD
-        if '..' in p:
-            start_s, end_s = p.split('..', 1)
-            start = datetime.strptime(start_s.strip(), '%Y-%m-%d')
-            end = datetime.strptime(end_s.strip(), '%Y-%m-%d') + timedelta(days=1)  # fin exclusivo
-            return start, end, 'range'
-
-        if re.match(r'^\d{4}-\d{2}-\d{2}$', p):  # diario
-            start = datetime.strptime(p, '%Y-%m-%d')
-            end = start + timedelta(days=1)
-            return start, end, 'daily'
-        if re.match(r'^\d{4}-W\d{2}$', p):       # semanal ISO
-            y, w = p.split('-W')
-            start = datetime.fromisocalendar(int(y), int(w), 1)  # lunes
-            end = start + timedelta(days=7)
-            return start, end, 'weekly'
-        if re.match(r'^\d{4}-\d{2}$', p):        # mensual
-            start = datetime.strptime(p, '%Y-%m')
-            y, m = start.year, start.month
-            end = (datetime(y+1, 1, 1) if m == 12 else datetime(y, m+1, 1))
-            return start, end, 'monthly'
-        raise ValueError(f"Formato de periodo no soportado: {periodo}")
+        """Ventana [start, end) y granularidad del periodo (ver parse_periodo)"""
+        return parse_periodo(periodo)
 
     def _get_last_periods_generic(self, periodo: str, n: int = 6):
         """Devuelve últimos n periodos según granularidad del periodo dado (incluye actual)."""
-        from datetime import timedelta
-        start, _, gran = self._parse_periodo(periodo)
-        periods = []
-        for i in range(n-1, -1, -1):
-            if gran == 'daily':
-                d = start - timedelta(days=i)
-                periods.append(d.strftime('%Y-%m-%d'))
-            elif gran == 'weekly':
-                d = start - timedelta(weeks=i)
-                iso = d.isocalendar()
-                periods.append(f"{iso.year}-W{iso.week:02d}")
-            else:  # monthly
-                y, m = start.year, start.month - i
-                while m <= 0:
-                    y -= 1
-                    m += 12
-                periods.append(f"{y}-{m:02d}")
-        return periods
+        return last_periods(periodo, n)
 
     def _get_previous_periodo_generic(self, periodo: str) -> str:
         seq = self._get_last_periods_generic(periodo, n=2)
         return seq[0] if len(seq) == 2 else None
+
+    def _previous_periods(self, periodo: str, n: int = 6) -> list:
+        """
+        Hasta n periodos anteriores con la misma granularidad, del más reciente al más antiguo
+        (vacío para rangos, que no tienen periodo anterior)
+        """
+        if parse_periodo(periodo)[2] == 'range':
+            return []
+        return self._get_last_periods_generic(periodo, n=n + 1)[-2::-1]
+
+    @staticmethod
+    def _periodo_for_date(d, granularity: str) -> str:
+        """Periodo (daily/weekly/monthly) que contiene la fecha `d`"""
+        if granularity == 'daily':
+            return d.strftime('%Y-%m-%d')
+        if granularity == 'weekly':
+            iso = d.isocalendar()
+            return f"{iso.year}-W{iso.week:02d}"
+        if granularity == 'monthly':
+            return f"{d.year}-{d.month:02d}"
+        raise ValueError(f"Granularidad no soportada: {granularity}")
+
+    def _periods_between(self, date_from, date_to, granularity: str) -> list:
+        """Periodos consecutivos (orden cronológico) que cubren [date_from, date_to]"""
+        from datetime import timedelta
+        periods = []
+        d = date_from
+        while d <= date_to:
+            p = self._periodo_for_date(d, granularity)
+            if not periods or periods[-1] != p:
+                periods.append(p)
+            d += timedelta(days=1)
+        return periods
     
+    # =============================
+    # Execution Loaders (streaming, columnas proyectadas)
+    # =============================
+    def _execution_query(
+        self,
+        categoria_id: int,
+        start: datetime,
+        end: datetime,
+        with_text: bool = True,
+        require_text: bool = False,
+        after_id: Optional[int] = None
+    ):
+        """
+        Consulta de ejecuciones de la categoría en [start, end) con solo las columnas necesarias
+        (id, query_id, proveedor_ia, timestamp[, respuesta_texto]); filas ligeras, sin identity map
+
+        Args:
+            after_id: Solo ejecuciones con id mayor (procesado incremental)
+        """
+        from src.database.models import Query, QueryExecution
+        columns = [
+            QueryExecution.id,
+            QueryExecution.query_id,
+            QueryExecution.proveedor_ia,
+            QueryExecution.timestamp,
+        ]
+        if with_text:
+            columns.append(QueryExecution.respuesta_texto)
+        query = self.read_session.query(*columns).join(
+            Query, QueryExecution.query_id == Query.id
+        ).filter(
+            Query.categoria_id == categoria_id,
+            QueryExecution.timestamp >= start,
+            QueryExecution.timestamp < end
+        )
+        if require_text:
+            query = query.filter(QueryExecution.respuesta_texto.isnot(None))
+        if after_id is not None:
+            query = query.filter(QueryExecution.id > after_id)
+        return query
+
+    def iter_executions(
+        self,
+        categoria_id: int,
+        start: datetime,
+        end: datetime,
+        with_text: bool = True,
+        require_text: bool = False,
+        after_id: Optional[int] = None
+    ) -> Iterator[Any]:
+        """
+        Recorre las ejecuciones del periodo por lotes (cursor de servidor en PostgreSQL)
+        La memoria del agente no crece con el tamaño del periodo
+
+        Yields:
+            Filas con id, query_id, proveedor_ia, timestamp[, respuesta_texto]
+        """
+        query = self._execution_query(categoria_id, start, end, with_text, require_text, after_id)
+        yield from query.yield_per(STREAM_BATCH_SIZE)
+
+    def text_mention_matrix(
+        self,
+        categoria_id: int,
+        start: datetime,
+        end: datetime,
+        marcas: Sequence[Any],
+        matcher,
+        after_id: Optional[int] = None,
+        require_text: bool = False
+    ):
+        """
+        MentionMatrix escaneando el texto con el BrandMatcher
+        En ventanas grandes reparte el escaneo entre procesos (analytics.extraction);
+        si no, una pasada en streaming en este proceso
+        """
+        from src.analytics.mention_matrix import MentionMatrix
+        from src.analytics import parallel_extraction
+        if parallel_extraction.extraction_workers() > 1:
+            total = self.count_executions(categoria_id, start, end, require_text=require_text, after_id=after_id)
+            if parallel_extraction.should_parallelize(total):
+                matrix = parallel_extraction.extract_parallel(
+                    self.read_session, categoria_id, start, end, marcas,
+                    after_id=after_id, require_text=require_text
+                )
+                if matrix is not None:
+                    return matrix
+        return MentionMatrix.from_texts(
+            self.iter_executions(categoria_id, start, end, require_text=require_text, after_id=after_id),
+            matcher,
+            marcas
+        )
+
+    def driver_index(self, categoria_id: int, start: datetime, end: datetime):
+        """
+        Índice keyword de driver → (ejecución, marca) del periodo
+        Una pasada por los textos; cacheado mientras no cambien ejecuciones ni aliases
+        """
+        from src.database.models import Marca
+        from src.analytics.brand_matcher import matcher_for_marcas
+        from src.analytics.driver_index import DriverIndex, cached_index
+        marcas = self.read_session.query(Marca).filter_by(categoria_id=categoria_id).all()
+        matcher = matcher_for_marcas(categoria_id, marcas)
+        total = self.count_executions(categoria_id, start, end, require_text=True)
+        return cached_index(
+            (categoria_id, start, end, matcher.fingerprint, total),
+            lambda: DriverIndex(matcher).add_executions(
+                self.iter_executions(categoria_id, start, end, require_text=True)
+            )
+        )
+
+    def count_executions(
+        self,
+        categoria_id: int,
+        start: datetime,
+        end: datetime,
+        require_text: bool = False,
+        after_id: Optional[int] = None
+    ) -> int:
+        """Nº de ejecuciones del periodo (COUNT en base de datos)"""
+        from sqlalchemy import func
+        from src.database.models import Query, QueryExecution
+        query = self.read_session.query(func.count(QueryExecution.id)).join(
+            Query, QueryExecution.query_id == Query.id
+        ).filter(
+            Query.categoria_id == categoria_id,
+            QueryExecution.timestamp >= start,
+            QueryExecution.timestamp < end
+        )
+        if require_text:
+            query = query.filter(QueryExecution.respuesta_texto.isnot(None))
+        if after_id is not None:
+            query = query.filter(QueryExecution.id > after_id)
+        return int(query.scalar() or 0)
+
+    def load_executions_by_id(self, execution_ids: Sequence[int]) -> Dict[int, Any]:
+        """Carga (con texto y pregunta) solo las ejecuciones indicadas: {id: fila}"""
+        from src.database.models import Query, QueryExecution
+        if not execution_ids:
+            return {}
+        rows = self.read_session.query(
+            QueryExecution.id,
+            QueryExecution.query_id,
+            QueryExecution.proveedor_ia,
+            QueryExecution.timestamp,
+            QueryExecution.respuesta_texto,
+            Query.pregunta
+        ).join(
+            Query, QueryExecution.query_id == Query.id
+        ).filter(QueryExecution.id.in_(list(execution_ids))).all()
+        return {r.id: r for r in rows}
+
     def _get_stratified_sample(self, categoria_id: int, periodo: str, samples_per_group: int = 2) -> str:
         """
         Obtiene muestra estratificada de respuestas textuales.
@@ -277,38 +781,32 @@ class BaseAgent(ABC):
         Returns:
             String formateado con las respuestas textuales estratificadas
         """
-        from src.database.models import Query, QueryExecution
         start, end, _ = self._parse_periodo(periodo)
         
-        # Obtener TODAS las ejecuciones con respuesta_texto en ventana [start, end)
-        executions = self.session.query(QueryExecution).join(
-            Query
-        ).filter(
-            Query.categoria_id == categoria_id,
-            QueryExecution.respuesta_texto.isnot(None),
-            QueryExecution.timestamp >= start,
-            QueryExecution.timestamp < end
-        ).all()
+        # Pasada en streaming solo con metadatos (sin texto): ids agrupados por (query_id, proveedor_ia)
+        groups = defaultdict(list)
+        total = 0
+        for row in self.iter_executions(categoria_id, start, end, with_text=False, require_text=True):
+            groups[(row.query_id, row.proveedor_ia)].append(row.id)
+            total += 1
         
-        if not executions:
+        if not total:
             return "No hay respuestas textuales disponibles para este periodo."
         
-        # Agrupar por (query_id, proveedor_ia) para estratificación
-        groups = defaultdict(list)
-        for execution in executions:
-            key = (execution.query_id, execution.proveedor_ia)
-            groups[key].append(execution)
-        
         # Seleccionar muestra estratificada
-        sampled = []
-        for group_executions in groups.values():
+        sampled_ids = []
+        for group_ids in groups.values():
             # Tomar N aleatorias de cada grupo (o todas si hay menos de N)
-            sample_size = min(samples_per_group, len(group_executions))
-            sampled.extend(random.sample(group_executions, sample_size))
+            sample_size = min(samples_per_group, len(group_ids))
+            sampled_ids.extend(random.sample(group_ids, sample_size))
+        
+        # Texto y pregunta solo de las ejecuciones muestreadas
+        by_id = self.load_executions_by_id(sampled_ids)
+        sampled = [by_id[i] for i in sampled_ids if i in by_id]
         
         # Log información de la estratificación
         self.logger.info(
-            f"Muestreo estratificado: {len(sampled)} respuestas de {len(groups)} grupos (total: {len(executions)})",
+            f"Muestreo estratificado: {len(sampled)} respuestas de {len(groups)} grupos (total: {total})",
             categoria_id=categoria_id,
             periodo=periodo
         )
@@ -319,7 +817,7 @@ class BaseAgent(ABC):
             texto_truncado = execution.respuesta_texto[:1000] if execution.respuesta_texto else ""
             formatted.append(
                 f"--- RESPUESTA {i} ---\n"
-                f"Query: {execution.query.pregunta if execution.query else 'N/A'}\n"
+                f"Query: {execution.pregunta or 'N/A'}\n"
                 f"Proveedor: {execution.proveedor_ia}\n"
                 f"Contenido: {texto_truncado}\n"
             )
@@ -329,6 +827,7 @@ class BaseAgent(ABC):
     # =============================
     # LLM Generation + Validation
     # =============================
+    @tracing.traced('llm.generate_with_validation')
     def _generate_with_validation(
         self,
         prompt: str,
@@ -365,6 +864,11 @@ class BaseAgent(ABC):
 
         augmented_prompt = prompt
         last_error: Optional[str] = None
+        tracing.set_attributes(**{
+            'llm.provider': provider,
+            'llm.model': llm_model or getattr(client, "model", None),
+            'llm.schema': pydantic_model.__name__,
+        })
 
         def _clip_to_balanced_json(text: str) -> str:
             # Intenta recortar al primer JSON balanceado ({} o []) ignorando braces dentro de comillas simples/dobles
@@ -408,6 +912,7 @@ class BaseAgent(ABC):
             return s[start_idx:]
 
         for attempt in range(max_retries + 1):
+            tracing.set_attributes(**{'llm.attempts': attempt + 1})
             try:
                 result = client.execute_query(
                     question=augmented_prompt,
@@ -462,25 +967,26 @@ class BaseAgent(ABC):
                     error=last_error
                 )
                 # Intento de reparación: recortar al JSON balanceado y revalidar inmediatamente
-                try:
-                    clipped = _clip_to_balanced_json(raw_text)
-                    if clipped and clipped != raw_text:
-                        try:
-                            parsed_obj = pydantic_model.model_validate_json(clipped)  # type: ignore[attr-defined]
-                        except AttributeError:
-                            parsed_obj = pydantic_model.parse_raw(clipped)  # type: ignore[attr-defined]
-                        try:
-                            parsed_dict = parsed_obj.model_dump()  # type: ignore[attr-defined]
-                        except Exception:
-                            parsed_dict = parsed_obj.dict()  # type: ignore[attr-defined]
-                        return {
-                            "parsed": parsed_dict,
-                            "raw_response": clipped,
-                            "success": True,
-                            "error": None,
-                        }
-                except Exception:
-                    pass
+                with tracing.span('llm.json_repair') as repair:
+                    try:
+                        clipped = _clip_to_balanced_json(raw_text)
+                        if clipped and clipped != raw_text:
+                            try:
+                                parsed_obj = pydantic_model.model_validate_json(clipped)  # type: ignore[attr-defined]
+                            except AttributeError:
+                                parsed_obj = pydantic_model.parse_raw(clipped)  # type: ignore[attr-defined]
+                            try:
+                                parsed_dict = parsed_obj.model_dump()  # type: ignore[attr-defined]
+                            except Exception:
+                                parsed_dict = parsed_obj.dict()  # type: ignore[attr-defined]
+                            return {
+                                "parsed": parsed_dict,
+                                "raw_response": clipped,
+                                "success": True,
+                                "error": None,
+                            }
+                    except Exception as e:
+                        repair.set_error(str(e))
                 # Reintentar con instrucción de corrección de formato
                 augmented_prompt = (
                     prompt
@@ -493,6 +999,7 @@ class BaseAgent(ABC):
                 self.logger.error("error_llm_generate", error=last_error)
                 break
 
+        tracing.current_span().set_error(last_error or "unknown_error")
         return {
             "parsed": None,
             "raw_response": "",
@@ -8,7 +8,7 @@ import yaml
 from pathlib import Path
 from typing import Dict, Any
 from src.analytics.agents.base_agent import BaseAgent
-from src.database.models import AnalysisResult, QueryExecution, Categoria, Mercado, Query
+from src.database.models import QueryExecution, Categoria, Mercado, Query
 from sqlalchemy import extract
 from src.query_executor.api_clients import OpenAIClient
 
@@ -19,8 +19,8 @@ class CampaignAnalysisAgent(BaseAgent):
     Detecta y analiza actividad de marketing, campañas publicitarias y estrategias de comunicación
     """
     
-    def __init__(self, session, version: str = "1.0.0"):
-        super().__init__(session, version)
+    def __init__(self, session, version: str = "1.0.0", read_session=None):
+        super().__init__(session, version, read_session)
         self.client = OpenAIClient()
         self.load_prompts()
     
@@ -245,7 +245,7 @@ IMPORTANTE:
         responses = []
         
         for keyword in marketing_keywords:
-            query_executions = self.session.query(QueryExecution).join(Query).filter(
+            query_executions = self.read_session.query(QueryExecution).join(Query).filter(
                 Query.categoria_id == categoria_id,
                 extract('year', QueryExecution.timestamp) == year,
                 extract('month', QueryExecution.timestamp) == month,
@@ -258,7 +258,7 @@ IMPORTANTE:
         
         # Si no hay respuestas específicas, obtener muestra general
         if len(responses) < 10:
-            general_executions = self.session.query(QueryExecution).join(Query).filter(
+            general_executions = self.read_session.query(QueryExecution).join(Query).filter(
                 Query.categoria_id == categoria_id,
                 extract('year', QueryExecution.timestamp) == year,
                 extract('month', QueryExecution.timestamp) == month
@@ -273,14 +273,3 @@ IMPORTANTE:
             return "No hay respuestas disponibles para este periodo."
         
         return "\n\n---\n\n".join(unique_responses)
-    
-    def _get_analysis(self, agent_name: str, categoria_id: int, periodo: str) -> Dict:
-        """Helper para obtener análisis previo"""
-        result = self.session.query(AnalysisResult).filter_by(
-            categoria_id=categoria_id,
-            periodo=periodo,
-            agente=agent_name
-        ).first()
-        
-        return result.resultado if result else {}
-
@@ -19,10 +19,10 @@ class CampaignAnalysisAgent(BaseAgent):
     Identifica actividad publicitaria, mensajes clave y efectividad de comunicación
     """
     
-    def __init__(self, session, version: str = "1.0.0"):
-        super().__init__(session, version)
+    def __init__(self, session, version: str = "1.0.0", read_session=None):
+        super().__init__(session, version, read_session)
         self.client = OpenAIClient()
-        self.rag_manager = RAGManager(session)
+        self.rag_manager = RAGManager(session, read_session=read_session)
         # Normalizamos el nombre del agente
         self.agent_name = 'campaign_analysis'
         self.top_k_fragments = 10
@@ -135,7 +135,7 @@ class CampaignAnalysisAgent(BaseAgent):
             # Fallback mínimo si sigue sin parsed
             if not parsed:
                 resultado = self._get_empty_result(categoria_id, periodo)
-                self.save_results(categoria_id, periodo, resultado)
+                self.save_results(categoria_id, periodo, resultado, cacheable=False)
                 return resultado
 
             # Añadir metadata estándar
@@ -17,10 +17,10 @@ class ChannelAnalysisAgent(BaseAgent):
     Identifica estrategias omnicanal, gaps de e-commerce y experiencia retail
     """
     
-    def __init__(self, session, version: str = "1.0.0"):
-        super().__init__(session, version)
+    def __init__(self, session, version: str = "1.0.0", read_session=None):
+        super().__init__(session, version, read_session)
         self.client = OpenAIClient()
-        self.rag_manager = RAGManager(session)
+        self.rag_manager = RAGManager(session, read_session=read_session)
         # Normalizamos el nombre del agente
         self.agent_name = 'channel_analysis'
         self.top_k_fragments = 10
@@ -116,7 +116,7 @@ class ChannelAnalysisAgent(BaseAgent):
 
             if not parsed:
                 resultado = self._get_empty_result(categoria_id, periodo)
-                self.save_results(categoria_id, periodo, resultado)
+                self.save_results(categoria_id, periodo, resultado, cacheable=False)
                 return resultado
 
             parsed['periodo'] = periodo
@@ -6,7 +6,6 @@ Análisis de posicionamiento competitivo
 from typing import Dict, Any, List, Optional
 from pydantic import BaseModel, Field
 from src.analytics.agents.base_agent import BaseAgent
-from src.database.models import AnalysisResult
 
 
 class EvidenceItem(BaseModel):
@@ -40,6 +39,8 @@ class CompetitiveAgent(BaseAgent):
     Agente de análisis competitivo
     Lee resultados de agentes previos y genera análisis comparativo
     """
+
+    depends_on = ('quantitative', 'qualitative', 'trends', 'campaign_analysis', 'channel_analysis')
     
     def analyze(self, categoria_id: int, periodo: str) -> Dict[str, Any]:
         """
@@ -212,7 +213,7 @@ class CompetitiveAgent(BaseAgent):
                 'ranking_sov': [m for m, _ in sorted(sov.items(), key=lambda x: x[1], reverse=True)],
                 'perfiles_competidores': [],
             }
-            self.save_results(categoria_id, periodo, fallback)
+            self.save_results(categoria_id, periodo, fallback, cacheable=False)
             return fallback
         # Post-proceso mínimo: normalizar periodo/fuente y añadir KPI reputación + trazabilidad campañas/canales
         try:
@@ -279,14 +280,3 @@ class CompetitiveAgent(BaseAgent):
         # Guardar y devolver
         self.save_results(categoria_id, periodo, parsed)
         return parsed
-    
-    def _get_analysis(self, agent_name: str, categoria_id: int, periodo: str) -> Dict:
-        """Helper para obtener análisis previo"""
-        result = self.session.query(AnalysisResult).filter_by(
-            categoria_id=categoria_id,
-            periodo=periodo,
-            agente=agent_name
-        ).first()
-        
-        return result.resultado if result else {}
-
@@ -16,10 +16,10 @@ class CustomerJourneyAgent(BaseAgent):
     Agente de Customer Journey y Buyer Personas
     """
 
-    def __init__(self, session, version: str = "1.0.0"):
-        super().__init__(session, version)
+    def __init__(self, session, version: str = "1.0.0", read_session=None):
+        super().__init__(session, version, read_session)
         self.client = OpenAIClient()
-        self.rag_manager = RAGManager(session)
+        self.rag_manager = RAGManager(session, read_session=read_session)
         self.agent_name = 'customer_journey'
         self.top_k_fragments = 12
 
@@ -19,10 +19,10 @@ class ESGAnalysisAgent(BaseAgent):
     Identifica controversias, percepción de sostenibilidad y drivers de compra ESG
     """
     
-    def __init__(self, session, version: str = "1.0.0"):
-        super().__init__(session, version)
+    def __init__(self, session, version: str = "1.0.0", read_session=None):
+        super().__init__(session, version, read_session)
         self.client = AnthropicClient()
-        self.rag_manager = RAGManager(session)
+        self.rag_manager = RAGManager(session, read_session=read_session)
         # Normalizamos el nombre del agente
         self.agent_name = 'esg_analysis'
         self.top_k_fragments = 10
@@ -140,7 +140,7 @@ class ESGAnalysisAgent(BaseAgent):
                 resultado['insights_esg'] = [
                     'Se detecta señal baja en ESG en el periodo actual; reforzar queries y monitoreo de controversias.'
                 ]
-                self.save_results(categoria_id, periodo, resultado)
+                self.save_results(categoria_id, periodo, resultado, cacheable=False)
                 return resultado
 
             parsed['periodo'] = periodo
@@ -1,32 +1,270 @@
 """
 Executive Agent
 Síntesis ejecutiva final - Genera el informe completo
+
+El informe se genera por secciones (EXECUTIVE_SECTIONS): cada una con su prompt, su
+contexto (solo los análisis previos que usa), su esquema Pydantic y su límite de tokens.
+Las secciones se generan en paralelo (analytics.executive.max_parallel_sections), cada
+una con sus propios reintentos; una sección que sigue fallando se toma del report del
+periodo anterior (marcada '_degradado') y el resto del informe no se pierde.
 """
 
+import contextvars
 import json
+import os
+import re
+import textwrap
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 import yaml
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, Iterable, Tuple
 from src.analytics.agents.base_agent import BaseAgent
 from src.analytics.rag_manager import RAGManager
-from src.database.models import AnalysisResult, Report, Categoria, Mercado
-from src.query_executor.api_clients import OpenAIClient
+from src.analytics.schemas import (
+    ResumenEjecutivoSection,
+    NarrativaSection,
+    AnalisisCompetitivoSection,
+    ConsumidorSection,
+    OportunidadesRiesgosSection,
+    Plan90DiasSection,
+)
+from src.database.models import Report, Categoria, Mercado
+from src.query_executor.api_clients.usage import usage_scope, active_scopes, adopt_scopes
+from src.utils import tracing
 from sqlalchemy.exc import IntegrityError
 
+DEFAULT_EXECUTIVE_SETTINGS = {
+    'max_parallel_sections': 4,   # secciones generadas a la vez (1 = secuencial)
+    'max_retries': 2,             # reintentos por sección (JSON inválido o fuera de esquema)
+}
+
+
+def _load_executive_settings(config_path: str = "config/settings.yaml") -> Dict[str, int]:
+    """Lee analytics.executive de settings (EXECUTIVE_MAX_PARALLEL_SECTIONS tiene prioridad)"""
+    settings = dict(DEFAULT_EXECUTIVE_SETTINGS)
+    try:
+        with open(config_path, "r", encoding="utf-8") as f:
+            cfg = yaml.safe_load(f) or {}
+        settings.update({
+            k: int(v) for k, v in ((cfg.get("analytics") or {}).get("executive") or {}).items()
+            if k in DEFAULT_EXECUTIVE_SETTINGS
+        })
+    except Exception:
+        pass
+    if os.getenv("EXECUTIVE_MAX_PARALLEL_SECTIONS"):
+        settings['max_parallel_sections'] = int(os.getenv("EXECUTIVE_MAX_PARALLEL_SECTIONS"))
+    return settings
+
+
+EXECUTIVE_SETTINGS = _load_executive_settings()
+
+# Secciones del informe, en el orden en que se presentan:
+#   titulo · schema: modelo Pydantic de la sección · max_tokens: salida de la llamada
+#   contexto: bloques de datos del prompt (ver ExecutiveAgent._context_blocks)
+#   plantilla: estructura JSON que se pide (solo el contenido de la sección)
+EXECUTIVE_SECTIONS: Dict[str, Dict[str, Any]] = {
+    'resumen_ejecutivo': {
+        'titulo': 'RESUMEN EJECUTIVO',
+        'schema': ResumenEjecutivoSection,
+        'max_tokens': 3000,
+        'contexto': ('kpis', 'historico', 'transversal', 'estrategico', 'citas'),
+        'plantilla': """{
+  "narrativa_principal": "DESARROLLA EN 4-6 PÁRRAFOS: Empieza con la situación del mercado (integrando KPIs clave como SOV, menciones y tendencias). Luego desarrolla la complicación (la tensión estratégica central con evidencia cuantitativa + citas cualitativas de la muestra de respuestas + patrones del análisis TRANSVERSAL). Finalmente responde a la pregunta clave con los hallazgos principales y su implicación. USA EXPLÍCITAMENTE los 'temas_comunes' del TRANSVERSAL como hilos conductores. Si hay 'contradicciones', señálalas. Narrativa fluida y argumentativa, no una lista.",
+  "hallazgos_clave": [
+    "Hallazgo 1 con evidencia integrada (KPI + cita cualitativa)",
+    "Hallazgo 2 respondiendo a la pregunta clave",
+    "Hallazgo 3 accionable con implicación de negocio",
+    "Hallazgo 4",
+    "Hallazgo 5"
+  ],
+  "recomendacion_principal": "1-2 párrafos con la recomendación estratégica de más alto nivel, vinculada a resolver la complicación",
+  "answer_first": {
+    "the_answer": "La recomendación principal, concreta y cuantificada",
+    "the_why": "El porqué con 2-3 argumentos basados en datos",
+    "the_how": "La palanca principal y la lógica de ejecución a 90 días",
+    "the_impact": "Impacto esperado cuantificado con horizonte temporal"
+  }
+}""",
+    },
+    'panorama_mercado': {
+        'titulo': 'PANORAMA DE MERCADO',
+        'schema': NarrativaSection,
+        'max_tokens': 2000,
+        'contexto': ('kpis', 'mercado'),
+        'plantilla': """{
+  "narrativa": "DESARROLLA EN 5-7 PÁRRAFOS: Describe la naturaleza del mercado/categoría (usando la situación de la narrativa central como apertura), tamaño y crecimiento si disponible, drivers de categoría principales con ejemplos específicos de cómo impactan decisiones, factores PESTEL más relevantes con implicaciones concretas (NO genéricas), análisis de Fuerzas de Porter adaptado a este mercado. USA EXPLÍCITAMENTE los datos del JSON 'CONTEXTO DE MERCADO': 'panorama_general', 'analisis_pestel', 'fuerzas_porter', 'drivers_categoria' y 'sintesis_estrategica'. Cuenta cómo funciona este mercado y qué factores lo moldean. Conecta los factores entre sí."
+}""",
+    },
+    'analisis_competitivo': {
+        'titulo': 'ANÁLISIS COMPETITIVO',
+        'schema': AnalisisCompetitivoSection,
+        'max_tokens': 3000,
+        'contexto': ('kpis', 'competitivo', 'pricing'),
+        'plantilla': """{
+  "narrativa_dinamica": "DESARROLLA EN 4-6 PÁRRAFOS: Analiza la dinámica competitiva actual: quién domina y por qué (con datos de SOV y sentimiento), cómo se posicionan las marcas principales, correlaciones entre visibilidad/percepción/marketing/canal, gaps competitivos explotables. USA EXPLÍCITAMENTE el JSON 'PRICING POWER': 'perceptual_map' (marca, precio, calidad, sov) para identificar marcas premium vs value y gaps de posicionamiento, y 'brand_pricing_metrics' (price_premium_pct, elasticity_signal, discounting_frequency). Menciona explícitamente 'Como muestra el Gráfico de SOV...'",
+  "perfiles_narrativos": [
+    {
+      "marca": "Marca Principal 1",
+      "analisis_profundo": "DESARROLLA EN 2-3 PÁRRAFOS: Posicionamiento percibido con evidencia, fortalezas clave sustentadas por datos, debilidades y vulnerabilidades específicas, estrategia de marketing y canal inferida, oportunidades de ataque o defensa."
+    },
+    {"marca": "Marca Principal 2", "analisis_profundo": "DESARROLLA EN 2-3 PÁRRAFOS: [Mismo formato]"},
+    {"marca": "Marca Principal 3", "analisis_profundo": "DESARROLLA EN 2-3 PÁRRAFOS: [Mismo formato]"}
+  ]
+}""",
+    },
+    'analisis_campanas': {
+        'titulo': 'ANÁLISIS DE CAMPAÑAS',
+        'schema': NarrativaSection,
+        'max_tokens': 1800,
+        'contexto': ('kpis', 'campanas', 'canales'),
+        'plantilla': """{
+  "narrativa": "DESARROLLA EN 3-5 PÁRRAFOS: Síntesis de la actividad de marketing en el mercado: qué marcas comunican activamente y cómo, principales campañas y mensajes clave, canales utilizados, percepción de efectividad y recepción cualitativa, gaps (marcas silenciosas o con comunicación inefectiva a pesar de alto SOV). USA EXPLÍCITAMENTE 'marca_mas_activa', 'mensajes_clave', 'canales_destacados', 'campanas_especificas' (nombre, canales, mensaje_central, recepcion) y 'gaps_marketing'. CITA ejemplos concretos de campañas y su recepción."
+}""",
+    },
+    'analisis_canales': {
+        'titulo': 'ANÁLISIS DE CANALES',
+        'schema': NarrativaSection,
+        'max_tokens': 1800,
+        'contexto': ('canales', 'citas'),
+        'plantilla': """{
+  "narrativa": "DESARROLLA EN 3-5 PÁRRAFOS: Estrategias de distribución observadas (intensiva/selectiva/exclusiva), ventajas competitivas en accesibilidad y presencia omnicanal, gaps de e-commerce y oportunidades digitales, retailers clave y experiencia de compra diferenciada. USA EXPLÍCITAMENTE 'marca_mejor_distribuida', 'gaps_e_commerce', 'retailers_clave', 'disponibilidad_por_marca' (canales_presencia, facilidad_encontrar, problemas_reportados) y 'tendencias_canal'. CITA ejemplos concretos por marca."
+}""",
+    },
+    'analisis_sostenibilidad_packaging': {
+        'titulo': 'SOSTENIBILIDAD Y PACKAGING',
+        'schema': NarrativaSection,
+        'max_tokens': 1800,
+        'contexto': ('kpis', 'esg', 'packaging'),
+        'plantilla': """{
+  "narrativa": "DESARROLLA EN 3-4 PÁRRAFOS: Percepción ESG del mercado (controversias, líderes, rezagados), análisis de packaging (problemas funcionales, diseño, innovaciones), importancia relativa de ESG y packaging como drivers de decisión, oportunidades de diferenciación. USA EXPLÍCITAMENTE del JSON ESG 'controversias_clave', 'driver_compra_sostenibilidad', 'benchmarking_marcas' y 'gaps_oportunidades'; del JSON de PACKAGING 'quejas_packaging', 'atributos_valorados', 'innovaciones_detectadas' y 'benchmarking_funcional'. CONECTA ESG y packaging cuando sea relevante."
+}""",
+    },
+    'consumidor': {
+        'titulo': 'CONSUMIDOR (VoC)',
+        'schema': ConsumidorSection,
+        'max_tokens': 2000,
+        'contexto': ('kpis', 'journey', 'citas'),
+        'plantilla': """{
+  "narrativa_voz_cliente": "DESARROLLA EN 4-5 PÁRRAFOS: Integra citas textuales directas de la muestra de respuestas para dar vida a la voz del consumidor. Desarrolla drivers de elección con ejemplos específicos de POR QUÉ eligen cada marca, explica barreras de compra con evidencia cualitativa, describe ocasiones de consumo principales y cómo impactan la decisión, identifica tensiones o contradicciones. HAZ QUE EL CONSUMIDOR COBRE VIDA con sus propias palabras entrecomilladas."
+}""",
+    },
+    'customer_journey': {
+        'titulo': 'CUSTOMER JOURNEY',
+        'schema': NarrativaSection,
+        'max_tokens': 1500,
+        'contexto': ('journey', 'citas'),
+        'plantilla': """{
+  "narrativa": "DESARROLLA EN 2-3 PÁRRAFOS: Explica el recorrido típico detectado (awareness→advocacy), pain points transversales por etapa, touchpoints dominantes (online/offline) y cómo esto se conecta con la Complicación. USA EXPLÍCITAMENTE 'stages' (name, pain_points, touchpoints, insights) y 'buyer_personas' del JSON 'CUSTOMER JOURNEY'. Incluye 1-2 citas textuales si es posible y menciona brevemente 1-2 buyer personas relevantes con sus características concretas."
+}""",
+    },
+    'sentimiento_reputacion': {
+        'titulo': 'SENTIMIENTO Y REPUTACIÓN',
+        'schema': NarrativaSection,
+        'max_tokens': 1800,
+        'contexto': ('kpis', 'historico', 'campanas', 'canales', 'citas'),
+        'plantilla': """{
+  "narrativa": "DESARROLLA EN 3-4 PÁRRAFOS: Presenta scores de sentimiento por marca con contexto (no solo números), EXPLICA el 'por qué' detrás de cada score con insights cualitativos del texto crudo, analiza correlaciones entre sentimiento/SOV/marketing, identifica cambios vs periodos anteriores si hay contexto histórico. Menciona 'Como muestra el Gráfico de Sentimiento...'"
+}""",
+    },
+    'oportunidades_riesgos': {
+        'titulo': 'OPORTUNIDADES Y RIESGOS',
+        'schema': OportunidadesRiesgosSection,
+        'max_tokens': 3000,
+        'contexto': ('estrategico', 'escenarios', 'transversal'),
+        'plantilla': """{
+  "narrativa_oportunidades": "DESARROLLA EN 3-4 PÁRRAFOS: Profundiza en las TOP 3-5 oportunidades más críticas, explicando la lógica, evidencia multi-fuente, impacto potencial, y cómo capitalizarlas. USA el JSON 'ESCENARIOS' ('best_case': probability, drivers, description, impact, recommended_actions) para contextualizarlas.",
+  "narrativa_riesgos": "DESARROLLA EN 3-4 PÁRRAFOS: Profundiza en los TOP 3-5 riesgos más graves, explicando probabilidad, severidad, evidencia, y estrategias de mitigación. USA 'worst_case' y 'base_case' del JSON 'ESCENARIOS' para identificar escenarios de mayor peligro y estrategias de mitigación concretas.",
+  "oportunidades": [
+    {"titulo": "Oportunidad del ANÁLISIS ESTRATÉGICO (top 5, misma estructura)", "descripcion": "...", "impacto": "alto|medio|bajo", "esfuerzo": "alto|medio|bajo", "prioridad": "alta|media|baja"}
+  ],
+  "riesgos": [
+    {"titulo": "Riesgo del ANÁLISIS ESTRATÉGICO (top 5, misma estructura)", "descripcion": "...", "probabilidad": "alta|media|baja", "severidad": "alta|media|baja", "mitigacion": "..."}
+  ],
+  "dafo_sintesis": {
+    "fortalezas_clave": ["F1", "F2", "F3"],
+    "debilidades_clave": ["D1", "D2", "D3"],
+    "oportunidades_clave": ["O1", "O2", "O3"],
+    "amenazas_clave": ["A1", "A2", "A3"],
+    "cruces_estrategicos": "DESARROLLA EN 2-3 PÁRRAFOS: Analiza los cruces DAFO más relevantes (FO, DO, FA, DA)"
+  }
+}""",
+    },
+    'plan_90_dias': {
+        'titulo': 'PLAN 90 DÍAS',
+        'schema': Plan90DiasSection,
+        'max_tokens': 3000,
+        'contexto': ('estrategico', 'campanas', 'canales', 'pricing', 'journey', 'escenarios'),
+        'plantilla': """{
+  "narrativa_estrategia": "DESARROLLA EN 2-3 PÁRRAFOS: Explica la lógica del plan de acción completo: por qué estas iniciativas, en este orden, para resolver la complicación identificada. USA EXPLÍCITAMENTE 'ANÁLISIS DE CAMPAÑAS' (campanas_especificas, gaps_marketing), 'ANÁLISIS DE CANALES' (gaps_e_commerce, disponibilidad_por_marca, problemas_reportados), 'PRICING POWER' (elasticity_signal, discounting_frequency), 'CUSTOMER JOURNEY' (pain_points por etapa) y 'ESCENARIOS' (recommended_actions de base_case) para PRIORIZAR iniciativas basadas en evidencia real.",
+  "iniciativas": [
+    {
+      "titulo": "Iniciativa 1",
+      "descripcion": "QUÉ hacer exactamente (2-3 líneas detalladas, NO bullets), citando canales, campañas, pain points o retailers concretos de los JSON",
+      "por_que": "POR QUÉ hacerlo - vinculado a la complicación y a cifras concretas de los JSON (2-3 líneas)",
+      "como": "CÓMO ejecutarlo con pasos concretos o tácticas (2-3 líneas)",
+      "kpi_medicion": "Métrica específica para medir éxito",
+      "timeline": "Mes 1-2",
+      "prioridad": "alta"
+    },
+    {"titulo": "Iniciativa 2", "descripcion": "...", "por_que": "...", "como": "...", "kpi_medicion": "...", "timeline": "Mes 2-3", "prioridad": "alta"},
+    {"titulo": "Iniciativa 3", "descripcion": "...", "por_que": "...", "como": "...", "kpi_medicion": "...", "timeline": "Mes 2-3", "prioridad": "media"},
+    {"titulo": "Iniciativa 4", "descripcion": "...", "por_que": "...", "como": "...", "kpi_medicion": "...", "timeline": "Mes 3", "prioridad": "media"},
+    {"titulo": "Iniciativa 5", "descripcion": "...", "por_que": "...", "como": "...", "kpi_medicion": "...", "timeline": "Mes 3", "prioridad": "baja"}
+  ]
+}""",
+    },
+}
+
+SECTION_OUTPUT_RULES = """REGLAS CRÍTICAS DE SALIDA:
+1. **NARRATIVA SOBRE BULLETS**: Los campos "narrativa_*" y "narrativa" son el CONTENIDO PRINCIPAL. Los bullets son complemento.
+2. **INTEGRACIÓN DE DATOS**: Cita KPIs DENTRO de las narrativas: "El líder domina con 54% de SOV, sin embargo, su sentimiento neutral (0.05) revela..."
+3. **CITAS TEXTUALES**: Si la sección incluye muestra de respuestas, usa citas directas: "Como menciona un consumidor: '...'"
+4. **PRECISIÓN CUANTITATIVA**: Cada párrafo debe incluir al menos 1 cifra con unidad y 1 comparación explícita (competidor o periodo).
+5. **TRAZABILIDAD**: Referencia la fuente de cada cifra (KPI, tendencia o cita textual) dentro del propio párrafo.
+6. **RESPONDE ÚNICAMENTE CON EL JSON VÁLIDO DE LA SECCIÓN, SIN TEXTO ADICIONAL NI MARKDOWN, SIN BLOQUES DE CÓDIGO**"""
+
 
 class ExecutiveAgent(BaseAgent):
     """
     Agente ejecutivo
     Genera síntesis consultiva completa leyendo todos los análisis previos
     """
-    
-    def __init__(self, session, version: str = "1.0.0"):
-        super().__init__(session, version)
-        self.client = OpenAIClient()
+
+    depends_on = (
+        'quantitative',
+        'qualitative',
+        'competitive',
+        'trends',
+        'campaign_analysis',
+        'channel_analysis',
+        'esg_analysis',
+        'packaging_analysis',
+        'customer_journey',
+        'scenario_planning',
+        'pricing_power',
+        'strategic',
+        'transversal',
+        'synthesis',
+    )
+    prompt_keys = ('executive_agent', 'executive_section_prompts')
+
+    def __init__(self, session, version: str = "1.0.0", read_session=None):
+        super().__init__(session, version, read_session)
         # task/system prompts se cargarán dinámicamente al analizar
         self.section_prompts = {}
-    
+
+    def cached_result(self, categoria_id: int, periodo: str, fingerprint):
+        """El resultado del ejecutivo es el report: se reutiliza si se generó con la misma huella"""
+        if not fingerprint:
+            return None
+        report = self.session.query(Report).filter_by(
+            categoria_id=categoria_id,
+            periodo=periodo,
+            fingerprint=fingerprint
+        ).first()
+        return {'report_id': report.id} if report else None
+
     def _load_section_prompts(self):
         """Carga prompts específicos por sección desde agent_prompts.yaml"""
         try:
@@ -38,19 +276,19 @@ class ExecutiveAgent(BaseAgent):
         except Exception:
             # No bloquear si no existen
             self.section_prompts = {}
-    
+
     def load_prompts(self):
         """Compat: método legado no usado."""
         pass
-    
+
     def analyze(self, categoria_id: int, periodo: str) -> Dict[str, Any]:
         """
         Genera síntesis ejecutiva completa
-        
+
         Args:
             categoria_id: ID de categoría
             periodo: Periodo (YYYY-MM)
-        
+
         Returns:
             Dict con informe completo estructurado
         """
@@ -58,10 +296,10 @@ class ExecutiveAgent(BaseAgent):
         categoria = self.session.query(Categoria).get(categoria_id)
         if not categoria:
             return {'error': 'Categoría no encontrada'}
-        
+
         mercado = self.session.query(Mercado).get(categoria.mercado_id)
         categoria_nombre = f"{mercado.nombre}/{categoria.nombre}"
-        
+
         # Obtener todos los análisis previos
         # Cargar prompts según tipo de mercado
         self.load_prompts_dynamic(categoria_id, default_key='executive_agent')
@@ -75,7 +313,7 @@ class ExecutiveAgent(BaseAgent):
         trends = self._get_analysis('trends', categoria_id, periodo)
         strategic = self._get_analysis('strategic', categoria_id, periodo)
         synthesis = self._get_analysis('synthesis', categoria_id, periodo)
-        
+
         # NUEVO: Obtener análisis FMCG especializados
         campaign = self._get_analysis('campaign_analysis', categoria_id, periodo)
         channel = self._get_analysis('channel_analysis', categoria_id, periodo)
@@ -89,7 +327,7 @@ class ExecutiveAgent(BaseAgent):
         market_context = self._get_analysis('market_context', categoria_id, periodo)
         # CRÍTICO: Análisis transversal (síntesis de patrones y contradicciones)
         transversal = self._get_analysis('transversal', categoria_id, periodo)
-        
+
         # Degradación para primer ciclo: si faltan algunos análisis, generamos un informe mínimo
         missing = []
         if not quantitative:
@@ -102,31 +340,29 @@ class ExecutiveAgent(BaseAgent):
             missing.append('strategic')
         if not synthesis:
             missing.append('synthesis')
-        
+
         if missing:
             self.logger.warning(f"Faltan análisis previos: {', '.join(missing)}. Generando informe mínimo.")
-        
+
         # ACTIVAR RAG - Obtener contexto histórico
-        rag_manager = RAGManager(self.session)
+        rag_manager = RAGManager(self.session, read_session=self._read_session)
         historical_context = rag_manager.get_historical_context(
             categoria_id,
             periodo,
             top_k=2
         )
-        
+
         # NUEVO: Obtener muestra estratificada de respuestas textuales
         raw_responses = self._get_stratified_sample(categoria_id, periodo, samples_per_group=4)
-        
-        # Construir prompt completo con todos los KPIs Y respuestas textuales
-        prompt = self._build_prompt(
-            categoria_nombre,
-            periodo,
+
+        # Cabecera común y bloques de datos que cada sección toma según su `contexto`
+        header = self._section_header(categoria_nombre, periodo, synthesis)
+        blocks = self._context_blocks(
             quantitative,
             qualitative,
             competitive,
             trends,
             strategic,
-            synthesis,
             historical_context,
             raw_responses,
             campaign,
@@ -139,72 +375,34 @@ class ExecutiveAgent(BaseAgent):
             market_context,
             transversal
         )
-        
-        # Generar informe con LLM (tokens aumentados para informe extenso de nivel consultora)
+
+        # Generar informe por secciones en paralelo
         try:
-            result = self.client.generate(
-                prompt=prompt,
-                temperature=0.45,  # Menor aleatoriedad para mayor precisión y consistencia en cifras
-                max_tokens=16000,  # 🔥 Límite máximo (16K permite informes de 35-50 páginas con densidad máxima)
-                json_mode=True
-            )
-            
-            # Obtener respuesta
-            response_text = result.get('response_text', '')
-            
-            # Log para debug
-            self.logger.debug(f"Respuesta del LLM (primeros 500 chars): {response_text[:500]}")
-            
-            # Limpiar respuesta: extraer JSON si está dentro de markdown code blocks
-            response_text = response_text.strip()
-            
-            # Si está en un code block de markdown, extraerlo
-            if response_text.startswith('```'):
-                # Buscar el inicio del JSON
-                lines = response_text.split('\n')
-                json_lines = []
-                in_json = False
-                
-                for line in lines:
-                    if line.strip().startswith('```'):
-                        if not in_json:
-                            in_json = True
-                            continue
-                        else:
-                            break
-                    if in_json:
-                        json_lines.append(line)
-                
-                response_text = '\n'.join(json_lines).strip()
-            
-            # Validar que no esté vacío
-            if not response_text:
-                self.logger.error("Respuesta vacía del LLM")
-                return {'error': 'Respuesta vacía del LLM'}
-            
-            # Parsear JSON (intentando extraer el primer objeto JSON válido si hay ruido)
-            try:
-                informe = json.loads(response_text)
-            except json.JSONDecodeError:
-                # Intento de extracción simple del primer bloque JSON con llaves
-                start = response_text.find('{')
-                end = response_text.rfind('}')
-                if start != -1 and end != -1 and end > start:
-                    candidate = response_text[start:end+1]
-                    try:
-                        informe = json.loads(candidate)
-                    except json.JSONDecodeError as e2:
-                        self.logger.error(f"Error parseando JSON (2do intento): {e2}")
-                        self.logger.error(f"Texto recibido: {response_text[:1000]}")
-                        return {'error': f'Error parseando JSON del LLM: {str(e2)}'}
-                else:
-                    self.logger.error("No se encontró bloque JSON en la respuesta")
-                    self.logger.error(f"Texto recibido: {response_text[:1000]}")
-                    return {'error': 'Respuesta del LLM no contiene JSON válido'}
-            
+            with usage_scope() as usage:
+                secciones, fallidas = self._generate_sections(header, blocks)
+
+            if not secciones:
+                detalle = '; '.join(f"{k}: {v}" for k, v in fallidas.items())
+                return {'error': f'No se generó ninguna sección del informe ({detalle})'}
+
+            # Secciones fallidas tras sus reintentos: las del report del periodo anterior
+            if fallidas:
+                secciones.update(self._previous_sections(categoria_id, periodo, fallidas))
+            informe = {key: secciones[key] for key in EXECUTIVE_SECTIONS if key in secciones}
+            if fallidas:
+                informe['secciones_fallidas'] = sorted(fallidas)
+
+            # Oportunidades/riesgos estructurados: los del strategic si la sección no los trae
+            opp_risk = informe.get('oportunidades_riesgos')
+            if isinstance(opp_risk, dict) and isinstance(strategic, dict):
+                if not opp_risk.get('oportunidades'):
+                    opp_risk['oportunidades'] = strategic.get('oportunidades', [])[:5]
+                if not opp_risk.get('riesgos'):
+                    opp_risk['riesgos'] = strategic.get('riesgos', [])[:5]
+
             # Validar estructura
             informe = self._validate_and_complete_report(informe, quantitative, strategic)
-            
+
             # Inyección de series de tendencias y snapshots para gráficos en PDF
             try:
                 # Competencia: SOV snapshot y tendencia
@@ -213,6 +411,16 @@ class ExecutiveAgent(BaseAgent):
                     competencia_block['sov_data'] = quantitative.get('sov_percent', {})
                 if isinstance(trends, dict) and trends.get('sov_trend_data'):
                     competencia_block['sov_trend_data'] = trends.get('sov_trend_data')
+                    competencia_block['trend_records'] = trends.get('tendencias', [])
+                # SOV por proveedor de IA desde el cubo de menciones (sin recalcular Quantitative;
+                # cube() descarta el guardado si ya no corresponde a las ejecuciones o aliases)
+                if not competencia_block.get('sov_por_proveedor'):
+                    from src.analytics.agents.quantitative_agent import QuantitativeAgent
+                    cube = QuantitativeAgent(self.session, read_session=self._read_session).cube(categoria_id, periodo)
+                    if cube is not None:
+                        competencia_block['sov_por_proveedor'] = cube.by('provider')
+                    elif isinstance(quantitative, dict) and quantitative.get('sov_por_proveedor'):
+                        competencia_block['sov_por_proveedor'] = quantitative.get('sov_por_proveedor')
 
                 # Sentimiento: snapshot (distribución y scores) y tendencia
                 sentimiento_block = informe.setdefault('sentimiento_reputacion', {})
@@ -243,14 +451,17 @@ class ExecutiveAgent(BaseAgent):
             except Exception:
                 # No bloquear por inyección de contexto
                 pass
-            
+
             # Guardar/actualizar en tabla reports (UPSERT por categoria_id + periodo)
             metrics = {
                 'hallazgos': len(informe.get('resumen_ejecutivo', {}).get('hallazgos_clave', [])),
                 'oportunidades': len(informe.get('oportunidades_riesgos', {}).get('oportunidades', [])),
                 'riesgos': len(informe.get('oportunidades_riesgos', {}).get('riesgos', [])),
-                'plan_acciones': len(informe.get('plan_90_dias', {}).get('iniciativas', []))
+                'plan_acciones': len(informe.get('plan_90_dias', {}).get('iniciativas', [])),
+                'secciones_fallidas': len(fallidas)
             }
+            # Con secciones de otro periodo el report no se reutiliza por huella
+            fingerprint = None if fallidas else self.fingerprint
 
             try:
                 existing = self.session.query(Report).filter_by(
@@ -265,6 +476,7 @@ class ExecutiveAgent(BaseAgent):
                     existing.generado_por = f"executive_agent_v{self.version}"
                     existing.timestamp = datetime.utcnow()
                     existing.metricas_calidad = metrics
+                    existing.fingerprint = fingerprint
                     self.session.commit()
                     report = existing
                 else:
@@ -276,99 +488,133 @@ class ExecutiveAgent(BaseAgent):
                         pdf_path=None,
                         generado_por=f"executive_agent_v{self.version}",
                         timestamp=datetime.utcnow(),
-                        metricas_calidad=metrics
+                        metricas_calidad=metrics,
+                        fingerprint=fingerprint
                     )
                     self.session.add(report)
                     self.session.commit()
-                
+
                 return {
                     'report_id': report.id,
                     'informe': informe,
                     'metadata': {
                         'categoria': categoria_nombre,
                         'periodo': periodo,
-                        'tokens_usados': result.get('tokens_input', 0) + result.get('tokens_output', 0)
+                        'tokens_usados': usage.tokens_input + usage.tokens_output,
+                        'secciones_fallidas': sorted(fallidas)
                     }
                 }
             except IntegrityError as e:
                 self.session.rollback()
                 return {'error': f'Error al guardar reporte: {str(e)}'}
-        
+
         except Exception as e:
             return {'error': f'Error al generar informe: {str(e)}'}
-    
-    def _build_prompt(
+
+    def _generate_sections(
         self,
-        categoria: str,
-        periodo: str,
-        quantitative: Dict,
-        qualitative: Dict,
-        competitive: Dict,
-        trends: Dict,  # ahora utilizado para inyectar series de tendencia
-        strategic: Dict,
-        synthesis: Dict,
-        historical_context: str,
-        raw_responses: str,
-        campaign: Dict,
-        channel: Dict,
-        esg: Dict,
-        packaging: Dict,
-        scenarios: Dict,
-        journey: Dict,
-        pricing_power: Dict,
-        market_context: Dict,
-        transversal: Dict
-    ) -> str:
-        """Construye el prompt completo con todos los datos (EXPANDIDO para FMCG Premium)"""
-        
-        # Bloque de instrucciones MBB por sección (inyectado si existe)
-        se = self.section_prompts or {}
-        se_block = "\n\n".join([
-            "========================================\nINSTRUCCIONES MBB POR SECCIÓN:\n========================================",
-            ("RESUMEN EJECUTIVO:\n" + (se.get('resumen_ejecutivo', '') or '').strip()),
-            ("PANORAMA DE MERCADO:\n" + (se.get('panorama_mercado', '') or '').strip()),
-            ("ANÁLISIS COMPETITIVO:\n" + (se.get('analisis_competitivo', '') or '').strip()),
-            ("ANÁLISIS DE CAMPAÑAS:\n" + (se.get('analisis_campanas', '') or '').strip()),
-            ("ANÁLISIS DE CANALES:\n" + (se.get('analisis_canales', '') or '').strip()),
-            ("SOSTENIBILIDAD Y PACKAGING:\n" + (se.get('analisis_sostenibilidad_packaging', '') or '').strip()),
-            ("CONSUMIDOR (VoC):\n" + (se.get('consumidor', '') or '').strip()),
-            ("CUSTOMER JOURNEY:\n" + (se.get('customer_journey', '') or '').strip()),
-            ("SENTIMIENTO Y REPUTACIÓN:\n" + (se.get('sentimiento_reputacion', '') or '').strip()),
-            ("OPORTUNIDADES Y RIESGOS:\n" + (se.get('oportunidades_riesgos', '') or '').strip()),
-            ("PLAN 90 DÍAS:\n" + (se.get('plan_90_dias', '') or '').strip()),
-        ])
-
-        prompt = f"""
-{self.system_prompt}
+        header: str,
+        blocks: Dict[str, Tuple[str, str]]
+    ) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, str]]:
+        """
+        Genera las secciones del informe en paralelo (max_parallel_sections)
+        Las llamadas de los hilos cuentan en los ámbitos de consumo del agente (y su presupuesto)
 
-{self.task_prompt}
+        Returns:
+            (secciones generadas, {sección fallida: error})
+        """
+        workers = max(1, min(EXECUTIVE_SETTINGS['max_parallel_sections'], len(EXECUTIVE_SECTIONS)))
+        scopes = active_scopes()
+        secciones: Dict[str, Dict[str, Any]] = {}
+        fallidas: Dict[str, str] = {}
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="executive") as pool:
+            futures = {
+                pool.submit(contextvars.copy_context().run, self._generate_section, key, header, blocks, scopes): key
+                for key in EXECUTIVE_SECTIONS
+            }
+            for future in as_completed(futures):
+                key = futures[future]
+                try:
+                    gen = future.result()
+                except Exception as e:
+                    gen = {'success': False, 'error': str(e)}
+                if gen.get('success') and gen.get('parsed'):
+                    secciones[key] = gen['parsed']
+                else:
+                    fallidas[key] = gen.get('error') or 'unknown_error'
+                    self.logger.warning("executive_section_failed", section=key, error=fallidas[key])
+        return secciones, fallidas
+
+    def _generate_section(
+        self,
+        key: str,
+        header: str,
+        blocks: Dict[str, Tuple[str, str]],
+        scopes: tuple
+    ) -> Dict[str, Any]:
+        """Genera una sección (en un hilo del pool) validándola contra su esquema, con reintentos"""
+        spec = EXECUTIVE_SECTIONS[key]
+        with adopt_scopes(scopes), tracing.span('executive.section', **{'executive.section': key}):
+            return self._generate_with_validation(
+                prompt=self._section_prompt(key, header, blocks),
+                pydantic_model=spec['schema'],
+                max_retries=EXECUTIVE_SETTINGS['max_retries'],
+                temperature=0.45,  # Menor aleatoriedad para mayor precisión y consistencia en cifras
+                max_tokens=spec['max_tokens'],
+                provider="openai"
+            )
+
+    def _previous_sections(self, categoria_id: int, periodo: str, keys: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Secciones `keys` de los reports de periodos anteriores (misma granularidad, del más
+        reciente al más antiguo), marcadas como degradadas; nunca una sección ya degradada
+        """
+        previos = self._previous_periods(periodo)
+        reports = {
+            r.periodo: r.contenido or {} for r in self.session.query(Report).filter(
+                Report.categoria_id == categoria_id,
+                Report.periodo.in_(previos)
+            )
+        } if previos else {}
+        secciones = {}
+        for key in keys:
+            for previo in previos:
+                seccion = reports.get(previo, {}).get(key)
+                if isinstance(seccion, dict) and not seccion.get('_degradado'):
+                    secciones[key] = {
+                        **seccion,
+                        '_degradado': {'tipo': 'periodo_anterior', 'motivo': 'seccion_fallida', 'periodo_origen': previo}
+                    }
+                    break
+        return secciones
+
+    def _section_header(self, categoria: str, periodo: str, synthesis: Dict) -> str:
+        """Parte común de los prompts de sección: rol, reglas narrativas y narrativa central (S-C-P)"""
+        synthesis = synthesis or {}
+        return f"""
+{self.system_prompt}
 
 ===========================================
-MISIÓN: GENERAR INFORME NARRATIVO TIPO McKINSEY
+MISIÓN: INFORME NARRATIVO TIPO McKINSEY, REDACTADO POR SECCIONES
 ===========================================
 
 ⚠️ NO GENERES UN "DUMP" DE DATOS. CUENTA UNA HISTORIA ESTRATÉGICA. ⚠️
 
-🔥 INSTRUCCIÓN CRÍTICA - USO DE TODOS LOS ANÁLISIS:
-Tienes acceso a 15+ análisis especializados (cuantitativos, cualitativos, competitivos, tendencias, estratégicos, síntesis, campañas, canales, ESG, packaging, pricing, journey, escenarios, market_context, TRANSVERSAL).
-DEBES integrar insights de TODOS ellos en tu narrativa. NO ignores ninguno. Cada sección debe referenciar EXPLÍCITAMENTE los datos de los JSONs correspondientes listados abajo.
-Los 'temas_comunes' del TRANSVERSAL son HILOS CONDUCTORES que deben aparecer en múltiples secciones.
-Si hay 'contradicciones' en el TRANSVERSAL, resuélvelas o señálalas explícitamente.
+El informe se redacta sección a sección. Escribe SOLO la sección indicada abajo con los análisis
+que la acompañan (son los relevantes para ella). El resto de secciones parten de la misma narrativa
+central: mantén su hilo argumental y referencia EXPLÍCITAMENTE los datos de los JSONs incluidos.
 
 REGLAS NARRATIVAS CRÍTICAS:
-1. PIRÁMIDE DE MINTO (ANSWER FIRST): Arranca cada sección con la conclusión clara (recomendación/diagnóstico) y después los 2-4 argumentos que la sustentan, cada uno con datos.
+1. PIRÁMIDE DE MINTO (ANSWER FIRST): Arranca con la conclusión clara (recomendación/diagnóstico) y después los 2-4 argumentos que la sustentan, cada uno con datos.
 2. MECE: Estructura los argumentos de forma mutuamente excluyente y colectivamente exhaustiva.
-3. Cada sección debe DESARROLLARSE en 3-7 párrafos fluidos y conectados.
+3. Cada narrativa debe DESARROLLARSE en 3-7 párrafos fluidos y conectados.
 4. NO uses listas de bullets como respuesta principal (úsalas solo para respaldar narrativas).
 5. USA transiciones narrativas: "Esto explica...", "Sin embargo...", "A pesar de...", "Lo que revela...".
 6. CITA datos específicos DENTRO de las narrativas (no como apéndices) con unidad, periodo y comparación.
-7. CONECTA insights entre secciones para construir un argumento coherente.
-8. Escribe como si estuvieras presentando en vivo a un CEO.
-9. VOZ ACTIVA Y PRESCRIPTIVA: Da órdenes y recomendaciones directas ("Recomendamos reasignar...", "Pausar...", "Lanzar...").
-10. LENGUAJE DE NEGOCIO: Conecta KPIs de marketing con impacto financiero (CAC, CLV, ROMI/ROI, EBITDA, cuota de mercado, payback).
-11. SO WHAT: Cada dato debe incluir su implicación de negocio explícita (impacto, riesgo o oportunidad y decisión).
-
-{se_block}
+7. Escribe como si estuvieras presentando en vivo a un CEO.
+8. VOZ ACTIVA Y PRESCRIPTIVA: Da órdenes y recomendaciones directas ("Recomendamos reasignar...", "Pausar...", "Lanzar...").
+9. LENGUAJE DE NEGOCIO: Conecta KPIs de marketing con impacto financiero (CAC, CLV, ROMI/ROI, EBITDA, cuota de mercado, payback).
+10. SO WHAT: Cada dato debe incluir su implicación de negocio explícita (impacto, riesgo o oportunidad y decisión).
 
 GUÍA DE PRECISIÓN DE DATOS (OBLIGATORIA):
 - Cita cifras con unidad y periodo: "SOV 54% (W43 2025)".
@@ -386,243 +632,101 @@ NARRATIVA CENTRAL (TU GUION):
 Situación: {synthesis.get('situacion', '')}
 Complicación: {synthesis.get('complicacion', '')}
 Pregunta Clave: {synthesis.get('pregunta_clave', '')}
+""".strip()
 
-========================================
-CONTEXTO HISTÓRICO:
-========================================
-{historical_context}
+    def _context_blocks(
+        self,
+        quantitative: Dict,
+        qualitative: Dict,
+        competitive: Dict,
+        trends: Dict,
+        strategic: Dict,
+        historical_context: str,
+        raw_responses: str,
+        campaign: Dict,
+        channel: Dict,
+        esg: Dict,
+        packaging: Dict,
+        scenarios: Dict,
+        journey: Dict,
+        pricing_power: Dict,
+        market_context: Dict,
+        transversal: Dict
+    ) -> Dict[str, Tuple[str, str]]:
+        """Bloques de datos (título, texto) que cada sección incluye según su `contexto`"""
+        quantitative = quantitative or {}
+        qualitative = qualitative or {}
+        competitive = competitive or {}
+        strategic = strategic or {}
 
-========================================
-DATOS CUANTITATIVOS (KPIs):
-========================================
-- Total menciones: {quantitative.get('total_menciones', 0)}
+        def _dump(data) -> str:
+            return json.dumps(data, indent=2) if data else 'No disponible'
+
+        kpis = f"""- Total menciones: {quantitative.get('total_menciones', 0)}
 - SOV: {json.dumps(quantitative.get('sov_percent', {}), indent=2)}
 - Sentimiento: {json.dumps(qualitative.get('sentimiento_por_marca', {}), indent=2)}
 - Líder mercado: {competitive.get('lider_mercado', 'N/A')}
 - Tendencia SOV: {json.dumps((trends or {}).get('sov_trend_data', {}), indent=2)}
-- Tendencia Sentimiento: {json.dumps((trends or {}).get('sentiment_trend_data', {}), indent=2)}
-
-========================================
-ANÁLISIS FMCG DETALLADO:
-========================================
-
-ANÁLISIS DE CAMPAÑAS Y MARKETING:
-{json.dumps(campaign, indent=2) if campaign else 'No disponible'}
-
-ANÁLISIS DE CANALES Y DISTRIBUCIÓN:
-{json.dumps(channel, indent=2) if channel else 'No disponible'}
-
-ANÁLISIS ESG Y SOSTENIBILIDAD:
-{json.dumps(esg, indent=2) if esg else 'No disponible'}
-
-ANÁLISIS DE PACKAGING Y DISEÑO:
-{json.dumps(packaging, indent=2) if packaging else 'No disponible'}
-
-ESCENARIOS (12-24 meses):
-{json.dumps(scenarios, indent=2) if scenarios else 'No disponible'}
-
-CUSTOMER JOURNEY:
-{json.dumps(journey, indent=2) if journey else 'No disponible'}
-
-PRICING POWER (Precio vs Calidad percibida; tamaño=SOV):
-{json.dumps(pricing_power, indent=2) if pricing_power else 'No disponible'}
-
-CONTEXTO DE MERCADO (PESTEL/Porter/Drivers):
-{json.dumps(market_context, indent=2) if market_context else 'No disponible'}
-
-========================================
-ANÁLISIS TRANSVERSAL (Patrones comunes y contradicciones entre marcas):
-========================================
-{json.dumps(transversal, indent=2) if transversal else 'No disponible'}
-
-⚠️ INSTRUCCIÓN CRÍTICA: INTEGRA los 'temas_comunes' del análisis transversal como hilos conductores en tu narrativa.
-   Si hay 'contradicciones', resuélvelas en tu análisis o señálalas explícitamente.
-   Los 'insights_nuevos' deben aparecer como hallazgos diferenciales en tu síntesis.
-
-========================================
-ANÁLISIS ESTRATÉGICO (DAFO, OPORTUNIDADES, RIESGOS):
-========================================
-- DAFO: {json.dumps(strategic.get('dafo', {}), indent=2)}
+- Tendencia Sentimiento: {json.dumps((trends or {}).get('sentiment_trend_data', {}), indent=2)}"""
+        estrategico = f"""- DAFO: {json.dumps(strategic.get('dafo', {}), indent=2)}
 - Oportunidades: {json.dumps(strategic.get('oportunidades', [])[:5], indent=2)}
-- Riesgos: {json.dumps(strategic.get('riesgos', [])[:5], indent=2)}
-
-========================================
-MUESTRA DE RESPUESTAS TEXTUALES (PARA CITAS):
-========================================
-{raw_responses[:4000]}
-
-========================================
-ESTRUCTURA JSON NARRATIVA REQUERIDA:
-========================================
+- Riesgos: {json.dumps(strategic.get('riesgos', [])[:5], indent=2)}"""
+        transversal_text = _dump(transversal)
+        if transversal:
+            transversal_text += (
+                "\n\n⚠️ INTEGRA los 'temas_comunes' como hilos conductores. Si hay 'contradicciones', "
+                "resuélvelas o señálalas explícitamente. Los 'insights_nuevos' son hallazgos diferenciales."
+            )
 
-⚠️ IMPORTANTE: Los campos "narrativa_*" y "narrativa" son el CONTENIDO PRINCIPAL del informe.
-Cada uno debe tener 3-7 párrafos sustanciales desarrollando el argumento.
-
-{{
-  "resumen_ejecutivo": {{
-    "narrativa_principal": "DESARROLLA EN 4-6 PÁRRAFOS: Empieza con la situación del mercado (integrando KPIs clave como SOV, menciones, tendencias Y contexto de PESTEL/Porter del market_context). Luego desarrolla la complicación (la tensión estratégica central con evidencia cuantitativa + citas cualitativas del raw_responses + patrones del análisis TRANSVERSAL). Finalmente responde a la pregunta clave con los hallazgos principales integrando insights de TODOS los análisis especializados (campañas, canales, ESG, packaging, pricing, journey, escenarios) y su implicación. USA EXPLÍCITAMENTE los 'temas_comunes' del TRANSVERSAL como hilos conductores. Si hay 'contradicciones', señálalas. Esta debe ser una narrativa fluida y argumentativa, no una lista.",
-    "hallazgos_clave": [
-      "Hallazgo 1 con evidencia integrada (KPI + cita cualitativa)",
-      "Hallazgo 2 respondiendo a la pregunta clave",
-      "Hallazgo 3 accionable con implicación de negocio",
-      "Hallazgo 4",
-      "Hallazgo 5"
-    ],
-    "recomendacion_principal": "1-2 párrafos con la recomendación estratégica de más alto nivel, vinculada a resolver la complicación"
-  }},
-  
-  "panorama_mercado": {{
-    "narrativa": "DESARROLLA EN 5-7 PÁRRAFOS: Describe la naturaleza del mercado/categoría (usando la situación del synthesis_agent como apertura), tamaño y crecimiento si disponible, drivers de categoría principales con ejemplos específicos de cómo impactan decisiones, factores PESTEL más relevantes con implicaciones concretas (NO genéricas), análisis de Fuerzas de Porter adaptado a este mercado. USA EXPLÍCITAMENTE los datos del JSON 'CONTEXTO DE MERCADO': extrae 'panorama_general' (descripcion, tamano_estimado, crecimiento_estimado, madurez, caracteristicas_clave), 'analisis_pestel' (politico_legal, economico, social, tecnologico, ecologico), 'fuerzas_porter' (rivalidad_competitiva, poder_compradores, poder_proveedores, amenaza_nuevos_entrantes, amenaza_sustitutos), 'drivers_categoria' (driver, importancia, tendencia, descripcion), 'sintesis_estrategica' (factores_criticos_exito, oportunidades_contexto, amenazas_prioritarias, insight_clave). Cuenta cómo funciona este mercado y qué factores lo moldean. Conecta los factores entre sí."
-  }},
-  
-  "analisis_competitivo": {{
-    "narrativa_dinamica": "DESARROLLA EN 4-6 PÁRRAFOS: Analiza la dinámica competitiva actual: quién domina y por qué (con datos de SOV y sentimiento), cómo se posicionan las marcas principales, correlaciones entre visibilidad/percepción/marketing/canal, gaps competitivos explotables. USA EXPLÍCITAMENTE el JSON 'PRICING POWER' para analizar el posicionamiento precio-calidad: extrae 'perceptual_map' (marca, precio, calidad, sov) para identificar marcas premium vs value, gaps de posicionamiento, y 'brand_pricing_metrics' (price_premium_pct, elasticity_signal, discounting_frequency). Conecta múltiples dimensiones para revelar la historia competitiva. Menciona explícitamente 'Como muestra el Gráfico de SOV...'",
-    "perfiles_narrativos": [
-      {{
-        "marca": "Marca Principal 1",
-        "analisis_profundo": "DESARROLLA EN 2-3 PÁRRAFOS: Posicionamiento percibido con evidencia, fortalezas clave sustentadas por datos, debilidades y vulnerabilidades específicas, estrategia de marketing y canal inferida, oportunidades de ataque o defensa. Cuenta la historia de esta marca en el mercado."
-      }},
-      {{
-        "marca": "Marca Principal 2",
-        "analisis_profundo": "DESARROLLA EN 2-3 PÁRRAFOS: [Mismo formato]"
-      }},
-      {{
-        "marca": "Marca Principal 3",
-        "analisis_profundo": "DESARROLLA EN 2-3 PÁRRAFOS: [Mismo formato]"
-      }}
-    ]
-  }},
-  
-  "analisis_campanas": {{
-    "narrativa": "DESARROLLA EN 3-5 PÁRRAFOS: Síntesis de la actividad de marketing en el mercado: qué marcas comunican activamente y cómo, principales campañas y mensajes clave, canales utilizados, percepción de efectividad y recepción cualitativa, gaps (marcas silenciosas o con comunicación inefectiva a pesar de alto SOV). USA EXPLÍCITAMENTE los datos del JSON 'ANÁLISIS DE CAMPAÑAS Y MARKETING': extrae 'marca_mas_activa', 'mensajes_clave', 'canales_destacados', 'campanas_especificas' (con nombre, canales, mensaje_central, recepcion), 'gaps_marketing'. CITA ejemplos concretos de campañas y su recepción."
-  }},
-  
-  "analisis_canales": {{
-    "narrativa": "DESARROLLA EN 3-5 PÁRRAFOS: Estrategias de distribución observadas (intensiva/selectiva/exclusiva), ventajas competitivas en accesibilidad y presencia omnicanal, gaps de e-commerce y oportunidades digitales, retailers clave y experiencia de compra diferenciada. USA EXPLÍCITAMENTE los datos del JSON 'ANÁLISIS DE CANALES Y DISTRIBUCIÓN': extrae 'marca_mejor_distribuida', 'gaps_e_commerce', 'retailers_clave', 'disponibilidad_por_marca' (canales_presencia, facilidad_encontrar, problemas_reportados), 'tendencias_canal'. CITA ejemplos concretos por marca."
-  }},
-  
-  "analisis_sostenibilidad_packaging": {{
-    "narrativa": "DESARROLLA EN 3-4 PÁRRAFOS: Percepción ESG del mercado (controversias, líderes, rezagados), análisis de packaging (problemas funcionales, diseño, innovaciones), importancia relativa de ESG y packaging como drivers de decisión, oportunidades de diferenciación. USA EXPLÍCITAMENTE los datos del JSON 'ANÁLISIS ESG Y SOSTENIBILIDAD': extrae 'controversias_clave', 'driver_compra_sostenibilidad', 'benchmarking_marcas' (percepcion_esg, fortalezas/debilidades_esg, certificaciones), 'gaps_oportunidades'. USA los datos del JSON 'ANÁLISIS DE PACKAGING Y DISEÑO': extrae 'quejas_packaging', 'atributos_valorados', 'innovaciones_detectadas', 'benchmarking_funcional' (score_funcionalidad, score_diseño, fortalezas/debilidades_packaging, material_principal). CONECTA ESG y packaging cuando sea relevante."
-  }},
-  
-  "consumidor": {{
-    "narrativa_voz_cliente": "DESARROLLA EN 4-5 PÁRRAFOS: Integra citas textuales directas del raw_responses para dar vida a la voz del consumidor. Desarrolla drivers de elección con ejemplos específicos de POR QUÉ eligen cada marca, explica barreras de compra con evidencia cualitativa, describe ocasiones de consumo principales y cómo impactan la decisión, identifica tensiones o contradicciones. HAZ QUE EL CONSUMIDOR COBRE VIDA con sus propias palabras entrecomilladas."
-  }},
-
-  "customer_journey": {{
-    "narrativa": "DESARROLLA EN 2-3 PÁRRAFOS: Explica el recorrido típico detectado (awareness→advocacy), pain points transversales por etapa, touchpoints dominantes (online/offline) y cómo esto se conecta con la Complicación y el plan de 90 días. USA EXPLÍCITAMENTE los datos del JSON 'CUSTOMER JOURNEY': extrae 'stages' (name, pain_points, touchpoints, insights) por cada etapa (awareness, consideration, purchase, retention, advocacy), y 'buyer_personas'. Incluye 1-2 citas textuales si es posible y menciona brevemente 1-2 buyer personas relevantes con sus características concretas del JSON."
-  }},
-  
-  "sentimiento_reputacion": {{
-    "narrativa": "DESARROLLA EN 3-4 PÁRRAFOS: Presenta scores de sentimiento por marca con contexto (no solo números), EXPLICA el 'por qué' detrás de cada score con insights cualitativos del texto crudo, analiza correlaciones entre sentimiento/SOV/marketing, identifica cambios vs periodos anteriores si hay contexto histórico. Menciona 'Como muestra el Gráfico de Sentimiento...'"
-  }},
-  
-  "oportunidades_riesgos": {{
-    "narrativa_oportunidades": "DESARROLLA EN 3-4 PÁRRAFOS: Profundiza en las TOP 3-5 oportunidades más críticas, explicando la lógica, evidencia multi-fuente, impacto potencial, y cómo capitalizarlas. USA el JSON 'ESCENARIOS' para contextualizar: extrae 'best_case' (probability, drivers, description, impact, recommended_actions) y conecta las oportunidades con este escenario optimista. Conecta oportunidades entre sí si es relevante.",
-    "narrativa_riesgos": "DESARROLLA EN 3-4 PÁRRAFOS: Profundiza en los TOP 3-5 riesgos más graves, explicando probabilidad, severidad, evidencia, y estrategias de mitigación. USA el JSON 'ESCENARIOS' para contextualizar: extrae 'worst_case' (probability, drivers, description, impact, recommended_actions) y 'base_case' para identificar escenarios de mayor peligro y estrategias de mitigación concretas. Identifica escenarios de mayor peligro.",
-    "oportunidades": {json.dumps(strategic.get('oportunidades', [])[:5])},
-    "riesgos": {json.dumps(strategic.get('riesgos', [])[:5])},
-    "dafo_sintesis": {{
-      "fortalezas_clave": ["F1", "F2", "F3"],
-      "debilidades_clave": ["D1", "D2", "D3"],
-      "oportunidades_clave": ["O1", "O2", "O3"],
-      "amenazas_clave": ["A1", "A2", "A3"],
-      "cruces_estrategicos": "DESARROLLA EN 2-3 PÁRRAFOS: Analiza los cruces DAFO más relevantes (FO: cómo usar fortalezas para oportunidades, DO: cómo superar debilidades para oportunidades, FA: cómo usar fortalezas contra amenazas, DA: escenarios de mayor riesgo)"
-    }}
-  }},
-  
-  "plan_90_dias": {{
-    "narrativa_estrategia": "DESARROLLA EN 2-3 PÁRRAFOS: Explica la lógica del plan de acción completo: por qué estas iniciativas, en este orden, para resolver la complicación identificada. USA EXPLÍCITAMENTE los datos de 'ANÁLISIS DE CAMPAÑAS' (campanas_especificas con recepcion positiva/negativa, gaps_marketing), 'ANÁLISIS DE CANALES' (gaps_e_commerce, disponibilidad_por_marca, problemas_reportados), 'PRICING POWER' (elasticity_signal, discounting_frequency), 'CUSTOMER JOURNEY' (pain_points por etapa), y 'ESCENARIOS' (recommended_actions de base_case) para PRIORIZAR iniciativas basadas en evidencia real. Especifica QUÉ campañas pausar o escalar, QUÉ canales reforzar, QUÉ pain points atacar, con datos concretos del JSON.",
-    "iniciativas": [
-      {{
-        "titulo": "Iniciativa 1",
-        "descripcion": "QUÉ hacer exactamente (2-3 líneas detalladas, NO bullets). CITA EXPLÍCITAMENTE datos concretos: nombra canales específicos del JSON 'ANÁLISIS DE CANALES' a reforzar (ej: 'e-commerce' si hay gaps), campañas específicas del JSON 'ANÁLISIS DE CAMPAÑAS' a pausar/escalar (ej: 'Campaña X con recepción negativa'), pain points concretos del 'CUSTOMER JOURNEY' a resolver (ej: 'fricción en etapa consideration por falta de reviews'), retailers específicos del 'ANÁLISIS DE CANALES' a priorizar.",
-        "por_que": "POR QUÉ hacerlo - vinculado explícitamente a la complicación y datos específicos del JSON correspondiente con cifras concretas (ej: 'porque el gap de e-commerce es X% vs competencia' o 'porque la campaña Y tiene recepción negativa del 65%') (2-3 líneas)",
-        "como": "CÓMO ejecutarlo con pasos concretos o tácticas (2-3 líneas)",
-        "kpi_medicion": "Métrica específica para medir éxito",
-        "timeline": "Mes 1-2",
-        "prioridad": "alta"
-      }},
-      {{
-        "titulo": "Iniciativa 2",
-        "descripcion": "...",
-        "por_que": "...",
-        "como": "...",
-        "kpi_medicion": "...",
-        "timeline": "Mes 2-3",
-        "prioridad": "alta"
-      }},
-      {{
-        "titulo": "Iniciativa 3",
-        "descripcion": "...",
-        "por_que": "...",
-        "como": "...",
-        "kpi_medicion": "...",
-        "timeline": "Mes 2-3",
-        "prioridad": "media"
-      }},
-      {{
-        "titulo": "Iniciativa 4",
-        "descripcion": "...",
-        "por_que": "...",
-        "como": "...",
-        "kpi_medicion": "...",
-        "timeline": "Mes 3",
-        "prioridad": "media"
-      }},
-      {{
-        "titulo": "Iniciativa 5",
-        "descripcion": "...",
-        "por_que": "...",
-        "como": "...",
-        "kpi_medicion": "...",
-        "timeline": "Mes 3",
-        "prioridad": "baja"
-      }}
-    ]
-  }}
-}}
-
-REGLAS CRÍTICAS DE NARRATIVA:
-1. **NARRATIVA SOBRE BULLETS**: Los campos "narrativa_*" y "narrativa" son el CONTENIDO PRINCIPAL. Los bullets son complemento.
-2. **TRANSICIONES**: Usa conectores argumentativos: "Esto explica...", "Sin embargo...", "A pesar de...", "Lo que revela..."
-3. **INTEGRACIÓN DE DATOS**: Cita KPIs DENTRO de las narrativas: "El líder domina con 54% de SOV, sin embargo, su sentimiento neutral (0.05) revela..."
-4. **CITAS TEXTUALES**: Incluye citas directas del raw_responses: "Como menciona un consumidor: '...'"
-5. **REFERENCIAS A GRÁFICOS**: Menciona explícitamente: "Como muestra el Gráfico de SOV..."
-6. **CONEXIONES**: Crea puentes narrativos entre secciones para mantener el hilo argumentativo
-7. **INTEGRA TODO**: KPIs + FMCG (Campañas, Canales, ESG, Packaging) + Estrategia en una historia cohesiva
-8. **PROFUNDIDAD**: Cada campo narrativo debe tener 3-7 párrafos sustanciales (4-8 líneas cada uno)
-9. **El plan de 90 días debe RESOLVER la complicación identificada**
-10. **RESPONDE ÚNICAMENTE CON EL JSON VÁLIDO, SIN TEXTO ADICIONAL NI MARKDOWN, SIN BLOQUES DE CÓDIGO**
-11. **PRECISIÓN CUANTITATIVA**: Cada párrafo debe incluir al menos 1 cifra con unidad y 1 comparación explícita (competidor o periodo).
-12. **MAGNITUD Y DIRECCIÓN**: Reporta deltas como "+X pp" o "+Y%" e indica dirección (↑/↓/↗/↘).
-13. **TRAZABILIDAD**: Referencia la fuente de cada cifra (KPI, tendencia o cita textual) dentro del propio párrafo.
+        return {
+            'kpis': ('DATOS CUANTITATIVOS (KPIs)', kpis),
+            'historico': ('CONTEXTO HISTÓRICO', historical_context or 'No disponible'),
+            'competitivo': ('ANÁLISIS COMPETITIVO (benchmarking)', _dump(competitive)),
+            'campanas': ('ANÁLISIS DE CAMPAÑAS Y MARKETING', _dump(campaign)),
+            'canales': ('ANÁLISIS DE CANALES Y DISTRIBUCIÓN', _dump(channel)),
+            'esg': ('ANÁLISIS ESG Y SOSTENIBILIDAD', _dump(esg)),
+            'packaging': ('ANÁLISIS DE PACKAGING Y DISEÑO', _dump(packaging)),
+            'escenarios': ('ESCENARIOS (12-24 meses)', _dump(scenarios)),
+            'journey': ('CUSTOMER JOURNEY', _dump(journey)),
+            'pricing': ('PRICING POWER (Precio vs Calidad percibida; tamaño=SOV)', _dump(pricing_power)),
+            'mercado': ('CONTEXTO DE MERCADO (PESTEL/Porter/Drivers)', _dump(market_context)),
+            'transversal': ('ANÁLISIS TRANSVERSAL (Patrones comunes y contradicciones entre marcas)', transversal_text),
+            'estrategico': ('ANÁLISIS ESTRATÉGICO (DAFO, OPORTUNIDADES, RIESGOS)', estrategico),
+            'citas': ('MUESTRA DE RESPUESTAS TEXTUALES (PARA CITAS)', (raw_responses or '')[:4000] or 'No disponible'),
+        }
+
+    def _task_instructions(self, key: str) -> str:
+        """Instrucciones detalladas de la sección dentro del task prompt (bloque "N. **`clave`**")"""
+        match = re.search(
+            rf"^[ \t]*\d+\.\s+\*\*`{key}`\*\*.*?(?=^[ \t]*\d+\.\s+\*\*`|^[ \t]*REGLAS CRÍTICAS|\Z)",
+            self.task_prompt or '',
+            re.S | re.M
+        )
+        return textwrap.dedent(match.group(0)).strip() if match else ''
+
+    def _section_prompt(self, key: str, header: str, blocks: Dict[str, Tuple[str, str]]) -> str:
+        """Prompt de una sección: cabecera común + instrucciones y datos propios + esquema JSON"""
+        spec = EXECUTIVE_SECTIONS[key]
+        partes = [
+            header,
+            f"========================================\nSECCIÓN A REDACTAR: {spec['titulo']}\n========================================"
+        ]
+        mbb = (self.section_prompts.get(key) or '').strip()
+        if mbb:
+            partes.append("INSTRUCCIONES MBB DE LA SECCIÓN:\n" + mbb)
+        detalle = self._task_instructions(key)
+        if detalle:
+            partes.append("INSTRUCCIONES DETALLADAS:\n" + detalle)
+        for name in spec['contexto']:
+            titulo, texto = blocks[name]
+            partes.append(f"========================================\n{titulo}:\n========================================\n{texto}")
+        partes.append(
+            "========================================\nESTRUCTURA JSON REQUERIDA (solo la sección):\n"
+            "========================================\n" + spec['plantilla']
+        )
+        partes.append(SECTION_OUTPUT_RULES)
+        return "\n\n".join(partes)
 
-========================================
-✅ CHECKLIST FINAL ANTES DE DEVOLVER EL JSON:
-========================================
-Antes de devolver tu respuesta, VERIFICA que has usado EXPLÍCITAMENTE datos de:
-□ CUANTITATIVOS (SOV, menciones, ranking)
-□ CUALITATIVOS (sentimiento, atributos)
-□ COMPETITIVOS (lider, benchmarking)
-□ TENDENCIAS (sov_trend_data, sentiment_trend_data)
-□ ESTRATÉGICOS (oportunidades, riesgos, DAFO)
-□ SÍNTESIS (situacion, complicacion, pregunta_clave)
-□ TRANSVERSAL (temas_comunes, contradicciones, insights_nuevos) ← CRÍTICO
-□ CAMPAÑAS (marca_mas_activa, campanas_especificas, gaps_marketing)
-□ CANALES (disponibilidad_por_marca, gaps_e_commerce, retailers_clave)
-□ ESG (benchmarking_marcas, controversias_clave)
-□ PACKAGING (benchmarking_funcional, quejas_packaging, innovaciones)
-□ PRICING POWER (perceptual_map, brand_pricing_metrics)
-□ CUSTOMER JOURNEY (stages con pain_points, buyer_personas)
-□ ESCENARIOS (best_case, base_case, worst_case)
-□ MARKET CONTEXT (panorama_general, pestel, porter, drivers_categoria)
-
-Si alguno está disponible pero NO lo has usado en las narrativas, REVISA y completa antes de devolver.
-"""
-        
-        return prompt
-    
     def _validate_and_complete_report(self, informe: Dict, quantitative: Dict, strategic: Dict) -> Dict:  # pylint: disable=unused-argument
         """Valida y completa el informe si falta algo"""
         
@@ -681,14 +785,3 @@ Si alguno está disponible pero NO lo has usado en las narrativas, REVISA y comp
                         p['pain_points'] = ', '.join(map(str, p['pain_points']))
         
         return informe
-    
-    def _get_analysis(self, agent_name: str, categoria_id: int, periodo: str) -> Dict:
-        """Helper para obtener análisis"""
-        result = self.session.query(AnalysisResult).filter_by(
-            categoria_id=categoria_id,
-            periodo=periodo,
-            agente=agent_name
-        ).first()
-        
-        return result.resultado if result else {}
-
@@ -8,7 +8,7 @@ import yaml
 from pathlib import Path
 from typing import Dict, Any
 from src.analytics.agents.base_agent import BaseAgent
-from src.database.models import AnalysisResult, Categoria, Mercado
+from src.database.models import Categoria, Mercado
 from src.query_executor.api_clients import OpenAIClient, PerplexityClient
 
 
@@ -18,8 +18,8 @@ class MarketContextAgent(BaseAgent):
     Genera análisis PESTEL, Porter y drivers de categoría usando información actualizada
     """
     
-    def __init__(self, session, version: str = "1.0.0"):
-        super().__init__(session, version)
+    def __init__(self, session, version: str = "1.0.0", read_session=None):
+        super().__init__(session, version, read_session)
         self.client = OpenAIClient()
         self.perplexity_client = PerplexityClient()
         self.load_prompts()
@@ -317,14 +317,3 @@ IMPORTANTE:
         except Exception as e:
             self.logger.warning(f"No se pudo obtener info de Perplexity: {str(e)}")
             return "No se pudo obtener información externa actualizada. Análisis basado en datos internos."
-    
-    def _get_analysis(self, agent_name: str, categoria_id: int, periodo: str) -> Dict:
-        """Helper para obtener análisis previo"""
-        result = self.session.query(AnalysisResult).filter_by(
-            categoria_id=categoria_id,
-            periodo=periodo,
-            agente=agent_name
-        ).first()
-        
-        return result.resultado if result else {}
-
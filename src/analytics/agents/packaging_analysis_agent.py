@@ -19,10 +19,10 @@ class PackagingAnalysisAgent(BaseAgent):
     Identifica quejas funcionales, atributos valorados e innovaciones en empaque
     """
     
-    def __init__(self, session, version: str = "1.0.0"):
-        super().__init__(session, version)
+    def __init__(self, session, version: str = "1.0.0", read_session=None):
+        super().__init__(session, version, read_session)
         self.client = AnthropicClient()
-        self.rag_manager = RAGManager(session)
+        self.rag_manager = RAGManager(session, read_session=read_session)
         # Normalizamos el nombre del agente
         self.agent_name = 'packaging_analysis'
         self.top_k_fragments = 10
@@ -195,7 +195,7 @@ class PackagingAnalysisAgent(BaseAgent):
             # Inyectar heurístico si no hay parsed o no pasa gating
             if not parsed or not _passes_gating(parsed):
                 resultado = _heuristic_result()
-                self.save_results(categoria_id, periodo, resultado)
+                self.save_results(categoria_id, periodo, resultado, cacheable=False)
                 return resultado
 
             parsed['periodo'] = periodo
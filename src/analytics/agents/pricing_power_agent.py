@@ -16,10 +16,12 @@ class PricingPowerAgent(BaseAgent):
     Agente de pricing: price premium, elasticidad percibida y mapa perceptual
     """
 
-    def __init__(self, session, version: str = "1.0.0"):
-        super().__init__(session, version)
+    depends_on = ('quantitative', 'qualitative')
+
+    def __init__(self, session, version: str = "1.0.0", read_session=None):
+        super().__init__(session, version, read_session)
         self.client = OpenAIClient()
-        self.rag_manager = RAGManager(session)
+        self.rag_manager = RAGManager(session, read_session=read_session)
         self.agent_name = 'pricing_power'
         self.top_k_fragments = 10
 
@@ -88,19 +90,6 @@ class PricingPowerAgent(BaseAgent):
         self.save_results(categoria_id, periodo, parsed)
         return parsed
 
-    def _get_analysis(self, agent_name: str, categoria_id: int, periodo: str) -> Dict[str, Any]:
-        """Helper para obtener análisis previo"""
-        try:
-            from src.database.models import AnalysisResult
-            result = self.session.query(AnalysisResult).filter_by(
-                categoria_id=categoria_id,
-                periodo=periodo,
-                agente=agent_name
-            ).first()
-            return result.resultado if result else {}
-        except Exception:
-            return {}
-
     def _clean_json_response(self, response_text: str) -> str:
         response_text = response_text.strip()
         if response_text.startswith('```'):
@@ -120,5 +109,3 @@ class PricingPowerAgent(BaseAgent):
             if start != -1 and end != -1 and end > start:
                 response_text = response_text[start:end+1]
         return response_text
-
-
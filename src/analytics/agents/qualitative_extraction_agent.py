@@ -31,10 +31,12 @@ class QualitativeExtractionAgent(BaseAgent):
     - Insights cualitativos clave
     """
     
-    def __init__(self, session, version: str = "3.0.0-RAG"):
-        super().__init__(session, version)
+    prompt_keys = ('qualitative_extraction_agent',)
+    
+    def __init__(self, session, version: str = "3.0.0-RAG", read_session=None):
+        super().__init__(session, version, read_session)
         self.client = AnthropicClient()
-        self.rag_manager = RAGManager(session)
+        self.rag_manager = RAGManager(session, read_session=read_session)
         # Normalizamos el nombre del agente para que sea 'qualitative'
         self.agent_name = 'qualitative'
         # Número de fragmentos a recuperar por pregunta analítica
@@ -53,7 +55,7 @@ class QualitativeExtractionAgent(BaseAgent):
             Dict con análisis cualitativo completo
         """
         # 1. Obtener marcas
-        marcas = self.session.query(Marca).filter_by(
+        marcas = self.read_session.query(Marca).filter_by(
             categoria_id=categoria_id
         ).all()
         
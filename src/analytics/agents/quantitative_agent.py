@@ -3,11 +3,20 @@ Quantitative Agent
 Análisis cuantitativo: SOV, menciones, co-ocurrencias
 """
 
-from typing import Dict, Any, List
-from collections import defaultdict
-from sqlalchemy import func
+from datetime import datetime
+from typing import Dict, Any, List, Optional
 from src.analytics.agents.base_agent import BaseAgent
-from src.database.models import Query, QueryExecution, Marca
+from src.database.models import AnalysisResult, Marca
+from src.analytics.brand_matcher import matcher_for_marcas
+from src.analytics.mention_matrix import MentionMatrix, MentionTallies, hhi
+from src.analytics.mention_rollup import rollup_available
+from src.analytics.timeseries import detect_trends, cross_section_outliers
+from src.analytics.significance import sov_intervals, sov_shift_test
+from src.analytics.mention_cube import MentionCube, load_cube, save_cube, discard_cube
+
+# Conteos + marca de agua para re-ejecuciones incrementales (analysis_results.estado,
+# fuera del resultado: no llega a otros agentes ni a prompts)
+STATE_VERSION = 1
 
 
 class QuantitativeAgent(BaseAgent):
@@ -31,43 +40,87 @@ class QuantitativeAgent(BaseAgent):
         start, end, _ = self._parse_periodo(periodo)
         
         # 1. Obtener marcas de la categoría
-        marcas = self.session.query(Marca).filter_by(
+        marcas = self.read_session.query(Marca).filter_by(
             categoria_id=categoria_id
         ).all()
         
         if not marcas:
             return {'error': 'No hay marcas configuradas para esta categoría'}
         
-        # 2. Obtener ejecuciones del periodo
-        executions = self.session.query(QueryExecution).join(
-            Query
-        ).filter(
-            Query.categoria_id == categoria_id,
-            QueryExecution.timestamp >= start,
-            QueryExecution.timestamp < end
-        ).all()
+        # Índice de menciones (execution_mentions + rollup diario) si cubre la ventana
+        use_rollup = rollup_available(self.read_session, categoria_id, start)
+        
+        matcher = matcher_for_marcas(categoria_id, marcas)
         
-        if not executions:
+        # 2-3. Conteos de menciones: incremental sobre el estado guardado del periodo
+        #      (solo ejecuciones posteriores a la marca de agua) o recálculo completo
+        state = self._load_incremental_state(categoria_id, periodo, matcher.fingerprint)
+        modo_calculo = 'completo'
+        if state:
+            high_water = state['high_water']
+            matrix = self._build_matrix(
+                categoria_id, start, end, marcas, matcher, use_rollup, after_id=high_water['execution_id']
+            )
+            previous = MentionTallies.from_dict(state['tallies'])
+            # Guardia: si se borraron ejecuciones o entraron con id inferior a la marca, recalcular
+            total_actual = self.count_executions(categoria_id, start, end)
+            if total_actual == previous.num_executions + matrix.num_executions:
+                tallies = previous.merge(MentionTallies.from_matrix(matrix))
+                modo_calculo = 'incremental'
+            else:
+                self.logger.info(
+                    "incremental_state_stale",
+                    categoria_id=categoria_id,
+                    periodo=periodo,
+                    esperado=previous.num_executions + matrix.num_executions,
+                    actual=total_actual
+                )
+                state = None
+        if not state:
+            matrix = self._build_matrix(categoria_id, start, end, marcas, matcher, use_rollup)
+            tallies = MentionTallies.from_matrix(matrix)
+            high_water = {'execution_id': None, 'timestamp': None}
+        
+        # Avanzar la marca de agua con lo procesado en esta pasada
+        high_water = self._advance_high_water(high_water, matrix)
+        
+        if not tallies.num_executions:
             return {'error': 'No hay datos de queries para este periodo'}
         
-        # 3. Contar menciones por marca
-        menciones_por_marca = defaultdict(int)
-        textos_por_marca = defaultdict(list)
+        resultado = self._build_result(
+            categoria_id, periodo, tallies,
+            fuente='rollup' if use_rollup else 'texto', modo_calculo=modo_calculo
+        )
+        if 'error' in resultado:
+            return resultado
         
-        for marca in marcas:
-            for execution in executions:
-                texto_lower = execution.respuesta_texto.lower()
-                
-                # Buscar aliases
-                for alias in marca.aliases:
-                    if alias.lower() in texto_lower:
-                        menciones_por_marca[marca.nombre] += 1
-                        textos_por_marca[marca.nombre].append({
-                            'query_id': execution.query_id,
-                            'provider': execution.proveedor_ia,
-                            'timestamp': execution.timestamp.isoformat()
-                        })
-                        break  # Solo contar una vez por ejecución
+        # Cubo de menciones (proveedor × query × día) para cortes posteriores sin recalcular
+        self._persist_cube(
+            categoria_id, periodo, matrix, tallies.num_executions, matcher.fingerprint,
+            incremental=(modo_calculo == 'incremental')
+        )
+        
+        # Guardar resultados (con el estado para la siguiente pasada incremental)
+        self.save_results(
+            categoria_id, periodo, resultado,
+            estado=self._incremental_state(tallies, matcher.fingerprint, high_water)
+        )
+        
+        return resultado
+    
+    def _build_result(
+        self,
+        categoria_id: int,
+        periodo: str,
+        tallies: MentionTallies,
+        fuente: str,
+        modo_calculo: str
+    ) -> Dict[str, Any]:
+        """Métricas del periodo a partir de los conteos (SOV, cortes, outliers, HHI, shift, series)"""
+        start, end, gran = self._parse_periodo(periodo)
+        
+        menciones_por_marca = tallies.mentions()
+        co_ocurrencias = tallies.cooccurrence()
         
         # 4. Calcular SOV (Share of Voice)
         total_menciones = sum(menciones_por_marca.values())
@@ -75,33 +128,14 @@ class QuantitativeAgent(BaseAgent):
         if total_menciones == 0:
             return {
                 'error': 'No se encontraron menciones de marcas en el periodo',
-                'total_executions': len(executions)
+                'total_executions': tallies.num_executions
             }
         
-        sov = {
-            marca: (count / total_menciones * 100)
-            for marca, count in menciones_por_marca.items()
-        }
-        
-        # 5. Co-ocurrencias (marcas mencionadas juntas)
-        co_ocurrencias = defaultdict(int)
+        sov = tallies.sov()
         
-        for execution in executions:
-            texto_lower = execution.respuesta_texto.lower()
-            marcas_en_texto = []
-            
-            for marca in marcas:
-                for alias in marca.aliases:
-                    if alias.lower() in texto_lower:
-                        marcas_en_texto.append(marca.nombre)
-                        break
-            
-            # Contar pares de marcas
-            marcas_en_texto = list(set(marcas_en_texto))  # Eliminar duplicados
-            for i, marca1 in enumerate(marcas_en_texto):
-                for marca2 in marcas_en_texto[i+1:]:
-                    pair = tuple(sorted([marca1, marca2]))
-                    co_ocurrencias[f"{pair[0]} + {pair[1]}"] += 1
+        # 5. Cortes de SOV por proveedor de IA y por query
+        sov_por_proveedor = tallies.sov_by_provider()
+        sov_por_query = tallies.sov_by_query()
         
         # 6. Ranking de marcas
         ranking = sorted(
@@ -110,128 +144,116 @@ class QuantitativeAgent(BaseAgent):
             reverse=True
         )
         
-        # 7. Outliers (alto/bajo SOV y cambios bruscos vs periodo anterior si existe)
+        # 7a. Series base para Trends (últimos 6 periodos; el actual con el SOV recién calculado)
+        sov_trend_data: Dict[str, List[Dict[str, Any]]] = {}
+        periods: List[str] = []
+        try:
+            periods = self._get_last_periods_generic(periodo, n=6)
+            for p in periods:
+                sov_p = sov if p == periodo else self._period_sov(categoria_id, p)
+                for marca, val in sov_p.items():
+                    sov_trend_data.setdefault(marca, []).append({'periodo': p, 'sov': float(val)})
+        except Exception:
+            sov_trend_data = {}
+
+        # 7b. Outliers (alto/bajo SOV entre marcas y cambios bruscos vs periodo anterior)
         outliers = {
             'sov_altos': [],
             'sov_bajos': [],
             'cambios_bruscos': []
         }
         try:
-            values = list(sov.values())
-            if values:
-                mean_val = sum(values) / len(values)
-                # Umbrales simples: ±1.5x de la media
-                high_thr = mean_val * 1.5
-                low_thr = mean_val * 0.5
-                for marca, val in sov.items():
-                    if val >= high_thr:
-                        outliers['sov_altos'].append({'marca': marca, 'sov': val, 'umbral': high_thr, 'razon': '>= 1.5x media'})
-                    elif val <= low_thr:
-                        outliers['sov_bajos'].append({'marca': marca, 'sov': val, 'umbral': low_thr, 'razon': '<= 0.5x media'})
+            altos, bajos = cross_section_outliers(sov)
+            for item, key in [(o, 'sov_altos') for o in altos] + [(o, 'sov_bajos') for o in bajos]:
+                outliers[key].append({
+                    'marca': item['marca'],
+                    'sov': item['valor'],
+                    'umbral': round(item['umbral'], 2),
+                    'z_robusto': item['z_robusto'],
+                    'razon': f"z robusto {item['z_robusto']:+.1f} entre marcas"
+                })
         except Exception:
             pass
 
-        # Cambios bruscos: comparar con periodo anterior
+        # Contraste bootstrap del cambio de SOV vs periodo anterior (menciones de ambos)
+        shift_tests: Dict[str, Dict[str, Any]] = {}
         try:
             prev_period = self._get_previous_periodo_generic(periodo)
             if prev_period:
-                prev_quant = self._get_analysis('quantitative', categoria_id, prev_period) or {}
-                prev_sov = prev_quant.get('sov_percent', {}) or {}
-                for marca, curr in sov.items():
-                    prev = float(prev_sov.get(marca, 0) or 0)
-                    delta = curr - prev
-                    if abs(delta) >= 5.0:  # cambio significativo en puntos
+                shift_tests = sov_shift_test(
+                    dict(menciones_por_marca), self._period_mentions(categoria_id, prev_period)
+                )
+        except Exception:
+            shift_tests = {}
+
+        # Cambios bruscos: detector de tendencias sobre la serie hasta el periodo actual,
+        # descartando los que el contraste bootstrap no distingue del ruido
+        try:
+            prev_period = self._get_previous_periodo_generic(periodo)
+            if prev_period:
+                prev_sov = self._period_sov(categoria_id, prev_period)
+                if prev_sov:
+                    orden = [p for p in periods if p not in (periodo, prev_period)] + [prev_period, periodo]
+                    serie = {
+                        marca: [pt for pt in sov_trend_data.get(marca, []) if pt['periodo'] not in (periodo, prev_period)]
+                               + [{'periodo': prev_period, 'sov': float(prev_sov.get(marca, 0) or 0)},
+                                  {'periodo': periodo, 'sov': float(curr)}]
+                        for marca, curr in sov.items()
+                    }
+                    for t in detect_trends(serie, compare='previous', periods=orden):
+                        test = shift_tests.get(t['marca'])
+                        if shift_tests and not (test and test['significativo']):
+                            continue
                         outliers['cambios_bruscos'].append({
-                            'marca': marca,
-                            'sov_actual': curr,
-                            'sov_anterior': prev,
-                            'cambio_puntos': round(delta, 2),
+                            'marca': t['marca'],
+                            'sov_actual': sov[t['marca']],
+                            'sov_anterior': float(prev_sov.get(t['marca'], 0) or 0),
+                            'cambio_puntos': t['cambio_puntos'],
                             'periodo_anterior': prev_period,
-                            'razon': '>= 5 pp vs periodo anterior'
+                            'z_robusto': t['z_robusto'],
+                            'significancia': t['significancia'],
+                            'ic_inf': test['ic_inf'] if test else None,
+                            'ic_sup': test['ic_sup'] if test else None,
+                            'p_valor': test['p_valor'] if test else None,
+                            'razon': ', '.join(t['motivos'])
                         })
         except Exception:
             pass
 
         # 9. Métricas de concentración (HHI)
-        def _compute_hhi(sov_map: Dict[str, float]) -> Dict[str, float]:
-            try:
-                shares = list(sov_map.values())
-                hhi = sum((s)**2 for s in shares)  # shares en % ⇒ HHI en 0..10000
-                # Normalización 0..1 (dividir entre 10000)
-                hhi_norm = hhi / 10000.0
-                return {'hhi': round(hhi, 2), 'hhi_normalized': round(hhi_norm, 4)}
-            except Exception:
-                return {'hhi': 0.0, 'hhi_normalized': 0.0}
-
-        concentration = _compute_hhi(sov)
+        concentration = hhi(sov)
 
         # 10. Share shift por marca vs periodo anterior (pp y % relativo)
         share_shift: List[Dict[str, Any]] = []
         try:
             prev_period = self._get_previous_periodo_generic(periodo)
             if prev_period:
-                prev_quant = self._get_analysis('quantitative', categoria_id, prev_period) or {}
-                prev_sov = prev_quant.get('sov_percent', {}) or {}
+                prev_sov = self._period_sov(categoria_id, prev_period)
                 for marca, curr in sov.items():
                     prev = float(prev_sov.get(marca, 0) or 0)
                     delta = curr - prev
                     rel = ((delta / prev) * 100.0) if prev > 0 else 0.0
+                    test = shift_tests.get(marca) or {}
                     share_shift.append({
                         'marca': marca,
                         'delta_pp': round(delta, 2),
                         'delta_rel_pct': round(rel, 1),
-                        'periodo_anterior': prev_period
+                        'periodo_anterior': prev_period,
+                        'ic_inf': test.get('ic_inf'),
+                        'ic_sup': test.get('ic_sup'),
+                        'p_valor': test.get('p_valor'),
+                        'significativo': test.get('significativo')
                     })
                 # ordenar por magnitud absoluta
                 share_shift = sorted(share_shift, key=lambda x: abs(x.get('delta_pp', 0.0)), reverse=True)
         except Exception:
             share_shift = []
 
-        # 11. Series base para Trends (últimos 6 periodos)
-        sov_trend_data: Dict[str, List[Dict[str, Any]]] = {}
-        try:
-            periods = self._get_last_periods_generic(periodo, n=6)
-            for p in periods:
-                q_prev = self._get_analysis('quantitative', categoria_id, p) or {}
-                sov_p = q_prev.get('sov_percent', {}) or {}
-                for marca, val in sov_p.items():
-                    sov_trend_data.setdefault(marca, []).append({'periodo': p, 'sov': float(val)})
-        except Exception:
-            sov_trend_data = {}
-
         # 12. Serie intra-rango por día si el periodo es un rango
         sov_by_day: Dict[str, List[Dict[str, Any]]] = {}
         try:
-            _, _, gran = self._parse_periodo(periodo)
             if gran == 'range':
-                # Construir por día usando las mismas ejecuciones
-                # Mapear aliases por marca
-                alias_map = {m.nombre: [a.lower() for a in (m.aliases or [])] for m in marcas}
-                from datetime import timedelta
-                days = []
-                cur = start
-                while cur < end:
-                    days.append(cur.date().isoformat())
-                    cur += timedelta(days=1)
-                # Contar por día
-                by_day_counts: Dict[str, Dict[str, int]] = {d: {k: 0 for k in alias_map.keys()} for d in days}
-                for e in executions:
-                    d = e.timestamp.date().isoformat()
-                    if d not in by_day_counts:
-                        continue
-                    text = (e.respuesta_texto or '').lower()
-                    for marca, aliases in alias_map.items():
-                        if any(a in text for a in aliases):
-                            by_day_counts[d][marca] += 1
-                # Convertir a SOV por día
-                sov_by_day = {m: [] for m in alias_map.keys()}
-                for d in days:
-                    counts = by_day_counts.get(d, {})
-                    total = sum(counts.values())
-                    for marca in alias_map.keys():
-                        val = (counts.get(marca, 0) / total * 100.0) if total else 0.0
-                        sov_by_day[marca].append({'periodo': d, 'sov': float(val)})
-                sov_by_day = {m: v for m, v in sov_by_day.items() if any(pt['sov'] > 0 for pt in v)}
+                sov_by_day = tallies.daily_sov_series(start, end)
         except Exception:
             sov_by_day = {}
 
@@ -240,15 +262,18 @@ class QuantitativeAgent(BaseAgent):
             'periodo': periodo,
             'categoria_id': categoria_id,
             'total_menciones': total_menciones,
-            'total_executions': len(executions),
+            'total_executions': tallies.num_executions,
             'num_marcas_mencionadas': len(menciones_por_marca),
             'menciones_por_marca': dict(menciones_por_marca),
             'sov_percent': sov,
+            'sov_intervalos': sov_intervals(dict(menciones_por_marca)),
             'ranking': [
                 {'marca': marca, 'menciones': count, 'sov': sov[marca]}
                 for marca, count in ranking
             ],
             'co_ocurrencias': dict(co_ocurrencias),
+            'sov_por_proveedor': sov_por_proveedor,
+            'sov_por_query': sov_por_query,
             'outliers': outliers,
             'concentration': {
                 'num_brands': len(sov),
@@ -258,14 +283,220 @@ class QuantitativeAgent(BaseAgent):
             'sov_trend_data': sov_trend_data,
             'sov_by_day': sov_by_day,
             'metadata': {
-                'queries_analizadas': len(set(e.query_id for e in executions)),
-                'proveedores': list(set(e.proveedor_ia for e in executions)),
+                'queries_analizadas': len(tallies.queries),
+                'proveedores': list(tallies.providers),
+                'fuente_menciones': fuente,
+                'modo_calculo': modo_calculo,
                 'fecha_analisis': None
             }
         }
         
-        # Guardar resultados
-        self.save_results(categoria_id, periodo, resultado)
-        
         return resultado
+    
+    def _build_matrix(
+        self,
+        categoria_id: int,
+        start: datetime,
+        end: datetime,
+        marcas: List[Marca],
+        matcher,
+        use_rollup: bool,
+        after_id: Optional[int] = None
+    ) -> MentionMatrix:
+        """
+        Matriz de incidencia ejecuciones × marcas
+        Con índice: metadatos + execution_mentions (sin texto); sin índice: matcher sobre el texto
+        (en streaming, o repartido entre procesos en ventanas grandes)
+        """
+        if use_rollup:
+            executions = list(self.iter_executions(categoria_id, start, end, with_text=False, after_id=after_id))
+            return MentionMatrix.from_index(
+                self.read_session, categoria_id, start, end, marcas,
+                executions=executions, after_id=after_id
+            )
+        return self.text_mention_matrix(categoria_id, start, end, marcas, matcher, after_id=after_id)
+    
+    def _persist_cube(
+        self,
+        categoria_id: int,
+        periodo: str,
+        matrix: MentionMatrix,
+        num_executions: int,
+        fingerprint: str,
+        incremental: bool = False
+    ) -> None:
+        """Guarda el cubo del periodo; en modo incremental suma las ejecuciones nuevas al guardado"""
+        meta = {'fingerprint': fingerprint, 'num_executions': int(num_executions)}
+        cube = MentionCube.from_matrix(matrix, meta)
+        if incremental:
+            saved = load_cube(categoria_id, periodo)
+            if (
+                saved is None
+                or saved.meta.get('fingerprint') != fingerprint
+                or saved.total_executions + cube.total_executions != num_executions
+            ):
+                # Sin base coherente: se reconstruye bajo demanda (cube())
+                discard_cube(categoria_id, periodo)
+                return
+            cube = saved.merge(cube, meta)
+        save_cube(cube, categoria_id, periodo)
+
+    def cube(self, categoria_id: int, periodo: str) -> Optional[MentionCube]:
+        """
+        Cubo de menciones del periodo para slice/dice
+        Usa el guardado si corresponde a las ejecuciones y aliases actuales; si no, lo reconstruye
+        """
+        start, end, _ = self._parse_periodo(periodo)
+        marcas = self.read_session.query(Marca).filter_by(categoria_id=categoria_id).all()
+        if not marcas:
+            return None
+        matcher = matcher_for_marcas(categoria_id, marcas)
+        total = self.count_executions(categoria_id, start, end)
+        saved = load_cube(categoria_id, periodo)
+        if saved is not None and saved.meta.get('fingerprint') == matcher.fingerprint and saved.total_executions == total:
+            return saved
+        use_rollup = rollup_available(self.read_session, categoria_id, start)
+        matrix = self._build_matrix(categoria_id, start, end, marcas, matcher, use_rollup)
+        cube = MentionCube.from_matrix(matrix, {'fingerprint': matcher.fingerprint, 'num_executions': matrix.num_executions})
+        save_cube(cube, categoria_id, periodo)
+        return cube
+
+    @staticmethod
+    def _incremental_state(tallies: MentionTallies, fingerprint: str, high_water: Dict[str, Any]) -> Dict[str, Any]:
+        """Estado para re-ejecuciones incrementales: conteos, marca de agua y huella de aliases"""
+        return {
+            'version': STATE_VERSION,
+            'aliases_fingerprint': fingerprint,
+            'high_water': high_water,
+            'tallies': tallies.to_dict(),
+        }
+
+    def _load_incremental_state(
+        self,
+        categoria_id: int,
+        periodo: str,
+        fingerprint: str
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Estado incremental del resultado guardado del periodo, si sigue siendo válido
+        (misma versión y mismas marcas/aliases; si cambian, recálculo completo)
+        """
+        state = self.session.query(AnalysisResult.estado).filter_by(
+            categoria_id=categoria_id,
+            periodo=periodo,
+            agente=self.agent_name
+        ).scalar()
+        if not isinstance(state, dict):
+            return None
+        if state.get('version') != STATE_VERSION or state.get('aliases_fingerprint') != fingerprint:
+            return None
+        if not (state.get('high_water') or {}).get('execution_id') or not state.get('tallies'):
+            return None
+        return state
+
+    
+    @staticmethod
+    def _advance_high_water(high_water: Dict[str, Any], matrix: MentionMatrix) -> Dict[str, Any]:
+        """Marca de agua (id y timestamp máximos) tras procesar `matrix`"""
+        if not matrix.num_executions:
+            return high_water
+        last_ts = matrix.last_timestamp.isoformat() if matrix.last_timestamp else None
+        return {
+            'execution_id': max(int(matrix.execution_ids.max()), high_water.get('execution_id') or 0),
+            'timestamp': max(filter(None, [high_water.get('timestamp'), last_ts]), default=None)
+        }
+    
+    def _period_result(self, categoria_id: int, periodo: str) -> Dict[str, Any]:
+        """Resultado de otro periodo: el calculado en este mismo backfill o el guardado"""
+        batch = getattr(self, '_batch_results', None) or {}
+        if periodo in batch:
+            return batch[periodo]
+        return self._get_analysis('quantitative', categoria_id, periodo) or {}
 
+    def _period_sov(self, categoria_id: int, periodo: str) -> Dict[str, float]:
+        """SOV de otro periodo"""
+        return self._period_result(categoria_id, periodo).get('sov_percent', {}) or {}
+
+    def _period_mentions(self, categoria_id: int, periodo: str) -> Dict[str, int]:
+        """Menciones por marca de otro periodo (base de los contrastes bootstrap)"""
+        return self._period_result(categoria_id, periodo).get('menciones_por_marca', {}) or {}
+    
+    def backfill(
+        self,
+        categoria_id: int,
+        date_from: datetime,
+        date_to: datetime,
+        granularity: str = 'monthly'
+    ) -> Dict[str, Any]:
+        """
+        Calcula el análisis cuantitativo de todos los periodos entre dos fechas
+        con una sola pasada por las ejecuciones (se reparten por periodo en memoria)
+        y guarda los AnalysisResult en bloque
+        
+        Args:
+            categoria_id: ID de categoría
+            date_from: Fecha inicial (incluida)
+            date_to: Fecha final (incluida)
+            granularity: daily, weekly o monthly
+        
+        Returns:
+            Dict con periodos calculados, sin datos y nº de ejecuciones leídas
+        """
+        periods = self._periods_between(date_from, date_to, granularity)
+        if not periods:
+            return {'error': 'Rango de fechas vacío'}
+        start = self._parse_periodo(periods[0])[0]
+        end = self._parse_periodo(periods[-1])[1]
+        
+        marcas = self.read_session.query(Marca).filter_by(
+            categoria_id=categoria_id
+        ).all()
+        if not marcas:
+            return {'error': 'No hay marcas configuradas para esta categoría'}
+        
+        matcher = matcher_for_marcas(categoria_id, marcas)
+        use_rollup = rollup_available(self.read_session, categoria_id, start)
+        
+        # Una sola matriz para toda la ventana, partida por periodo
+        matrix = self._build_matrix(categoria_id, start, end, marcas, matcher, use_rollup)
+        buckets = matrix.split([self._periodo_for_date(t, granularity) for t in matrix.timestamps])
+        
+        # En orden cronológico: share shift y series usan los periodos ya calculados en memoria
+        resultados: Dict[str, Dict[str, Any]] = {}
+        estados: Dict[str, Dict[str, Any]] = {}
+        sin_datos: List[str] = []
+        self._batch_results = {}
+        try:
+            for periodo in periods:
+                part = buckets.get(periodo)
+                if part is None:
+                    sin_datos.append(periodo)
+                    continue
+                tallies = MentionTallies.from_matrix(part)
+                resultado = self._build_result(
+                    categoria_id, periodo, tallies,
+                    fuente='rollup' if use_rollup else 'texto', modo_calculo='backfill'
+                )
+                if 'error' in resultado:
+                    sin_datos.append(periodo)
+                    continue
+                resultados[periodo] = resultado
+                estados[periodo] = self._incremental_state(
+                    tallies, matcher.fingerprint,
+                    self._advance_high_water({'execution_id': None, 'timestamp': None}, part)
+                )
+                self._batch_results[periodo] = resultado
+                save_cube(
+                    MentionCube.from_matrix(part, {'fingerprint': matcher.fingerprint, 'num_executions': part.num_executions}),
+                    categoria_id, periodo
+                )
+        finally:
+            self._batch_results = {}
+        
+        guardados = self.save_results_bulk(categoria_id, resultados, estados=estados)
+        return {
+            'periodos': list(resultados),
+            'sin_datos': sin_datos,
+            'guardados': guardados,
+            'total_executions': matrix.num_executions,
+        }
@@ -15,8 +15,10 @@ class ScenarioPlanningAgent(BaseAgent):
     Agente de planificación de escenarios (12-24 meses)
     """
 
-    def __init__(self, session, version: str = "1.0.0"):
-        super().__init__(session, version)
+    depends_on = ('strategic', 'trends')
+
+    def __init__(self, session, version: str = "1.0.0", read_session=None):
+        super().__init__(session, version, read_session)
         self.client = OpenAIClient()
         self.agent_name = 'scenario_planning'
 
@@ -56,15 +58,6 @@ class ScenarioPlanningAgent(BaseAgent):
         self.save_results(categoria_id, periodo, parsed)
         return parsed
 
-    def _get_analysis(self, agent_name: str, categoria_id: int, periodo: str) -> Dict:
-        from src.database.models import AnalysisResult
-        result = self.session.query(AnalysisResult).filter_by(
-            categoria_id=categoria_id,
-            periodo=periodo,
-            agente=agent_name
-        ).first()
-        return result.resultado if result else {}
-
     def _clean_json_response(self, response_text: str) -> str:
         response_text = response_text.strip()
         if response_text.startswith('```'):
@@ -84,5 +77,3 @@ class ScenarioPlanningAgent(BaseAgent):
             if start != -1 and end != -1 and end > start:
                 response_text = response_text[start:end+1]
         return response_text
-
-
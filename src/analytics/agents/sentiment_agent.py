@@ -11,7 +11,9 @@ from pydantic import BaseModel, Field, RootModel
 from collections import defaultdict
 from sqlalchemy import extract
 from src.analytics.agents.base_agent import BaseAgent
-from src.database.models import Query, QueryExecution, Marca
+from src.database.models import Marca
+from src.analytics.mention_rollup import rollup_available, executions_mentioning, brand_fragment
+from src.analytics.significance import mean_intervals, mean_shift_test
 from src.query_executor.api_clients import OpenAIClient
 
 
@@ -21,8 +23,8 @@ class SentimentAgent(BaseAgent):
     Usa LLM para clasificar sentimiento por marca y atributo
     """
     
-    def __init__(self, session, version: str = "1.0.0"):
-        super().__init__(session, version)
+    def __init__(self, session, version: str = "1.0.0", read_session=None):
+        super().__init__(session, version, read_session)
         self.client = OpenAIClient()
         self.load_prompts()
     
@@ -71,7 +73,7 @@ class SentimentAgent(BaseAgent):
         start, end, _ = self._parse_periodo(periodo)
         
         # 1. Obtener marcas
-        marcas = self.session.query(Marca).filter_by(
+        marcas = self.read_session.query(Marca).filter_by(
             categoria_id=categoria_id
         ).all()
         
@@ -80,16 +82,10 @@ class SentimentAgent(BaseAgent):
         
         marca_nombres = [m.nombre for m in marcas]
         
-        # 2. Obtener ejecuciones
-        executions = self.session.query(QueryExecution).join(
-            Query
-        ).filter(
-            Query.categoria_id == categoria_id,
-            QueryExecution.timestamp >= start,
-            QueryExecution.timestamp < end
-        ).all()
+        # 2. Contar ejecuciones (COUNT en BD; el texto solo se carga para la muestra)
+        total_executions = self.count_executions(categoria_id, start, end)
         
-        if not executions:
+        if not total_executions:
             return {'error': 'No hay datos para analizar'}
         
         # 3. Analizar sentimiento por respuesta (muestra) con validación Pydantic
@@ -100,8 +96,24 @@ class SentimentAgent(BaseAgent):
         class SentimentOutput(RootModel[Dict[str, MarcaSentiment]]):
             pass
 
-        sample_size = min(10, len(executions))
-        sampled_executions = executions[:sample_size]
+        # Con índice de menciones: muestrear ejecuciones que citan marcas y usar
+        # el fragmento centrado en la primera mención en lugar del inicio del texto
+        fragment_offsets: Dict[int, int] = {}
+        if rollup_available(self.read_session, categoria_id, start):
+            for execution_id, _marca_id, offset in executions_mentioning(
+                self.read_session, categoria_id, start, end, limit=10
+            ):
+                fragment_offsets[execution_id] = min(offset, fragment_offsets.get(execution_id, offset))
+        if fragment_offsets:
+            sample_ids = sorted(fragment_offsets, reverse=True)[:10]
+        else:
+            sample_ids = [
+                row.id for row in
+                self._execution_query(categoria_id, start, end, with_text=False).limit(10)
+            ]
+        by_id = self.load_executions_by_id(sample_ids)
+        sampled_executions = [by_id[i] for i in sample_ids if i in by_id]
+        sample_size = len(sampled_executions)
 
         sentiments_by_marca = defaultdict(list)
         atributos_by_marca = defaultdict(lambda: defaultdict(list))
@@ -111,7 +123,10 @@ class SentimentAgent(BaseAgent):
         ]
 
         for execution in sampled_executions:
-            texto_src = (execution.respuesta_texto or '')[:800]
+            if execution.id in fragment_offsets:
+                texto_src = brand_fragment(execution.respuesta_texto, fragment_offsets[execution.id], 800)
+            else:
+                texto_src = (execution.respuesta_texto or '')[:800]
             marcas_csv = ', '.join(marca_nombres)
             attrs_csv = ', '.join(allowed_attrs)
             prompt = (
@@ -164,8 +179,35 @@ class SentimentAgent(BaseAgent):
                     'positivo': len([s for s in scores if s > 0.3]),
                     'neutral': len([s for s in scores if -0.3 <= s <= 0.3]),
                     'negativo': len([s for s in scores if s < -0.3])
-                }
+                },
+                # Scores muestreados (permiten contrastar cambios entre periodos)
+                'scores': [round(v, 3) for v in sentiments_by_marca.get(marca, [])]
             }
+
+        # Intervalos bootstrap de la media y cambios significativos vs periodo anterior
+        intervalos = mean_intervals({m: list(v) for m, v in sentiments_by_marca.items()})
+        for marca, ic in intervalos.items():
+            sentimiento_agregado[marca]['ic_inf'] = ic['ic_inf']
+            sentimiento_agregado[marca]['ic_sup'] = ic['ic_sup']
+        cambios_sentimiento = []
+        try:
+            # Periodo anterior de la misma granularidad (los rangos no tienen); un resultado
+            # degradado es copia de otro periodo y no sirve de referencia
+            prev_period = next(iter(self._previous_periods(periodo)), None)
+            previo = self._get_analysis(self.agent_name, categoria_id, prev_period) if prev_period else {}
+            if previo.get('_degradado'):
+                previo = {}
+            scores_previos = {
+                m: d.get('scores') or [] for m, d in (previo.get('sentimiento_por_marca') or {}).items()
+                if isinstance(d, dict)
+            }
+            actuales = {m: list(v) for m, v in sentiments_by_marca.items()}
+            for marca, test in mean_shift_test(actuales, scores_previos).items():
+                if test['significativo']:
+                    cambios_sentimiento.append({'marca': marca, 'periodo_anterior': prev_period, **test})
+            cambios_sentimiento.sort(key=lambda c: abs(c['delta']), reverse=True)
+        except Exception:
+            cambios_sentimiento = []
         
         # 5. Agregar atributos
         atributos_agregados = {}
@@ -180,6 +222,7 @@ class SentimentAgent(BaseAgent):
             metricas_compact = {
                 "por_marca": sentimiento_agregado,
                 "atributos_por_marca": atributos_agregados,
+                "cambios_significativos_vs_anterior": cambios_sentimiento,
             }
             import json as _json
             metricas_json = _json.dumps(metricas_compact, ensure_ascii=False, indent=2)
@@ -268,10 +311,11 @@ class SentimentAgent(BaseAgent):
             'por_marca': sentimiento_agregado,
             'sentimiento_por_marca': sentimiento_agregado,
             'atributos_por_marca': atributos_agregados,
+            'cambios_significativos': cambios_sentimiento,
             'insights': insights_list,
             'metadata': {
                 'executions_analizadas': sample_size,
-                'total_executions': len(executions),
+                'total_executions': total_executions,
                 'metodo': 'llm_sampling+validated'
             }
         }
@@ -8,7 +8,6 @@ import yaml
 from pathlib import Path
 from typing import Dict, Any, List
 from src.analytics.agents.base_agent import BaseAgent
-from src.database.models import AnalysisResult
 from src.query_executor.api_clients import OpenAIClient
 from src.analytics.schemas import StrategicOutput
 
@@ -18,9 +17,20 @@ class StrategicAgent(BaseAgent):
     Agente estratégico
     Genera oportunidades y riesgos basándose en análisis previos usando LLM
     """
+
+    depends_on = (
+        'quantitative',
+        'qualitative',
+        'competitive',
+        'trends',
+        'campaign_analysis',
+        'channel_analysis',
+        'esg_analysis',
+        'packaging_analysis',
+    )
     
-    def __init__(self, session, version: str = "1.0.0"):
-        super().__init__(session, version)
+    def __init__(self, session, version: str = "1.0.0", read_session=None):
+        super().__init__(session, version, read_session)
         self.client = OpenAIClient()
         # Prompt se cargará dinámicamente
     
@@ -214,14 +224,3 @@ class StrategicAgent(BaseAgent):
             return txt[start:end+1]
         # No hay JSON detectable
         return '{}'
-    
-    def _get_analysis(self, agent_name: str, categoria_id: int, periodo: str) -> Dict:
-        """Helper para obtener análisis"""
-        result = self.session.query(AnalysisResult).filter_by(
-            categoria_id=categoria_id,
-            periodo=periodo,
-            agente=agent_name
-        ).first()
-        
-        return result.resultado if result else {}
-
@@ -8,7 +8,6 @@ import yaml
 from pathlib import Path
 from typing import Dict, Any
 from src.analytics.agents.base_agent import BaseAgent
-from src.database.models import AnalysisResult
 from src.query_executor.api_clients import AnthropicClient
 
 
@@ -17,9 +16,11 @@ class SynthesisAgent(BaseAgent):
     Agente de síntesis narrativa
     Genera el "So What?" del análisis
     """
+
+    depends_on = ('quantitative', 'qualitative', 'strategic')
     
-    def __init__(self, session, version: str = "1.0.0"):
-        super().__init__(session, version)
+    def __init__(self, session, version: str = "1.0.0", read_session=None):
+        super().__init__(session, version, read_session)
         self.client = AnthropicClient()  # Cambiado a Anthropic
         self.load_prompts()
     
@@ -150,13 +151,3 @@ class SynthesisAgent(BaseAgent):
         if start != -1 and end != -1 and end > start:
             return txt[start:end+1]
         return '{}'
-    
-    def _get_analysis(self, agent_name: str, categoria_id: int, periodo: str) -> Dict:
-        """Helper para obtener análisis"""
-        result = self.session.query(AnalysisResult).filter_by(
-            categoria_id=categoria_id,
-            periodo=periodo,
-            agente=agent_name
-        ).first()
-        return result.resultado if result else {}
-
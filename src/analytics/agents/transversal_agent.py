@@ -6,15 +6,26 @@ Sintetiza patrones transversales entre resultados de agentes para detectar temas
 import json
 from typing import Dict, Any
 from src.analytics.agents.base_agent import BaseAgent
-from src.database.models import AnalysisResult
 from src.query_executor.api_clients import OpenAIClient
 
 
 class TransversalAgent(BaseAgent):
     """Agente transversal para síntesis de patrones e inconsistencias"""
 
-    def __init__(self, session, version: str = "1.0.0"):
-        super().__init__(session, version)
+    depends_on = (
+        'quantitative',
+        'qualitative',
+        'competitive',
+        'trends',
+        'campaign_analysis',
+        'channel_analysis',
+        'esg_analysis',
+        'packaging_analysis',
+        'strategic',
+    )
+
+    def __init__(self, session, version: str = "1.0.0", read_session=None):
+        super().__init__(session, version, read_session)
         self.client = OpenAIClient()
         self.agent_name = 'transversal'
 
@@ -34,16 +45,13 @@ class TransversalAgent(BaseAgent):
             keys = [ak]
             if ak == 'qualitative':
                 keys = ['qualitative', 'qualitativeextraction']
-            row = None
+            data = {}
             for k in keys:
-                row = self.session.query(AnalysisResult).filter_by(
-                    categoria_id=categoria_id,
-                    periodo=periodo,
-                    agente=k
-                ).first()
-                if row:
+                data = self._get_analysis(k, categoria_id, periodo)
+                if data:
                     break
-            resultados[ak] = row.resultado if row else {}
+            # Claves internas (prefijo _, p. ej. _degradado) fuera del prompt
+            resultados[ak] = {k: v for k, v in data.items() if not k.startswith('_')}
 
         # Construir prompt mínimo si no hay YAML específico
         if not self.task_prompt:
@@ -90,7 +98,7 @@ class TransversalAgent(BaseAgent):
             
             if not response_text:
                 self.logger.warning("Transversal agent: respuesta vacía del LLM")
-                self.save_results(categoria_id, periodo, default_data)
+                self.save_results(categoria_id, periodo, default_data, cacheable=False)
                 return default_data
             
             # Limpiar respuesta por si tiene markdown o texto extra
@@ -4,9 +4,11 @@ Detección de tendencias y cambios temporales
 """
 
 from typing import Dict, Any, List
-from datetime import timedelta
 from src.analytics.agents.base_agent import BaseAgent
-from src.database.models import AnalysisResult, Query, QueryExecution, Marca
+from src.database.models import Marca
+from src.analytics.brand_matcher import matcher_for_marcas
+from src.analytics.mention_rollup import rollup_available, daily_sov_series
+from src.analytics.timeseries import detect_trends
 
 
 class TrendsAgent(BaseAgent):
@@ -14,6 +16,15 @@ class TrendsAgent(BaseAgent):
     Agente de detección de tendencias
     Compara periodo actual con anteriores
     """
+
+    depends_on = (
+        'quantitative',
+        'qualitative',
+        'campaign_analysis',
+        'channel_analysis',
+        'esg_analysis',
+        'packaging_analysis',
+    )
     
     def analyze(self, categoria_id: int, periodo: str) -> Dict[str, Any]:
         """
@@ -64,6 +75,9 @@ class TrendsAgent(BaseAgent):
                     score = float(data)
                 if score is not None:
                     sentiment_trend_data.setdefault(marca, []).append({'periodo': p, 'score': float(score)})
+
+        # Serie multi-periodo (antes de sustituirla por series intra-periodo para gráficos)
+        hist_sov = {marca: list(puntos) for marca, puntos in sov_trend_data.items()}
         
         # Si estamos en una semana y solo tenemos el snapshot del periodo actual,
         # construimos una serie intra-semana (por días) a partir de QueryExecution
@@ -86,26 +100,9 @@ class TrendsAgent(BaseAgent):
                 intra_range = self._build_intra_range_sov_series(categoria_id, periodo)
                 if isinstance(intra_range, dict) and any(len(v) >= 2 for v in intra_range.values()):
                     sov_trend_data = intra_range
-                    # NUEVO: tendencias intra-rango (primer día vs último día)
+                    # Tendencias intra-rango (último día vs primer día, con historial diario)
                     try:
-                        for marca, serie in intra_range.items():
-                            if not serie or len(serie) < 2:
-                                continue
-                            start_val = float(serie[0].get('sov', 0) or 0.0)
-                            end_val = float(serie[-1].get('sov', 0) or 0.0)
-                            delta = end_val - start_val
-                            rel = ((delta / start_val) * 100.0) if start_val > 0 else 0.0
-                            if abs(delta) >= 2.0 or abs(rel) >= 8.0:
-                                tendencias.append({
-                                    'marca': marca,
-                                    'metrica': 'SOV',
-                                    'cambio_puntos': round(delta, 2),
-                                    'cambio_rel_pct': round(rel, 1),
-                                    'periodo_inicio': serie[0].get('periodo'),
-                                    'periodo_fin': serie[-1].get('periodo'),
-                                    'direccion': '↑' if delta > 0 else '↓',
-                                    'significancia': 'alta' if abs(delta) >= 4.0 or abs(rel) >= 16.0 else 'media'
-                                })
+                        tendencias.extend(detect_trends(intra_range, compare='first'))
                     except Exception:
                         pass
                 # Si no hay serie de sentimiento, usar snapshot del periodo actual
@@ -125,56 +122,32 @@ class TrendsAgent(BaseAgent):
             pass
 
         if previous_quantitative:
-            # Comparar SOV
-            current_sov = current_quantitative.get('sov_percent', {})
-            previous_sov = previous_quantitative.get('sov_percent', {})
-            
-            for marca in current_sov.keys():
-                current_val = float(current_sov.get(marca, 0) or 0)
-                previous_val = float(previous_sov.get(marca, 0) or 0)
-
-                cambio = current_val - previous_val
-                rel = 0.0
-                if previous_val > 0:
-                    rel = (cambio / previous_val) * 100.0
-
-                # Más sensible: 3 pp absolutos o 10% relativo
-                if abs(cambio) >= 3.0 or abs(rel) >= 10.0:
-                    tendencias.append({
-                        'marca': marca,
-                        'metrica': 'SOV',
-                        'cambio_puntos': round(cambio, 2),
-                        'cambio_rel_pct': round(rel, 1),
-                        'direccion': '↑' if cambio > 0 else '↓',
-                        'significancia': 'alta' if abs(cambio) >= 6.0 or abs(rel) >= 20.0 else 'media'
-                    })
-
-        # ===== Enriquecer con detección de picos (último valor vs historial) y posibles drivers =====
-        def _detect_peak(serie_vals: list[float]) -> bool:
-            try:
-                if not serie_vals or len(serie_vals) < 3:
-                    return False
-                last = float(serie_vals[-1])
-                base = [float(v) for v in serie_vals[:-1] if v is not None]
-                if not base:
-                    return False
-                base_mean = sum(base) / len(base)
-                # Pico si supera en >= 30% al promedio previo o en >= 4 pp absolutos
-                return (last - base_mean) >= 4.0 or (base_mean > 0 and (last - base_mean) / base_mean >= 0.30)
-            except Exception:
-                return False
-
-        # Mapear series por marca para picos (prefiere multi-periodo; si no, intra-range)
-        series_por_marca: dict[str, list[float]] = {}
-        if sov_trend_data:
-            for marca, puntos in sov_trend_data.items():
-                try:
-                    series_por_marca[marca] = [float(p.get('sov', 0) or 0.0) for p in puntos]
-                except Exception:
-                    pass
-        elif 'sov_percent' in current_quantitative:
-            # Solo snapshot, sin picos
-            series_por_marca = {}
+            # Comparar SOV: último punto vs periodo anterior, con EWMA / z robusto /
+            # punto de cambio sobre el historial de la marca
+            current_sov = current_quantitative.get('sov_percent', {}) or {}
+            orden = [p for p in periodos_hist if p not in (periodo, previous_periodo)] + [previous_periodo, periodo]
+            serie_hist = {
+                marca: [pt for pt in hist_sov.get(marca, []) if pt['periodo'] != periodo]
+                       + [{'periodo': periodo, 'sov': float(current_sov.get(marca, 0) or 0.0)}]
+                for marca in current_sov
+            }
+            for marca, val in (previous_quantitative.get('sov_percent', {}) or {}).items():
+                if marca in serie_hist and not any(pt['periodo'] == previous_periodo for pt in serie_hist[marca]):
+                    serie_hist[marca].append({'periodo': previous_periodo, 'sov': float(val or 0.0)})
+            # Solo movimientos que el contraste bootstrap de Quantitative no atribuye al ruido
+            contrastes = {
+                sh['marca']: sh for sh in (current_quantitative.get('share_shift') or [])
+                if isinstance(sh, dict) and sh.get('significativo') is not None
+                and sh.get('periodo_anterior') == previous_periodo
+            }
+            for rec in detect_trends(serie_hist, compare='previous', periods=orden):
+                test = contrastes.get(rec['marca'])
+                if test is not None:
+                    if not test['significativo']:
+                        continue
+                    rec.update({'ic_inf': test.get('ic_inf'), 'ic_sup': test.get('ic_sup'), 'p_valor': test.get('p_valor')})
+                tendencias.append(rec)
+            tendencias.sort(key=lambda t: t.get('score', 0), reverse=True)
 
         # Posibles drivers desde otros agentes (SOLO del periodo solicitado; sin fallback mensual para evitar ruido)
         campaign_data = self._get_analysis('campaign_analysis', categoria_id, periodo) or {}
@@ -185,44 +158,19 @@ class TrendsAgent(BaseAgent):
         sent_now = qual_now.get('sentimiento_por_marca', {}) or {}
         attrs_now = qual_now.get('atributos_por_marca', {}) or {}
 
-        # Helper: inferir drivers por texto de QueryExecution en la ventana del periodo
+        # Helper: drivers por texto de QueryExecution en la ventana del periodo
+        # (índice invertido construido una vez; keywords cerca de menciones de la marca)
+        text_index: Dict[str, Any] = {}
+
         def _infer_drivers_from_texts(marca: str) -> list[str]:
-            drivers: list[str] = []
             try:
-                start, end, _ = self._parse_periodo(periodo)
-                # Obtener ejecuciones con texto en ventana
-                executions = self.session.query(QueryExecution).join(Query). \
-                    filter(
-                        Query.categoria_id == categoria_id,
-                        QueryExecution.respuesta_texto.isnot(None),
-                        QueryExecution.timestamp >= start,
-                        QueryExecution.timestamp < end
-                    ).all()
-                if not executions:
-                    return drivers
-                text_blob = "\n".join([(e.respuesta_texto or "").lower() for e in executions])
-                # Solo considerar fragmentos donde aparece la marca o alias exacto
-                # (heurística rápida: si el corpus no contiene la marca, seguimos igualmente)
-
-                # Diccionario genérico de keywords por driver (válido para cualquier mercado)
-                kw = {
-                    'precio/promos': ['precio', 'tarifa', 'promoci', 'descuento', 'oferta', 'subida', 'bajada'],
-                    'campañas/marketing': ['campaña', 'anuncio', 'spot', 'creativo', 'influencer', 'patrocinio'],
-                    'canales/disponibilidad': ['disponibilidad', 'stock', 'agotado', 'retailer', 'tienda', 'web', 'online', 'marketplace'],
-                    'servicio/soporte': ['soporte', 'servicio', 'avería', 'incidencia', 'reclamaci', 'atención'],
-                    'producto/calidad': ['calidad', 'rendimiento', 'defecto', 'sabor', 'diseño', 'experiencia'],
-                    'sostenibilidad/esg': ['esg', 'sostenibil', 'controversia', 'medioambient', 'recicl', 'denuncia'],
-                    'portabilidad/procesos': ['portabilidad', 'alta', 'baja', 'cambio', 'trámite'],
-                    'facturación/cobros': ['factura', 'facturación', 'cobro', 'cargo', 'tarificación'],
-                    'app/procesos': ['app', 'aplicación', 'login', 'e-sim', 'esim', 'proceso', 'registro']
-                }
-                for driver_name, words in kw.items():
-                    hits = sum(word in text_blob for word in words)
-                    if hits >= 3:  # umbral simple para evitar ruido
-                        drivers.append(driver_name)
+                if 'index' not in text_index:
+                    start, end, _ = self._parse_periodo(periodo)
+                    text_index['index'] = self.driver_index(categoria_id, start, end)
+                return text_index['index'].drivers_for(marca)
             except Exception:
-                return drivers
-            return drivers
+                text_index['index'] = None
+                return []
 
         def _drivers_para_marca(marca: str) -> list[str]:
             drivers: list[str] = []
@@ -296,31 +244,18 @@ class TrendsAgent(BaseAgent):
                     drivers.append(d)
             return drivers
 
-        # Enriquecer elementos existentes y marcar picos
+        # Enriquecer elementos existentes (pico / muestras ya vienen del detector)
         for t in tendencias:
             marca = t.get('marca')
             if not marca:
                 continue
-            serie_vals = series_por_marca.get(marca) or []
-            t['pico'] = _detect_peak(serie_vals)
-            # Añadir muestras (nº puntos en serie)
-            try:
-                t['muestras'] = len(sov_trend_data.get(marca, []) or [])
-            except Exception:
-                pass
             drv = _drivers_para_marca(marca)
             if drv:
                 t['posibles_drivers'] = drv
             # Estimar driver_confidence
             try:
-                delta = abs(float(t.get('cambio_puntos', 0) or 0.0))
-                rel = abs(float(t.get('cambio_rel_pct', 0) or 0.0))
-                score = 0.0
-                # Magnitud
-                if delta >= 6.0 or rel >= 20.0:
-                    score += 0.5
-                elif delta >= 3.0 or rel >= 10.0:
-                    score += 0.35
+                # Magnitud (significancia del detector)
+                score = 0.5 if t.get('significancia') == 'alta' else 0.35
                 # Evidencias externas
                 evid = 0
                 if drv:
@@ -337,19 +272,8 @@ class TrendsAgent(BaseAgent):
             except Exception:
                 pass
 
-        # Gating: filtrar tendencias poco significativas y sin drivers
-        filtered_tendencias = []
-        for t in tendencias:
-            try:
-                abs_pp = abs(float(t.get('cambio_puntos', 0) or 0.0))
-                abs_rel = abs(float(t.get('cambio_rel_pct', 0) or 0.0))
-                has_driver = bool(t.get('posibles_drivers'))
-                if (abs_pp >= 2.0 or abs_rel >= 8.0) and has_driver:
-                    filtered_tendencias.append(t)
-            except Exception:
-                # Si no podemos evaluar, omitimos la tendencia
-                continue
-        tendencias = filtered_tendencias
+        # Gating: el detector ya descarta cambios no significativos; exigir drivers
+        tendencias = [t for t in tendencias if t.get('posibles_drivers')]
         
         resultado = {
             'periodo': periodo,
@@ -368,16 +292,6 @@ class TrendsAgent(BaseAgent):
         self.save_results(categoria_id, periodo, resultado)
         return resultado
     
-    def _get_analysis(self, agent_name: str, categoria_id: int, periodo: str) -> Dict:
-        """Helper para obtener análisis"""
-        result = self.session.query(AnalysisResult).filter_by(
-            categoria_id=categoria_id,
-            periodo=periodo,
-            agente=agent_name
-        ).first()
-        
-        return result.resultado if result else {}
-    
     # Delegamos en BaseAgent los helpers genéricos de periodos
     
     def _build_intra_range_sov_series(self, categoria_id: int, periodo: str) -> Dict[str, List[Dict[str, Any]]]:
@@ -386,53 +300,25 @@ class TrendsAgent(BaseAgent):
         if gran != 'range':
             return {}
 
-        # Marcas configuradas en la categoría y sus aliases
-        marcas = self.session.query(Marca).filter_by(categoria_id=categoria_id).all()
-        alias_map = {m.nombre: [a.lower() for a in (m.aliases or [])] for m in marcas}
-        if not alias_map:
+        # Marcas configuradas en la categoría
+        marcas = self.read_session.query(Marca).filter_by(categoria_id=categoria_id).all()
+        if not marcas:
             return {}
 
-        # Obtener todas las ejecuciones con texto en la ventana del rango
-        executions = self.session.query(QueryExecution).join(Query). \
-            filter(
-                Query.categoria_id == categoria_id,
-                QueryExecution.respuesta_texto.isnot(None),
-                QueryExecution.timestamp >= start,
-                QueryExecution.timestamp < end
-            ).all()
-
-        if not executions:
+        # Rollup diario: GROUP BY sobre filas agregadas en lugar de re-escanear el texto
+        if rollup_available(self.read_session, categoria_id, start):
+            return daily_sov_series(
+                self.read_session, categoria_id, start, end,
+                {m.id: m.nombre for m in marcas}
+            )
+
+        # Sin índice: escaneo de textos con el matcher de la categoría (streaming o multiproceso)
+        matrix = self.text_mention_matrix(
+            categoria_id, start, end, marcas, matcher_for_marcas(categoria_id, marcas), require_text=True
+        )
+        if not matrix.num_executions:
             return {}
-
-        # Contar menciones por marca por día
-        by_day: Dict[str, Dict[str, int]] = {}
-        for e in executions:
-            d = e.timestamp.date().isoformat()
-            text = (e.respuesta_texto or "").lower()
-            day_counts = by_day.setdefault(d, dict.fromkeys(alias_map.keys(), 0))
-            for marca, aliases in alias_map.items():
-                if any(alias in text for alias in aliases):
-                    day_counts[marca] += 1
-
-        # Generar lista de días completos del rango [start, end)
-        days = []
-        cur = start
-        while cur < end:
-            days.append(cur.date().isoformat())
-            cur += timedelta(days=1)
-
-        # Convertir a SOV (%) por día
-        series: Dict[str, List[Dict[str, Any]]] = {m: [] for m in alias_map.keys()}
-        for d in days:
-            counts = by_day.get(d, dict.fromkeys(alias_map.keys(), 0))
-            total = sum(counts.values())
-            for marca in alias_map.keys():
-                val = (counts.get(marca, 0) / total * 100) if total else 0.0
-                series[marca].append({'periodo': d, 'sov': float(val)})
-
-        # Eliminar marcas sin valores
-        series = {m: vals for m, vals in series.items() if any(p['sov'] > 0 for p in vals)}
-        return series
+        return matrix.daily_sov_series(start, end)
 
     def _build_intra_week_sov_series(self, categoria_id: int, periodo: str) -> Dict[str, List[Dict[str, Any]]]:
         """Construye serie diaria de SOV dentro de una semana concreta.
@@ -442,53 +328,25 @@ class TrendsAgent(BaseAgent):
         if gran != 'weekly':
             return {}
 
-        # Marcas configuradas en la categoría y sus aliases
-        marcas = self.session.query(Marca).filter_by(categoria_id=categoria_id).all()
-        alias_map = {m.nombre: [a.lower() for a in (m.aliases or [])] for m in marcas}
-        if not alias_map:
+        # Marcas configuradas en la categoría
+        marcas = self.read_session.query(Marca).filter_by(categoria_id=categoria_id).all()
+        if not marcas:
             return {}
 
-        # Obtener todas las ejecuciones con texto en la semana
-        executions = self.session.query(QueryExecution).join(Query).\
-            filter(
-                Query.categoria_id == categoria_id,
-                QueryExecution.respuesta_texto.isnot(None),
-                QueryExecution.timestamp >= start,
-                QueryExecution.timestamp < end
-            ).all()
-
-        if not executions:
+        # Rollup diario: GROUP BY sobre filas agregadas en lugar de re-escanear el texto
+        if rollup_available(self.read_session, categoria_id, start):
+            return daily_sov_series(
+                self.read_session, categoria_id, start, end,
+                {m.id: m.nombre for m in marcas}
+            )
+
+        # Sin índice: escaneo de textos con el matcher de la categoría (streaming o multiproceso)
+        matrix = self.text_mention_matrix(
+            categoria_id, start, end, marcas, matcher_for_marcas(categoria_id, marcas), require_text=True
+        )
+        if not matrix.num_executions:
             return {}
-
-        # Contar menciones por marca por día
-        by_day: Dict[str, Dict[str, int]] = {}
-        for e in executions:
-            d = e.timestamp.date().isoformat()
-            text = (e.respuesta_texto or "").lower()
-            day_counts = by_day.setdefault(d, dict.fromkeys(alias_map.keys(), 0))
-            for marca, aliases in alias_map.items():
-                if any(alias in text for alias in aliases):
-                    day_counts[marca] += 1
-
-        # Generar lista de días completos de la semana [start, end)
-        days = []
-        cur = start
-        while cur < end:
-            days.append(cur.date().isoformat())
-            cur += timedelta(days=1)
-
-        # Convertir a SOV (%) por día
-        series: Dict[str, List[Dict[str, Any]]] = {m: [] for m in alias_map.keys()}
-        for d in days:
-            counts = by_day.get(d, dict.fromkeys(alias_map.keys(), 0))
-            total = sum(counts.values())
-            for marca in alias_map.keys():
-                val = (counts.get(marca, 0) / total * 100) if total else 0.0
-                series[marca].append({'periodo': d, 'sov': float(val)})
-
-        # Eliminar marcas sin ningún valor > 0 para limpiar el gráfico
-        series = {m: vals for m, vals in series.items() if any(p['sov'] > 0 for p in vals)}
-        return series
+        return matrix.daily_sov_series(start, end)
     
     def _generate_summary(self, tendencias: list) -> str:
         """Genera resumen de tendencias"""
@@ -500,4 +358,3 @@ class TrendsAgent(BaseAgent):
         
         summary = f"{len(crecimiento)} marcas en crecimiento, {len(decrecimiento)} en decrecimiento"
         return summary
-
@@ -0,0 +1,227 @@
+"""
+Batch Scheduler
+Informes de varias categorías en paralelo para un mismo periodo
+
+- Hasta `max_parallel_categories` análisis a la vez (hilos: las llamadas LLM
+  comparten el limitador global y por proveedor del proceso)
+- Render de PDF en un pool propio en cuanto termina el análisis de cada
+  categoría, mientras otras siguen analizando (1 worker por defecto: los
+  gráficos de matplotlib no son seguros entre hilos)
+- Resumen de progreso periódico
+- Paralelismo limitado a lo que admite el pool de BD (aviso si se reduce)
+
+Parámetros en settings (analytics.batch). BATCH_MAX_PARALLEL_CATEGORIES tiene prioridad.
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Callable, Dict, List, Optional
+import yaml
+from src.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+DEFAULT_BATCH_SETTINGS = {
+    'max_parallel_categories': 3,   # análisis simultáneos
+    'pdf_workers': 1,               # PDFs simultáneos
+    'progress_interval_seconds': 15,
+}
+
+
+def _load_batch_settings(config_path: str = "config/settings.yaml") -> Dict[str, int]:
+    """Lee analytics.batch de settings"""
+    settings = dict(DEFAULT_BATCH_SETTINGS)
+    try:
+        with open(config_path, "r", encoding="utf-8") as f:
+            cfg = yaml.safe_load(f) or {}
+        settings.update({
+            k: int(v) for k, v in ((cfg.get("analytics") or {}).get("batch") or {}).items()
+            if k in DEFAULT_BATCH_SETTINGS
+        })
+    except Exception:
+        pass
+    try:
+        settings['max_parallel_categories'] = int(
+            os.getenv("BATCH_MAX_PARALLEL_CATEGORIES", settings['max_parallel_categories'])
+        )
+    except ValueError:
+        pass
+    return settings
+
+
+BATCH_SETTINGS = _load_batch_settings()
+
+
+class BatchScheduler:
+    """
+    Ejecuta run_analysis + generate_pdf por categoría con análisis y PDFs solapados
+    """
+
+    def __init__(
+        self,
+        max_parallel: Optional[int] = None,
+        pdf_workers: Optional[int] = None,
+        progress_interval: Optional[float] = None
+    ):
+        self.max_parallel = max(1, int(max_parallel or BATCH_SETTINGS['max_parallel_categories']))
+        self.pdf_workers = max(1, int(pdf_workers or BATCH_SETTINGS['pdf_workers']))
+        self.max_parallel = self._clamp_to_pool(self.max_parallel)
+        self.progress_interval = float(progress_interval or BATCH_SETTINGS['progress_interval_seconds'])
+        self._lock = threading.Lock()
+        self._analysing: set = set()
+
+    def _clamp_to_pool(self, max_parallel: int) -> int:
+        """
+        Categorías simultáneas que caben en el pool de BD (cada una con sus agentes en
+        paralelo); por encima, los checkouts esperarían hasta pool_timeout y fallarían
+        """
+        from src.database.connection import analysis_connections, pool_capacity
+        from src.analytics.orchestrator import _load_max_parallel_agents
+
+        capacity = pool_capacity()
+        if not capacity:
+            return max_parallel
+        agents = _load_max_parallel_agents()
+        needed = analysis_connections(agents, max_parallel, self.pdf_workers)
+        if needed <= capacity:
+            return max_parallel
+        fits = max(1, (capacity - 2 * self.pdf_workers) // analysis_connections(agents))
+        logger.warning(
+            "batch_parallelism_clamped",
+            max_parallel_categories=max_parallel,
+            clamped_to=fits,
+            max_parallel_agents=agents,
+            connections_needed=needed,
+            pool_capacity=capacity
+        )
+        return min(max_parallel, fits)
+
+    def run(
+        self,
+        categories: List[str],
+        periodo: str,
+        force: bool = False,
+        echo: Callable[[str], None] = print
+    ) -> List[Dict[str, Any]]:
+        """
+        Args:
+            categories: Rutas Mercado/Categoría
+            periodo: Periodo común
+            force: Recalcular todos los agentes (ver run_analysis)
+            echo: Salida de eventos y resumen de progreso
+
+        Returns:
+            [{'category', 'status': 'success'|'error', 'path' | 'error', 'report_id', 'run_id', 'seconds'}]
+            en el orden de `categories`
+        """
+        from src.reporting.pdf_generator import generate_pdf
+
+        started = time.time()
+        outcomes: Dict[str, Dict[str, Any]] = {}
+        pdf_pending = 0
+        last_summary = started
+
+        logger.info(
+            "batch_started",
+            categories=len(categories),
+            periodo=periodo,
+            max_parallel=self.max_parallel,
+            pdf_workers=self.pdf_workers
+        )
+
+        with ThreadPoolExecutor(max_workers=self.max_parallel, thread_name_prefix="batch") as analysis_pool, \
+                ThreadPoolExecutor(max_workers=self.pdf_workers, thread_name_prefix="pdf") as pdf_pool:
+            futures = {
+                analysis_pool.submit(self._analyze, category, periodo, force): ('analysis', category)
+                for category in categories
+            }
+            while futures:
+                finished, _ = wait(futures, timeout=self.progress_interval, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    kind, category = futures.pop(future)
+                    if kind == 'analysis':
+                        try:
+                            report_id, stats, seconds = future.result()
+                        except Exception as e:
+                            outcomes[category] = {
+                                'category': category,
+                                'status': 'error',
+                                'error': str(e),
+                                'run_id': getattr(e, 'run_id', None)
+                            }
+                            echo(f"  ✗ {category}: {e}")
+                            continue
+                        cache = stats.get('cache') or {}
+                        outcomes[category] = {
+                            'category': category,
+                            'report_id': report_id,
+                            'run_id': stats.get('run_id'),
+                            'seconds': round(seconds, 1),
+                        }
+                        echo(
+                            f"  ✓ {category}: análisis en {seconds:.0f}s "
+                            f"(reutilizados {len(cache.get('hits', []))}, recalculados {len(cache.get('misses', []))})"
+                        )
+                        futures[pdf_pool.submit(generate_pdf, report_id, agents_stats=stats)] = ('pdf', category)
+                        pdf_pending += 1
+                    else:
+                        pdf_pending -= 1
+                        try:
+                            path = future.result()
+                        except Exception as e:
+                            outcomes[category].update({'status': 'error', 'error': f"PDF: {e}"})
+                            echo(f"  ✗ {category}: PDF falló: {e}")
+                            continue
+                        outcomes[category].update({'status': 'success', 'path': path})
+                        echo(f"  📁 {category}: {path}")
+
+                if futures and time.time() - last_summary >= self.progress_interval:
+                    echo(self._summary(len(categories), outcomes, pdf_pending, started))
+                    last_summary = time.time()
+
+        elapsed = time.time() - started
+        logger.info(
+            "batch_completed",
+            categories=len(categories),
+            periodo=periodo,
+            successful=sum(1 for o in outcomes.values() if o.get('status') == 'success'),
+            failed=sum(1 for o in outcomes.values() if o.get('status') == 'error'),
+            seconds=round(elapsed, 1)
+        )
+        return [outcomes[c] for c in categories]
+
+    def _analyze(self, category: str, periodo: str, force: bool):
+        """Análisis de una categoría (hilo del pool)"""
+        from src.analytics.orchestrator import run_analysis
+
+        with self._lock:
+            self._analysing.add(category)
+        start = time.time()
+        try:
+            report_id, stats = run_analysis(category, periodo, force=force)
+            return report_id, stats, time.time() - start
+        finally:
+            with self._lock:
+                self._analysing.discard(category)
+
+    def _summary(self, total: int, outcomes: Dict[str, Dict[str, Any]], pdf_pending: int, started: float) -> str:
+        """Línea de progreso: hechas, en análisis, en PDF, en cola, fallidas y LLM en vuelo"""
+        from src.query_executor.api_clients.rate_limiter import get_rate_limiter
+
+        with self._lock:
+            analysing = len(self._analysing)
+        done = sum(1 for o in outcomes.values() if o.get('status') == 'success')
+        failed = sum(1 for o in outcomes.values() if o.get('status') == 'error')
+        queued = total - len(outcomes) - analysing
+        llm = get_rate_limiter().snapshot()
+        providers = " ".join(
+            f"{name} {p['in_flight']}/{p['max_concurrent']}"
+            for name, p in sorted(llm['providers'].items()) if p['calls']
+        )
+        return (
+            f"⏱ {time.time() - started:>5.0f}s · ✓ {done}/{total} · analizando {analysing} · "
+            f"PDF {pdf_pending} · en cola {queued} · ✗ {failed} · "
+            f"LLM {llm['in_flight']}/{llm['max_concurrent_total']}" + (f" ({providers})" if providers else "")
+        )
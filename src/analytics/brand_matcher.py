@@ -0,0 +1,219 @@
+"""
+Brand Matcher
+Detección de marcas en texto con un autómata Aho-Corasick sobre todos los aliases
+
+- Una sola pasada lineal por texto, independientemente del nº de marcas/aliases
+- Insensible a mayúsculas y acentos (NFKD sin marcas combinantes)
+- Límites de palabra: un alias alfanumérico no casa dentro de otra palabra
+  ("Mas" no casa en "Masters"); los bordes no alfanuméricos ("Heineken®") no exigen límite
+- Compilado una vez por categoría y cacheado hasta que cambian los aliases
+"""
+
+import hashlib
+import json
+import re
+import threading
+import unicodedata
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from sqlalchemy.orm import Session
+from src.database.models import Marca
+
+
+def fold(text: Optional[str]) -> Tuple[str, List[int]]:
+    """
+    Minúsculas sin acentos y mapa de posiciones al texto original
+
+    Returns:
+        (texto_normalizado, offsets) donde offsets[i] es la posición original del carácter i
+    """
+    out: List[str] = []
+    offsets: List[int] = []
+    for i, ch in enumerate(text or ""):
+        if ch.isascii():
+            out.append(ch.lower())
+            offsets.append(i)
+            continue
+        for c in unicodedata.normalize("NFKD", ch.lower()):
+            if not unicodedata.combining(c):
+                out.append(c)
+                offsets.append(i)
+    return "".join(out), offsets
+
+
+def canonical(name: Optional[str]) -> str:
+    """Forma canónica para comparar nombres (sin acentos, solo alfanumérico y espacios)"""
+    s, _ = fold((name or "").strip())
+    s = re.sub(r"[^a-z0-9 ]+", "", s)
+    return re.sub(r"\s+", " ", s).strip()
+
+
+class BrandMatcher:
+    """
+    Autómata Aho-Corasick que mapea cada alias normalizado a su marca
+    """
+
+    def __init__(self, aliases_by_brand: Dict[int, Iterable[str]], names: Optional[Dict[int, str]] = None):
+        """
+        Args:
+            aliases_by_brand: {marca_id: [alias, ...]}
+            names: {marca_id: nombre} (opcional, para resultados por nombre)
+        """
+        self.names = dict(names or {})
+        self.fingerprint = aliases_fingerprint(aliases_by_brand, names)
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[Tuple[int, int, bool, bool]]] = [[]]
+        self._canonical: Dict[str, int] = {}
+
+        for marca_id, aliases in aliases_by_brand.items():
+            for alias in set(aliases or []):
+                folded, _ = fold(str(alias).strip())
+                if not folded:
+                    continue
+                self._add(folded, marca_id)
+                self._canonical.setdefault(canonical(alias), marca_id)
+            if marca_id in self.names:
+                self._canonical.setdefault(canonical(self.names[marca_id]), marca_id)
+        self._canonical.pop("", None)
+        self._build()
+
+    def _add(self, pattern: str, marca_id: int) -> None:
+        node = 0
+        for ch in pattern:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            node = nxt
+        # (longitud, marca, exige límite al inicio, exige límite al final)
+        self._out[node].append((len(pattern), marca_id, pattern[0].isalnum(), pattern[-1].isalnum()))
+
+    def _build(self) -> None:
+        """Enlaces de fallo por BFS (las salidas se heredan del sufijo)"""
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self._goto[node].items():
+                queue.append(nxt)
+                f = self._fail[node]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                cand = self._goto[f].get(ch, 0)
+                self._fail[nxt] = cand if cand != nxt else 0
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def iter_matches(self, text: Optional[str]) -> Iterable[Tuple[int, int, int]]:
+        """
+        Todas las coincidencias válidas (con límites de palabra)
+
+        Yields:
+            (marca_id, inicio, fin) en posiciones del texto original
+        """
+        folded, offsets = fold(text)
+        n = len(folded)
+        node = 0
+        goto, fail, out = self._goto, self._fail, self._out
+        for i, ch in enumerate(folded):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if not out[node]:
+                continue
+            for length, marca_id, bound_start, bound_end in out[node]:
+                start = i - length + 1
+                if bound_start and start > 0 and folded[start - 1].isalnum():
+                    continue
+                if bound_end and i + 1 < n and folded[i + 1].isalnum():
+                    continue
+                yield marca_id, offsets[start], offsets[i] + 1
+
+    def find(self, text: Optional[str]) -> Dict[int, Tuple[int, int]]:
+        """
+        Menciones por marca; aliases solapados de una marca cuentan como una aparición
+
+        Returns:
+            {marca_id: (first_offset, count)}
+        """
+        spans: Dict[int, List[Tuple[int, int]]] = {}
+        for marca_id, start, end in self.iter_matches(text):
+            spans.setdefault(marca_id, []).append((start, end))
+        found: Dict[int, Tuple[int, int]] = {}
+        for marca_id, items in spans.items():
+            items.sort()
+            count, cur_end = 0, -1
+            for start, end in items:
+                if start >= cur_end:
+                    count += 1
+                cur_end = max(cur_end, end)
+            found[marca_id] = (items[0][0], count)
+        return found
+
+    def brands_in(self, text: Optional[str]) -> Set[int]:
+        """IDs de marcas mencionadas en el texto"""
+        return {marca_id for marca_id, _, _ in self.iter_matches(text)}
+
+    def brand_names_in(self, text: Optional[str]) -> Set[str]:
+        """Nombres de marcas mencionadas en el texto"""
+        return {self.names[m] for m in self.brands_in(text) if m in self.names}
+
+    def lookup(self, name: Optional[str]) -> Optional[int]:
+        """Marca cuyo nombre o alias coincide (forma canónica) con `name`"""
+        return self._canonical.get(canonical(name))
+
+    @property
+    def canonical_aliases(self) -> List[str]:
+        return list(self._canonical)
+
+
+# =============================
+# Caché por categoría
+# =============================
+
+_cache: Dict[Tuple[int, str], BrandMatcher] = {}
+_cache_lock = threading.Lock()
+
+
+def aliases_fingerprint(aliases_by_brand: Dict[int, Iterable[str]], names: Optional[Dict[int, str]] = None) -> str:
+    """Huella estable de marcas/aliases (cambia si se añade, borra o edita un alias)"""
+    payload = json.dumps(
+        sorted((mid, sorted({str(a).lower() for a in (aliases or []) if a}), (names or {}).get(mid))
+               for mid, aliases in aliases_by_brand.items()),
+        ensure_ascii=False
+    )
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def brand_aliases(marcas: Iterable[Marca]) -> Tuple[Dict[int, List[str]], Dict[int, str]]:
+    """
+    ({marca_id: aliases}, {marca_id: nombre}): entrada del BrandMatcher (serializable)
+    En el texto solo se buscan los aliases; el nombre sirve para lookup() y resultados
+    """
+    marcas = list(marcas)
+    aliases = {m.id: list(m.aliases or []) for m in marcas}
+    names = {m.id: m.nombre for m in marcas}
+    return aliases, names
+
+
+def matcher_for_marcas(categoria_id: int, marcas: Iterable[Marca]) -> BrandMatcher:
+    """Matcher para marcas ya cargadas (compilado una vez por huella de aliases)"""
+    aliases, names = brand_aliases(marcas)
+    key = (categoria_id, aliases_fingerprint(aliases, names))
+    with _cache_lock:
+        matcher = _cache.get(key)
+        if matcher is None:
+            # Descartar versiones anteriores de la categoría
+            for old in [k for k in _cache if k[0] == categoria_id]:
+                del _cache[old]
+            matcher = BrandMatcher(aliases, names)
+            _cache[key] = matcher
+    return matcher
+
+
+def get_brand_matcher(session: Session, categoria_id: int) -> BrandMatcher:
+    """Matcher de la categoría (consulta ligera de aliases; recompila solo si cambiaron)"""
+    marcas = session.query(Marca).filter_by(categoria_id=categoria_id).all()
+    return matcher_for_marcas(categoria_id, marcas)
@@ -7,13 +7,13 @@ from __future__ import annotations
 
 import json
 import re
-import unicodedata
 from difflib import SequenceMatcher
 from typing import List, Dict, Any
 from sqlalchemy.orm import Session
 
-from src.database.models import Marca, BrandCandidate, QueryExecution, Categoria
+from src.database.models import BrandCandidate, QueryExecution, Categoria
 from src.query_executor.api_clients import OpenAIClient
+from src.analytics.brand_matcher import get_brand_matcher, canonical
 from src.utils.logger import setup_logger
 
 
@@ -82,28 +82,14 @@ TEXTO:
         return [{"nombre": n, "aliases": [n], "confianza": 0.4} for n in sorted(raw)]
 
     def _filter_existing_brands(self, categoria_id: int, candidates: List[Dict[str, Any]]):
-        existing = self.session.query(Marca).filter_by(categoria_id=categoria_id).all()
-
-        def normalize(s: str) -> str:
-            s = s or ""
-            s = s.lower().strip()
-            s = unicodedata.normalize('NFKD', s)
-            s = ''.join(ch for ch in s if not unicodedata.combining(ch))
-            # mantener alfanumérico y espacios
-            s = re.sub(r"[^a-z0-9 ]+", "", s)
-            s = re.sub(r"\s+", " ", s).strip()
-            return s
-
-        existing_norm = set()
-        for m in existing:
-            existing_norm.add(normalize(m.nombre))
-            for a in (m.aliases or []):
-                existing_norm.add(normalize(a))
+        # Matcher compilado de la categoría (cacheado hasta que cambian los aliases)
+        matcher = get_brand_matcher(self.session, categoria_id)
+        existing_norm = matcher.canonical_aliases
 
         def is_known(name: str) -> bool:
-            n = normalize(name)
-            if n in existing_norm:
+            if matcher.lookup(name) is not None:
                 return True
+            n = canonical(name)
             # fuzzy cerca de exacto
             for known in existing_norm:
                 if not known or not n:
@@ -0,0 +1,97 @@
+"""
+Analysis Context
+Resultados de agentes compartidos durante una ejecución del orquestador
+
+- Precarga con una sola consulta (agente IN ..., periodo IN ...) los resultados
+  que los agentes leen: periodo actual e historial reciente
+- Los resultados guardados durante la ejecución sustituyen a los precargados
+  (BaseAgent.save_results los publica aquí)
+- Las ausencias también se recuerdan: un agente sin resultado no se vuelve a consultar
+- Cada lectura devuelve una copia: un agente no puede alterar lo que ven los demás
+"""
+
+import copy
+import threading
+from typing import Any, Dict, Iterable, Optional, Tuple
+from sqlalchemy.orm import Session
+from src.database.models import AnalysisResult
+from src.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class AnalysisContext:
+    """
+    Caché de AnalysisResult.resultado por (agente, periodo) para una categoría
+    """
+
+    def __init__(self, categoria_id: int, periodo: str):
+        self.categoria_id = categoria_id
+        self.periodo = periodo
+        self._results: Dict[Tuple[str, str], Optional[Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+        self.queries = 0
+        self.hits = 0
+
+    def prefetch(self, session: Session, agentes: Iterable[str], periodos: Iterable[str]) -> int:
+        """
+        Carga de una vez todos los resultados de `agentes` × `periodos`
+        (las combinaciones sin fila quedan registradas como ausentes)
+
+        Returns:
+            Nº de resultados encontrados
+        """
+        agentes, periodos = sorted(set(agentes)), sorted(set(periodos))
+        rows = session.query(
+            AnalysisResult.agente, AnalysisResult.periodo, AnalysisResult.resultado
+        ).filter(
+            AnalysisResult.categoria_id == self.categoria_id,
+            AnalysisResult.agente.in_(agentes),
+            AnalysisResult.periodo.in_(periodos)
+        ).all()
+        found = {(r.agente, r.periodo): r.resultado for r in rows}
+        with self._lock:
+            self.queries += 1
+            for agente in agentes:
+                for periodo in periodos:
+                    # Lo publicado durante la ejecución tiene prioridad
+                    self._results.setdefault((agente, periodo), found.get((agente, periodo)))
+        logger.info(
+            "analysis_context_prefetched",
+            categoria_id=self.categoria_id,
+            agentes=len(agentes),
+            periodos=len(periodos),
+            resultados=len(found)
+        )
+        return len(found)
+
+    def put(self, agente: str, periodo: str, resultado: Dict[str, Any]) -> None:
+        """Publica el resultado recién guardado por un agente"""
+        with self._lock:
+            self._results[(agente, periodo)] = copy.deepcopy(resultado)
+
+    def get(self, session: Session, agente: str, periodo: str) -> Dict[str, Any]:
+        """
+        Resultado de `agente` en `periodo` ({} si no existe); consulta solo si no se precargó
+        """
+        key = (agente, periodo)
+        with self._lock:
+            known = key in self._results
+            resultado = self._results.get(key)
+            if known:
+                self.hits += 1
+        if not known:
+            row = session.query(AnalysisResult.resultado).filter_by(
+                categoria_id=self.categoria_id,
+                periodo=periodo,
+                agente=agente
+            ).first()
+            resultado = row.resultado if row else None
+            with self._lock:
+                self.queries += 1
+                resultado = self._results.setdefault(key, resultado)
+        return copy.deepcopy(resultado) if resultado else {}
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {'queries': self.queries, 'hits': self.hits, 'cached': len(self._results)}
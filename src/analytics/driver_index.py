@@ -0,0 +1,140 @@
+"""
+Driver Index
+Índice invertido keyword de driver → (ejecución, marca) por periodo
+
+- Una sola pasada por los textos del periodo: keywords y menciones de marca
+- Una keyword se atribuye a una marca solo si cae en la ventana de una de sus
+  menciones (± window_chars), no en cualquier parte del corpus
+- La atribución de drivers por marca es una consulta al índice
+- Se construye una vez por periodo y se cachea hasta que cambian las
+  ejecuciones del periodo o los aliases
+"""
+
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+import yaml
+from src.analytics.brand_matcher import BrandMatcher, fold
+
+# Diccionario genérico de keywords por driver (válido para cualquier mercado)
+# Las keywords son prefijos: 'promoci' casa con promoción/promociones
+DRIVER_KEYWORDS: Dict[str, List[str]] = {
+    'precio/promos': ['precio', 'tarifa', 'promoci', 'descuento', 'oferta', 'subida', 'bajada'],
+    'campañas/marketing': ['campaña', 'anuncio', 'spot', 'creativo', 'influencer', 'patrocinio'],
+    'canales/disponibilidad': ['disponibilidad', 'stock', 'agotado', 'retailer', 'tienda', 'web', 'online', 'marketplace'],
+    'servicio/soporte': ['soporte', 'servicio', 'avería', 'incidencia', 'reclamaci', 'atención'],
+    'producto/calidad': ['calidad', 'rendimiento', 'defecto', 'sabor', 'diseño', 'experiencia'],
+    'sostenibilidad/esg': ['esg', 'sostenibil', 'controversia', 'medioambient', 'recicl', 'denuncia'],
+    'portabilidad/procesos': ['portabilidad', 'alta', 'baja', 'cambio', 'trámite'],
+    'facturación/cobros': ['factura', 'facturación', 'cobro', 'cargo', 'tarificación'],
+    'app/procesos': ['app', 'aplicación', 'login', 'e-sim', 'esim', 'proceso', 'registro']
+}
+
+DEFAULT_DRIVER_SETTINGS = {
+    'window_chars': 300,   # caracteres a cada lado de una mención de marca
+    'min_keywords': 3,     # keywords distintas de un driver para atribuirlo a la marca
+    'cache_size': 16,      # índices de periodo cacheados en el proceso
+}
+
+
+def _load_driver_settings(config_path: str = "config/settings.yaml") -> Dict[str, int]:
+    """Lee analytics.drivers de settings"""
+    settings = dict(DEFAULT_DRIVER_SETTINGS)
+    try:
+        with open(config_path, "r", encoding="utf-8") as f:
+            cfg = yaml.safe_load(f) or {}
+        settings.update({
+            k: int(v) for k, v in ((cfg.get("analytics") or {}).get("drivers") or {}).items()
+            if k in DEFAULT_DRIVER_SETTINGS
+        })
+    except Exception:
+        pass
+    return settings
+
+
+DRIVER_SETTINGS = _load_driver_settings()
+
+# Keyword normalizada (sin acentos) → keyword original; una regex para todas
+_FOLDED = {fold(word)[0]: word for words in DRIVER_KEYWORDS.values() for word in words}
+_KEYWORD_RE = re.compile(
+    r"(?<![a-z0-9])(" + "|".join(re.escape(k) for k in sorted(_FOLDED, key=len, reverse=True)) + ")"
+)
+
+
+class DriverIndex:
+    """
+    Postings {keyword: {marca_id: {execution_id}}} restringidos a ventanas de marca
+    """
+
+    def __init__(self, matcher: BrandMatcher, window_chars: Optional[int] = None):
+        self.matcher = matcher
+        self.window_chars = int(window_chars if window_chars is not None else DRIVER_SETTINGS['window_chars'])
+        self.postings: Dict[str, Dict[int, Set[int]]] = {}
+        self.num_executions = 0
+
+    def add_text(self, execution_id: int, text: Optional[str]) -> None:
+        """Indexa un texto: cada keyword se asocia a las marcas cuya ventana la contiene"""
+        self.num_executions += 1
+        if not text:
+            return
+        spans = [(m, max(0, s - self.window_chars), e + self.window_chars)
+                 for m, s, e in self.matcher.iter_matches(text)]
+        if not spans:
+            return
+        folded, offsets = fold(text)
+        for match in _KEYWORD_RE.finditer(folded):
+            pos = offsets[match.start()]
+            keyword = _FOLDED[match.group(1)]
+            for marca_id, lo, hi in spans:
+                if lo <= pos <= hi:
+                    self.postings.setdefault(keyword, {}).setdefault(marca_id, set()).add(execution_id)
+
+    def add_executions(self, executions: Iterable[Any]) -> "DriverIndex":
+        """Indexa filas con `.id` y `.respuesta_texto` (p. ej. BaseAgent.iter_executions)"""
+        for execution in executions:
+            self.add_text(execution.id, execution.respuesta_texto)
+        return self
+
+    def keywords_for(self, marca: str) -> Dict[str, int]:
+        """{keyword: nº de ejecuciones} en ventanas de la marca (nombre o alias)"""
+        marca_id = self.matcher.lookup(marca)
+        if marca_id is None:
+            return {}
+        return {
+            keyword: len(by_brand[marca_id])
+            for keyword, by_brand in self.postings.items()
+            if marca_id in by_brand
+        }
+
+    def drivers_for(self, marca: str, min_keywords: Optional[int] = None) -> List[str]:
+        """Drivers con al menos `min_keywords` keywords distintas cerca de la marca"""
+        threshold = int(min_keywords if min_keywords is not None else DRIVER_SETTINGS['min_keywords'])
+        seen = self.keywords_for(marca)
+        return [
+            driver for driver, words in DRIVER_KEYWORDS.items()
+            if sum(word in seen for word in words) >= threshold
+        ]
+
+
+# =============================
+# Caché por periodo
+# =============================
+
+_cache: "OrderedDict[Tuple, DriverIndex]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def cached_index(key: Tuple, build) -> DriverIndex:
+    """Índice de la clave (categoría, ventana, huella de aliases, nº ejecuciones) o lo construye"""
+    with _cache_lock:
+        index = _cache.get(key)
+        if index is not None:
+            _cache.move_to_end(key)
+            return index
+    index = build()
+    with _cache_lock:
+        _cache[key] = index
+        while len(_cache) > max(1, DRIVER_SETTINGS['cache_size']):
+            _cache.popitem(last=False)
+    return index
@@ -0,0 +1,448 @@
+"""
+Estimator
+Estimación en seco de un análisis (o de un batch): llamadas LLM, tokens, coste y duración
+
+- Recorre el DAG del orquestador sin llamar a ningún LLM; sin --force calcula la huella
+  de cada agente para saber cuáles se reutilizarían (un agente se recalcula si cambia
+  su huella o si se recalcula alguna de sus dependencias)
+- Tamaño de prompt a partir de los datos reales: texto de las ejecuciones del periodo
+  y tamaño de los resultados de las dependencias del agente
+- Llamadas por agente, tokens de salida y latencias del histórico de analysis_runs
+  (consumo 'llm' registrado por agente); sin histórico, perfil por defecto
+- Duración simulando el DAG con `max_parallel_agents`, las categorías de un batch con
+  `max_parallel_categories` y el pool de PDF, acotada por los límites LLM
+  (concurrencia global/proveedor y peticiones por minuto)
+
+Parámetros en settings (analytics.estimator).
+"""
+
+import heapq
+import json
+import math
+import statistics
+from collections import Counter, defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+import yaml
+from sqlalchemy import func
+from src.database.connection import get_session
+from src.database.models import AnalysisResult, AnalysisRun, Categoria, Mercado, Query, QueryExecution
+from src.analytics.agents.base_agent import parse_periodo, last_periods
+from src.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+DEFAULT_ESTIMATOR_SETTINGS = {
+    'history_runs': 30,                # ejecuciones recientes de las que salen las estadísticas por agente
+    'chars_per_token': 4.0,
+    'output_tokens_per_second': 40.0,  # latencia de una llamada sin histórico
+    'call_overhead_seconds': 2.0,      # latencia fija por llamada sin histórico
+    'reuse_seconds': 0.5,              # agente reutilizado por huella
+    'pdf_seconds': 30.0,               # render de un PDF
+    'upstream_tokens_cap': 12000,      # tope de tokens de resultados previos en un prompt
+}
+
+# Perfil de agentes sin histórico:
+#   calls: llamadas fijas · per_execution_calls: llamadas de una ejecución cada una (tope)
+#   template_tokens: instrucciones del prompt · texts: (fragmentos por llamada, caracteres máx.)
+#   upstream: el prompt incluye los resultados de sus dependencias
+#   upstream_share: fracción de esos resultados en cada llamada (prompts con contexto parcial)
+#   output_tokens: salida por llamada · seconds: tiempo fuera del LLM
+#   parallel_sections: las llamadas van en paralelo (secciones del ejecutivo, analytics.executive)
+DEFAULT_AGENT_PROFILES: Dict[str, Dict[str, Any]] = {
+    'quantitative': {'calls': 0, 'seconds': 5},
+    'qualitative': {'calls': 6, 'provider': 'anthropic', 'template_tokens': 400, 'texts': (10, 900), 'output_tokens': 1500},
+    'sentiment': {'calls': 1, 'per_execution_calls': 10, 'template_tokens': 250, 'texts': (1, 800), 'output_tokens': 400},
+    'competitive': {'calls': 1, 'template_tokens': 1500, 'upstream': True, 'output_tokens': 2500},
+    'trends': {'calls': 0, 'seconds': 2},
+    'customer_journey': {'calls': 1, 'template_tokens': 800, 'upstream': True, 'output_tokens': 2000},
+    'scenario_planning': {'calls': 1, 'template_tokens': 800, 'upstream': True, 'output_tokens': 2000},
+    'campaign_analysis': {'calls': 1, 'template_tokens': 1000, 'texts': (10, 600), 'output_tokens': 2000},
+    'channel_analysis': {'calls': 1, 'template_tokens': 1000, 'texts': (10, 600), 'output_tokens': 2000},
+    'esg_analysis': {'calls': 1, 'provider': 'anthropic', 'template_tokens': 1000, 'texts': (10, 600), 'output_tokens': 2000},
+    'packaging_analysis': {'calls': 1, 'provider': 'anthropic', 'template_tokens': 1000, 'texts': (10, 600), 'output_tokens': 2000},
+    'pricing_power': {'calls': 1, 'template_tokens': 800, 'upstream': True, 'output_tokens': 1800},
+    'strategic': {'calls': 1, 'template_tokens': 2000, 'upstream': True, 'output_tokens': 4000},
+    'transversal': {'calls': 1, 'template_tokens': 1000, 'upstream': True, 'output_tokens': 2000},
+    'synthesis': {'calls': 1, 'provider': 'anthropic', 'template_tokens': 2000, 'upstream': True, 'output_tokens': 5000},
+    'executive': {'calls': 11, 'template_tokens': 1800, 'upstream': True, 'upstream_share': 0.35, 'output_tokens': 2200, 'parallel_sections': True},
+}
+
+DEFAULT_MODELS = {
+    'openai': ('OPENAI_MODEL', 'gpt-4o'),
+    'anthropic': ('ANTHROPIC_MODEL', 'claude-3-7-sonnet-latest'),
+    'google': ('GOOGLE_MODEL', 'gemini-2.5-flash'),
+    'perplexity': ('PPLX_MODEL', 'sonar-reasoning'),
+}
+
+
+def _load_estimator_settings(config_path: str = "config/settings.yaml") -> Dict[str, float]:
+    """Lee analytics.estimator de settings"""
+    settings = dict(DEFAULT_ESTIMATOR_SETTINGS)
+    try:
+        with open(config_path, "r", encoding="utf-8") as f:
+            cfg = yaml.safe_load(f) or {}
+        for k, v in ((cfg.get("analytics") or {}).get("estimator") or {}).items():
+            if k in DEFAULT_ESTIMATOR_SETTINGS:
+                settings[k] = type(DEFAULT_ESTIMATOR_SETTINGS[k])(v)
+    except Exception:
+        pass
+    return settings
+
+
+ESTIMATOR_SETTINGS = _load_estimator_settings()
+
+
+def _default_model(provider: str) -> str:
+    import os
+    env, default = DEFAULT_MODELS.get(provider, (None, ''))
+    return os.getenv(env, default) if env else default
+
+
+def simulate_graph(
+    graph: Dict[str, Set[str]],
+    durations: Dict[str, float],
+    workers: int,
+    rank: Optional[Dict[str, int]] = None
+) -> float:
+    """
+    Duración de un DAG con `workers` tareas a la vez, lanzando las listas en orden de `rank`
+    (misma política que AnalysisOrchestrator._run_graph)
+    """
+    rank = rank or {}
+    pending = dict(graph)
+    finished: Set[str] = set()
+    running: List[Tuple[float, str]] = []
+    now = 0.0
+    while pending or running:
+        ready = sorted((n for n, deps in pending.items() if deps <= finished), key=lambda n: rank.get(n, 0))
+        for name in ready[:max(0, workers - len(running))]:
+            del pending[name]
+            heapq.heappush(running, (now + durations.get(name, 0.0), name))
+        if not running:
+            break  # dependencias imposibles: no debería ocurrir con un grafo validado
+        now, name = heapq.heappop(running)
+        finished.add(name)
+        while running and running[0][0] <= now:
+            finished.add(heapq.heappop(running)[1])
+    return now
+
+
+def simulate_batch(durations: List[float], workers: int, pdf_workers: int, pdf_seconds: float) -> float:
+    """Duración de un batch: análisis en `workers` huecos (en orden) y cada PDF en su pool al terminar"""
+    slots = [0.0] * max(1, workers)
+    analysis_done = []
+    for d in durations:
+        start = heapq.heappop(slots)
+        analysis_done.append(start + d)
+        heapq.heappush(slots, start + d)
+    pdf_slots = [0.0] * max(1, pdf_workers)
+    end = 0.0
+    for ready in sorted(analysis_done):
+        start = max(ready, heapq.heappop(pdf_slots))
+        heapq.heappush(pdf_slots, start + pdf_seconds)
+        end = max(end, start + pdf_seconds)
+    return end
+
+
+class AnalysisEstimator:
+    """
+    Estimación sin LLM del coste y la duración de run_analysis / generate-batch
+    """
+
+    def __init__(self, settings: Optional[Dict[str, float]] = None):
+        from src.analytics.orchestrator import AnalysisOrchestrator
+        from src.query_executor.api_clients.rate_limiter import _load_rate_limits
+        from src.utils.cost_tracker import cost_tracker
+
+        self.settings = {**ESTIMATOR_SETTINGS, **(settings or {})}
+        self.orchestrator = AnalysisOrchestrator()
+        self.rank = {name: i for i, (name, _) in enumerate(self.orchestrator.agent_order)}
+        self.rate_limits = _load_rate_limits()
+        self.cost_tracker = cost_tracker
+        self._history: Optional[Dict[str, Dict[str, Any]]] = None
+
+    # =============================
+    # Histórico por agente
+    # =============================
+    def history(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Estadísticas por agente de las últimas `history_runs` ejecuciones (agentes recalculados con éxito):
+        {agente: {'n', 'calls', 'output_tokens', 'seconds_per_call', 'other_seconds', 'model'}}
+        """
+        if self._history is not None:
+            return self._history
+        samples: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        with get_session(read_only=True) as session:
+            runs = session.query(AnalysisRun.agentes).order_by(
+                AnalysisRun.id.desc()
+            ).limit(int(self.settings['history_runs'])).all()
+        for (agentes,) in runs:
+            for name, entry in (agentes or {}).items():
+                if entry.get('status') == 'success' and entry.get('cache') in ('miss', 'forced'):
+                    samples[name].append(entry)
+
+        stats = {}
+        for name, entries in samples.items():
+            with_llm = [e['llm'] for e in entries if e.get('llm')]
+            calls = [u['calls'] for u in with_llm]
+            called = [u for u in with_llm if u['calls']]
+            models = Counter()
+            for u in called:
+                models.update(u.get('models') or {})
+            stats[name] = {
+                'n': len(entries),
+                'calls': statistics.median(calls) if calls else None,
+                'output_tokens': statistics.median(u['tokens_output'] / u['calls'] for u in called) if called else None,
+                'seconds_per_call': statistics.median(u['seconds'] / u['calls'] for u in called) if called else None,
+                'other_seconds': statistics.median(
+                    max(0.0, (e.get('execution_time') or 0) - ((e.get('llm') or {}).get('seconds') or 0))
+                    for e in entries
+                ),
+                'model': models.most_common(1)[0][0] if models else None,
+            }
+        self._history = stats
+        return stats
+
+    # =============================
+    # Datos del periodo
+    # =============================
+    def _period_data(self, session, categoria_id: int, periodo: str) -> Dict[str, float]:
+        """Nº de ejecuciones del periodo y longitud media de sus respuestas (una consulta)"""
+        start, end, _ = parse_periodo(periodo)
+        executions, chars = session.query(
+            func.count(QueryExecution.id),
+            func.coalesce(func.sum(func.length(QueryExecution.respuesta_texto)), 0)
+        ).join(
+            Query, QueryExecution.query_id == Query.id
+        ).filter(
+            Query.categoria_id == categoria_id,
+            QueryExecution.timestamp >= start,
+            QueryExecution.timestamp < end
+        ).one()
+        return {'executions': int(executions or 0), 'avg_chars': (float(chars or 0) / executions) if executions else 0.0}
+
+    def _result_tokens(self, session, categoria_id: int, periodo: str, agentes: Iterable[str]) -> Dict[str, int]:
+        """Tokens del último resultado guardado de cada agente (el del periodo o el más reciente)"""
+        agentes = list(agentes)
+        try:
+            periodos = set(last_periods(periodo, 6))
+        except ValueError:
+            periodos = set()
+        periodos.add(periodo)
+        rows = session.query(
+            AnalysisResult.agente, AnalysisResult.periodo, AnalysisResult.resultado
+        ).filter(
+            AnalysisResult.categoria_id == categoria_id,
+            AnalysisResult.agente.in_(agentes),
+            AnalysisResult.periodo.in_(periodos)
+        ).order_by(AnalysisResult.timestamp.desc()).all()
+        tokens: Dict[str, int] = {}
+        for row in rows:
+            if row.agente not in tokens or row.periodo == periodo:
+                size = len(json.dumps(row.resultado, ensure_ascii=False, default=str))
+                tokens[row.agente] = int(size / self.settings['chars_per_token'])
+        return tokens
+
+    def _reusable(self, categoria_id: int, periodo: str, graph: Dict[str, Set[str]]) -> Set[str]:
+        """Agentes cuya huella coincide con la guardada y cuyas dependencias también se reutilizan"""
+        classes = dict(self.orchestrator.agent_order)
+        reusable: Set[str] = set()
+        for name in sorted(graph, key=lambda n: self.rank[n]):
+            if not graph[name] <= reusable:
+                continue
+            try:
+                with get_session(read_only=True) as session:
+                    agent = classes[name](session, read_session=session)
+                    fingerprint = agent.input_fingerprint(categoria_id, periodo)
+                    if agent.cached_result(categoria_id, periodo, fingerprint) is not None:
+                        reusable.add(name)
+            except Exception as e:
+                logger.warning("estimate_fingerprint_failed", agent=name, error=str(e))
+        return reusable
+
+    # =============================
+    # Estimación
+    # =============================
+    def _agent_estimate(
+        self,
+        name: str,
+        deps: Set[str],
+        data: Dict[str, float],
+        result_tokens: Dict[str, int]
+    ) -> Dict[str, Any]:
+        """Llamadas, tokens, coste y segundos de un agente que se recalcula"""
+        cpt = self.settings['chars_per_token']
+        profile = DEFAULT_AGENT_PROFILES.get(name, {'calls': 1, 'template_tokens': 1000, 'upstream': True, 'output_tokens': 2000})
+        hist = self.history().get(name) or {}
+
+        # Prompt: plantilla + fragmentos del periodo + resultados de las dependencias
+        per_call_text = 0.0
+        if profile.get('texts'):
+            n_texts, max_chars = profile['texts']
+            per_call_text = min(n_texts, data['executions']) * min(max_chars, data['avg_chars']) / cpt
+        upstream = 0
+        if profile.get('upstream'):
+            upstream = min(int(self.settings['upstream_tokens_cap']), sum(result_tokens.get(d, 0) for d in deps))
+            upstream *= profile.get('upstream_share', 1.0)
+        per_execution_calls = min(profile.get('per_execution_calls', 0), data['executions'])
+        fixed_calls = profile.get('calls', 1)
+        template = profile.get('template_tokens', 0)
+        input_fixed = template + per_call_text + upstream
+        input_per_execution = template + min((profile.get('texts') or (1, 0))[1], data['avg_chars']) / cpt
+
+        modelled_calls = fixed_calls + per_execution_calls
+        calls = hist.get('calls')
+        calls = modelled_calls if calls is None else calls
+        if not data['executions'] and not profile.get('upstream'):
+            calls = 0  # sin datos el agente no llama al LLM
+        # Reparto de las llamadas entre fijas y por ejecución según el perfil
+        share_fixed = fixed_calls / modelled_calls if modelled_calls else 1.0
+        tokens_input = calls * (share_fixed * input_fixed + (1 - share_fixed) * input_per_execution)
+
+        output_per_call = hist.get('output_tokens')
+        if output_per_call is None:
+            output_per_call = profile.get('output_tokens', 0)
+        tokens_output = calls * output_per_call
+
+        seconds_per_call = hist.get('seconds_per_call')
+        if seconds_per_call is None:
+            seconds_per_call = (
+                self.settings['call_overhead_seconds'] + output_per_call / self.settings['output_tokens_per_second']
+            )
+        llm_seconds = calls * seconds_per_call
+        other_seconds = hist.get('other_seconds')
+        if other_seconds is None:
+            other_seconds = profile.get('seconds', 1.0)
+        # Duración: llamadas simultáneas en tandas de max_parallel_sections
+        wall_llm_seconds = llm_seconds
+        if profile.get('parallel_sections') and calls:
+            from src.analytics.agents.executive_agent import EXECUTIVE_SETTINGS
+            wall_llm_seconds = math.ceil(calls / max(1, EXECUTIVE_SETTINGS['max_parallel_sections'])) * seconds_per_call
+
+        provider_model = hist.get('model') or ''
+        if '/' in provider_model:
+            provider, model = provider_model.split('/', 1)
+        else:
+            provider = profile.get('provider', 'openai')
+            model = _default_model(provider)
+
+        return {
+            'status': 'recalcular',
+            'source': f"histórico n={hist['n']}" if hist.get('calls') is not None else 'perfil',
+            'provider': provider,
+            'model': model,
+            'calls': round(calls, 1),
+            'tokens_input': int(tokens_input),
+            'tokens_output': int(tokens_output),
+            'cost_usd': self.cost_tracker.calculate_cost(provider, model, int(tokens_input), int(tokens_output)),
+            'llm_seconds': llm_seconds,
+            'seconds': other_seconds + wall_llm_seconds,
+        }
+
+    def estimate_category(self, categoria_id: int, periodo: str, force: bool = False) -> Dict[str, Any]:
+        """
+        Estimación de run_analysis(categoria_id, periodo)
+
+        Returns:
+            {'categoria', 'periodo', 'data', 'agents': {agente: {...}}, 'calls', 'tokens_input',
+             'tokens_output', 'cost_usd', 'llm_seconds', 'wall_seconds', 'by_provider'}
+        """
+        from src.analytics.orchestrator import FMCG_AGENTS
+
+        with get_session(read_only=True) as session:
+            categoria = session.query(Categoria).get(categoria_id)
+            if not categoria:
+                raise ValueError(f"Categoría {categoria_id} no encontrada")
+            mercado = session.query(Mercado).get(categoria.mercado_id)
+            categoria_nombre = f"{mercado.nombre}/{categoria.nombre}"
+            skip = FMCG_AGENTS if getattr(mercado, 'tipo_mercado', 'FMCG') != 'FMCG' else set()
+            graph = self.orchestrator.dependency_graph(skip)
+            data = self._period_data(session, categoria_id, periodo)
+            result_tokens = self._result_tokens(
+                session, categoria_id, periodo, [name for name, _ in self.orchestrator.agent_order]
+            )
+
+        reusable = set() if force else self._reusable(categoria_id, periodo, graph)
+        classes = dict(self.orchestrator.agent_order)
+
+        agents: Dict[str, Dict[str, Any]] = {name: {'status': 'omitir'} for name in sorted(skip)}
+        for name in sorted(graph, key=lambda n: self.rank[n]):
+            if name in reusable:
+                agents[name] = {
+                    'status': 'reutilizar', 'calls': 0, 'tokens_input': 0, 'tokens_output': 0,
+                    'cost_usd': 0.0, 'llm_seconds': 0.0, 'seconds': self.settings['reuse_seconds']
+                }
+            else:
+                declared = set(getattr(classes[name], 'depends_on', ()) or ())
+                agents[name] = self._agent_estimate(name, declared, data, result_tokens)
+
+        durations = {n: a['seconds'] for n, a in agents.items() if n in graph}
+        dag_seconds = simulate_graph(graph, durations, self.orchestrator.max_parallel, self.rank)
+
+        estimate = {
+            'categoria': categoria_nombre,
+            'categoria_id': categoria_id,
+            'periodo': periodo,
+            'data': data,
+            'agents': agents,
+            'dag_seconds': dag_seconds,
+        }
+        estimate.update(self._totals([estimate]))
+        estimate['wall_seconds'], estimate['bound'] = self._bounded(dag_seconds, estimate)
+        return estimate
+
+    def estimate_batch(
+        self,
+        categoria_ids: List[int],
+        periodo: str,
+        force: bool = False,
+        max_parallel: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """Estimación de generate-batch: cada categoría más el solape de análisis y PDFs"""
+        from src.analytics.batch import BATCH_SETTINGS
+
+        parallel = max(1, int(max_parallel or BATCH_SETTINGS['max_parallel_categories']))
+        categories = [self.estimate_category(cid, periodo, force=force) for cid in categoria_ids]
+        batch_seconds = simulate_batch(
+            [c['wall_seconds'] for c in categories],
+            parallel,
+            int(BATCH_SETTINGS['pdf_workers']),
+            self.settings['pdf_seconds']
+        )
+        estimate = {'periodo': periodo, 'categories': categories, 'max_parallel_categories': parallel}
+        estimate.update(self._totals(categories))
+        estimate['wall_seconds'], estimate['bound'] = self._bounded(batch_seconds, estimate)
+        return estimate
+
+    def _totals(self, estimates: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Suma de llamadas, tokens, coste y segundos LLM (total y por proveedor)"""
+        totals = {'calls': 0.0, 'tokens_input': 0, 'tokens_output': 0, 'cost_usd': 0.0, 'llm_seconds': 0.0}
+        by_provider: Dict[str, Dict[str, float]] = defaultdict(lambda: {'calls': 0.0, 'llm_seconds': 0.0, 'cost_usd': 0.0})
+        for estimate in estimates:
+            for agent in estimate['agents'].values():
+                if agent['status'] != 'recalcular':
+                    continue
+                for k in totals:
+                    totals[k] += agent[k]
+                provider = by_provider[agent['provider']]
+                provider['calls'] += agent['calls']
+                provider['llm_seconds'] += agent['llm_seconds']
+                provider['cost_usd'] += agent['cost_usd']
+        totals['by_provider'] = dict(by_provider)
+        return totals
+
+    def _bounded(self, simulated: float, totals: Dict[str, Any]) -> Tuple[float, str]:
+        """
+        Duración = máx(simulación, cotas de los límites LLM): segundos LLM / concurrencia
+        (global y por proveedor) y llamadas / peticiones por minuto
+        """
+        from src.query_executor.api_clients.rate_limiter import DEFAULT_PROVIDER_LIMITS
+
+        bounds = [(simulated, 'dag')]
+        bounds.append((totals['llm_seconds'] / self.rate_limits['max_concurrent_total'], 'llm_max_concurrent_total'))
+        for provider, usage in totals['by_provider'].items():
+            limits = {**DEFAULT_PROVIDER_LIMITS, **self.rate_limits['providers'].get(provider, {})}
+            bounds.append((usage['llm_seconds'] / max(1, limits['max_concurrent']), f"{provider}.max_concurrent"))
+            if limits['requests_per_minute'] > 0:
+                bounds.append((usage['calls'] * 60.0 / limits['requests_per_minute'], f"{provider}.requests_per_minute"))
+        return max(bounds)
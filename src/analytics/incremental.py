@@ -0,0 +1,368 @@
+"""
+Incremental Analysis
+Análisis incremental dirigido por eventos de ingesta
+
+- La ingesta (poller.execute_query) deja un evento por ejecución en analysis_events
+  (outbox, en la misma transacción) y, en PostgreSQL, un NOTIFY en el canal
+  `analysis_events` que se entrega al confirmar
+- `IncrementalWorker` (main.py analysis-worker) agrupa los eventos pendientes por
+  categoría/periodo y, tras `debounce_seconds` sin eventos nuevos (o `max_delay_seconds`
+  desde el primero), recalcula solo los agentes sin LLM (quantitative, trends)
+- Cada ejecución genera un evento por granularidad configurada (`granularities`, con
+  `category_granularities` por categoría): su día, semana ISO y/o mes
+- Los agentes con LLM quedan para las ejecuciones programadas (generate-report / generate-batch)
+- Los rollups de menciones ya se actualizan en la propia ingesta (mention_rollup.record_execution)
+- Sin NOTIFY (SQLite, PgBouncer en modo transacción) el worker consulta cada `poll_interval_seconds`
+- Un único worker por base de datos
+
+Parámetros en settings (analytics.incremental). ANALYSIS_WORKER_DEBOUNCE_SECONDS tiene prioridad.
+"""
+
+import os
+import select
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import yaml
+from sqlalchemy import func, text
+from sqlalchemy.orm import Session
+from src.database.models import AnalysisEvent, QueryExecution
+from src.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+DEFAULT_INCREMENTAL_SETTINGS = {
+    'enabled': True,                        # emitir eventos en la ingesta
+    'agents': ['quantitative', 'trends'],   # solo agentes sin llamadas LLM
+    'debounce_seconds': 300,
+    'max_delay_seconds': 1800,
+    'poll_interval_seconds': 30,
+    'retention_days': 7,                    # eventos procesados que se conservan
+    'granularities': ['monthly'],           # periodos que refresca cada ejecución (daily/weekly/monthly)
+    'category_granularities': {},           # categoria_id -> granularidades (sustituye a `granularities`)
+}
+
+NOTIFY_CHANNEL = "analysis_events"
+
+
+def _load_incremental_settings(config_path: str = "config/settings.yaml") -> Dict[str, Any]:
+    """Lee analytics.incremental de settings"""
+    settings = dict(DEFAULT_INCREMENTAL_SETTINGS)
+    try:
+        with open(config_path, "r", encoding="utf-8") as f:
+            cfg = yaml.safe_load(f) or {}
+        settings.update({
+            k: v for k, v in ((cfg.get("analytics") or {}).get("incremental") or {}).items()
+            if k in DEFAULT_INCREMENTAL_SETTINGS
+        })
+    except Exception:
+        pass
+    try:
+        settings['debounce_seconds'] = float(
+            os.getenv("ANALYSIS_WORKER_DEBOUNCE_SECONDS", settings['debounce_seconds'])
+        )
+    except ValueError:
+        pass
+    return settings
+
+
+INCREMENTAL_SETTINGS = _load_incremental_settings()
+
+
+def event_periods(timestamp: datetime, categoria_id: int) -> List[str]:
+    """Periodos (uno por granularidad configurada para la categoría) que contienen `timestamp`"""
+    from src.analytics.agents.base_agent import BaseAgent
+    por_categoria = INCREMENTAL_SETTINGS['category_granularities'] or {}
+    granularities = por_categoria.get(categoria_id, por_categoria.get(str(categoria_id)))
+    periodos = []
+    for granularity in granularities or INCREMENTAL_SETTINGS['granularities']:
+        periodo = BaseAgent._periodo_for_date(timestamp, granularity)
+        if periodo not in periodos:
+            periodos.append(periodo)
+    return periodos
+
+
+def emit_execution_event(session: Session, execution: QueryExecution, categoria_id: int) -> None:
+    """
+    Registra los eventos de una ejecución recién insertada, uno por periodo afectado
+    (llamar en la misma transacción; el NOTIFY se entrega al confirmar)
+    """
+    if not INCREMENTAL_SETTINGS['enabled']:
+        return
+    periodos = event_periods(execution.timestamp, categoria_id)
+    now = datetime.utcnow()
+    for periodo in periodos:
+        session.add(AnalysisEvent(
+            categoria_id=categoria_id,
+            periodo=periodo,
+            tipo='execution',
+            referencia_id=execution.id,
+            created_at=now
+        ))
+    session.flush()
+    if session.get_bind().dialect.name == 'postgresql':
+        for periodo in periodos:
+            session.execute(
+                text("SELECT pg_notify(:channel, :payload)"),
+                {'channel': NOTIFY_CHANNEL, 'payload': f"{categoria_id}:{periodo}"}
+            )
+
+
+class IncrementalWorker:
+    """
+    Recalcula los agentes incrementales de las categorías/periodos con ejecuciones nuevas
+    """
+
+    def __init__(
+        self,
+        agents: Optional[List[str]] = None,
+        debounce_seconds: Optional[float] = None,
+        max_delay_seconds: Optional[float] = None,
+        poll_interval: Optional[float] = None
+    ):
+        from src.analytics.orchestrator import AnalysisOrchestrator
+
+        self.orchestrator = AnalysisOrchestrator()
+        self.agents = list(agents or INCREMENTAL_SETTINGS['agents'])
+        known = {name for name, _ in self.orchestrator.agent_order}
+        unknown = set(self.agents) - known
+        if unknown:
+            raise ValueError(f"Agentes desconocidos en analytics.incremental.agents: {sorted(unknown)}")
+        self.debounce = float(
+            INCREMENTAL_SETTINGS['debounce_seconds'] if debounce_seconds is None else debounce_seconds
+        )
+        self.max_delay = float(max_delay_seconds or INCREMENTAL_SETTINGS['max_delay_seconds'])
+        self.poll_interval = float(poll_interval or INCREMENTAL_SETTINGS['poll_interval_seconds'])
+        self._failures: Dict[Tuple[int, str], int] = {}
+        self._retry_after: Dict[Tuple[int, str], float] = {}
+        self._listener = None
+        self._last_purge = 0.0
+
+    # =============================
+    # Eventos pendientes
+    # =============================
+    def pending(self) -> List[Dict[str, Any]]:
+        """Eventos sin procesar agrupados por categoría/periodo (primario: sin retraso de réplica)"""
+        from src.database.connection import get_session
+
+        with get_session() as session:
+            rows = session.query(
+                AnalysisEvent.categoria_id,
+                AnalysisEvent.periodo,
+                func.count(AnalysisEvent.id),
+                func.min(AnalysisEvent.created_at),
+                func.max(AnalysisEvent.created_at),
+                func.max(AnalysisEvent.id)
+            ).filter(
+                AnalysisEvent.processed_at.is_(None)
+            ).group_by(
+                AnalysisEvent.categoria_id, AnalysisEvent.periodo
+            ).all()
+        return [
+            {
+                'categoria_id': categoria_id,
+                'periodo': periodo,
+                'events': events,
+                'first': first,
+                'last': last,
+                'max_id': max_id
+            }
+            for categoria_id, periodo, events, first, last, max_id in rows
+        ]
+
+    def due(self, groups: List[Dict[str, Any]], flush: bool = False) -> Tuple[List[Dict[str, Any]], Optional[float]]:
+        """
+        Grupos listos (sin eventos nuevos en `debounce` segundos o esperando ya `max_delay`)
+
+        Returns:
+            (grupos listos, segundos hasta el siguiente grupo listo o None)
+        """
+        now = datetime.utcnow()
+        clock = time.monotonic()
+        ready, next_due = [], None
+        for group in groups:
+            key = (group['categoria_id'], group['periodo'])
+            waits = []
+            if key in self._retry_after and self._retry_after[key] > clock:
+                waits.append(self._retry_after[key] - clock)
+            if not flush:
+                quiet = (now - group['last']).total_seconds()
+                waited = (now - group['first']).total_seconds()
+                if quiet < self.debounce and waited < self.max_delay:
+                    waits.append(min(self.debounce - quiet, self.max_delay - waited))
+            if waits:
+                wait = max(waits)
+                next_due = wait if next_due is None else min(next_due, wait)
+            else:
+                ready.append(group)
+        return ready, next_due
+
+    # =============================
+    # Procesado
+    # =============================
+    def process(self, group: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Recalcula los agentes incrementales de un grupo y marca sus eventos procesados
+        (solo hasta `max_id`: lo que llegue durante el recálculo queda para la siguiente vuelta).
+        Si falla, los eventos siguen pendientes y el grupo se reintenta con espera creciente
+        """
+        from src.database.connection import get_session
+
+        key = (group['categoria_id'], group['periodo'])
+        try:
+            outcome = self.orchestrator.run_incremental(group['categoria_id'], group['periodo'], self.agents)
+        except Exception as e:
+            failures = self._failures.get(key, 0) + 1
+            self._failures[key] = failures
+            backoff = min(self.max_delay, max(self.poll_interval, self.debounce) * 2 ** (failures - 1))
+            self._retry_after[key] = time.monotonic() + backoff
+            logger.error(
+                "incremental_analysis_failed",
+                categoria_id=group['categoria_id'],
+                periodo=group['periodo'],
+                events=group['events'],
+                failures=failures,
+                retry_in_seconds=backoff,
+                error=str(e)
+            )
+            return {**group, 'status': 'error', 'error': str(e)}
+
+        self._failures.pop(key, None)
+        self._retry_after.pop(key, None)
+        with get_session() as session:
+            session.query(AnalysisEvent).filter(
+                AnalysisEvent.categoria_id == group['categoria_id'],
+                AnalysisEvent.periodo == group['periodo'],
+                AnalysisEvent.processed_at.is_(None),
+                AnalysisEvent.id <= group['max_id']
+            ).update({'processed_at': datetime.utcnow()}, synchronize_session=False)
+        results = outcome['results']
+        return {
+            **group,
+            'status': 'success' if all(r.get('status') == 'success' for r in results.values()) else 'partial',
+            'agents': {name: r.get('cache') or r.get('status') for name, r in results.items()},
+            'seconds': outcome['total_time_seconds']
+        }
+
+    def run_once(self, flush: bool = False) -> Tuple[List[Dict[str, Any]], Optional[float]]:
+        """
+        Una vuelta: procesa los grupos listos
+
+        Args:
+            flush: Procesar todo lo pendiente sin esperar al debounce
+
+        Returns:
+            (resultados por grupo, segundos hasta el siguiente grupo listo o None)
+        """
+        ready, next_due = self.due(self.pending(), flush=flush)
+        processed = [self.process(group) for group in ready]
+        self._purge()
+        return processed, next_due
+
+    def run(self, once: bool = False, echo: Callable[[str], None] = print) -> None:
+        """
+        Bucle del worker: espera a NOTIFY (o consulta periódicamente) y procesa los grupos listos
+
+        Args:
+            once: Procesar todo lo pendiente sin debounce y salir
+            echo: Salida de un resumen por grupo procesado
+        """
+        logger.info(
+            "analysis_worker_started",
+            agents=self.agents,
+            debounce_seconds=self.debounce,
+            max_delay_seconds=self.max_delay,
+            listen=not once and self._listen() is not None
+        )
+        try:
+            while True:
+                processed, next_due = self.run_once(flush=once)
+                for group in processed:
+                    if group['status'] == 'error':
+                        echo(f"  ✗ categoría {group['categoria_id']} {group['periodo']}: {group['error']}")
+                    else:
+                        agents = ", ".join(f"{name} ({state})" for name, state in group['agents'].items())
+                        echo(
+                            f"  ✓ categoría {group['categoria_id']} {group['periodo']}: "
+                            f"{group['events']} ejecuciones nuevas → {agents} en {group['seconds']:.1f}s"
+                        )
+                if once:
+                    return
+                timeout = self.poll_interval if next_due is None else min(self.poll_interval, next_due)
+                self._wait(max(0.5, timeout))
+        finally:
+            self._close_listener()
+
+    # =============================
+    # LISTEN / NOTIFY
+    # =============================
+    def _listen(self):
+        """
+        Conexión dedicada con LISTEN (psycopg2, fuera del pool)
+        None si el backend no lo admite: el worker consulta periódicamente
+        """
+        if self._listener is not None:
+            return self._listener
+        from src.database.connection import get_engine, DB_SETTINGS
+
+        engine = get_engine()
+        if engine.dialect.name != 'postgresql' or DB_SETTINGS['pgbouncer']:
+            return None
+        try:
+            raw = engine.raw_connection()
+            raw.detach()  # autocommit y LISTEN no deben volver al pool
+            conn = raw.driver_connection
+            if not hasattr(conn, 'poll'):
+                raw.close()
+                return None
+            conn.autocommit = True
+            with conn.cursor() as cursor:
+                cursor.execute(f"LISTEN {NOTIFY_CHANNEL}")
+            self._listener = raw
+        except Exception as e:
+            logger.warning("analysis_worker_listen_failed", error=str(e))
+            return None
+        return self._listener
+
+    def _wait(self, timeout: float) -> None:
+        """Espera hasta `timeout` segundos o hasta el siguiente NOTIFY"""
+        raw = self._listen()
+        if raw is None:
+            time.sleep(timeout)
+            return
+        conn = raw.driver_connection
+        try:
+            if select.select([conn], [], [], timeout) != ([], [], []):
+                conn.poll()
+                del conn.notifies[:]
+        except Exception as e:
+            logger.warning("analysis_worker_listen_lost", error=str(e))
+            self._close_listener()
+            time.sleep(min(timeout, self.poll_interval))
+
+    def _close_listener(self) -> None:
+        if self._listener is not None:
+            try:
+                self._listener.close()
+            except Exception:
+                pass
+            self._listener = None
+
+    def _purge(self) -> None:
+        """Borra (como mucho cada hora) los eventos procesados más antiguos que retention_days"""
+        from src.database.connection import get_session
+
+        if time.monotonic() - self._last_purge < 3600:
+            return
+        self._last_purge = time.monotonic()
+        cutoff = datetime.utcnow() - timedelta(days=int(INCREMENTAL_SETTINGS['retention_days']))
+        try:
+            with get_session() as session:
+                deleted = session.query(AnalysisEvent).filter(
+                    AnalysisEvent.processed_at.isnot(None),
+                    AnalysisEvent.processed_at < cutoff
+                ).delete(synchronize_session=False)
+            if deleted:
+                logger.info("analysis_events_purged", deleted=deleted)
+        except Exception as e:
+            logger.warning("analysis_events_purge_failed", error=str(e))
@@ -0,0 +1,310 @@
+"""
+Mention Cube
+Cubo OLAP en proceso de menciones: marca × proveedor × query × día
+
+- Celdas (proveedor, query, día) con nº de ejecuciones y ejecuciones que mencionan cada marca
+- Se construye una vez por ejecución de Quantitative desde la MentionMatrix
+  y se persiste comprimido (.npz) por categoría y periodo
+- slice/by responden "SOV solo en Perplexity" o "por query" en milisegundos,
+  sin volver a recorrer ejecuciones ni texto
+"""
+
+import json
+import os
+import re
+from datetime import date
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+import numpy as np
+import yaml
+from src.analytics.mention_matrix import MentionMatrix
+from src.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+DEFAULT_CUBE_DIR = "data/cubes"
+
+DIMENSIONS = ('provider', 'query', 'day')
+
+
+def _load_cube_dir(config_path: str = "config/settings.yaml") -> str:
+    """Lee analytics.cube.dir de settings (MENTION_CUBE_DIR tiene prioridad)"""
+    try:
+        with open(config_path, "r", encoding="utf-8") as f:
+            cfg = yaml.safe_load(f) or {}
+        default = ((cfg.get("analytics") or {}).get("cube") or {}).get("dir", DEFAULT_CUBE_DIR)
+    except Exception:
+        default = DEFAULT_CUBE_DIR
+    return os.getenv("MENTION_CUBE_DIR", default)
+
+
+class MentionCube:
+    """
+    Cubo disperso por celdas: cells[C × 3] (índices de proveedor, query, día),
+    counts[C × marcas] (ejecuciones con mención) y totals[C] (ejecuciones)
+    """
+
+    def __init__(
+        self,
+        brand_names: List[str],
+        providers: List[str],
+        queries: List[int],
+        days: List[str],
+        cells: np.ndarray,
+        counts: np.ndarray,
+        totals: np.ndarray,
+        meta: Optional[Dict[str, Any]] = None
+    ):
+        self.brand_names = list(brand_names)
+        self.labels = {'provider': list(providers), 'query': list(queries), 'day': list(days)}
+        self.cells = np.asarray(cells, dtype=np.int32).reshape(-1, 3)
+        self.counts = np.asarray(counts, dtype=np.int64).reshape(self.cells.shape[0], len(self.brand_names))
+        self.totals = np.asarray(totals, dtype=np.int64)
+        self.meta = dict(meta or {})
+
+    # -----------------------------
+    # Construcción
+    # -----------------------------
+
+    @classmethod
+    def from_matrix(cls, matrix: MentionMatrix, meta: Optional[Dict[str, Any]] = None) -> "MentionCube":
+        """Agrega la matriz de incidencia por celda (proveedor, query, día)"""
+        keys = np.stack([matrix.provider_codes, matrix.query_codes, matrix.day_codes], axis=1)
+        if keys.shape[0]:
+            cells, inverse = np.unique(keys, axis=0, return_inverse=True)
+            inverse = inverse.ravel()
+            counts = matrix._group_counts(inverse, cells.shape[0])
+            totals = np.bincount(inverse, minlength=cells.shape[0])
+        else:
+            cells = np.zeros((0, 3), dtype=np.int32)
+            counts = np.zeros((0, len(matrix.brand_names)))
+            totals = np.zeros(0, dtype=np.int64)
+        return cls(
+            matrix.brand_names,
+            [str(p) for p in matrix.provider_labels],
+            [int(q) for q in matrix.query_labels],
+            [d.isoformat() if isinstance(d, date) else str(d) for d in matrix.day_labels],
+            cells, np.rint(counts), totals, meta
+        )
+
+    @staticmethod
+    def _aggregate(cells: np.ndarray, counts: np.ndarray, totals: np.ndarray):
+        """Suma celdas repetidas (mismas coordenadas)"""
+        if not cells.shape[0]:
+            return cells, counts, totals
+        uniq, inverse = np.unique(cells, axis=0, return_inverse=True)
+        inverse = inverse.ravel()
+        out_counts = np.zeros((uniq.shape[0], counts.shape[1]), dtype=np.int64)
+        np.add.at(out_counts, inverse, counts)
+        return uniq, out_counts, np.bincount(inverse, weights=totals, minlength=uniq.shape[0]).astype(np.int64)
+
+    def merge(self, other: "MentionCube", meta: Optional[Dict[str, Any]] = None) -> "MentionCube":
+        """Suma de dos cubos (p. ej. estado guardado + ejecuciones nuevas)"""
+        brands = self.brand_names + [b for b in other.brand_names if b not in self.brand_names]
+        labels = {
+            dim: self.labels[dim] + [v for v in other.labels[dim] if v not in self.labels[dim]]
+            for dim in DIMENSIONS
+        }
+
+        def _remap(cube: "MentionCube"):
+            cells = np.empty_like(cube.cells)
+            for k, dim in enumerate(DIMENSIONS):
+                pos = {v: i for i, v in enumerate(labels[dim])}
+                lookup = np.array([pos[v] for v in cube.labels[dim]], dtype=np.int32)
+                cells[:, k] = lookup[cube.cells[:, k]] if lookup.size else cube.cells[:, k]
+            counts = np.zeros((cube.cells.shape[0], len(brands)), dtype=np.int64)
+            counts[:, [brands.index(b) for b in cube.brand_names]] = cube.counts
+            return cells, counts, cube.totals
+
+        a, b = _remap(self), _remap(other)
+        cells, counts, totals = self._aggregate(
+            np.concatenate([a[0], b[0]]), np.concatenate([a[1], b[1]]), np.concatenate([a[2], b[2]])
+        )
+        return MentionCube(
+            brands, labels['provider'], labels['query'], labels['day'],
+            cells, counts, totals, meta if meta is not None else {**self.meta, **other.meta}
+        )
+
+    # -----------------------------
+    # Slice / dice
+    # -----------------------------
+
+    def slice(
+        self,
+        brands: Optional[Iterable[str]] = None,
+        providers: Optional[Iterable[str]] = None,
+        queries: Optional[Iterable[int]] = None,
+        day_from: Optional[str] = None,
+        day_to: Optional[str] = None
+    ) -> "MentionCube":
+        """
+        Sub-cubo filtrado (los filtros a None no restringen)
+
+        Args:
+            day_from / day_to: Días ISO (YYYY-MM-DD), ambos inclusive
+        """
+        mask = np.ones(self.cells.shape[0], dtype=bool)
+        if providers is not None:
+            wanted = {str(p).lower() for p in providers}
+            keep = np.array([str(p).lower() in wanted for p in self.labels['provider']], dtype=bool)
+            mask &= keep[self.cells[:, 0]] if keep.size else False
+        if queries is not None:
+            wanted_q = {int(q) for q in queries}
+            keep = np.array([q in wanted_q for q in self.labels['query']], dtype=bool)
+            mask &= keep[self.cells[:, 1]] if keep.size else False
+        if day_from or day_to:
+            days = self.labels['day']
+            keep = np.array([(not day_from or d >= day_from) and (not day_to or d <= day_to) for d in days], dtype=bool)
+            mask &= keep[self.cells[:, 2]] if keep.size else False
+        cols = list(range(len(self.brand_names)))
+        if brands is not None:
+            wanted_b = {b.lower() for b in brands}
+            cols = [j for j, b in enumerate(self.brand_names) if b.lower() in wanted_b]
+        return MentionCube(
+            [self.brand_names[j] for j in cols],
+            self.labels['provider'], self.labels['query'], self.labels['day'],
+            self.cells[mask], self.counts[mask][:, cols], self.totals[mask], self.meta
+        )
+
+    @property
+    def total_executions(self) -> int:
+        return int(self.totals.sum())
+
+    def _brand_dict(self, values: np.ndarray, digits: Optional[int] = None) -> Dict[str, Any]:
+        return {
+            self.brand_names[j]: (round(float(values[j]), digits) if digits is not None else int(values[j]))
+            for j in np.flatnonzero(values)
+        }
+
+    def mentions(self) -> Dict[str, int]:
+        """{marca: ejecuciones que la mencionan}"""
+        return self._brand_dict(self.counts.sum(axis=0))
+
+    def sov(self) -> Dict[str, float]:
+        """SOV (%) del sub-cubo sobre el total de menciones de marca"""
+        counts = self.counts.sum(axis=0).astype(float)
+        total = counts.sum()
+        return self._brand_dict(counts * 100.0 / total, 2) if total else {}
+
+    def mention_rate(self) -> Dict[str, float]:
+        """% de ejecuciones del sub-cubo que mencionan cada marca"""
+        total = self.total_executions
+        return self._brand_dict(self.counts.sum(axis=0) * 100.0 / total, 2) if total else {}
+
+    def by(self, dimension: str, metric: str = 'sov') -> Dict[Any, Dict[str, float]]:
+        """
+        Desglose por dimensión ('provider', 'query', 'day')
+
+        Args:
+            metric: 'sov', 'mention_rate' o 'mentions'
+        """
+        k = DIMENSIONS.index(dimension)
+        labels = self.labels[dimension]
+        grouped = np.zeros((len(labels), len(self.brand_names)), dtype=np.int64)
+        np.add.at(grouped, self.cells[:, k], self.counts)
+        totals = np.bincount(self.cells[:, k], weights=self.totals, minlength=len(labels))
+        out: Dict[Any, Dict[str, float]] = {}
+        for g in np.flatnonzero(totals):
+            row = grouped[g].astype(float)
+            if metric == 'mentions':
+                out[labels[g]] = self._brand_dict(grouped[g])
+            elif metric == 'mention_rate':
+                out[labels[g]] = self._brand_dict(row * 100.0 / totals[g], 2)
+            else:
+                out[labels[g]] = self._brand_dict(row * 100.0 / row.sum(), 2) if row.sum() else {}
+        return out
+
+    # -----------------------------
+    # Persistencia
+    # -----------------------------
+
+    def save(self, path: Path) -> Path:
+        """Escribe el cubo comprimido (.npz) de forma atómica"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        with open(tmp, "wb") as f:
+            np.savez_compressed(
+                f,
+                brands=np.array(self.brand_names, dtype=str),
+                providers=np.array(self.labels['provider'], dtype=str),
+                queries=np.array(self.labels['query'], dtype=np.int64),
+                days=np.array(self.labels['day'], dtype=str),
+                cells=self.cells,
+                counts=self.counts.astype(np.int32),
+                totals=self.totals,
+                meta=np.array(json.dumps(self.meta, ensure_ascii=False, default=str))
+            )
+        os.replace(tmp, path)
+        return path
+
+    @classmethod
+    def load(cls, path: Path) -> "MentionCube":
+        with np.load(path, allow_pickle=False) as data:
+            return cls(
+                data['brands'].tolist(), data['providers'].tolist(), data['queries'].tolist(),
+                data['days'].tolist(), data['cells'], data['counts'], data['totals'],
+                json.loads(str(data['meta']))
+            )
+
+
+# =============================
+# Almacenamiento por categoría y periodo
+# =============================
+
+def cube_path(categoria_id: int, periodo: str) -> Path:
+    safe = re.sub(r"[^0-9A-Za-z_-]+", "_", periodo)
+    return Path(_load_cube_dir()) / str(categoria_id) / f"{safe}.npz"
+
+
+def save_cube(cube: MentionCube, categoria_id: int, periodo: str) -> Optional[Path]:
+    """Persiste el cubo del periodo (el cubo es auxiliar: un fallo no interrumpe el análisis)"""
+    try:
+        return cube.save(cube_path(categoria_id, periodo))
+    except Exception as e:
+        logger.warning("mention_cube_save_failed", categoria_id=categoria_id, periodo=periodo, error=str(e))
+        return None
+
+
+def load_cube(categoria_id: int, periodo: str) -> Optional[MentionCube]:
+    """Cubo guardado del periodo o None"""
+    path = cube_path(categoria_id, periodo)
+    if not path.exists():
+        return None
+    try:
+        return MentionCube.load(path)
+    except Exception as e:
+        logger.warning("mention_cube_load_failed", path=str(path), error=str(e))
+        return None
+
+
+def discard_cube(categoria_id: int, periodo: str) -> None:
+    """Borra un cubo que ya no corresponde a los datos del periodo"""
+    try:
+        cube_path(categoria_id, periodo).unlink(missing_ok=True)
+    except Exception:
+        pass
+
+
+def parse_slice(filters: Sequence[str]) -> Dict[str, Any]:
+    """
+    'clave=valor' (CLI) → kwargs de MentionCube.slice
+    Claves: brand, provider, query, from, to (brand/provider/query admiten valores separados por coma)
+    """
+    kwargs: Dict[str, Any] = {}
+    for item in filters or []:
+        key, _, value = item.partition("=")
+        key, values = key.strip().lower(), [v.strip() for v in value.split(",") if v.strip()]
+        if key in ("brand", "marca"):
+            kwargs['brands'] = values
+        elif key in ("provider", "proveedor"):
+            kwargs['providers'] = values
+        elif key == "query":
+            kwargs['queries'] = [int(v) for v in values]
+        elif key in ("from", "desde"):
+            kwargs['day_from'] = value.strip()
+        elif key in ("to", "hasta"):
+            kwargs['day_to'] = value.strip()
+        else:
+            raise ValueError(f"Filtro de cubo desconocido: {key}")
+    return kwargs
@@ -0,0 +1,433 @@
+"""
+Mention Matrix
+Matriz de incidencia ejecuciones × marcas para métricas cuantitativas vectorizadas
+
+Se construye en una sola pasada (desde execution_mentions o con el BrandMatcher
+sobre el texto) y de ella salen SOV, co-ocurrencias (MᵀM), cortes por proveedor
+y por query, HHI y series diarias sin bucles Python por ejecución.
+
+Usa scipy.sparse si está instalado; si no, una matriz densa de NumPy (float32, productos por BLAS).
+"""
+
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+import numpy as np
+from sqlalchemy.orm import Session
+from src.database.models import Query, QueryExecution, ExecutionMention
+
+try:
+    import scipy.sparse as sp
+except ImportError:  # scipy es opcional: fallback denso
+    sp = None
+
+
+def _incidence(rows: np.ndarray, cols: np.ndarray, shape: Tuple[int, int]):
+    """Matriz 0/1 (CSR si hay scipy, densa si no) a partir de coordenadas"""
+    if sp is not None:
+        data = np.ones(rows.shape[0], dtype=np.int32)
+        m = sp.csr_matrix((data, (rows, cols)), shape=shape, dtype=np.int32)
+        m.data[:] = 1  # duplicados (marca repetida en una ejecución) cuentan una vez
+        return m
+    # float32 denso: los productos matriciales van por BLAS (conteos exactos hasta 2^24)
+    m = np.zeros(shape, dtype=np.float32)
+    m[rows, cols] = 1
+    return m
+
+
+def _dense(x) -> np.ndarray:
+    return x.toarray() if hasattr(x, "toarray") else np.asarray(x)
+
+
+def _codes(values: Sequence[Any]) -> Tuple[np.ndarray, List[Any]]:
+    """Codifica valores a enteros 0..k-1 (orden de primera aparición)"""
+    labels: Dict[Any, int] = {}
+    codes = np.fromiter((labels.setdefault(v, len(labels)) for v in values), dtype=np.int64, count=len(values))
+    return codes, list(labels)
+
+
+class MentionMatrix:
+    """
+    Incidencia ejecución × marca (1 si la ejecución menciona la marca)
+    """
+
+    def __init__(
+        self,
+        brand_names: List[str],
+        execution_ids: np.ndarray,
+        providers: List[str],
+        query_ids: List[int],
+        timestamps: List[datetime],
+        rows: np.ndarray,
+        cols: np.ndarray
+    ):
+        self.brand_names = brand_names
+        self.execution_ids = execution_ids
+        self.timestamps = list(timestamps)
+        self.provider_codes, self.provider_labels = _codes(providers)
+        self.query_codes, self.query_labels = _codes(query_ids)
+        self.day_codes, self.day_labels = _codes([t.date() for t in self.timestamps])
+        self.matrix = _incidence(rows, cols, (len(execution_ids), len(brand_names)))
+
+    # -----------------------------
+    # Construcción
+    # -----------------------------
+
+    @classmethod
+    def from_texts(
+        cls,
+        executions: Iterable[Any],
+        matcher,
+        marcas: Sequence[Any]
+    ) -> "MentionMatrix":
+        """
+        Una pasada por texto con el BrandMatcher de la categoría
+
+        Args:
+            executions: Filas con id, query_id, proveedor_ia, timestamp, respuesta_texto
+            matcher: BrandMatcher de la categoría
+            marcas: Marcas (columnas de la matriz)
+        """
+        col_of = {m.id: j for j, m in enumerate(marcas)}
+        ids: List[int] = []
+        providers: List[str] = []
+        queries: List[int] = []
+        timestamps: List[datetime] = []
+        rows: List[int] = []
+        cols: List[int] = []
+        for i, e in enumerate(executions):
+            ids.append(e.id)
+            providers.append(e.proveedor_ia)
+            queries.append(e.query_id)
+            timestamps.append(e.timestamp)
+            for marca_id in matcher.brands_in(e.respuesta_texto):
+                j = col_of.get(marca_id)
+                if j is not None:
+                    rows.append(i)
+                    cols.append(j)
+        return cls(
+            [m.nombre for m in marcas], np.asarray(ids, dtype=np.int64),
+            providers, queries, timestamps,
+            np.asarray(rows, dtype=np.int64), np.asarray(cols, dtype=np.int64)
+        )
+
+    @classmethod
+    def from_index(
+        cls,
+        session: Session,
+        categoria_id: int,
+        start: datetime,
+        end: datetime,
+        marcas: Sequence[Any],
+        executions: Optional[Sequence[Any]] = None,
+        after_id: Optional[int] = None
+    ) -> "MentionMatrix":
+        """
+        Desde execution_mentions (sin leer texto)
+
+        Args:
+            executions: Metadatos ya cargados (id, query_id, proveedor_ia, timestamp);
+                si no se pasan se consultan
+            after_id: Solo ejecuciones con id mayor (procesado incremental)
+        """
+        window_filters = [
+            Query.categoria_id == categoria_id,
+            QueryExecution.timestamp >= start,
+            QueryExecution.timestamp < end
+        ]
+        if after_id is not None:
+            window_filters.append(QueryExecution.id > after_id)
+        if executions is None:
+            executions = session.query(
+                QueryExecution.id,
+                QueryExecution.query_id,
+                QueryExecution.proveedor_ia,
+                QueryExecution.timestamp
+            ).join(Query).filter(*window_filters).all()
+        row_of = {e.id: i for i, e in enumerate(executions)}
+        col_of = {m.id: j for j, m in enumerate(marcas)}
+
+        window = session.query(QueryExecution.id).join(Query).filter(*window_filters).scalar_subquery()
+        pairs = session.query(ExecutionMention.execution_id, ExecutionMention.marca_id).filter(
+            ExecutionMention.execution_id.in_(window)
+        ).all()
+        rows = [row_of[eid] for eid, mid in pairs if eid in row_of and mid in col_of]
+        cols = [col_of[mid] for eid, mid in pairs if eid in row_of and mid in col_of]
+        return cls(
+            [m.nombre for m in marcas],
+            np.asarray([e.id for e in executions], dtype=np.int64),
+            [e.proveedor_ia for e in executions],
+            [e.query_id for e in executions],
+            [e.timestamp for e in executions],
+            np.asarray(rows, dtype=np.int64), np.asarray(cols, dtype=np.int64)
+        )
+
+    def split(self, keys: Sequence[Any]) -> Dict[Any, "MentionMatrix"]:
+        """
+        Parte la matriz por filas según una clave por ejecución (p. ej. el periodo)
+
+        Args:
+            keys: Clave de cada fila (misma longitud que execution_ids)
+
+        Returns:
+            {clave: MentionMatrix con solo esas filas}
+        """
+        codes, labels = _codes(keys)
+        if not codes.shape[0]:
+            return {}
+        order = np.argsort(codes, kind="stable")
+        bounds = np.flatnonzero(np.diff(codes[order])) + 1
+        return {labels[codes[idx[0]]]: self._take(idx) for idx in np.split(order, bounds)}
+
+    def _take(self, idx: np.ndarray) -> "MentionMatrix":
+        sub = MentionMatrix.__new__(MentionMatrix)
+        sub.brand_names = self.brand_names
+        sub.execution_ids = self.execution_ids[idx]
+        sub.timestamps = [self.timestamps[i] for i in idx]
+        sub.provider_codes, sub.provider_labels = _codes([self.provider_labels[c] for c in self.provider_codes[idx]])
+        sub.query_codes, sub.query_labels = _codes([self.query_labels[c] for c in self.query_codes[idx]])
+        sub.day_codes, sub.day_labels = _codes([t.date() for t in sub.timestamps])
+        sub.matrix = self.matrix[idx]
+        return sub
+
+    # -----------------------------
+    # Métricas
+    # -----------------------------
+
+    @property
+    def num_executions(self) -> int:
+        return int(self.execution_ids.shape[0])
+
+    @property
+    def last_timestamp(self) -> Optional[datetime]:
+        return max(self.timestamps) if self.timestamps else None
+
+    def counts(self) -> np.ndarray:
+        """Ejecuciones con mención por marca (vector de longitud nº marcas)"""
+        return np.asarray(self.matrix.sum(axis=0)).ravel().astype(np.int64)
+
+    def _as_dict(self, values: np.ndarray) -> Dict[str, int]:
+        return {self.brand_names[j]: int(values[j]) for j in np.flatnonzero(values)}
+
+    def mentions(self) -> Dict[str, int]:
+        """{marca: nº ejecuciones que la mencionan} (solo marcas con menciones)"""
+        return self._as_dict(self.counts())
+
+    @staticmethod
+    def _shares(counts: np.ndarray) -> np.ndarray:
+        total = counts.sum(axis=-1, keepdims=True)
+        return np.divide(counts * 100.0, total, out=np.zeros(counts.shape, dtype=float), where=total > 0)
+
+    def sov(self) -> Dict[str, float]:
+        """Share of Voice (%) sobre el total de menciones de marca"""
+        counts = self.counts()
+        shares = self._shares(counts.astype(float))
+        return {self.brand_names[j]: float(shares[j]) for j in np.flatnonzero(counts)}
+
+    def cooccurrence(self) -> Dict[str, int]:
+        """Pares de marcas mencionadas juntas: triángulo superior de MᵀM"""
+        co = _dense(self.matrix.T @ self.matrix).astype(np.int64)
+        i, j = np.nonzero(np.triu(co, k=1))
+        out: Dict[str, int] = {}
+        for a, b in zip(i, j):
+            pair = sorted([self.brand_names[a], self.brand_names[b]])
+            out[f"{pair[0]} + {pair[1]}"] = int(co[a, b])
+        return out
+
+    def _group_counts(self, codes: np.ndarray, n_groups: int) -> np.ndarray:
+        """Suma de filas por grupo: G (grupos × ejecuciones) @ M (reduceat en modo denso)"""
+        if sp is not None:
+            g = _incidence(codes, np.arange(codes.shape[0], dtype=np.int64), (n_groups, codes.shape[0]))
+            return _dense(g @ self.matrix)
+        out = np.zeros((n_groups, self.matrix.shape[1]), dtype=np.float64)
+        if codes.shape[0] == 0:
+            return out
+        order = np.argsort(codes, kind="stable")
+        sorted_codes = codes[order]
+        starts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]])
+        out[sorted_codes[starts]] = np.add.reduceat(self.matrix[order], starts, axis=0)
+        return out
+
+    def _sov_slices(self, codes: np.ndarray, labels: List[Any]) -> Dict[Any, Dict[str, float]]:
+        counts = self._group_counts(codes, len(labels))
+        shares = self._shares(counts.astype(float))
+        return {
+            labels[g]: {self.brand_names[j]: float(shares[g, j]) for j in np.flatnonzero(counts[g])}
+            for g in range(len(labels)) if counts[g].any()
+        }
+
+    def sov_by_provider(self) -> Dict[str, Dict[str, float]]:
+        """SOV (%) por proveedor de IA"""
+        return self._sov_slices(self.provider_codes, self.provider_labels)
+
+    def sov_by_query(self) -> Dict[int, Dict[str, float]]:
+        """SOV (%) por query"""
+        return self._sov_slices(self.query_codes, self.query_labels)
+
+    def daily_sov_series(self, start: datetime, end: datetime) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Serie diaria de SOV en [start, end), formato {marca: [{periodo, sov}]}
+        Omite marcas sin ningún valor > 0
+        """
+        counts = self._group_counts(self.day_codes, len(self.day_labels))
+        row_of_day = {d: i for i, d in enumerate(self.day_labels)}
+        days = []
+        cur = start
+        while cur < end:
+            days.append(cur.date())
+            cur += timedelta(days=1)
+        grid = np.zeros((len(days), len(self.brand_names)), dtype=float)
+        for k, d in enumerate(days):
+            if d in row_of_day:
+                grid[k] = counts[row_of_day[d]]
+        shares = self._shares(grid)
+        keep = np.flatnonzero((shares > 0).any(axis=0))
+        return {
+            self.brand_names[j]: [
+                {'periodo': d.isoformat(), 'sov': float(shares[k, j])} for k, d in enumerate(days)
+            ]
+            for j in keep
+        }
+
+
+class MentionTallies:
+    """
+    Conteos aditivos de menciones (globales, por proveedor, query y día, y co-ocurrencias)
+
+    Serializables a JSON y fusionables: el resultado de las ejecuciones nuevas se suma
+    al estado persistido sin volver a recorrer las ya contadas
+    """
+
+    def __init__(
+        self,
+        num_executions: int = 0,
+        counts: Optional[Dict[str, int]] = None,
+        by_provider: Optional[Dict[str, Dict[str, int]]] = None,
+        by_query: Optional[Dict[str, Dict[str, int]]] = None,
+        by_day: Optional[Dict[str, Dict[str, int]]] = None,
+        cooccurrence: Optional[Dict[str, int]] = None,
+        queries: Optional[Iterable[Any]] = None,
+        providers: Optional[Iterable[str]] = None
+    ):
+        self.num_executions = int(num_executions)
+        self.counts = dict(counts or {})
+        self.by_provider = {k: dict(v) for k, v in (by_provider or {}).items()}
+        self.by_query = {k: dict(v) for k, v in (by_query or {}).items()}
+        self.by_day = {k: dict(v) for k, v in (by_day or {}).items()}
+        self.cooccurrence_counts = dict(cooccurrence or {})
+        self.queries = [str(q) for q in (queries or [])]
+        self.providers = list(providers or [])
+
+    @classmethod
+    def from_matrix(cls, matrix: MentionMatrix) -> "MentionTallies":
+        names = matrix.brand_names
+
+        def _slices(codes: np.ndarray, labels: List[Any]) -> Dict[str, Dict[str, int]]:
+            grouped = matrix._group_counts(codes, len(labels))
+            return {
+                str(labels[g]): {names[j]: int(grouped[g, j]) for j in np.flatnonzero(grouped[g])}
+                for g in range(len(labels)) if grouped[g].any()
+            }
+
+        return cls(
+            num_executions=matrix.num_executions,
+            counts=matrix.mentions(),
+            by_provider=_slices(matrix.provider_codes, matrix.provider_labels),
+            by_query=_slices(matrix.query_codes, matrix.query_labels),
+            by_day=_slices(matrix.day_codes, [d.isoformat() for d in matrix.day_labels]),
+            cooccurrence=matrix.cooccurrence(),
+            queries=matrix.query_labels,
+            providers=matrix.provider_labels
+        )
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "MentionTallies":
+        return cls(
+            num_executions=data.get('num_executions', 0),
+            counts=data.get('counts'),
+            by_provider=data.get('by_provider'),
+            by_query=data.get('by_query'),
+            by_day=data.get('by_day'),
+            cooccurrence=data.get('cooccurrence'),
+            queries=data.get('queries'),
+            providers=data.get('providers')
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'num_executions': self.num_executions,
+            'counts': self.counts,
+            'by_provider': self.by_provider,
+            'by_query': self.by_query,
+            'by_day': self.by_day,
+            'cooccurrence': self.cooccurrence_counts,
+            'queries': self.queries,
+            'providers': self.providers,
+        }
+
+    @staticmethod
+    def _add(target: Dict[str, int], other: Dict[str, int]) -> None:
+        for key, value in other.items():
+            target[key] = target.get(key, 0) + int(value)
+
+    def merge(self, other: "MentionTallies") -> "MentionTallies":
+        """Suma `other` sobre este estado (in place) y lo devuelve"""
+        self.num_executions += other.num_executions
+        self._add(self.counts, other.counts)
+        self._add(self.cooccurrence_counts, other.cooccurrence_counts)
+        for mine, theirs in (
+            (self.by_provider, other.by_provider),
+            (self.by_query, other.by_query),
+            (self.by_day, other.by_day),
+        ):
+            for label, counts in theirs.items():
+                self._add(mine.setdefault(label, {}), counts)
+        known_queries, known_providers = set(self.queries), set(self.providers)
+        self.queries.extend(q for q in other.queries if q not in known_queries)
+        self.providers.extend(p for p in other.providers if p not in known_providers)
+        return self
+
+    # -----------------------------
+    # Métricas (mismo formato que MentionMatrix)
+    # -----------------------------
+
+    @staticmethod
+    def _shares(counts: Dict[str, int]) -> Dict[str, float]:
+        total = sum(counts.values())
+        if not total:
+            return {}
+        return {marca: count * 100.0 / total for marca, count in counts.items() if count}
+
+    def mentions(self) -> Dict[str, int]:
+        return {marca: count for marca, count in self.counts.items() if count}
+
+    def sov(self) -> Dict[str, float]:
+        return self._shares(self.counts)
+
+    def cooccurrence(self) -> Dict[str, int]:
+        return {pair: count for pair, count in self.cooccurrence_counts.items() if count}
+
+    def sov_by_provider(self) -> Dict[str, Dict[str, float]]:
+        return {p: self._shares(c) for p, c in self.by_provider.items() if sum(c.values())}
+
+    def sov_by_query(self) -> Dict[str, Dict[str, float]]:
+        return {q: self._shares(c) for q, c in self.by_query.items() if sum(c.values())}
+
+    def daily_sov_series(self, start: datetime, end: datetime) -> Dict[str, List[Dict[str, Any]]]:
+        days = []
+        cur = start
+        while cur < end:
+            days.append(cur.date().isoformat())
+            cur += timedelta(days=1)
+        shares_by_day = {d: self._shares(self.by_day.get(d, {})) for d in days}
+        brands = [m for m in self.counts if any(shares.get(m, 0) > 0 for shares in shares_by_day.values())]
+        return {
+            marca: [{'periodo': d, 'sov': float(shares_by_day[d].get(marca, 0.0))} for d in days]
+            for marca in brands
+        }
+
+
+def hhi(sov_map: Dict[str, float]) -> Dict[str, float]:
+    """Índice Herfindahl-Hirschman con shares en % (0..10000) y normalizado (0..1)"""
+    shares = np.fromiter(sov_map.values(), dtype=float, count=len(sov_map))
+    value = float(np.square(shares).sum())
+    return {'hhi': round(value, 2), 'hhi_normalized': round(value / 10000.0, 4)}
@@ -0,0 +1,328 @@
+"""
+Mention Rollup
+Índices de menciones de marca mantenidos en la ingesta
+
+- execution_mentions: marcas detectadas por ejecución (primera posición, nº de apariciones)
+- brand_mentions_daily: rollup diario por marca/proveedor/query
+
+Se mantienen en la ingesta (poller.execute_query) y se reconstruyen cuando cambian
+los aliases. Menciones, co-ocurrencias, SOV y series diarias pasan a ser consultas
+sobre tablas indexadas en lugar de escanear `respuesta_texto`.
+"""
+
+from collections import Counter, defaultdict
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Any, Optional, Tuple
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from src.database.models import (
+    Query, QueryExecution, BrandMentionDaily, BrandMentionRollupState, ExecutionMention
+)
+from src.analytics.brand_matcher import BrandMatcher, get_brand_matcher
+from src.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+# =============================
+# Detección de marcas
+# =============================
+
+def load_matcher(session: Session, categoria_id: int) -> Tuple[BrandMatcher, str]:
+    """
+    Matcher compilado de la categoría y huella de sus aliases
+
+    Returns:
+        (BrandMatcher, fingerprint)
+    """
+    matcher = get_brand_matcher(session, categoria_id)
+    return matcher, matcher.fingerprint
+
+
+# =============================
+# Escritura (ingesta y reconstrucción)
+# =============================
+
+def _insert(session: Session):
+    """INSERT con soporte ON CONFLICT según dialecto (PostgreSQL / SQLite)"""
+    if session.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert
+
+
+def _key_columns() -> List[str]:
+    return ["categoria_id", "marca_id", "proveedor_ia", "query_id", "day"]
+
+
+def record_execution(session: Session, execution: QueryExecution, categoria_id: int) -> List[int]:
+    """
+    Suma la ejecución al rollup (llamar en la misma transacción que la inserta)
+
+    Si el rollup de la categoría no existe se inicia con cobertura desde esta ejecución.
+    Si los aliases cambiaron desde la última reconstrucción no se actualiza: el rollup
+    queda obsoleto (los agentes vuelven a escanear texto) hasta `rebuild_rollup`.
+
+    Returns:
+        IDs de marcas detectadas (vacío si el rollup está obsoleto)
+    """
+    matcher, fingerprint = load_matcher(session, categoria_id)
+    insert = _insert(session)
+
+    session.execute(
+        insert(BrandMentionRollupState.__table__).values(
+            categoria_id=categoria_id,
+            covered_from=execution.timestamp,
+            aliases_fingerprint=fingerprint,
+            updated_at=datetime.utcnow()
+        ).on_conflict_do_nothing(index_elements=["categoria_id"])
+    )
+    state = session.get(BrandMentionRollupState, categoria_id)
+    if state is None or state.aliases_fingerprint != fingerprint:
+        logger.info("mention_rollup_stale", categoria_id=categoria_id)
+        return []
+
+    mentions = matcher.find(execution.respuesta_texto)
+    marca_ids = list(mentions)
+    if not marca_ids:
+        return []
+
+    session.execute(
+        insert(ExecutionMention.__table__).values([
+            {"execution_id": execution.id, "marca_id": mid, "first_offset": off, "count": n}
+            for mid, (off, n) in mentions.items()
+        ]).on_conflict_do_nothing(index_elements=["execution_id", "marca_id"])
+    )
+
+    table = BrandMentionDaily.__table__
+    stmt = insert(table).values([
+        {
+            "categoria_id": categoria_id,
+            "marca_id": mid,
+            "proveedor_ia": execution.proveedor_ia,
+            "query_id": execution.query_id,
+            "day": execution.timestamp.date(),
+            "executions_with_mention": 1,
+        }
+        for mid in marca_ids
+    ])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=_key_columns(),
+        set_={"executions_with_mention": table.c.executions_with_mention + stmt.excluded.executions_with_mention}
+    )
+    session.execute(stmt)
+    return marca_ids
+
+
+def invalidate_rollup(session: Session, categoria_id: int, reason: str) -> None:
+    """
+    Marca el rollup de la categoría como incompleto (borra su estado): los agentes vuelven
+    a escanear texto hasta `rebuild_rollup`. La siguiente ejecución registrada lo reinicia
+    con cobertura desde ella, así que las ventanas anteriores siguen sin usarlo.
+    """
+    session.query(BrandMentionRollupState).filter_by(categoria_id=categoria_id).delete(synchronize_session=False)
+    logger.warning("mention_rollup_invalidated", categoria_id=categoria_id, reason=reason)
+
+
+def rebuild_rollup(
+    session: Session,
+    categoria_id: int,
+    batch_size: int = 1000
+) -> Dict[str, Any]:
+    """
+    Reconstruye execution_mentions y el rollup diario de una categoría desde el texto
+
+    Returns:
+        Dict con ejecuciones procesadas, menciones y filas de rollup escritas
+    """
+    matcher, fingerprint = load_matcher(session, categoria_id)
+    counts: Counter = Counter()
+    processed = 0
+    category_executions = session.query(QueryExecution.id).join(Query).filter(
+        Query.categoria_id == categoria_id
+    )
+
+    session.query(ExecutionMention).filter(
+        ExecutionMention.execution_id.in_(category_executions.scalar_subquery())
+    ).delete(synchronize_session=False)
+    session.query(BrandMentionDaily).filter(
+        BrandMentionDaily.categoria_id == categoria_id
+    ).delete(synchronize_session=False)
+
+    mention_rows: List[Dict[str, Any]] = []
+    written_mentions = 0
+    rows = session.query(
+        QueryExecution.id,
+        QueryExecution.query_id,
+        QueryExecution.proveedor_ia,
+        QueryExecution.timestamp,
+        QueryExecution.respuesta_texto
+    ).join(Query).filter(
+        Query.categoria_id == categoria_id
+    ).yield_per(batch_size)
+    for execution_id, query_id, proveedor, ts, texto in rows:
+        processed += 1
+        for mid, (off, n) in matcher.find(texto).items():
+            counts[(mid, proveedor, query_id, ts.date())] += 1
+            mention_rows.append(
+                {"execution_id": execution_id, "marca_id": mid, "first_offset": off, "count": n}
+            )
+        if len(mention_rows) >= batch_size:
+            session.execute(ExecutionMention.__table__.insert(), mention_rows)
+            written_mentions += len(mention_rows)
+            mention_rows = []
+    if mention_rows:
+        session.execute(ExecutionMention.__table__.insert(), mention_rows)
+        written_mentions += len(mention_rows)
+
+    payload = [
+        {
+            "categoria_id": categoria_id,
+            "marca_id": mid,
+            "proveedor_ia": proveedor,
+            "query_id": query_id,
+            "day": day,
+            "executions_with_mention": n,
+        }
+        for (mid, proveedor, query_id, day), n in counts.items()
+    ]
+    for i in range(0, len(payload), batch_size):
+        session.execute(BrandMentionDaily.__table__.insert(), payload[i:i + batch_size])
+
+    now = datetime.utcnow()
+    state = session.get(BrandMentionRollupState, categoria_id)
+    if state is None:
+        state = BrandMentionRollupState(categoria_id=categoria_id)
+        session.add(state)
+    state.covered_from = None
+    state.aliases_fingerprint = fingerprint
+    state.rebuilt_at = now
+    state.updated_at = now
+    session.flush()
+
+    logger.info(
+        "mention_rollup_rebuilt",
+        categoria_id=categoria_id,
+        executions=processed,
+        mentions=written_mentions,
+        rows=len(payload)
+    )
+    return {"executions": processed, "mentions": written_mentions, "rows": len(payload)}
+
+
+# =============================
+# Lectura
+# =============================
+
+def rollup_available(session: Session, categoria_id: int, start: datetime) -> bool:
+    """
+    True si el rollup es completo para ventanas que empiezan en `start`
+    (cobertura suficiente y aliases sin cambios desde su construcción)
+    """
+    state = session.get(BrandMentionRollupState, categoria_id)
+    if state is None:
+        return False
+    if state.covered_from is not None and state.covered_from > start:
+        return False
+    _, fingerprint = load_matcher(session, categoria_id)
+    return state.aliases_fingerprint == fingerprint
+
+
+def daily_counts(
+    session: Session,
+    categoria_id: int,
+    start: datetime,
+    end: datetime
+) -> Dict[date, Dict[int, int]]:
+    """Ejecuciones con mención por día y marca en [start, end)"""
+    rows = session.query(
+        BrandMentionDaily.day,
+        BrandMentionDaily.marca_id,
+        func.sum(BrandMentionDaily.executions_with_mention)
+    ).filter(
+        BrandMentionDaily.categoria_id == categoria_id,
+        BrandMentionDaily.day >= start.date(),
+        BrandMentionDaily.day < end.date()
+    ).group_by(BrandMentionDaily.day, BrandMentionDaily.marca_id).all()
+    out: Dict[date, Dict[int, int]] = defaultdict(dict)
+    for day, mid, n in rows:
+        out[day][mid] = int(n or 0)
+    return out
+
+
+def daily_sov_series(
+    session: Session,
+    categoria_id: int,
+    start: datetime,
+    end: datetime,
+    marca_names: Dict[int, str]
+) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Serie diaria de SOV (%) por marca en [start, end)
+    Mismo formato que las series de TrendsAgent: {marca: [{periodo: 'YYYY-MM-DD', sov}]}
+    Omite marcas sin ningún valor > 0
+    """
+    by_day = daily_counts(session, categoria_id, start, end)
+    series: Dict[str, List[Dict[str, Any]]] = {name: [] for name in marca_names.values()}
+    cur = start
+    while cur < end:
+        counts = by_day.get(cur.date(), {})
+        total = sum(counts.values())
+        for mid, name in marca_names.items():
+            val = (counts.get(mid, 0) / total * 100.0) if total else 0.0
+            series[name].append({'periodo': cur.date().isoformat(), 'sov': float(val)})
+        cur += timedelta(days=1)
+    return {m: vals for m, vals in series.items() if any(p['sov'] > 0 for p in vals)}
+
+
+def _window_executions(session: Session, categoria_id: int, start: datetime, end: datetime):
+    """IDs de ejecuciones de la categoría en [start, end) (subconsulta)"""
+    return session.query(QueryExecution.id).join(Query).filter(
+        Query.categoria_id == categoria_id,
+        QueryExecution.timestamp >= start,
+        QueryExecution.timestamp < end
+    ).scalar_subquery()
+
+
+def executions_mentioning(
+    session: Session,
+    categoria_id: int,
+    start: datetime,
+    end: datetime,
+    marca_ids: Optional[List[int]] = None,
+    limit: Optional[int] = None
+) -> List[Tuple[int, int, int]]:
+    """
+    Ejecuciones con mención de marca en [start, end), más recientes primero
+
+    Args:
+        limit: Máximo de ejecuciones (las `limit` más recientes, con todas sus marcas);
+            ORDER BY/LIMIT en la BD
+
+    Returns:
+        Lista de (execution_id, marca_id, first_offset)
+    """
+    def mentions(*cols):
+        q = session.query(*cols).filter(
+            ExecutionMention.execution_id.in_(_window_executions(session, categoria_id, start, end))
+        )
+        if marca_ids:
+            q = q.filter(ExecutionMention.marca_id.in_(marca_ids))
+        return q
+
+    q = mentions(ExecutionMention.execution_id, ExecutionMention.marca_id, ExecutionMention.first_offset)
+    if limit:
+        latest = mentions(ExecutionMention.execution_id).distinct().order_by(
+            ExecutionMention.execution_id.desc()
+        ).limit(limit).subquery()
+        q = q.filter(ExecutionMention.execution_id.in_(session.query(latest.c.execution_id)))
+    q = q.order_by(ExecutionMention.execution_id.desc())
+    return [(eid, mid, off) for eid, mid, off in q.all()]
+
+
+def brand_fragment(texto: Optional[str], first_offset: int, width: int = 800) -> str:
+    """Fragmento de `width` caracteres centrado en la primera mención de la marca"""
+    texto = texto or ""
+    start = max(0, min(first_offset - width // 2, len(texto) - width))
+    return texto[start:start + width]
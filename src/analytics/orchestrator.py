@@ -3,10 +3,19 @@ Orchestrator
 Orquestador de agentes - Coordina la ejecución del análisis completo
 """
 
+import contextvars
+import os
+import threading
 import time
-from typing import Dict, Any
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Set, Tuple
+import yaml
 from src.database.connection import get_session
-from src.database.models import Mercado, Categoria
+from src.database.models import Mercado, Categoria, AnalysisResult, AnalysisRun
+from src.analytics.context import AnalysisContext
+from src.query_executor.api_clients.usage import usage_scope, BudgetExceeded
+from src.analytics.agents.base_agent import last_periods
 from src.analytics.agents import (
     QuantitativeAgent,
     QualitativeExtractionAgent,
@@ -25,18 +34,97 @@ from src.analytics.agents import (
     ScenarioPlanningAgent,
     PricingPowerAgent
 )
+from src.utils import tracing
 from src.utils.logger import setup_logger, log_agent_analysis
 
 logger = setup_logger(__name__)
 
+DEFAULT_MAX_PARALLEL_AGENTS = 4
+# Margen tras el tiempo de presupuesto antes de abandonar a un agente que no termina
+DEFAULT_BUDGET_GRACE_SECONDS = 30.0
+
+# Un error en estos agentes aborta el análisis; el resto espera a que terminen
+CRITICAL_AGENTS = ('quantitative', 'qualitative')
+# Una excepción en estos agentes aborta el análisis
+ABORT_ON_EXCEPTION = ('quantitative', 'qualitative', 'executive')
+
+# Periodos de historial que se precargan en el contexto (Trends/Quantitative leen 6)
+CONTEXT_HISTORY_PERIODS = 6
+# Nombres de resultados que algunos agentes aún leen además de los orquestados
+LEGACY_RESULT_NAMES = ('qualitativeextraction', 'market_context')
+
+# Agentes condicionales: solo mercados FMCG
+FMCG_AGENTS = {'campaign_analysis', 'channel_analysis', 'esg_analysis', 'packaging_analysis'}
+
+
+class AnalysisRunFailed(Exception):
+    """Fallo de una ejecución del orquestador; `run_id` permite reanudarla (--resume)"""
+
+    def __init__(self, message: str, run_id: int):
+        super().__init__(message)
+        self.run_id = run_id
+
+
+def _load_max_parallel_agents(config_path: str = "config/settings.yaml") -> int:
+    """Lee analytics.orchestrator.max_parallel_agents (ANALYSIS_MAX_PARALLEL_AGENTS tiene prioridad)"""
+    try:
+        with open(config_path, "r", encoding="utf-8") as f:
+            cfg = yaml.safe_load(f) or {}
+        value = ((cfg.get("analytics") or {}).get("orchestrator") or {}).get(
+            "max_parallel_agents", DEFAULT_MAX_PARALLEL_AGENTS
+        )
+    except Exception:
+        value = DEFAULT_MAX_PARALLEL_AGENTS
+    try:
+        return max(1, int(os.getenv("ANALYSIS_MAX_PARALLEL_AGENTS", value)))
+    except (TypeError, ValueError):
+        return DEFAULT_MAX_PARALLEL_AGENTS
+
+
+def _load_agent_budgets(config_path: str = "config/settings.yaml") -> Dict[str, Any]:
+    """
+    Lee analytics.budgets: presupuesto de segundos y tokens por agente (0 = sin límite)
+
+    Returns:
+        {'grace_seconds': float, 'default': {'seconds', 'tokens'}, 'agents': {agente: {'seconds', 'tokens'}}}
+    """
+    budgets = {
+        'grace_seconds': DEFAULT_BUDGET_GRACE_SECONDS,
+        'default': {'seconds': 0.0, 'tokens': 0},
+        'agents': {}
+    }
+    try:
+        with open(config_path, "r", encoding="utf-8") as f:
+            cfg = yaml.safe_load(f) or {}
+        block = (cfg.get("analytics") or {}).get("budgets") or {}
+        budgets['grace_seconds'] = float(block.get('grace_seconds', DEFAULT_BUDGET_GRACE_SECONDS))
+        default = block.get('default') or {}
+        budgets['default'] = {
+            'seconds': float(default.get('seconds', 0) or 0),
+            'tokens': int(default.get('tokens', 0) or 0)
+        }
+        for name, values in block.items():
+            if name != 'default' and isinstance(values, dict):
+                budgets['agents'][name] = {
+                    'seconds': float(values.get('seconds', budgets['default']['seconds']) or 0),
+                    'tokens': int(values.get('tokens', budgets['default']['tokens']) or 0)
+                }
+    except Exception:
+        pass
+    return budgets
+
 
 class AnalysisOrchestrator:
     """
     Orquestador de análisis multi-agente
-    Ejecuta agentes en el orden correcto respetando dependencias
+    Construye un DAG con las dependencias declaradas por cada agente (`depends_on`)
+    y ejecuta en paralelo los agentes listos, cada uno con su propia sesión
     """
     
-    def __init__(self):
+    def __init__(self, max_parallel: int = None):
+        self.max_parallel = max_parallel or _load_max_parallel_agents()
+        self.budgets = _load_agent_budgets()
+        # Orden de referencia: desempata entre agentes listos a la vez
         self.agent_order = [
             ('quantitative', QuantitativeAgent),
             ('qualitative', QualitativeExtractionAgent),
@@ -55,19 +143,76 @@ class AnalysisOrchestrator:
             ('synthesis', SynthesisAgent),
             ('executive', ExecutiveAgent)
         ]
+        self._validate_graph()
     
-    def run_analysis(self, categoria_id: int, periodo: str) -> int:
+    def dependency_graph(self, skip: Set[str] = frozenset()) -> Dict[str, Set[str]]:
+        """
+        {agente: dependencias} de los agentes a ejecutar
+        Dependencias fuera del plan (omitidas o no orquestadas) se ignoran; todo agente
+        no crítico espera además a los críticos, para abortar antes de gastar en LLM
+        """
+        planned = {name for name, _ in self.agent_order if name not in skip}
+        graph: Dict[str, Set[str]] = {}
+        for name, AgentClass in self.agent_order:
+            if name not in planned:
+                continue
+            deps = set(getattr(AgentClass, 'depends_on', ()) or ()) & planned
+            if name not in CRITICAL_AGENTS:
+                deps |= set(CRITICAL_AGENTS) & planned
+            graph[name] = deps - {name}
+        return graph
+    
+    def budget_for(self, agent_name: str) -> Optional[Dict[str, float]]:
+        """
+        Presupuesto {'seconds', 'tokens'} del agente, o None si no tiene
+        Los agentes cuyo fallo aborta el análisis no tienen: no hay resultado con el que sustituirlos
+        """
+        if agent_name in CRITICAL_AGENTS or agent_name in ABORT_ON_EXCEPTION:
+            return None
+        budget = self.budgets['agents'].get(agent_name) or self.budgets['default']
+        if not budget['seconds'] and not budget['tokens']:
+            return None
+        return budget
+    
+    def _validate_graph(self) -> None:
+        """Falla al construir el orquestador si las dependencias forman un ciclo"""
+        graph = self.dependency_graph()
+        done: Set[str] = set()
+        while len(done) < len(graph):
+            ready = [n for n, deps in graph.items() if n not in done and deps <= done]
+            if not ready:
+                raise ValueError(f"Ciclo de dependencias entre agentes: {sorted(set(graph) - done)}")
+            done.update(ready)
+    
+    @tracing.traced('analysis.run', root=True)
+    def run_analysis(
+        self,
+        categoria_id: int,
+        periodo: str,
+        force: bool = False,
+        resume_run_id: Optional[int] = None
+    ) -> Tuple[int, Dict[str, Any]]:
         """
         Ejecuta análisis completo para una categoría y periodo
+        Los agentes cuya huella de entradas no ha cambiado reutilizan su resultado guardado.
+        El estado de cada agente se registra en analysis_runs a medida que termina.
+        La ejecución se traza en logs/traces/run_<run_id>.jsonl (ver `main.py trace-report`)
         
         Args:
             categoria_id: ID de categoría
             periodo: Periodo (YYYY-MM)
+            force: Recalcular todos los agentes aunque su huella coincida
+            resume_run_id: Reanudar esa ejecución: solo corren los agentes fallidos o
+                pendientes y los que dependen de ellos
         
         Returns:
-            ID del report generado
+            Tupla (report_id, stats): ID del report generado y estadísticas de la ejecución
+            (run_id, agentes, caché, degradados, contexto, traza y tiempos)
+        
+        Raises:
+            AnalysisRunFailed: El executive no generó el report (reanudable con resume_run_id)
         """
-        with get_session() as session:
+        with get_session(read_only=True) as session:
             # Verificar categoría existe
             categoria = session.query(Categoria).get(categoria_id)
             if not categoria:
@@ -75,139 +220,627 @@ class AnalysisOrchestrator:
             
             mercado = session.query(Mercado).get(categoria.mercado_id)
             categoria_nombre = f"{mercado.nombre}/{categoria.nombre}"
-            
-            logger.info(
-                "starting_analysis",
-                categoria=categoria_nombre,
+            tipo_mercado = getattr(mercado, 'tipo_mercado', 'FMCG')
+        
+        results: Dict[str, Dict[str, Any]] = {}
+        
+        # Skipping condicional según tipo de mercado
+        skip = FMCG_AGENTS if tipo_mercado != 'FMCG' else set()
+        for agent_name in sorted(skip):
+            logger.info("skipping_agent_for_market", agent=agent_name, tipo_mercado=tipo_mercado)
+            results[agent_name] = {'status': 'skipped'}
+        
+        graph = self.dependency_graph(skip)
+        if resume_run_id is not None:
+            run_id, resumed = self._resume_run(resume_run_id, categoria_id, periodo, graph)
+            results.update(resumed)
+            graph = {n: deps - set(resumed) for n, deps in graph.items() if n not in resumed}
+        else:
+            run_id = self._start_run(categoria_id, periodo)
+        tracing.set_run_id(run_id)
+        tracing.set_attributes(**{
+            'analysis.categoria': categoria_nombre,
+            'analysis.categoria_id': categoria_id,
+            'analysis.periodo': periodo,
+            'analysis.force': force,
+            'analysis.resumed_from': resume_run_id,
+        })
+        for agent_name in sorted(skip):
+            self._checkpoint(run_id, agent_name, results[agent_name])
+        
+        context = self._build_context(categoria_id, periodo)
+        
+        logger.info(
+            "starting_analysis",
+            categoria=categoria_nombre,
+            categoria_id=categoria_id,
+            periodo=periodo,
+            tipo_mercado=tipo_mercado,
+            max_parallel_agents=self.max_parallel,
+            force=force,
+            run_id=run_id,
+            resumed_agents=sorted(n for n, r in results.items() if r.get('cache') == 'resumed')
+        )
+        
+        wall_start = time.time()
+        try:
+            self._run_graph(
+                graph, categoria_id, periodo, categoria_nombre, results, force,
+                on_done=lambda name, outcome: self._checkpoint(run_id, name, outcome),
+                context=context
+            )
+        except Exception as e:
+            self._finish_run(run_id, 'failed', error=str(e))
+            raise AnalysisRunFailed(f"{e} (run {run_id}; reanudar con --resume {run_id})", run_id) from e
+        wall_time = time.time() - wall_start
+        
+        report_id = (results.get('executive') or {}).pop('report_id', None)
+        
+        # Resumen final
+        agents_time = sum(r.get('execution_time', 0) for r in results.values())
+        successful = sum(1 for r in results.values() if r.get('status') == 'success')
+        failed = sum(1 for r in results.values() if r.get('status') == 'failed')
+        cache = {
+            'hits': sorted(n for n, r in results.items() if r.get('cache') == 'hit'),
+            'misses': sorted(n for n, r in results.items() if r.get('cache') in ('miss', 'forced')),
+            'resumed': sorted(n for n, r in results.items() if r.get('cache') == 'resumed')
+        }
+        degraded = {n: r['degraded'] for n, r in results.items() if r.get('degraded')}
+        
+        logger.info(
+            "analysis_completed",
+            categoria=categoria_nombre,
+            periodo=periodo,
+            run_id=run_id,
+            report_id=report_id,
+            total_time_seconds=wall_time,
+            agents_time_seconds=agents_time,
+            agents_successful=successful,
+            agents_failed=failed,
+            cache_hits=len(cache['hits']),
+            cache_misses=len(cache['misses']),
+            degraded=degraded,
+            context=context.stats(),
+            results=results
+        )
+        
+        if not report_id:
+            exec_error = None
+            if 'executive' in results:
+                exec_error = results['executive'].get('error') or results['executive'].get('status')
+            message = "No se pudo generar el report (executive agent falló)"
+            if exec_error:
+                message = f"{message}: {exec_error}"
+            self._finish_run(run_id, 'failed', error=message)
+            raise AnalysisRunFailed(f"{message} (run {run_id}; reanudar con --resume {run_id})", run_id)
+        
+        self._finish_run(run_id, 'completed', report_id=report_id)
+        
+        # Retornar report_id y estadísticas
+        return report_id, {
+            'run_id': run_id,
+            'agents_executed': {
+                'total': len(results),
+                'successful': successful,
+                'failed': failed,
+                'skipped': sum(1 for r in results.values() if r.get('status') == 'skipped')
+            },
+            'cache': cache,
+            'degraded': degraded,
+            'context': context.stats(),
+            'trace': tracing.current_context(),
+            'total_time_seconds': wall_time,
+            'agents_time_seconds': agents_time,
+            'results_detail': results
+        }
+    
+    @tracing.traced('analysis.incremental', root=True)
+    def run_incremental(self, categoria_id: int, periodo: str, agents: List[str]) -> Dict[str, Any]:
+        """
+        Recalcula solo `agents` para una categoría y periodo (análisis incremental)
+        Sin informe ni registro en analysis_runs: el resto de agentes no se ejecuta y los
+        seleccionados leen el último resultado guardado de sus dependencias.
+        Los agentes cuya huella de entradas no ha cambiado reutilizan su resultado
+        
+        Args:
+            categoria_id: ID de categoría
+            periodo: Periodo (YYYY-MM, YYYY-Www o YYYY-MM-DD)
+            agents: Agentes a recalcular (nombres del orquestador)
+        
+        Returns:
+            {'results': {agente: resultado}, 'total_time_seconds'}
+        
+        Raises:
+            ValueError: Categoría o agentes desconocidos
+        """
+        known = {name for name, _ in self.agent_order}
+        unknown = set(agents) - known
+        if unknown:
+            raise ValueError(f"Agentes desconocidos: {sorted(unknown)}")
+        
+        with get_session(read_only=True) as session:
+            categoria = session.query(Categoria).get(categoria_id)
+            if not categoria:
+                raise ValueError(f"Categoría {categoria_id} no encontrada")
+            mercado = session.query(Mercado).get(categoria.mercado_id)
+            categoria_nombre = f"{mercado.nombre}/{categoria.nombre}"
+            tipo_mercado = getattr(mercado, 'tipo_mercado', 'FMCG')
+        
+        skip = known - set(agents)
+        if tipo_mercado != 'FMCG':
+            skip |= FMCG_AGENTS
+        graph = self.dependency_graph(skip)
+        tracing.set_attributes(**{
+            'analysis.categoria': categoria_nombre,
+            'analysis.categoria_id': categoria_id,
+            'analysis.periodo': periodo,
+            'analysis.agents': ",".join(sorted(graph)),
+        })
+        
+        results: Dict[str, Dict[str, Any]] = {}
+        start = time.time()
+        self._run_graph(
+            graph, categoria_id, periodo, categoria_nombre, results,
+            context=self._build_context(categoria_id, periodo)
+        )
+        elapsed = time.time() - start
+        
+        logger.info(
+            "incremental_analysis_completed",
+            categoria=categoria_nombre,
+            periodo=periodo,
+            agents={n: r.get('cache') or r.get('status') for n, r in results.items()},
+            failed=sorted(n for n, r in results.items() if r.get('status') != 'success'),
+            total_time_seconds=elapsed
+        )
+        return {'results': results, 'total_time_seconds': elapsed}
+    
+    @tracing.traced('analysis.context')
+    def _build_context(self, categoria_id: int, periodo: str) -> AnalysisContext:
+        """Contexto de la ejecución con los resultados existentes precargados (una consulta)"""
+        context = AnalysisContext(categoria_id, periodo)
+        try:
+            periodos = {periodo}
+            try:
+                periodos.update(last_periods(periodo, CONTEXT_HISTORY_PERIODS))
+            except ValueError:
+                pass
+            with get_session() as session:
+                context.prefetch(
+                    session,
+                    [name for name, _ in self.agent_order] + list(LEGACY_RESULT_NAMES),
+                    periodos
+                )
+        except Exception as e:
+            # Sin precarga los agentes consultan bajo demanda
+            logger.warning("analysis_context_prefetch_failed", categoria_id=categoria_id, error=str(e))
+        return context
+    
+    # =============================
+    # Checkpoints (analysis_runs)
+    # =============================
+    def _start_run(self, categoria_id: int, periodo: str) -> int:
+        """Registra una nueva ejecución en estado 'running'"""
+        with get_session() as session:
+            run = AnalysisRun(
                 categoria_id=categoria_id,
                 periodo=periodo,
-                tipo_mercado=getattr(mercado, 'tipo_mercado', 'FMCG')
+                estado='running',
+                agentes={},
+                started_at=datetime.utcnow()
             )
+            session.add(run)
+            session.commit()
+            return run.id
+    
+    def _resume_run(
+        self,
+        run_id: int,
+        categoria_id: int,
+        periodo: str,
+        graph: Dict[str, Set[str]]
+    ):
+        """
+        Reabre una ejecución y decide qué agentes no hace falta repetir: los que
+        terminaron con éxito (sin degradar) y cuyas dependencias tampoco se repiten
+        
+        Returns:
+            (run_id, {agente: resultado reutilizado})
+        """
+        with get_session() as session:
+            run = session.query(AnalysisRun).get(run_id)
+            if not run:
+                raise ValueError(f"Ejecución {run_id} no encontrada")
+            if run.categoria_id != categoria_id or run.periodo != periodo:
+                raise ValueError(
+                    f"La ejecución {run_id} es de categoría {run.categoria_id} / {run.periodo}, "
+                    f"no de {categoria_id} / {periodo}"
+                )
+            recorded = dict(run.agentes or {})
             
-            # Ejecutar agentes en orden
-            results = {}
-            report_id = None
+            # En orden topológico: reutilizable si tuvo éxito y sus dependencias son reutilizables
+            reusable: Set[str] = set()
+            remaining = dict(graph)
+            while remaining:
+                ready = [n for n, deps in remaining.items() if not deps & set(remaining)]
+                for name in ready:
+                    deps = remaining.pop(name)
+                    entry = recorded.get(name) or {}
+                    # Los degradados por presupuesto se repiten
+                    if entry.get('status') == 'success' and not entry.get('degraded') and deps <= reusable:
+                        reusable.add(name)
+            if 'executive' in reusable and not run.report_id:
+                reusable.discard('executive')
             
-            # Conjuntos de agentes condicionales por tipo de mercado
-            FMCG_AGENTS = {'campaign_analysis', 'channel_analysis', 'esg_analysis', 'packaging_analysis'}
-
-            for agent_name, AgentClass in self.agent_order:
-                start_time = time.time()
+            resumed = {
+                name: {'status': 'success', 'execution_time': 0, 'cache': 'resumed'}
+                for name in reusable
+            }
+            if 'executive' in resumed:
+                resumed['executive']['report_id'] = run.report_id
+            
+            run.estado = 'running'
+            run.error = None
+            run.finished_at = None
+            run.reanudaciones = (run.reanudaciones or 0) + 1
+            session.commit()
+        
+        logger.info(
+            "analysis_run_resumed",
+            run_id=run_id,
+            reused=sorted(reusable),
+            rerun=sorted(set(graph) - reusable)
+        )
+        return run_id, resumed
+    
+    def _checkpoint(self, run_id: int, agent_name: str, outcome: Dict[str, Any]) -> None:
+        """Guarda el estado de un agente en la ejecución (nunca interrumpe el análisis)"""
+        entry = {
+            k: v for k, v in outcome.items()
+            if k in ('status', 'execution_time', 'cache', 'result_id', 'error', 'llm', 'degraded')
+        }
+        entry['finished_at'] = datetime.utcnow().isoformat()
+        try:
+            with get_session() as session:
+                run = session.query(AnalysisRun).get(run_id)
+                agentes = dict(run.agentes or {})
+                agentes[agent_name] = entry
+                run.agentes = agentes
+                if agent_name == 'executive' and outcome.get('report_id'):
+                    run.report_id = outcome['report_id']
+                session.commit()
+        except Exception as e:
+            logger.warning("analysis_checkpoint_failed", run_id=run_id, agent=agent_name, error=str(e))
+    
+    def _finish_run(
+        self,
+        run_id: int,
+        estado: str,
+        report_id: Optional[int] = None,
+        error: Optional[str] = None
+    ) -> None:
+        """Cierra la ejecución como 'completed' o 'failed'"""
+        try:
+            with get_session() as session:
+                run = session.query(AnalysisRun).get(run_id)
+                run.estado = estado
+                run.error = error
+                run.finished_at = datetime.utcnow()
+                if report_id:
+                    run.report_id = report_id
+                session.commit()
+        except Exception as e:
+            logger.warning("analysis_run_close_failed", run_id=run_id, estado=estado, error=str(e))
+    
+    def _run_graph(
+        self,
+        graph: Dict[str, Set[str]],
+        categoria_id: int,
+        periodo: str,
+        categoria_nombre: str,
+        results: Dict[str, Dict[str, Any]],
+        force: bool = False,
+        on_done=None,
+        context: Optional[AnalysisContext] = None
+    ) -> None:
+        """
+        Lanza cada agente en cuanto sus dependencias han terminado (con éxito o no),
+        con como mucho `max_parallel` a la vez. Un fallo crítico cancela lo pendiente
+        y se propaga cuando terminan los agentes ya en curso.
+        Un agente con presupuesto de tiempo que sigue en curso pasado ese tiempo más
+        `grace_seconds` se abandona: se sustituye por su resultado del periodo anterior
+        y sus dependientes continúan sin esperarlo
+        
+        Args:
+            on_done: Callback (agente, resultado) al terminar cada agente (checkpoint)
+            context: Contexto compartido por los agentes de la ejecución
+        """
+        classes = dict(self.agent_order)
+        rank = {name: i for i, (name, _) in enumerate(self.agent_order)}
+        pending = dict(graph)
+        done: Set[str] = set()
+        running = {}
+        cancels: Dict[Any, threading.Event] = {}
+        started: Dict[Any, float] = {}
+        hard_deadlines: Dict[Any, float] = {}
+        abandoned = False
+        
+        pool = ThreadPoolExecutor(max_workers=self.max_parallel, thread_name_prefix="agent")
+        try:
+            while pending or running:
+                ready: List[str] = sorted(
+                    (n for n, deps in pending.items() if deps <= done), key=rank.get
+                )
+                for name in ready[:max(0, self.max_parallel - len(running))]:
+                    del pending[name]
+                    cancel = threading.Event()
+                    # El span del agente cuelga del de la ejecución (contexto copiado al hilo)
+                    future = pool.submit(
+                        contextvars.copy_context().run, self._run_agent, name, classes[name], categoria_id, periodo, categoria_nombre,
+                        force, context, cancel
+                    )
+                    running[future] = name
+                    cancels[future] = cancel
+                    started[future] = time.monotonic()
+                    budget = self.budget_for(name)
+                    if budget and budget['seconds']:
+                        hard_deadlines[future] = started[future] + budget['seconds'] + self.budgets['grace_seconds']
+                
+                timeout = None
+                if hard_deadlines:
+                    timeout = max(0.0, min(hard_deadlines.values()) - time.monotonic())
+                finished, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+                
+                if not finished:
+                    # Agentes fuera de plazo: se abandonan (su hilo no guarda ni lanza más llamadas)
+                    now = time.monotonic()
+                    for future in [f for f, t in hard_deadlines.items() if t <= now and not f.done()]:
+                        name = running.pop(future)
+                        del hard_deadlines[future]
+                        cancels[future].set()
+                        abandoned = True
+                        outcome = self._abandon_agent(
+                            name, classes[name], categoria_id, periodo, categoria_nombre, context,
+                            now - started[future]
+                        )
+                        results[name] = outcome
+                        done.add(name)
+                        if on_done:
+                            on_done(name, outcome)
+                    continue
                 
-                try:
+                for future in finished:
+                    name = running.pop(future)
+                    hard_deadlines.pop(future, None)
+                    outcome = future.result()
+                    error = outcome.pop('_exception', None)
+                    results[name] = outcome
+                    done.add(name)
+                    if on_done:
+                        on_done(name, outcome)
+                    
+                    abort = None
+                    if outcome['status'] == 'error' and name in CRITICAL_AGENTS:
+                        abort = Exception(f"Agente crítico {name} falló: {outcome['error']}")
+                    elif outcome['status'] == 'failed' and name in ABORT_ON_EXCEPTION:
+                        abort = error
+                    if abort is not None:
+                        for other in running:
+                            other.cancel()
+                        logger.error(
+                            "analysis_aborted",
+                            agent=name,
+                            categoria=categoria_nombre,
+                            pending=sorted(pending),
+                            running=sorted(running.values())
+                        )
+                        raise abort
+        finally:
+            # Los hilos abandonados terminan su llamada en curso en segundo plano: no se esperan
+            pool.shutdown(wait=not abandoned)
+    
+    def _abandon_agent(
+        self,
+        agent_name: str,
+        AgentClass,
+        categoria_id: int,
+        periodo: str,
+        categoria_nombre: str,
+        context: Optional[AnalysisContext],
+        elapsed: float
+    ) -> Dict[str, Any]:
+        """Sustituye a un agente fuera de plazo por su resultado del periodo anterior"""
+        fallback, result_id = None, None
+        try:
+            with get_session() as session:
+                agent = AgentClass(session, read_session=session)
+                agent.context = context
+                fallback = agent.save_previous_period_fallback(categoria_id, periodo, 'tiempo')
+                if fallback is not None:
+                    result_id = session.query(AnalysisResult.id).filter_by(
+                        categoria_id=categoria_id, periodo=periodo, agente=agent.agent_name
+                    ).scalar()
+        except Exception as e:
+            logger.error("agent_fallback_failed", agent=agent_name, error=str(e))
+        tracing.record_span('agent', elapsed, **{
+            'agent.name': agent_name,
+            'agent.abandoned': True,
+            'agent.degraded': 'periodo_anterior' if fallback is not None else 'sin_resultado',
+        })
+        
+        logger.warning(
+            "agent_abandoned",
+            agent=agent_name,
+            categoria=categoria_nombre,
+            elapsed_seconds=round(elapsed, 1),
+            budget=self.budget_for(agent_name),
+            fallback='periodo_anterior' if fallback is not None else None
+        )
+        if fallback is None:
+            return {
+                'status': 'error',
+                'error': 'presupuesto de tiempo agotado sin resultado de un periodo anterior',
+                'execution_time': elapsed,
+                'cache': 'miss',
+                'degraded': 'sin_resultado'
+            }
+        return {
+            'status': 'success',
+            'execution_time': elapsed,
+            'cache': 'miss',
+            'result_id': result_id,
+            'degraded': 'periodo_anterior'
+        }
+    
+    @tracing.traced('agent')
+    def _run_agent(
+        self,
+        agent_name: str,
+        AgentClass,
+        categoria_id: int,
+        periodo: str,
+        categoria_nombre: str,
+        force: bool = False,
+        context: Optional[AnalysisContext] = None,
+        cancelled: Optional[threading.Event] = None
+    ) -> Dict[str, Any]:
+        """
+        Ejecuta un agente con sesiones propias (hilo del pool); nunca lanza excepciones
+        Si la huella de entradas coincide con la del resultado guardado (y no se fuerza), lo reutiliza.
+        El consumo LLM del agente (llamadas, tokens, coste) va en 'llm' del resultado.
+        Con presupuesto agotado el agente no lanza más llamadas: se queda con su resultado
+        parcial o, si no llega a tenerlo, con el del periodo anterior ('degraded')
+        """
+        start_time = time.time()
+        usage = None
+        degraded = None
+        budget = self.budget_for(agent_name)
+        tracing.set_attributes(**{'agent.name': agent_name})
+        try:
+            # Sesión propia por agente (lecturas pesadas vía réplica si existe)
+            with get_session() as session, get_session(read_only=True) as read_session:
+                agent = AgentClass(session, read_session=read_session)
+                agent.context = context
+                with tracing.span('agent.fingerprint'):
+                    try:
+                        agent.fingerprint = agent.input_fingerprint(categoria_id, periodo)
+                    except Exception as e:
+                        logger.warning("agent_fingerprint_failed", agent=agent_name, error=str(e))
+                    cached = None if force else agent.cached_result(categoria_id, periodo, agent.fingerprint)
+                
+                if cached is not None:
+                    cache = 'hit'
+                    result = cached
+                    logger.info(
+                        "agent_result_reused",
+                        agent=agent_name,
+                        categoria=categoria_nombre,
+                        fingerprint=agent.fingerprint[:12]
+                    )
+                else:
+                    cache = 'forced' if force else 'miss'
                     logger.info(
                         "executing_agent",
                         agent=agent_name,
-                        categoria=categoria_nombre
+                        categoria=categoria_nombre,
+                        cache=cache
                     )
+                    with usage_scope(
+                        max_tokens=budget['tokens'] if budget else None,
+                        deadline=time.monotonic() + budget['seconds'] if budget and budget['seconds'] else None,
+                        cancelled=cancelled
+                    ) as usage:
+                        agent.budget = usage if budget else None
+                        try:
+                            result = agent.analyze(categoria_id, periodo)
+                        except BudgetExceeded as e:
+                            result = {'error': str(e)}
                     
-                    # Skipping condicional según tipo de mercado
-                    if agent_name in FMCG_AGENTS and getattr(mercado, 'tipo_mercado', 'FMCG') != 'FMCG':
-                        logger.info(
-                            "skipping_agent_for_market",
-                            agent=agent_name,
-                            tipo_mercado=getattr(mercado, 'tipo_mercado', 'N/A')
-                        )
-                        results[agent_name] = {'status': 'skipped'}
-                        continue
-
-                    # Crear instancia del agente
-                    agent = AgentClass(session)
-                    
-                    # Ejecutar análisis
-                    result = agent.analyze(categoria_id, periodo)
-                    
-                    # Verificar errores
-                    if 'error' in result:
+                    if usage.exhausted and not usage.abandoned:
+                        if 'error' in result:
+                            fallback = agent.save_previous_period_fallback(categoria_id, periodo, usage.exhausted)
+                            if fallback is not None:
+                                result, degraded = fallback, 'periodo_anterior'
+                        else:
+                            degraded = 'parcial'
                         logger.warning(
-                            "agent_returned_error",
+                            "agent_budget_exhausted",
                             agent=agent_name,
-                            error=result['error']
+                            categoria=categoria_nombre,
+                            reason=usage.exhausted,
+                            budget=budget,
+                            tokens=usage.tokens_input + usage.tokens_output,
+                            degraded=degraded
                         )
-                        results[agent_name] = {'status': 'error', 'error': result['error']}
-                        
-                        # Algunos agentes son críticos
-                        if agent_name in ['quantitative', 'qualitative']:
-                            raise Exception(f"Agente crítico {agent_name} falló: {result['error']}")
-                        
-                        continue
-                    
-                    execution_time = time.time() - start_time
-                    
-                    # Log
-                    log_agent_analysis(
-                        logger=logger,
-                        agent_name=agent_name,
-                        categoria_id=categoria_id,
-                        periodo=periodo,
-                        execution_time_seconds=execution_time,
-                        result_summary=self._get_result_summary(agent_name, result)
-                    )
-                    
-                    results[agent_name] = {
-                        'status': 'success',
-                        'execution_time': execution_time
-                    }
-                    
-                    # Si es el agente ejecutivo, guardamos el report_id
-                    if agent_name == 'executive' and 'report_id' in result:
-                        report_id = result['report_id']
                 
-                except Exception as e:
-                    execution_time = time.time() - start_time
-                    
-                    logger.error(
-                        "agent_execution_failed",
-                        agent=agent_name,
-                        categoria=categoria_nombre,
-                        error=str(e),
-                        exc_info=True
-                    )
-                    
-                    results[agent_name] = {
-                        'status': 'failed',
-                        'error': str(e),
-                        'execution_time': execution_time
-                    }
-                    
-                    # Si un agente crítico falla, abortar
-                    if agent_name in ['quantitative', 'qualitative', 'executive']:
-                        raise
+                result_id = None
+                if 'error' not in result:
+                    result_id = result.get('report_id') if agent_name == 'executive' else session.query(
+                        AnalysisResult.id
+                    ).filter_by(categoria_id=categoria_id, periodo=periodo, agente=agent.agent_name).scalar()
             
-            # Resumen final
-            total_time = sum(r.get('execution_time', 0) for r in results.values())
-            successful = sum(1 for r in results.values() if r.get('status') == 'success')
-            failed = sum(1 for r in results.values() if r.get('status') == 'failed')
+            execution_time = time.time() - start_time
+            tracing.set_attributes(**{'agent.cache': cache, 'agent.degraded': degraded})
             
-            logger.info(
-                "analysis_completed",
+            # Verificar errores
+            if 'error' in result:
+                tracing.current_span().set_error(result['error'])
+                logger.warning(
+                    "agent_returned_error",
+                    agent=agent_name,
+                    error=result['error']
+                )
+                return {
+                    'status': 'error',
+                    'error': result['error'],
+                    'execution_time': execution_time,
+                    'cache': cache,
+                    'llm': usage.as_dict() if usage else None,
+                    'degraded': 'sin_resultado' if usage and usage.exhausted else None
+                }
+            
+            # Log
+            if cache != 'hit':
+                log_agent_analysis(
+                    logger=logger,
+                    agent_name=agent_name,
+                    categoria_id=categoria_id,
+                    periodo=periodo,
+                    execution_time_seconds=execution_time,
+                    result_summary=self._get_result_summary(agent_name, result)
+                )
+            
+            outcome = {
+                'status': 'success',
+                'execution_time': execution_time,
+                'cache': cache,
+                'result_id': result_id,
+                'llm': usage.as_dict() if usage else None,
+                'degraded': degraded
+            }
+            # Si es el agente ejecutivo, guardamos el report_id
+            if agent_name == 'executive' and 'report_id' in result:
+                outcome['report_id'] = result['report_id']
+            return outcome
+        
+        except Exception as e:
+            execution_time = time.time() - start_time
+            tracing.current_span().set_error(str(e))
+            
+            logger.error(
+                "agent_execution_failed",
+                agent=agent_name,
                 categoria=categoria_nombre,
-                periodo=periodo,
-                report_id=report_id,
-                total_time_seconds=total_time,
-                agents_successful=successful,
-                agents_failed=failed,
-                results=results
+                error=str(e),
+                exc_info=True
             )
             
-            if not report_id:
-                exec_error = None
-                if 'executive' in results:
-                    exec_error = results['executive'].get('error') or results['executive'].get('status')
-                if exec_error:
-                    raise Exception(f"No se pudo generar el report (executive agent falló): {exec_error}")
-                raise Exception("No se pudo generar el report (executive agent falló)")
-            
-            # Retornar report_id y estadísticas
-            return report_id, {
-                'agents_executed': {
-                    'total': len(results),
-                    'successful': successful,
-                    'failed': failed,
-                    'skipped': sum(1 for r in results.values() if r.get('status') == 'skipped')
-                },
-                'total_time_seconds': total_time,
-                'results_detail': results
+            return {
+                'status': 'failed',
+                'error': str(e),
+                'execution_time': execution_time,
+                'llm': usage.as_dict() if usage else None,
+                '_exception': e
             }
     
     def _get_result_summary(self, agent_name: str, result: Dict) -> Dict[str, Any]:
@@ -269,13 +902,14 @@ class AnalysisOrchestrator:
 
 
 # Función helper para uso desde CLI
-def run_analysis(category_path: str, periodo: str) -> tuple:
+def run_analysis(category_path: str, periodo: str, force: bool = False) -> tuple:
     """
     Ejecuta análisis completo desde un path de categoría
     
     Args:
         category_path: Ruta de categoría (Mercado/Categoría)
         periodo: Periodo (YYYY-MM)
+        force: Recalcular todos los agentes aunque sus entradas no hayan cambiado
     
     Returns:
         Tupla (report_id: int, stats: dict) con el ID del report generado y estadísticas de ejecución
@@ -285,7 +919,7 @@ def run_analysis(category_path: str, periodo: str) -> tuple:
     except ValueError:
         raise ValueError("Formato de categoría inválido. Usa: Mercado/Categoría")
     
-    with get_session() as session:
+    with get_session(read_only=True) as session:
         # Buscar categoría
         mercado = session.query(Mercado).filter_by(nombre=market_name).first()
         if not mercado:
@@ -297,8 +931,30 @@ def run_analysis(category_path: str, periodo: str) -> tuple:
         ).first()
         if not categoria:
             raise ValueError(f"Categoría '{category_path}' no encontrada")
-        
-        # Ejecutar análisis
-        orchestrator = AnalysisOrchestrator()
-        return orchestrator.run_analysis(categoria.id, periodo)
+        categoria_id = categoria.id
+    
+    # Ejecutar análisis (sin retener la conexión: cada agente abre las suyas)
+    orchestrator = AnalysisOrchestrator()
+    return orchestrator.run_analysis(categoria_id, periodo, force=force)
+
+
 
+def resume_analysis(run_id: int, force: bool = False) -> tuple:
+    """
+    Reanuda una ejecución registrada en analysis_runs desde sus agentes fallidos o pendientes
+    
+    Args:
+        run_id: ID de la ejecución (ver `main.py list-runs`)
+        force: Recalcular los agentes que se repiten aunque su huella coincida
+    
+    Returns:
+        Tupla (report_id: int, stats: dict), como run_analysis
+    """
+    with get_session() as session:
+        run = session.query(AnalysisRun).get(run_id)
+        if not run:
+            raise ValueError(f"Ejecución {run_id} no encontrada")
+        categoria_id, periodo = run.categoria_id, run.periodo
+    
+    orchestrator = AnalysisOrchestrator()
+    return orchestrator.run_analysis(categoria_id, periodo, force=force, resume_run_id=run_id)
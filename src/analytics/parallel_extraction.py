@@ -0,0 +1,264 @@
+"""
+Parallel Extraction
+Extracción de menciones por texto repartida entre procesos (rangos de id de ejecución)
+
+Cada worker abre su propia conexión, compila el BrandMatcher una vez y devuelve
+arrays NumPy compactos (ids, metadatos codificados y pares fila/marca); el proceso
+padre los concatena en una MentionMatrix. Solo se activa para ventanas grandes:
+por debajo del umbral el coste de arrancar el pool no compensa.
+
+Los workers se arrancan con `spawn` (no `fork`): el pool se crea desde hilos del
+orquestador y del batch, y un hijo bifurcado podría heredar tomados los locks de
+logging, del pool de SQLAlchemy o del limitador y quedarse colgado. Si el pool no
+termina en `timeout_seconds`, se cancela y el llamador cae a la vía secuencial.
+"""
+
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, wait
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+import yaml
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from src.database.models import Query, QueryExecution
+from src.analytics.brand_matcher import BrandMatcher, brand_aliases
+from src.analytics.mention_matrix import MentionMatrix
+from src.utils import tracing
+from src.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+DEFAULT_EXTRACTION_SETTINGS = {
+    'workers': 0,                # 0 = auto (nº de CPUs - 1); 1 = desactivado
+    'min_executions': 20000,     # por debajo, extracción secuencial
+    'chunks_per_worker': 4,      # rangos por worker (reparto de carga)
+    'start_method': 'spawn',     # spawn | forkserver (fork no es seguro con hilos)
+    'timeout_seconds': 600,      # sin terminar en este tiempo → vía secuencial
+}
+
+
+def _load_extraction_settings(config_path: str = "config/settings.yaml") -> Dict[str, int]:
+    """Lee analytics.extraction de settings (EXTRACTION_WORKERS tiene prioridad)"""
+    settings = dict(DEFAULT_EXTRACTION_SETTINGS)
+    try:
+        with open(config_path, "r", encoding="utf-8") as f:
+            cfg = yaml.safe_load(f) or {}
+        settings.update({
+            k: type(DEFAULT_EXTRACTION_SETTINGS[k])(v)
+            for k, v in ((cfg.get("analytics") or {}).get("extraction") or {}).items()
+            if k in DEFAULT_EXTRACTION_SETTINGS
+        })
+    except Exception:
+        pass
+    if os.getenv("EXTRACTION_WORKERS"):
+        settings['workers'] = int(os.getenv("EXTRACTION_WORKERS"))
+    return settings
+
+
+EXTRACTION_SETTINGS = _load_extraction_settings()
+
+
+def extraction_workers() -> int:
+    """Grado de paralelismo efectivo"""
+    workers = EXTRACTION_SETTINGS['workers']
+    if workers <= 0:
+        workers = max(1, (os.cpu_count() or 1) - 1)
+    return workers
+
+
+def should_parallelize(num_executions: int) -> bool:
+    return extraction_workers() > 1 and num_executions >= EXTRACTION_SETTINGS['min_executions']
+
+
+# =============================
+# Worker
+# =============================
+
+_worker_matcher: Optional[BrandMatcher] = None
+_worker_cols: Dict[int, int] = {}
+
+
+def _init_worker(aliases: Dict[int, List[str]], names: Dict[int, str], col_of: Dict[int, int]) -> None:
+    """Inicialización por proceso: matcher compilado una vez y pool de conexiones propio"""
+    global _worker_matcher, _worker_cols
+    from src.database.connection import engine, replica_engine
+    # Con spawn el engine es nuevo; con fork (start_method) las conexiones heredadas
+    # del padre no se comparten entre procesos
+    engine.dispose(close=False)
+    if replica_engine is not None:
+        replica_engine.dispose(close=False)
+    _worker_matcher = BrandMatcher(aliases, names)
+    _worker_cols = col_of
+
+
+def _scan_range(
+    categoria_id: int,
+    start: datetime,
+    end: datetime,
+    id_from: int,
+    id_to: int,
+    require_text: bool
+) -> Dict[str, Any]:
+    """
+    Escanea las ejecuciones con id en [id_from, id_to)
+
+    Returns:
+        Arrays compactos: ids, query_ids, timestamps (datetime64[us]), códigos de proveedor
+        con sus etiquetas, y pares (fila local, columna de marca)
+    """
+    from src.database.connection import get_session
+    from src.analytics.agents.base_agent import STREAM_BATCH_SIZE
+    ids: List[int] = []
+    query_ids: List[int] = []
+    timestamps: List[datetime] = []
+    provider_codes: List[int] = []
+    provider_labels: Dict[str, int] = {}
+    rows: List[int] = []
+    cols: List[int] = []
+    with get_session(read_only=True) as session:
+        query = session.query(
+            QueryExecution.id,
+            QueryExecution.query_id,
+            QueryExecution.proveedor_ia,
+            QueryExecution.timestamp,
+            QueryExecution.respuesta_texto
+        ).join(
+            Query, QueryExecution.query_id == Query.id
+        ).filter(
+            Query.categoria_id == categoria_id,
+            QueryExecution.timestamp >= start,
+            QueryExecution.timestamp < end,
+            QueryExecution.id >= id_from,
+            QueryExecution.id < id_to
+        )
+        if require_text:
+            query = query.filter(QueryExecution.respuesta_texto.isnot(None))
+        for i, e in enumerate(query.yield_per(STREAM_BATCH_SIZE)):
+            ids.append(e.id)
+            query_ids.append(e.query_id)
+            timestamps.append(e.timestamp)
+            provider_codes.append(provider_labels.setdefault(e.proveedor_ia, len(provider_labels)))
+            for marca_id in _worker_matcher.brands_in(e.respuesta_texto):
+                j = _worker_cols.get(marca_id)
+                if j is not None:
+                    rows.append(i)
+                    cols.append(j)
+    return {
+        'ids': np.asarray(ids, dtype=np.int64),
+        'query_ids': np.asarray(query_ids, dtype=np.int64),
+        'timestamps': np.asarray(timestamps, dtype='datetime64[us]'),
+        'provider_codes': np.asarray(provider_codes, dtype=np.int32),
+        'provider_labels': list(provider_labels),
+        'rows': np.asarray(rows, dtype=np.int64),
+        'cols': np.asarray(cols, dtype=np.int32),
+    }
+
+
+# =============================
+# Padre
+# =============================
+
+def _id_ranges(session: Session, categoria_id: int, start: datetime, end: datetime,
+               after_id: Optional[int], n_chunks: int) -> List[Tuple[int, int]]:
+    """Rangos [desde, hasta) de id que cubren la ventana, de tamaño similar"""
+    query = session.query(func.min(QueryExecution.id), func.max(QueryExecution.id)).join(
+        Query, QueryExecution.query_id == Query.id
+    ).filter(
+        Query.categoria_id == categoria_id,
+        QueryExecution.timestamp >= start,
+        QueryExecution.timestamp < end
+    )
+    if after_id is not None:
+        query = query.filter(QueryExecution.id > after_id)
+    lo, hi = query.one()
+    if lo is None:
+        return []
+    bounds = np.unique(np.linspace(lo, hi + 1, n_chunks + 1).astype(np.int64))
+    return [(int(a), int(b)) for a, b in zip(bounds[:-1], bounds[1:])]
+
+
+def _terminate(pool: Optional[ProcessPoolExecutor]) -> None:
+    """Cierra el pool sin esperar a workers colgados (los termina)"""
+    if pool is None:
+        return
+    # Sin cancel_futures: los pendientes reciben BrokenProcessPool al terminar los workers
+    processes = list((getattr(pool, '_processes', None) or {}).values())
+    pool.shutdown(wait=False)
+    for process in processes:
+        if process.is_alive():
+            process.terminate()
+
+
+@tracing.traced('extraction.parallel')
+def extract_parallel(
+    session: Session,
+    categoria_id: int,
+    start: datetime,
+    end: datetime,
+    marcas: Sequence[Any],
+    after_id: Optional[int] = None,
+    require_text: bool = False
+) -> Optional[MentionMatrix]:
+    """
+    MentionMatrix de la ventana escaneando el texto en varios procesos
+
+    Returns:
+        La matriz, o None si el pool no pudo ejecutarse (el llamador cae a la vía secuencial)
+    """
+    workers = extraction_workers()
+    ranges = _id_ranges(
+        session, categoria_id, start, end, after_id,
+        workers * max(1, EXTRACTION_SETTINGS['chunks_per_worker'])
+    )
+    aliases, names = brand_aliases(marcas)
+    col_of = {m.id: j for j, m in enumerate(marcas)}
+    if not ranges:
+        return MentionMatrix([m.nombre for m in marcas], np.zeros(0, dtype=np.int64), [], [], [],
+                             np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64))
+    timeout = EXTRACTION_SETTINGS['timeout_seconds'] or None
+    pool = None
+    try:
+        pool = ProcessPoolExecutor(
+            max_workers=min(workers, len(ranges)),
+            mp_context=multiprocessing.get_context(EXTRACTION_SETTINGS['start_method']),
+            initializer=_init_worker,
+            initargs=(aliases, names, col_of)
+        )
+        futures = [pool.submit(_scan_range, categoria_id, start, end, a, b, require_text) for a, b in ranges]
+        _, not_done = wait(futures, timeout=timeout)
+        if not_done:
+            logger.warning("parallel_extraction_timeout", categoria_id=categoria_id, timeout_seconds=timeout)
+            _terminate(pool)
+            return None
+        parts = [f.result() for f in futures]
+    except Exception as e:
+        logger.warning("parallel_extraction_failed", categoria_id=categoria_id, error=str(e))
+        _terminate(pool)
+        return None
+    pool.shutdown()
+
+    # Fusión: desplazar filas locales y traducir códigos de proveedor a etiquetas
+    offsets = np.cumsum([0] + [p['ids'].shape[0] for p in parts[:-1]])
+    providers: List[str] = []
+    for p in parts:
+        labels = np.asarray(p['provider_labels'], dtype=object)
+        providers.extend(labels[p['provider_codes']].tolist() if p['provider_labels'] else [])
+    matrix = MentionMatrix(
+        [m.nombre for m in marcas],
+        np.concatenate([p['ids'] for p in parts]),
+        providers,
+        np.concatenate([p['query_ids'] for p in parts]).tolist(),
+        np.concatenate([p['timestamps'] for p in parts]).tolist(),
+        np.concatenate([p['rows'] + off for p, off in zip(parts, offsets)]),
+        np.concatenate([p['cols'] for p in parts]).astype(np.int64)
+    )
+    logger.info(
+        "parallel_extraction_done",
+        categoria_id=categoria_id,
+        workers=min(workers, len(ranges)),
+        rangos=len(ranges),
+        ejecuciones=matrix.num_executions
+    )
+    return matrix
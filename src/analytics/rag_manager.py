@@ -3,11 +3,14 @@ RAG Manager
 Sistema de Retrieval-Augmented Generation para contexto histórico
 """
 
+import json
 from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime, timedelta
 from sqlalchemy import text
 from src.database.models import Embedding, Report, AnalysisResult, QueryExecution
+from src.database.connection import route_read
 from src.query_executor.api_clients import OpenAIClient
+from src.utils import tracing
 from src.utils.logger import setup_logger
 
 logger = setup_logger(__name__)
@@ -18,17 +21,24 @@ class RAGManager:
     Gestor de RAG con embeddings y búsqueda vectorial
     """
     
-    def __init__(self, session):
+    def __init__(self, session, read_session=None):
         """
         Initialize RAG manager
         
         Args:
             session: Sesión de SQLAlchemy
+            read_session: Sesión de solo lectura (réplica) para las búsquedas vectoriales
         """
         self.session = session
+        self._read_session = read_session
         self.client = OpenAIClient()
         self.embedding_dimension = 1536  # OpenAI text-embedding-3-small
     
+    @property
+    def read_session(self):
+        """Sesión para búsquedas: réplica si está al día, si no el primario"""
+        return route_read(self.session, self._read_session)
+    
     def create_embedding(
         self,
         categoria_id: int,
@@ -83,6 +93,7 @@ class RAGManager:
             logger.error(f"Error creando embedding: {e}", exc_info=True)
             return None
     
+    @tracing.traced('rag.search_similar')
     def search_similar(
         self,
         categoria_id: int,
@@ -109,8 +120,10 @@ class RAGManager:
             Lista de embeddings similares con metadata
         """
         try:
+            tracing.set_attributes(**{'rag.categoria_id': categoria_id, 'rag.tipo': tipo_filtro, 'rag.top_k': top_k})
             # Generar embedding de la query
-            query_vector = self.client.generate_embedding(query_text)
+            with tracing.span('rag.embedding'):
+                query_vector = self.client.generate_embedding(query_text)
             
             # Construcción de condiciones
             tipo_condition = ""
@@ -137,30 +150,8 @@ class RAGManager:
                         periodo_condition = "AND e.periodo != :periodo_actual"
                 fecha_condition = periodo_condition
 
-            sql = text(f"""
-                SELECT 
-                    e.id,
-                    e.categoria_id,
-                    e.periodo,
-                    e.tipo,
-                    e.referencia_id,
-                    e.metadata,
-                    (e.vector <=> :query_vector) as distance
-                FROM embeddings e
-                {fecha_join}
-                WHERE e.categoria_id = :categoria_id
-                    {fecha_condition}
-                    {tipo_condition}
-                ORDER BY e.vector <=> :query_vector
-                LIMIT :top_k
-            """)
-            
-            # Parámetros
-            params = {
-                'query_vector': str(query_vector),
-                'categoria_id': categoria_id,
-                'top_k': top_k
-            }
+            # Parámetros de filtro
+            params = {'categoria_id': categoria_id}
             if use_precise_dates:
                 params['start_date'] = start_date
                 params['end_date'] = end_date
@@ -169,22 +160,51 @@ class RAGManager:
 
             if tipo_filtro:
                 params['tipo_filtro'] = tipo_filtro
-            
-            # Ejecutar query
-            result = self.session.execute(sql, params)
-            
-            # Procesar resultados
-            similar_items = []
-            for row in result:
-                similar_items.append({
-                    'embedding_id': row.id,
-                    'periodo': row.periodo,
-                    'tipo': row.tipo,
-                    'referencia_id': row.referencia_id,
-                    'distance': float(row.distance),
-                    'similarity': 1 - float(row.distance),  # Convertir distancia a similaridad
-                    'metadata': row.metadata
-                })
+
+            session = self.read_session
+            if session.get_bind().dialect.name != 'postgresql':
+                # Backend embebido (SQLite): filtros en SQL, similitud en el índice NumPy
+                similar_items = self._search_similar_local(
+                    session, categoria_id, query_vector, top_k,
+                    fecha_join, fecha_condition, tipo_condition, params
+                )
+            else:
+                sql = text(f"""
+                    SELECT 
+                        e.id,
+                        e.categoria_id,
+                        e.periodo,
+                        e.tipo,
+                        e.referencia_id,
+                        e.metadata,
+                        (e.vector <=> :query_vector) as distance
+                    FROM embeddings e
+                    {fecha_join}
+                    WHERE e.categoria_id = :categoria_id
+                        {fecha_condition}
+                        {tipo_condition}
+                    ORDER BY e.vector <=> :query_vector
+                    LIMIT :top_k
+                """)
+                params['query_vector'] = str(query_vector)
+                params['top_k'] = top_k
+                
+                # Ejecutar query
+                with tracing.span('rag.vector_search', **{'rag.backend': 'pgvector'}):
+                    result = session.execute(sql, params)
+                
+                # Procesar resultados
+                similar_items = []
+                for row in result:
+                    similar_items.append({
+                        'embedding_id': row.id,
+                        'periodo': row.periodo,
+                        'tipo': row.tipo,
+                        'referencia_id': row.referencia_id,
+                        'distance': float(row.distance),
+                        'similarity': 1 - float(row.distance),  # Convertir distancia a similaridad
+                        'metadata': row.metadata
+                    })
             
             if start_date and end_date:
                 logger.info(
@@ -205,12 +225,65 @@ class RAGManager:
                     results_found=len(similar_items)
                 )
             
+            tracing.set_attributes(**{'rag.results': len(similar_items)})
             return similar_items
         
         except Exception as e:
             logger.error(f"Error en búsqueda de similaridad: {e}", exc_info=True)
+            tracing.current_span().set_error(str(e))
             return []
     
+    @tracing.traced('rag.vector_search', **{'rag.backend': 'numpy'})
+    def _search_similar_local(
+        self,
+        session,
+        categoria_id: int,
+        query_vector: List[float],
+        top_k: int,
+        fecha_join: str,
+        fecha_condition: str,
+        tipo_condition: str,
+        params: Dict[str, Any]
+    ) -> List[Dict[str, Any]]:
+        """
+        Búsqueda de similitud sin pgvector: los mismos filtros que search_similar
+        seleccionan candidatos en SQL y el ranking lo hace el índice NumPy (memmap)
+        """
+        from src.analytics.vector_index import get_vector_index_store
+
+        sql = text(f"""
+            SELECT e.id, e.periodo, e.tipo, e.referencia_id, e.metadata
+            FROM embeddings e
+            {fecha_join}
+            WHERE e.categoria_id = :categoria_id
+                {fecha_condition}
+                {tipo_condition}
+        """)
+        candidates = {row.id: row for row in session.execute(sql, params)}
+        if not candidates:
+            return []
+
+        index = get_vector_index_store().get(session, categoria_id)
+        similar_items = []
+        for emb_id, distance in index.search(query_vector, top_k, candidate_ids=list(candidates)):
+            row = candidates[emb_id]
+            metadata = row.metadata
+            if isinstance(metadata, str):
+                try:
+                    metadata = json.loads(metadata)
+                except ValueError:
+                    pass
+            similar_items.append({
+                'embedding_id': emb_id,
+                'periodo': row.periodo,
+                'tipo': row.tipo,
+                'referencia_id': row.referencia_id,
+                'distance': distance,
+                'similarity': 1 - distance,
+                'metadata': metadata
+            })
+        return similar_items
+    
     def search_query_executions_for_question(
         self,
         categoria_id: int,
@@ -285,7 +358,7 @@ class RAGManager:
             # Recuperar los textos completos de las QueryExecution
             results = []
             for emb in similar_embeddings:
-                execution = self.session.query(QueryExecution).get(emb['referencia_id'])
+                execution = self.read_session.query(QueryExecution).get(emb['referencia_id'])
                 
                 if execution and execution.respuesta_texto:
                     results.append({
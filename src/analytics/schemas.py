@@ -188,3 +188,76 @@ class StrategicOutput(BaseModel):
     metadata: Dict[str, Any] = Field(default_factory=dict)
 
 
+
+
+# ==========================
+# Executive Section Schemas
+# ==========================
+# Una por sección del informe ejecutivo (generación por secciones). Se admiten claves
+# adicionales: las plantillas del PDF leen campos opcionales que el modelo puede añadir.
+
+class ExecutiveSection(BaseModel):
+    model_config = {'extra': 'allow'}
+
+
+class AnswerFirst(BaseModel):
+    the_answer: str = ""
+    the_why: str = ""
+    the_how: str = ""
+    the_impact: str = ""
+
+
+class ResumenEjecutivoSection(ExecutiveSection):
+    narrativa_principal: str
+    hallazgos_clave: List[str] = Field(default_factory=list)
+    recomendacion_principal: str = ""
+    answer_first: AnswerFirst = Field(default_factory=AnswerFirst)
+
+
+class NarrativaSection(ExecutiveSection):
+    narrativa: str
+
+
+class PerfilNarrativo(BaseModel):
+    marca: str
+    analisis_profundo: str = ""
+
+
+class AnalisisCompetitivoSection(ExecutiveSection):
+    narrativa_dinamica: str
+    perfiles_narrativos: List[PerfilNarrativo] = Field(default_factory=list)
+
+
+class ConsumidorSection(ExecutiveSection):
+    narrativa_voz_cliente: str
+
+
+class DafoSintesis(BaseModel):
+    fortalezas_clave: List[str] = Field(default_factory=list)
+    debilidades_clave: List[str] = Field(default_factory=list)
+    oportunidades_clave: List[str] = Field(default_factory=list)
+    amenazas_clave: List[str] = Field(default_factory=list)
+    cruces_estrategicos: str = ""
+
+
+class OportunidadesRiesgosSection(ExecutiveSection):
+    narrativa_oportunidades: str
+    narrativa_riesgos: str
+    oportunidades: List[Dict[str, Any]] = Field(default_factory=list)
+    riesgos: List[Dict[str, Any]] = Field(default_factory=list)
+    dafo_sintesis: DafoSintesis = Field(default_factory=DafoSintesis)
+
+
+class IniciativaPlan(BaseModel):
+    titulo: str
+    descripcion: Optional[str] = None
+    por_que: Optional[str] = None
+    como: Optional[str] = None
+    kpi_medicion: Optional[str] = None
+    timeline: Optional[str] = None
+    prioridad: Optional[str] = None
+
+
+class Plan90DiasSection(ExecutiveSection):
+    narrativa_estrategia: str
+    iniciativas: List[IniciativaPlan] = Field(default_factory=list)
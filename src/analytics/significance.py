@@ -0,0 +1,225 @@
+"""
+Significance
+Intervalos de confianza por remuestreo vectorizado para SOV y sentimiento
+
+- SOV: bootstrap de Poisson sobre los conteos de menciones por marca
+  (cada remuestreo es una fila de una matriz remuestreos × marcas)
+- Sentimiento: bootstrap de la media de los scores muestreados por marca,
+  todas las marcas a la vez con índices aleatorios y máscara de longitud
+- Cambios entre periodos: intervalo de la diferencia y p-valor bilateral;
+  un cambio es significativo si el intervalo no contiene 0
+
+Miles de remuestreos para todas las marcas en una sola operación NumPy.
+Parámetros en settings (analytics.significance).
+"""
+
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+import yaml
+
+DEFAULT_SIGNIFICANCE_SETTINGS = {
+    'resamples': 2000,    # remuestreos bootstrap
+    'confidence': 0.95,   # nivel del intervalo
+    'seed': 0,            # semilla fija: resultados reproducibles entre ejecuciones
+}
+
+
+def _load_significance_settings(config_path: str = "config/settings.yaml") -> Dict[str, float]:
+    """Lee analytics.significance de settings"""
+    settings = dict(DEFAULT_SIGNIFICANCE_SETTINGS)
+    try:
+        with open(config_path, "r", encoding="utf-8") as f:
+            cfg = yaml.safe_load(f) or {}
+        for k, v in ((cfg.get("analytics") or {}).get("significance") or {}).items():
+            if k in DEFAULT_SIGNIFICANCE_SETTINGS:
+                settings[k] = type(DEFAULT_SIGNIFICANCE_SETTINGS[k])(v)
+    except Exception:
+        pass
+    return settings
+
+
+SIGNIFICANCE_SETTINGS = _load_significance_settings()
+
+
+def _rng(seed: Optional[int] = None) -> np.random.Generator:
+    return np.random.default_rng(SIGNIFICANCE_SETTINGS['seed'] if seed is None else seed)
+
+
+def _bounds(samples: np.ndarray, confidence: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """Percentiles del intervalo por columna (remuestreos en el eje 0)"""
+    alpha = 1.0 - (confidence or SIGNIFICANCE_SETTINGS['confidence'])
+    lo, hi = np.percentile(samples, [100 * alpha / 2, 100 * (1 - alpha / 2)], axis=0)
+    return lo, hi
+
+
+def _p_two_sided(diff: np.ndarray) -> np.ndarray:
+    """p-valor bilateral de H0: diferencia = 0 a partir de la distribución bootstrap"""
+    below = (diff <= 0).mean(axis=0)
+    above = (diff >= 0).mean(axis=0)
+    return np.minimum(1.0, 2.0 * np.minimum(below, above))
+
+
+# =============================
+# SOV (conteos de menciones)
+# =============================
+
+def poisson_sov_samples(counts: np.ndarray, resamples: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    SOV (%) remuestreado: conteos ~ Poisson(conteo observado) por marca
+
+    Returns:
+        Matriz remuestreos × marcas
+    """
+    sampled = rng.poisson(np.asarray(counts, dtype=float), size=(resamples, len(counts)))
+    totals = sampled.sum(axis=1, keepdims=True)
+    return sampled * 100.0 / np.maximum(totals, 1)
+
+
+def sov_intervals(
+    menciones: Dict[str, int],
+    resamples: Optional[int] = None,
+    confidence: Optional[float] = None,
+    seed: Optional[int] = None
+) -> Dict[str, Dict[str, float]]:
+    """{marca: {'sov', 'ic_inf', 'ic_sup'}} a partir de las menciones del periodo"""
+    marcas = list(menciones)
+    if not marcas:
+        return {}
+    counts = np.fromiter((float(menciones[m] or 0) for m in marcas), dtype=float, count=len(marcas))
+    if counts.sum() <= 0:
+        return {}
+    samples = poisson_sov_samples(counts, int(resamples or SIGNIFICANCE_SETTINGS['resamples']), _rng(seed))
+    lo, hi = _bounds(samples, confidence)
+    sov = counts * 100.0 / counts.sum()
+    return {
+        m: {'sov': round(float(sov[i]), 2), 'ic_inf': round(float(lo[i]), 2), 'ic_sup': round(float(hi[i]), 2)}
+        for i, m in enumerate(marcas)
+    }
+
+
+def sov_shift_test(
+    current: Dict[str, int],
+    previous: Dict[str, int],
+    resamples: Optional[int] = None,
+    confidence: Optional[float] = None,
+    seed: Optional[int] = None
+) -> Dict[str, Dict[str, float]]:
+    """
+    Cambio de SOV (pp) entre dos periodos con intervalo bootstrap
+
+    Args:
+        current / previous: {marca: menciones} de cada periodo
+
+    Returns:
+        {marca: {'delta_pp', 'ic_inf', 'ic_sup', 'p_valor', 'significativo'}}
+    """
+    marcas = sorted(set(current) | set(previous))
+    cur = np.array([float(current.get(m, 0) or 0) for m in marcas])
+    prev = np.array([float(previous.get(m, 0) or 0) for m in marcas])
+    if not marcas or cur.sum() <= 0 or prev.sum() <= 0:
+        return {}
+    n = int(resamples or SIGNIFICANCE_SETTINGS['resamples'])
+    rng = _rng(seed)
+    diff = poisson_sov_samples(cur, n, rng) - poisson_sov_samples(prev, n, rng)
+    lo, hi = _bounds(diff, confidence)
+    p = _p_two_sided(diff)
+    delta = cur * 100.0 / cur.sum() - prev * 100.0 / prev.sum()
+    return {
+        m: {
+            'delta_pp': round(float(delta[i]), 2),
+            'ic_inf': round(float(lo[i]), 2),
+            'ic_sup': round(float(hi[i]), 2),
+            'p_valor': round(float(p[i]), 4),
+            'significativo': bool(lo[i] > 0 or hi[i] < 0),
+        }
+        for i, m in enumerate(marcas)
+    }
+
+
+# =============================
+# Medias (scores de sentimiento)
+# =============================
+
+def bootstrap_mean_samples(
+    samples: Sequence[Sequence[float]],
+    resamples: int,
+    rng: np.random.Generator
+) -> np.ndarray:
+    """
+    Medias remuestreadas de grupos de distinto tamaño en una pasada
+
+    Returns:
+        Matriz remuestreos × grupos (NaN en grupos vacíos)
+    """
+    sizes = np.array([len(s) for s in samples])
+    G, width = len(samples), int(sizes.max()) if len(samples) else 0
+    if width == 0:
+        return np.full((resamples, G), np.nan)
+    values = np.zeros((G, width))
+    for g, s in enumerate(samples):
+        values[g, :len(s)] = s
+    # Índices uniformes en [0, n_g) por grupo; columnas más allá de n_g enmascaradas
+    idx = (rng.random((resamples, G, width)) * np.maximum(sizes, 1)[None, :, None]).astype(int)
+    mask = np.arange(width)[None, None, :] < sizes[None, :, None]
+    picked = values[np.arange(G)[None, :, None], idx] * mask
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return picked.sum(axis=2) / np.where(sizes > 0, sizes, np.nan)[None, :]
+
+
+def mean_intervals(
+    scores: Dict[str, List[float]],
+    resamples: Optional[int] = None,
+    confidence: Optional[float] = None,
+    seed: Optional[int] = None
+) -> Dict[str, Dict[str, float]]:
+    """{marca: {'media', 'ic_inf', 'ic_sup', 'n'}} de los scores por marca"""
+    marcas = [m for m in scores if scores[m]]
+    if not marcas:
+        return {}
+    groups = [[float(v) for v in scores[m]] for m in marcas]
+    samples = bootstrap_mean_samples(groups, int(resamples or SIGNIFICANCE_SETTINGS['resamples']), _rng(seed))
+    lo, hi = _bounds(samples, confidence)
+    return {
+        m: {
+            'media': round(float(np.mean(groups[i])), 3),
+            'ic_inf': round(float(lo[i]), 3),
+            'ic_sup': round(float(hi[i]), 3),
+            'n': len(groups[i]),
+        }
+        for i, m in enumerate(marcas)
+    }
+
+
+def mean_shift_test(
+    current: Dict[str, List[float]],
+    previous: Dict[str, List[float]],
+    resamples: Optional[int] = None,
+    confidence: Optional[float] = None,
+    seed: Optional[int] = None
+) -> Dict[str, Dict[str, float]]:
+    """
+    Cambio de la media (p. ej. sentimiento) entre dos periodos con intervalo bootstrap
+
+    Returns:
+        {marca: {'delta', 'ic_inf', 'ic_sup', 'p_valor', 'significativo'}} (marcas con datos en ambos)
+    """
+    marcas = [m for m in current if current[m] and previous.get(m)]
+    if not marcas:
+        return {}
+    n = int(resamples or SIGNIFICANCE_SETTINGS['resamples'])
+    rng = _rng(seed)
+    cur = [[float(v) for v in current[m]] for m in marcas]
+    prev = [[float(v) for v in previous[m]] for m in marcas]
+    diff = bootstrap_mean_samples(cur, n, rng) - bootstrap_mean_samples(prev, n, rng)
+    lo, hi = _bounds(diff, confidence)
+    p = _p_two_sided(diff)
+    return {
+        m: {
+            'delta': round(float(np.mean(cur[i]) - np.mean(prev[i])), 3),
+            'ic_inf': round(float(lo[i]), 3),
+            'ic_sup': round(float(hi[i]), 3),
+            'p_valor': round(float(p[i]), 4),
+            'significativo': bool(lo[i] > 0 or hi[i] < 0),
+        }
+        for i, m in enumerate(marcas)
+    }
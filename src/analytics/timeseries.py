@@ -0,0 +1,280 @@
+"""
+Time Series
+Detección vectorizada de tendencias en series por marca (matriz marcas × periodos)
+
+- Línea base EWMA del historial (sin el último punto)
+- z robusto del último punto frente al historial (mediana / MAD; con MAD nulo, MAD de
+  las primeras diferencias y un suelo proporcional al nivel de la serie)
+- Punto de cambio único por marca: máximo estadístico t entre las particiones
+  antes/después, calculado para todas a la vez con sumas acumuladas
+- Registros de tendencia ordenados por significancia, comunes a Trends,
+  Quantitative y los gráficos
+
+Los umbrales se leen de settings (analytics.trends).
+"""
+
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+import yaml
+
+DEFAULT_TREND_SETTINGS = {
+    'ewma_alpha': 0.5,               # peso del punto más reciente en la línea base
+    'z_threshold': 2.0,              # |z robusto| a partir del cual el último punto es anómalo
+    'change_point_threshold': 3.0,   # estadístico t mínimo para declarar punto de cambio
+    'min_delta_pp': 3.0,             # cambio absoluto mínimo (pp) vs referencia
+    'min_delta_rel': 10.0,           # cambio relativo mínimo (%) vs referencia
+    'peak_delta_pp': 4.0,            # pico sin historial suficiente: pp sobre la media previa
+    'peak_delta_rel': 30.0,          # pico sin historial suficiente: % sobre la media previa
+    'min_history': 3,                # puntos previos necesarios para z robusto
+    'scale_floor': 0.5,              # dispersión mínima (pp): evita z infinitos en series planas
+    'scale_floor_rel': 0.1,          # dispersión mínima relativa a la mediana del historial
+}
+
+
+def _load_trend_settings(config_path: str = "config/settings.yaml") -> Dict[str, float]:
+    """Lee analytics.trends de settings"""
+    settings = dict(DEFAULT_TREND_SETTINGS)
+    try:
+        with open(config_path, "r", encoding="utf-8") as f:
+            cfg = yaml.safe_load(f) or {}
+        settings.update({
+            k: float(v) for k, v in ((cfg.get("analytics") or {}).get("trends") or {}).items()
+            if k in DEFAULT_TREND_SETTINGS
+        })
+    except Exception:
+        pass
+    return settings
+
+
+TREND_SETTINGS = _load_trend_settings()
+
+
+# =============================
+# Construcción de la matriz
+# =============================
+
+def series_matrix(
+    series: Dict[str, List[Dict[str, Any]]],
+    value_key: str = 'sov',
+    periods: Optional[Sequence[str]] = None
+) -> Tuple[List[str], List[str], np.ndarray]:
+    """
+    {marca: [{periodo, valor}]} → (marcas, periodos, X[marcas × periodos])
+
+    Args:
+        periods: Orden de columnas (por defecto, ordenados); se descartan los que no tienen datos
+
+    Una marca sin punto en un periodo presente cuenta como 0 (sin menciones)
+    """
+    present = {p.get('periodo') for pts in series.values() for p in (pts or []) if p.get('periodo')}
+    periods = sorted(present) if periods is None else [p for p in periods if p in present]
+    col = {p: j for j, p in enumerate(periods)}
+    brands = list(series)
+    X = np.zeros((len(brands), len(periods)), dtype=float)
+    for i, marca in enumerate(brands):
+        for punto in series[marca] or []:
+            j = col.get(punto.get('periodo'))
+            if j is not None:
+                try:
+                    X[i, j] = float(punto.get(value_key) or 0.0)
+                except (TypeError, ValueError):
+                    pass
+    return brands, list(periods), X
+
+
+# =============================
+# Estadísticos (todas las marcas a la vez)
+# =============================
+
+def ewma(X: np.ndarray, alpha: float) -> np.ndarray:
+    """EWMA por fila (columna t = línea base con datos hasta t)"""
+    out = np.empty_like(X, dtype=float)
+    if X.shape[1] == 0:
+        return out
+    out[:, 0] = X[:, 0]
+    for t in range(1, X.shape[1]):
+        out[:, t] = alpha * X[:, t] + (1.0 - alpha) * out[:, t - 1]
+    return out
+
+
+def robust_z(X: np.ndarray, min_history: int, scale_floor: float, scale_floor_rel: float = 0.0) -> np.ndarray:
+    """
+    z robusto del último punto frente a los anteriores: (x - mediana) / (1.4826·MAD)
+    NaN si el historial tiene menos de `min_history` puntos
+
+    Con MAD nulo (historial mayoritariamente constante) la escala es la MAD de las primeras
+    diferencias (ruido punto a punto, insensible a un cambio de nivel), y nunca baja de
+    max(scale_floor, scale_floor_rel·|mediana|)
+    """
+    hist, last = X[:, :-1], X[:, -1]
+    if hist.shape[1] < min_history:
+        return np.full(X.shape[0], np.nan)
+    med = np.median(hist, axis=1)
+    scale = 1.4826 * np.median(np.abs(hist - med[:, None]), axis=1)
+    if hist.shape[1] >= 2:
+        diff_scale = 1.4826 * np.median(np.abs(np.diff(hist, axis=1)), axis=1) / np.sqrt(2.0)
+        scale = np.where(scale > 0, scale, diff_scale)
+    floor = np.maximum(scale_floor, scale_floor_rel * np.abs(med))
+    return (last - med) / np.maximum(scale, floor)
+
+
+def change_points(X: np.ndarray, scale_floor: float) -> Dict[str, np.ndarray]:
+    """
+    Punto de cambio único por fila (segmentos de al menos 2 puntos)
+
+    Returns:
+        {'index': primer índice del segundo segmento, 'stat': t, 'before': media, 'after': media}
+        (stat = 0 si la serie tiene menos de 4 puntos)
+    """
+    B, T = X.shape
+    empty = {'index': np.zeros(B, dtype=int), 'stat': np.zeros(B),
+             'before': np.zeros(B), 'after': np.zeros(B)}
+    if T < 4:
+        return empty
+    k = np.arange(2, T - 1)                       # tamaños del primer segmento
+    S = np.cumsum(X, axis=1)
+    SS = np.cumsum(X * X, axis=1)
+    left_mean = S[:, k - 1] / k
+    right_mean = (S[:, -1:] - S[:, k - 1]) / (T - k)
+    within = (SS[:, k - 1] - k * left_mean ** 2) + (SS[:, -1:] - SS[:, k - 1] - (T - k) * right_mean ** 2)
+    var = np.maximum(within / (T - 2), scale_floor ** 2)
+    stat = np.abs(right_mean - left_mean) / np.sqrt(var * (1.0 / k + 1.0 / (T - k)))
+    best = np.argmax(stat, axis=1)
+    rows = np.arange(B)
+    return {
+        'index': k[best],
+        'stat': stat[rows, best],
+        'before': left_mean[rows, best],
+        'after': right_mean[rows, best],
+    }
+
+
+# =============================
+# Registros de tendencia
+# =============================
+
+def detect_trends(
+    series: Dict[str, List[Dict[str, Any]]],
+    value_key: str = 'sov',
+    metric: str = 'SOV',
+    compare: str = 'previous',
+    periods: Optional[Sequence[str]] = None,
+    settings: Optional[Dict[str, float]] = None
+) -> List[Dict[str, Any]]:
+    """
+    Tendencias significativas del último punto de cada serie
+
+    Args:
+        series: {marca: [{periodo, <value_key>}]}
+        compare: 'previous' (último vs penúltimo) o 'first' (último vs primero, intra-rango)
+        periods: Orden explícito de los periodos (por defecto, ordenados)
+
+    Returns:
+        Registros ordenados por `score` descendente; solo marcas con cambio relevante,
+        z anómalo o punto de cambio
+    """
+    cfg = {**TREND_SETTINGS, **(settings or {})}
+    brands, periods, X = series_matrix(series, value_key, periods)
+    if X.shape[1] < 2 or not brands:
+        return []
+
+    last = X[:, -1]
+    ref_idx = -2 if compare == 'previous' else 0
+    ref = X[:, ref_idx]
+    delta = last - ref
+    rel = np.divide(delta * 100.0, ref, out=np.zeros_like(delta), where=ref > 0)
+
+    base = ewma(X[:, :-1], cfg['ewma_alpha'])[:, -1]
+    z = robust_z(X, int(cfg['min_history']), cfg['scale_floor'], cfg['scale_floor_rel'])
+    cp = change_points(X, cfg['scale_floor'])
+
+    z_abs = np.nan_to_num(np.abs(z))
+    score = np.max(np.vstack([
+        np.abs(delta) / cfg['min_delta_pp'],
+        np.abs(rel) / cfg['min_delta_rel'],
+        z_abs / cfg['z_threshold'],
+        cp['stat'] / cfg['change_point_threshold'],
+    ]), axis=0)
+
+    # Pico: z robusto si hay historial; si no, desviación sobre la media previa.
+    # Solo si el último punto sube respecto al anterior (un nivel ya alcanzado no es pico)
+    hist_mean = X[:, :-1].mean(axis=1)
+    over = last - hist_mean
+    over_rel = np.divide(over * 100.0, hist_mean, out=np.zeros_like(over), where=hist_mean > 0)
+    peak = np.where(
+        np.isnan(z),
+        (X.shape[1] >= 3) & ((over >= cfg['peak_delta_pp']) | (over_rel >= cfg['peak_delta_rel'])),
+        z >= cfg['z_threshold']
+    ) & (last > X[:, -2])
+
+    records: List[Dict[str, Any]] = []
+    for i in np.flatnonzero(score >= 1.0):
+        motivos = []
+        if abs(delta[i]) >= cfg['min_delta_pp'] or abs(rel[i]) >= cfg['min_delta_rel']:
+            motivos.append('cambio')
+        if z_abs[i] >= cfg['z_threshold']:
+            motivos.append('z_robusto')
+        if cp['stat'][i] >= cfg['change_point_threshold']:
+            motivos.append('punto_cambio')
+        direction = delta[i] if delta[i] != 0 else (z[i] if not np.isnan(z[i]) else cp['after'][i] - cp['before'][i])
+        record = {
+            'marca': brands[i],
+            'metrica': metric,
+            'cambio_puntos': round(float(delta[i]), 2),
+            'cambio_rel_pct': round(float(rel[i]), 1),
+            'periodo_inicio': periods[ref_idx],
+            'periodo_fin': periods[-1],
+            'direccion': '↑' if direction > 0 else '↓',
+            'significancia': 'alta' if score[i] >= 2.0 else 'media',
+            'pico': bool(peak[i]),
+            'base_ewma': round(float(base[i]), 2),
+            'z_robusto': None if np.isnan(z[i]) else round(float(z[i]), 2),
+            'punto_cambio': None,
+            'motivos': motivos,
+            'score': round(float(score[i]), 2),
+            'muestras': int(X.shape[1]),
+        }
+        if cp['stat'][i] >= cfg['change_point_threshold']:
+            record['punto_cambio'] = {
+                'periodo': periods[int(cp['index'][i])],
+                'media_antes': round(float(cp['before'][i]), 2),
+                'media_despues': round(float(cp['after'][i]), 2),
+                'estadistico': round(float(cp['stat'][i]), 2),
+            }
+        records.append(record)
+
+    records.sort(key=lambda r: r['score'], reverse=True)
+    return records
+
+
+def cross_section_outliers(
+    values: Dict[str, float],
+    settings: Optional[Dict[str, float]] = None
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Marcas atípicamente altas/bajas en un mismo periodo (z robusto entre marcas)
+
+    Returns:
+        (altos, bajos) con {'marca', 'valor', 'z_robusto', 'umbral'}
+    """
+    cfg = {**TREND_SETTINGS, **(settings or {})}
+    if len(values) < 3:
+        return [], []
+    names = list(values)
+    v = np.fromiter((float(values[n] or 0.0) for n in names), dtype=float, count=len(names))
+    med = float(np.median(v))
+    scale = 1.4826 * float(np.median(np.abs(v - med)))
+    if scale <= 0:
+        scale = float(v.std())
+    scale = max(scale, cfg['scale_floor'])
+    z = (v - med) / scale
+    thr = cfg['z_threshold']
+    altos = [
+        {'marca': names[i], 'valor': float(v[i]), 'z_robusto': round(float(z[i]), 2), 'umbral': med + thr * scale}
+        for i in np.argsort(-z) if z[i] >= thr
+    ]
+    bajos = [
+        {'marca': names[i], 'valor': float(v[i]), 'z_robusto': round(float(z[i]), 2), 'umbral': med - thr * scale}
+        for i in np.argsort(z) if z[i] <= -thr
+    ]
+    return altos, bajos
@@ -0,0 +1,212 @@
+"""
+Vector Index
+Índice vectorial NumPy en proceso para backends sin pgvector (SQLite local / CI)
+"""
+
+import hashlib
+import os
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+import yaml
+from sqlalchemy import func
+from src.database.models import Embedding
+from src.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+DEFAULT_INDEX_DIR = "data/vector_index"
+
+
+def _load_index_dir(config_path: str = "config/settings.yaml") -> str:
+    """Lee analytics.rag.vector_index_dir de settings (VECTOR_INDEX_DIR tiene prioridad)"""
+    try:
+        with open(config_path, "r", encoding="utf-8") as f:
+            cfg = yaml.safe_load(f) or {}
+        rag_cfg = ((cfg.get("analytics") or {}).get("rag") or {})
+        default = rag_cfg.get("vector_index_dir", DEFAULT_INDEX_DIR)
+    except Exception:
+        default = DEFAULT_INDEX_DIR
+    return os.getenv("VECTOR_INDEX_DIR", default)
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    """Normaliza filas a norma 1 (el coseno pasa a ser un producto escalar)"""
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32, copy=False)
+
+
+class CategoryVectorIndex:
+    """
+    Matriz normalizada (N x dim) de los embeddings de una categoría
+    Persistida en .npy y abierta con memmap; `ids` ordenados ascendentemente
+    """
+
+    def __init__(self, ids: np.ndarray, matrix: np.ndarray):
+        self.ids = ids
+        self.matrix = matrix
+
+    @property
+    def stamp(self) -> Tuple[int, int]:
+        return (int(self.ids.shape[0]), int(self.ids[-1]) if self.ids.shape[0] else 0)
+
+    def search(
+        self,
+        query_vector: Sequence[float],
+        top_k: int,
+        candidate_ids: Optional[Sequence[int]] = None
+    ) -> List[Tuple[int, float]]:
+        """
+        Top-k por similitud coseno
+
+        Args:
+            query_vector: Vector de la consulta (sin normalizar)
+            top_k: Número de resultados
+            candidate_ids: Restringe la búsqueda a estos IDs de embedding (filtros SQL)
+
+        Returns:
+            Lista de (embedding_id, distancia coseno) ordenada por distancia
+        """
+        if top_k <= 0 or self.ids.shape[0] == 0:
+            return []
+
+        q = _normalize(np.asarray(query_vector, dtype=np.float32).reshape(1, -1))[0]
+
+        if candidate_ids is None:
+            positions = None
+            scores = self.matrix @ q
+        else:
+            cand = np.asarray(sorted(candidate_ids), dtype=np.int64)
+            positions = np.searchsorted(self.ids, cand)
+            positions = positions[positions < self.ids.shape[0]]
+            positions = positions[np.isin(self.ids[positions], cand)]
+            if positions.shape[0] == 0:
+                return []
+            scores = self.matrix[positions] @ q
+
+        k = min(top_k, scores.shape[0])
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        rows = top if positions is None else positions[top]
+        return [(int(self.ids[r]), float(1.0 - s)) for r, s in zip(rows, scores[top])]
+
+
+class VectorIndexStore:
+    """
+    Caché de índices por categoría con refresco incremental
+
+    El índice se compara con (count, max_id) de la tabla embeddings:
+    - igual: se reutiliza
+    - solo hay filas nuevas (id > max_id): se añaden al final
+    - cualquier otro cambio (borrados): reconstrucción completa
+    """
+
+    def __init__(self, index_dir: Optional[str] = None, dim: int = 1536, batch_size: int = 2000):
+        self.index_dir = Path(index_dir or _load_index_dir())
+        self.dim = dim
+        self.batch_size = batch_size
+        self._cache: Dict[Tuple[str, int], CategoryVectorIndex] = {}
+        self._lock = threading.Lock()
+
+    def _paths(self, db_key: str, categoria_id: int) -> Tuple[Path, Path]:
+        base = self.index_dir / db_key
+        base.mkdir(parents=True, exist_ok=True)
+        return base / f"cat_{categoria_id}.npy", base / f"cat_{categoria_id}.ids.npy"
+
+    @staticmethod
+    def _db_key(session) -> str:
+        """Separa índices por base de datos (dev y CI pueden compartir directorio)"""
+        url = session.get_bind().url.render_as_string(hide_password=True)
+        return hashlib.sha1(url.encode("utf-8")).hexdigest()[:12]
+
+    def _fetch(self, session, categoria_id: int, min_id: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+        """Lee vectores de BD en lotes (id > min_id) y devuelve (ids, matriz normalizada)"""
+        ids: List[int] = []
+        chunks: List[np.ndarray] = []
+        batch: List[np.ndarray] = []
+        query = session.query(Embedding.id, Embedding.vector).filter(
+            Embedding.categoria_id == categoria_id,
+            Embedding.id > min_id,
+            Embedding.vector.isnot(None)
+        ).order_by(Embedding.id).yield_per(self.batch_size)
+        for emb_id, vector in query:
+            ids.append(emb_id)
+            batch.append(np.asarray(vector, dtype=np.float32))
+            if len(batch) >= self.batch_size:
+                chunks.append(_normalize(np.vstack(batch)))
+                batch = []
+        if batch:
+            chunks.append(_normalize(np.vstack(batch)))
+        matrix = np.vstack(chunks) if chunks else np.empty((0, self.dim), dtype=np.float32)
+        return np.asarray(ids, dtype=np.int64), matrix
+
+    def _save(self, db_key: str, categoria_id: int, ids: np.ndarray, matrix: np.ndarray) -> CategoryVectorIndex:
+        """Escribe de forma atómica y reabre la matriz como memmap"""
+        m_path, i_path = self._paths(db_key, categoria_id)
+        for path, arr in ((m_path, matrix), (i_path, ids)):
+            tmp = path.with_suffix(".tmp.npy")
+            np.save(tmp, arr)
+            os.replace(tmp, path)
+        return self._open(db_key, categoria_id)
+
+    def _open(self, db_key: str, categoria_id: int) -> Optional[CategoryVectorIndex]:
+        m_path, i_path = self._paths(db_key, categoria_id)
+        if not (m_path.exists() and i_path.exists()):
+            return None
+        try:
+            return CategoryVectorIndex(np.load(i_path), np.load(m_path, mmap_mode="r"))
+        except Exception:
+            return None
+
+    def get(self, session, categoria_id: int) -> CategoryVectorIndex:
+        """Devuelve el índice de la categoría, sincronizado con la tabla embeddings"""
+        db_key = self._db_key(session)
+        count, max_id = session.query(
+            func.count(Embedding.id), func.max(Embedding.id)
+        ).filter(
+            Embedding.categoria_id == categoria_id,
+            Embedding.vector.isnot(None)
+        ).one()
+        stamp = (int(count or 0), int(max_id or 0))
+
+        with self._lock:
+            key = (db_key, categoria_id)
+            index = self._cache.get(key) or self._open(db_key, categoria_id)
+            if index is not None and index.stamp == stamp:
+                self._cache[key] = index
+                return index
+
+            if index is not None and index.ids.shape[0] and stamp[0] > index.stamp[0]:
+                new_ids, new_matrix = self._fetch(session, categoria_id, min_id=index.stamp[1])
+                if index.stamp[0] + new_ids.shape[0] == stamp[0]:
+                    index = self._save(
+                        db_key, categoria_id,
+                        np.concatenate([index.ids, new_ids]),
+                        np.vstack([np.asarray(index.matrix), new_matrix])
+                    )
+                    self._cache[key] = index
+                    logger.info("vector_index_appended", categoria_id=categoria_id,
+                                added=int(new_ids.shape[0]), total=stamp[0])
+                    return index
+
+            ids, matrix = self._fetch(session, categoria_id)
+            index = self._save(db_key, categoria_id, ids, matrix)
+            self._cache[key] = index
+            logger.info("vector_index_rebuilt", categoria_id=categoria_id, total=int(ids.shape[0]))
+            return index
+
+
+_store: Optional[VectorIndexStore] = None
+_store_lock = threading.Lock()
+
+
+def get_vector_index_store() -> VectorIndexStore:
+    """Store compartido por proceso (los índices quedan en memoria entre agentes)"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = VectorIndexStore()
+    return _store
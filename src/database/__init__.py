@@ -9,9 +9,14 @@ from src.database.models import (
     QueryExecution,
     AnalysisResult,
     Report,
-    Embedding
+    AnalysisRun,
+    AnalysisEvent,
+    Embedding,
+    BrandMentionDaily,
+    BrandMentionRollupState,
+    ExecutionMention
 )
-from src.database.connection import get_session, init_db, get_engine
+from src.database.connection import get_session, init_db, get_engine, get_pool_stats
 
 __all__ = [
     'Base',
@@ -22,9 +27,15 @@ __all__ = [
     'QueryExecution',
     'AnalysisResult',
     'Report',
+    'AnalysisRun',
+    'AnalysisEvent',
     'Embedding',
+    'BrandMentionDaily',
+    'BrandMentionRollupState',
+    'ExecutionMention',
     'get_session',
     'init_db',
-    'get_engine'
+    'get_engine',
+    'get_pool_stats'
 ]
 
@@ -1,17 +1,21 @@
 """
 Database Connection Management
-Gestión de sesiones y conexión con PostgreSQL
+Gestión de sesiones y conexión con PostgreSQL (o SQLite embebido vía DATABASE_URL=sqlite:///...)
 """
 
 import os
+import threading
+import time
 from contextlib import contextmanager
-from typing import Generator
+from typing import Generator, Dict, Any, Optional
+import yaml
 from dotenv import load_dotenv
-from sqlalchemy import create_engine, event, text
+from sqlalchemy import create_engine, event, exc, text
 from sqlalchemy.orm import sessionmaker, Session
-from sqlalchemy.pool import QueuePool
+from sqlalchemy.pool import QueuePool, NullPool
 
 from src.database.models import Base
+from src.utils import tracing
 
 # Load environment variables
 load_dotenv()
@@ -19,17 +23,253 @@ load_dotenv()
 # Database URL from environment
 DATABASE_URL = os.getenv("DATABASE_URL", "postgresql://localhost:5432/twolaps")
 
-# Create engine with connection pooling
-engine = create_engine(
-    DATABASE_URL,
-    poolclass=QueuePool,
-    pool_size=5,
-    max_overflow=10,
-    pool_timeout=30,
-    pool_recycle=3600,
-    echo=False,  # Set to True for SQL query logging
-    connect_args={"connect_timeout": int(os.getenv("DB_CONNECT_TIMEOUT", "5"))},
-)
+
+def analysis_connections(max_parallel_agents: int, max_parallel_categories: int = 1, pdf_workers: int = 0) -> int:
+    """
+    Conexiones simultáneas de un generate-batch: por categoría, 2 por agente en curso
+    (sesión de escritura + lectura) y 1 del checkpoint en analysis_runs; 2 por worker de PDF
+    """
+    return max(1, max_parallel_categories) * (2 * max(1, max_parallel_agents) + 1) + 2 * max(0, pdf_workers)
+
+
+def _load_database_settings(config_path: str = "config/settings.yaml") -> Dict[str, Any]:
+    """
+    Lee el bloque `database` de config/settings.yaml y resuelve el tamaño del pool.
+
+    - pool_size: 'auto' (o ausente) => el mayor entre polling.max_concurrent_queries + 2
+      (un hilo por worker del executor + hilo principal) y las conexiones de un
+      generate-batch (ver `analysis_connections`)
+    - Variables de entorno DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT,
+      DB_POOL_RECYCLE y DB_PGBOUNCER tienen prioridad sobre el YAML
+    """
+    cfg: Dict[str, Any] = {}
+    try:
+        with open(config_path, "r", encoding="utf-8") as f:
+            cfg = yaml.safe_load(f) or {}
+    except Exception:
+        cfg = {}
+
+    db_cfg = dict(cfg.get("database") or {})
+    try:
+        workers = int((cfg.get("polling") or {}).get("max_concurrent_queries", 12))
+    except (TypeError, ValueError):
+        workers = 12
+
+    analytics = cfg.get("analytics") or {}
+    batch = analytics.get("batch") or {}
+    try:
+        batch_connections = analysis_connections(
+            int(os.getenv("ANALYSIS_MAX_PARALLEL_AGENTS", (analytics.get("orchestrator") or {}).get("max_parallel_agents", 4))),
+            int(os.getenv("BATCH_MAX_PARALLEL_CATEGORIES", batch.get("max_parallel_categories", 3))),
+            int(batch.get("pdf_workers", 1))
+        )
+    except (TypeError, ValueError):
+        batch_connections = 0
+
+    pool_size = os.getenv("DB_POOL_SIZE", db_cfg.get("pool_size", "auto"))
+    if str(pool_size).lower() == "auto":
+        pool_size = max(workers + 2, batch_connections)
+    max_overflow = os.getenv("DB_MAX_OVERFLOW", db_cfg.get("max_overflow", 10))
+    pgbouncer = os.getenv("DB_PGBOUNCER", db_cfg.get("pgbouncer", False))
+
+    return {
+        "pool_size": int(pool_size),
+        "max_overflow": int(max_overflow),
+        "pool_timeout": int(os.getenv("DB_POOL_TIMEOUT", db_cfg.get("pool_timeout", 30))),
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", db_cfg.get("pool_recycle", 3600))),
+        "pool_pre_ping": bool(db_cfg.get("pool_pre_ping", True)),
+        "echo": bool(db_cfg.get("echo", False)),
+        "pgbouncer": str(pgbouncer).lower() in ("1", "true", "yes", "on"),
+        "workers": workers,
+    }
+
+
+class PoolMetrics:
+    """
+    Métricas del pool de conexiones (thread-safe)
+    Tiempo de espera en checkout, conexiones en uso y pico de utilización
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.checkouts = 0
+            self.checkout_wait_total_ms = 0.0
+            self.checkout_wait_max_ms = 0.0
+            self.checkout_timeouts = 0
+            self.in_use = 0
+            self.peak_in_use = 0
+            self.connections_created = 0
+
+    def record_wait(self, wait_ms: float, timed_out: bool = False) -> None:
+        with self._lock:
+            if timed_out:
+                self.checkout_timeouts += 1
+                return
+            self.checkout_wait_total_ms += wait_ms
+            self.checkout_wait_max_ms = max(self.checkout_wait_max_ms, wait_ms)
+
+    def on_checkout(self) -> None:
+        with self._lock:
+            self.checkouts += 1
+            self.in_use += 1
+            self.peak_in_use = max(self.peak_in_use, self.in_use)
+
+    def on_checkin(self) -> None:
+        with self._lock:
+            self.in_use = max(0, self.in_use - 1)
+
+    def on_connect(self) -> None:
+        with self._lock:
+            self.connections_created += 1
+
+    def snapshot(self, capacity: int) -> Dict[str, Any]:
+        with self._lock:
+            avg_wait = (self.checkout_wait_total_ms / self.checkouts) if self.checkouts else 0.0
+            return {
+                "checkouts": self.checkouts,
+                "checkout_wait_avg_ms": round(avg_wait, 2),
+                "checkout_wait_max_ms": round(self.checkout_wait_max_ms, 2),
+                "checkout_timeouts": self.checkout_timeouts,
+                "in_use": self.in_use,
+                "peak_in_use": self.peak_in_use,
+                "capacity": capacity,
+                "utilization": round(self.in_use / capacity, 3) if capacity else 0.0,
+                "peak_utilization": round(self.peak_in_use / capacity, 3) if capacity else 0.0,
+                "connections_created": self.connections_created,
+            }
+
+
+pool_metrics = PoolMetrics()
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool que mide el tiempo de espera de cada checkout"""
+
+    metrics: PoolMetrics = pool_metrics
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except exc.TimeoutError:
+            self.metrics.record_wait(0.0, timed_out=True)
+            raise
+        self.metrics.record_wait((time.perf_counter() - start) * 1000.0)
+        return conn
+
+    def recreate(self):
+        # engine.dispose() recrea el pool: conservar el destino de las métricas
+        new_pool = super().recreate()
+        new_pool.metrics = self.metrics
+        return new_pool
+
+
+DB_SETTINGS = _load_database_settings()
+
+# Réplica de lectura opcional (streaming replication) para analítica y dashboard
+DATABASE_REPLICA_URL = os.getenv("DATABASE_REPLICA_URL")
+
+
+def is_sqlite_url(url: Optional[str]) -> bool:
+    """True si la URL apunta al backend embebido SQLite (desarrollo local / CI)"""
+    return bool(url) and url.startswith("sqlite")
+
+
+def _build_engine_kwargs(settings: Dict[str, Any], url: str = DATABASE_URL) -> Dict[str, Any]:
+    """Construye kwargs de create_engine según settings (modo directo, PgBouncer o SQLite)"""
+    if is_sqlite_url(url):
+        # SQLite embebido: sesiones compartidas entre hilos del executor, sin dimensionado de pool
+        return {
+            "echo": settings["echo"],
+            "connect_args": {"check_same_thread": False, "timeout": settings["pool_timeout"]},
+        }
+
+    connect_args: Dict[str, Any] = {"connect_timeout": int(os.getenv("DB_CONNECT_TIMEOUT", "5"))}
+    kwargs: Dict[str, Any] = {
+        "echo": settings["echo"],  # Set to True for SQL query logging
+        "pool_pre_ping": settings["pool_pre_ping"],
+        "connect_args": connect_args,
+    }
+
+    if settings["pgbouncer"]:
+        # PgBouncer (transaction pooling): el pooling lo hace PgBouncer, sin estado de sesión
+        # y sin prepared statements de servidor (psycopg3 los activa tras N ejecuciones)
+        kwargs["poolclass"] = NullPool
+        if url.startswith("postgresql+psycopg:"):
+            connect_args["prepare_threshold"] = None
+        return kwargs
+
+    kwargs.update({
+        "poolclass": InstrumentedQueuePool,
+        "pool_size": settings["pool_size"],
+        "max_overflow": settings["max_overflow"],
+        "pool_timeout": settings["pool_timeout"],
+        "pool_recycle": settings["pool_recycle"],
+    })
+    return kwargs
+
+
+def _instrument_engine(target_engine, metrics: PoolMetrics) -> None:
+    """Registra eventos de pool (connect/checkout/checkin) sin sentencias extra por conexión"""
+    if isinstance(target_engine.pool, InstrumentedQueuePool):
+        target_engine.pool.metrics = metrics
+
+    @event.listens_for(target_engine, "connect")
+    def connect(dbapi_connection, connection_record):
+        """Cuenta conexiones físicas nuevas (la extensión se verifica en ensure_extensions)"""
+        metrics.on_connect()
+        if target_engine.dialect.name == "sqlite":
+            # FKs con ON DELETE CASCADE como en PostgreSQL; WAL para lectores concurrentes
+            cursor = dbapi_connection.cursor()
+            cursor.execute("PRAGMA foreign_keys=ON")
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.close()
+
+    @event.listens_for(target_engine, "checkout")
+    def checkout(dbapi_connection, connection_record, connection_proxy):
+        metrics.on_checkout()
+
+    @event.listens_for(target_engine, "checkin")
+    def checkin(dbapi_connection, connection_record):
+        metrics.on_checkin()
+
+    @event.listens_for(target_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        """Span db.query por sentencia, solo dentro de una traza activa"""
+        span = tracing.start_span(
+            'db.query',
+            **{
+                'db.system': target_engine.dialect.name,
+                'db.operation': statement.lstrip().split(None, 1)[0].upper() if statement.strip() else None,
+                'db.statement': statement[:int(tracing.TRACING_SETTINGS['statement_chars'])],
+                'db.executemany': executemany or None,
+            }
+        )
+        conn.info.setdefault('trace_spans', []).append(span)
+
+    @event.listens_for(target_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        spans = conn.info.get('trace_spans')
+        span = spans.pop() if spans else None
+        if span is not None:
+            span.end()
+
+    @event.listens_for(target_engine, "handle_error")
+    def handle_error(exception_context):
+        conn = exception_context.connection
+        spans = conn.info.get('trace_spans') if conn is not None else None
+        span = spans.pop() if spans else None
+        if span is not None:
+            span.end(error=exception_context.original_exception)
+
+
+# Create engine with connection pooling (config/settings.yaml -> database)
+engine = create_engine(DATABASE_URL, **_build_engine_kwargs(DB_SETTINGS))
+_instrument_engine(engine, pool_metrics)
 
 # Session factory
 SessionLocal = sessionmaker(
@@ -38,25 +278,205 @@ SessionLocal = sessionmaker(
     bind=engine
 )
 
+replica_engine = None
+ReplicaSessionLocal = None
+replica_pool_metrics = PoolMetrics()
+if DATABASE_REPLICA_URL:
+    replica_engine = create_engine(
+        DATABASE_REPLICA_URL,
+        **_build_engine_kwargs(DB_SETTINGS, url=DATABASE_REPLICA_URL)
+    )
+    _instrument_engine(replica_engine, replica_pool_metrics)
+    ReplicaSessionLocal = sessionmaker(
+        autocommit=False,
+        autoflush=False,
+        bind=replica_engine
+    )
+
+
+# =============================
+# Read-your-writes: LSN de la última escritura de este proceso
+# =============================
+_replica_lock = threading.Lock()
+_last_write_lsn: Optional[str] = None
+_replica_caught_up_lsn: Optional[str] = None
+
+
+def _record_primary_write() -> None:
+    """Guarda el LSN del primario tras un commit con escrituras (solo si hay réplica)"""
+    global _last_write_lsn
+    if replica_engine is None:
+        return
+    try:
+        with engine.connect() as conn:
+            lsn = conn.execute(text("SELECT pg_current_wal_lsn()::text")).scalar()
+    except Exception:
+        return
+    with _replica_lock:
+        _last_write_lsn = lsn
+
+
+def replica_is_current() -> bool:
+    """
+    True si la réplica ha reproducido todas las escrituras confirmadas por este proceso.
+    Si no se puede verificar (réplica caída, no es standby), se asume que no.
+    """
+    global _replica_caught_up_lsn
+    if replica_engine is None:
+        return False
+    with _replica_lock:
+        target, caught_up = _last_write_lsn, _replica_caught_up_lsn
+    if target is None or target == caught_up:
+        return True
+    try:
+        with replica_engine.connect() as conn:
+            ok = conn.execute(
+                text("SELECT pg_last_wal_replay_lsn() >= CAST(:lsn AS pg_lsn)"),
+                {"lsn": target}
+            ).scalar()
+    except Exception:
+        return False
+    if ok:
+        with _replica_lock:
+            _replica_caught_up_lsn = target
+    return bool(ok)
+
+
+def route_read(session: Session, read_session: Optional[Session]) -> Session:
+    """
+    Devuelve la sesión para una lectura pesada: la de réplica si está al día
+    con las escrituras de este proceso; si no, la sesión primaria.
+    """
+    if read_session is None or read_session is session:
+        return session
+    if read_session.info.get("replica") and not replica_is_current():
+        return session
+    return read_session
+
+
+@event.listens_for(SessionLocal, "after_flush")
+def _mark_session_writes(session, flush_context):
+    session.info["has_writes"] = True
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _track_commit(session):
+    if session.info.pop("has_writes", False):
+        _record_primary_write()
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _reset_writes(session):
+    session.info.pop("has_writes", None)
+
+
+def _guard_read_only(session, flush_context, instances):
+    if session.info.get("read_only") and (session.new or session.dirty or session.deleted):
+        raise RuntimeError("Escritura en una sesión de solo lectura (usa get_session() sin read_only)")
+
+
+event.listen(SessionLocal, "before_flush", _guard_read_only)
+if ReplicaSessionLocal is not None:
+    event.listen(ReplicaSessionLocal, "before_flush", _guard_read_only)
+
+_extensions_lock = threading.Lock()
+_extensions_checked = False
+
+
+def ensure_extensions() -> None:
+    """
+    Habilita pgvector una sola vez por proceso (no en cada conexión nueva).
+    Si la extensión no está disponible o no hay permisos, se continúa sin ella.
+    """
+    global _extensions_checked
+    if _extensions_checked:
+        return
+    with _extensions_lock:
+        if _extensions_checked:
+            return
+        if engine.dialect.name != "postgresql":
+            # SQLite: vectores como blob, búsqueda con el índice NumPy
+            _extensions_checked = True
+            return
+        try:
+            conn = engine.connect()
+        except Exception:
+            # BD no accesible: se reintentará en la próxima sesión
+            return
+        try:
+            available = conn.execute(text(
+                "SELECT EXISTS (SELECT 1 FROM pg_available_extensions WHERE name = 'vector')"
+            )).scalar()
+            if available:
+                conn.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
+                conn.commit()
+        except Exception:
+            # Sin permisos o sin extensión: continuar sin ella (rollback al cerrar)
+            pass
+        finally:
+            conn.close()
+        _extensions_checked = True
+
 
 def get_engine():
     """Get the SQLAlchemy engine instance"""
     return engine
 
 
+def pool_capacity() -> int:
+    """Conexiones máximas del pool (pool_size + max_overflow); 0 sin límite (PgBouncer, SQLite)"""
+    pooled = not (DB_SETTINGS["pgbouncer"] or is_sqlite_url(DATABASE_URL))
+    return DB_SETTINGS["pool_size"] + DB_SETTINGS["max_overflow"] if pooled else 0
+
+
+def get_pool_stats() -> Dict[str, Any]:
+    """
+    Métricas del pool: espera en checkout, conexiones en uso y utilización
+    En modo PgBouncer (NullPool) solo se reportan checkouts
+    """
+    capacity = pool_capacity()
+    stats = pool_metrics.snapshot(capacity)
+    if is_sqlite_url(DATABASE_URL):
+        stats["mode"] = "sqlite"
+    else:
+        stats["mode"] = "pgbouncer" if DB_SETTINGS["pgbouncer"] else "queue_pool"
+    stats["pool_status"] = engine.pool.status()
+    if replica_engine is not None:
+        stats["replica"] = replica_pool_metrics.snapshot(capacity)
+        stats["replica"]["pool_status"] = replica_engine.pool.status()
+    return stats
+
+
 @contextmanager
-def get_session() -> Generator[Session, None, None]:
+def get_session(read_only: bool = False) -> Generator[Session, None, None]:
     """
     Context manager for database sessions
     
+    Args:
+        read_only: Si True, enruta a la réplica (DATABASE_REPLICA_URL) cuando existe
+            y está al día con las escrituras de este proceso; si no, al primario.
+            La sesión rechaza escrituras y no hace commit al salir.
+    
     Usage:
         with get_session() as session:
             result = session.query(Mercado).all()
+        
+        with get_session(read_only=True) as session:
+            rows = session.query(QueryExecution).filter(...).all()
     """
-    session = SessionLocal()
+    ensure_extensions()
+    if read_only and ReplicaSessionLocal is not None and replica_is_current():
+        session = ReplicaSessionLocal()
+        session.info["replica"] = True
+    else:
+        session = SessionLocal()
+    session.info["read_only"] = read_only
     try:
         yield session
-        session.commit()
+        if read_only:
+            session.rollback()
+        else:
+            session.commit()
     except Exception as e:
         session.rollback()
         raise e
@@ -69,6 +489,7 @@ def init_db():
     Initialize database - Create all tables
     Solo crea tablas si no existen
     """
+    ensure_extensions()
     Base.metadata.create_all(bind=engine)
     print("✓ Database initialized successfully")
 
@@ -92,31 +513,6 @@ def reset_db():
     print("✓ Database reset completed")
 
 
-# Event listener para habilitar pgvector en cada conexión con manejo de errores
-@event.listens_for(engine, "connect")
-def connect(dbapi_connection, connection_record):
-    """Enable pgvector extension if available and keep transaction clean"""
-    cursor = dbapi_connection.cursor()
-    try:
-        # Verificar si la extensión está disponible en el servidor
-        cursor.execute("SELECT EXISTS (SELECT 1 FROM pg_available_extensions WHERE name = 'vector')")
-        available = cursor.fetchone()[0]
-        if available:
-            cursor.execute("CREATE EXTENSION IF NOT EXISTS vector")
-            dbapi_connection.commit()
-        else:
-            # Asegura que no quede transacción abierta si no está disponible
-            dbapi_connection.rollback()
-    except Exception:
-        # Asegura limpiar la transacción si algo falla
-        try:
-            dbapi_connection.rollback()
-        except Exception:
-            pass
-    finally:
-        cursor.close()
-
-
 def test_connection():
     """
     Test database connection
@@ -145,6 +541,7 @@ def create_session() -> Session:
         finally:
             session.close()
     """
+    ensure_extensions()
     return SessionLocal()
 
 
@@ -0,0 +1,55 @@
+"""
+Add brand_mentions_daily rollup and its state table
+
+Revision ID: 20261018_add_brand_mentions_daily
+Revises: 20251021_add_tipo_mercado
+Create Date: 2026-10-18 00:00:01
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '20261018_add_brand_mentions_daily'
+down_revision = '20251021_add_tipo_mercado'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'brand_mentions_daily',
+        sa.Column('id', sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column('categoria_id', sa.Integer(), sa.ForeignKey('categorias.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('marca_id', sa.Integer(), sa.ForeignKey('marcas.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('proveedor_ia', sa.String(length=50), nullable=False),
+        sa.Column('query_id', sa.Integer(), sa.ForeignKey('queries.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('executions_with_mention', sa.Integer(), nullable=False, server_default='0'),
+    )
+    op.create_index(
+        'idx_mentions_daily_key',
+        'brand_mentions_daily',
+        ['categoria_id', 'marca_id', 'proveedor_ia', 'query_id', 'day'],
+        unique=True
+    )
+    op.create_index('idx_mentions_daily_categoria_day', 'brand_mentions_daily', ['categoria_id', 'day'])
+
+    # Sin fila de estado el rollup no se usa: los agentes escanean texto hasta
+    # la primera ingesta (cobertura desde ese momento) o `admin rebuild-mentions`
+    op.create_table(
+        'brand_mentions_rollup_state',
+        sa.Column('categoria_id', sa.Integer(), sa.ForeignKey('categorias.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('covered_from', sa.DateTime(), nullable=True),
+        sa.Column('aliases_fingerprint', sa.String(length=64), nullable=False),
+        sa.Column('rebuilt_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=False, server_default=sa.func.now()),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('brand_mentions_rollup_state')
+    op.drop_index('idx_mentions_daily_categoria_day', table_name='brand_mentions_daily')
+    op.drop_index('idx_mentions_daily_key', table_name='brand_mentions_daily')
+    op.drop_table('brand_mentions_daily')
@@ -0,0 +1,36 @@
+"""
+Add execution_mentions (per-execution brand mention index)
+
+Revision ID: 20261018_add_execution_mentions
+Revises: 20261018_add_brand_mentions_daily
+Create Date: 2026-10-18 00:00:02
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '20261018_add_execution_mentions'
+down_revision = '20261018_add_brand_mentions_daily'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'execution_mentions',
+        sa.Column('execution_id', sa.Integer(), sa.ForeignKey('query_executions.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('marca_id', sa.Integer(), sa.ForeignKey('marcas.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('first_offset', sa.Integer(), nullable=False),
+        sa.Column('count', sa.Integer(), nullable=False, server_default='1'),
+    )
+    op.create_index('idx_execution_mentions_marca', 'execution_mentions', ['marca_id', 'execution_id'])
+    # El rollup existente no incluye este índice: forzar reconstrucción
+    # (`admin rebuild-mentions`) antes de que los agentes lo usen
+    op.execute("DELETE FROM brand_mentions_rollup_state")
+
+
+def downgrade() -> None:
+    op.drop_index('idx_execution_mentions_marca', table_name='execution_mentions')
+    op.drop_table('execution_mentions')
@@ -0,0 +1,28 @@
+"""
+Add input fingerprint to analysis_results and reports
+
+Revision ID: 20261018_add_analysis_fingerprint
+Revises: 20261018_add_execution_mentions
+Create Date: 2026-10-18 00:00:03
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '20261018_add_analysis_fingerprint'
+down_revision = '20261018_add_execution_mentions'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # NULL = sin huella: la próxima ejecución del agente recalcula
+    op.add_column('analysis_results', sa.Column('fingerprint', sa.String(length=64), nullable=True))
+    op.add_column('reports', sa.Column('fingerprint', sa.String(length=64), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('reports', 'fingerprint')
+    op.drop_column('analysis_results', 'fingerprint')
@@ -0,0 +1,44 @@
+"""
+Add analysis_runs (checkpoint per orchestrator run)
+
+Revision ID: 20261018_add_analysis_runs
+Revises: 20261018_add_analysis_fingerprint
+Create Date: 2026-10-18 00:00:04
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '20261018_add_analysis_runs'
+down_revision = '20261018_add_analysis_fingerprint'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'analysis_runs',
+        sa.Column('id', sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column('categoria_id', sa.Integer(), sa.ForeignKey('categorias.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('periodo', sa.String(length=32), nullable=False),
+        sa.Column('estado', sa.String(length=20), nullable=False, server_default='running'),
+        sa.Column('agentes', sa.JSON(), nullable=False),
+        sa.Column('report_id', sa.Integer(), sa.ForeignKey('reports.id', ondelete='SET NULL'), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('reanudaciones', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('started_at', sa.DateTime(), nullable=False),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.CheckConstraint("estado IN ('running', 'completed', 'failed')", name='check_estado_analysis_run_valido'),
+    )
+    op.create_index('ix_analysis_runs_categoria_id', 'analysis_runs', ['categoria_id'])
+    op.create_index('ix_analysis_runs_periodo', 'analysis_runs', ['periodo'])
+    op.create_index('idx_analysis_run_categoria_periodo', 'analysis_runs', ['categoria_id', 'periodo'])
+
+
+def downgrade() -> None:
+    op.drop_index('idx_analysis_run_categoria_periodo', table_name='analysis_runs')
+    op.drop_index('ix_analysis_runs_periodo', table_name='analysis_runs')
+    op.drop_index('ix_analysis_runs_categoria_id', table_name='analysis_runs')
+    op.drop_table('analysis_runs')
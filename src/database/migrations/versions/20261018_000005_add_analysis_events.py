@@ -0,0 +1,36 @@
+"""
+Add analysis_events (outbox de ingesta para el análisis incremental)
+
+Revision ID: 20261018_add_analysis_events
+Revises: 20261018_add_analysis_runs
+Create Date: 2026-10-18 00:00:05
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '20261018_add_analysis_events'
+down_revision = '20261018_add_analysis_runs'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'analysis_events',
+        sa.Column('id', sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column('categoria_id', sa.Integer(), sa.ForeignKey('categorias.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('periodo', sa.String(length=32), nullable=False),
+        sa.Column('tipo', sa.String(length=30), nullable=False, server_default='execution'),
+        sa.Column('referencia_id', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('processed_at', sa.DateTime(), nullable=True),
+    )
+    op.create_index('idx_analysis_event_pending', 'analysis_events', ['processed_at', 'categoria_id', 'periodo'])
+
+
+def downgrade() -> None:
+    op.drop_index('idx_analysis_event_pending', table_name='analysis_events')
+    op.drop_table('analysis_events')
@@ -0,0 +1,54 @@
+"""
+Add estado to analysis_results (agent state outside resultado)
+
+Revision ID: 20261018_add_analysis_result_state
+Revises: 20261018_add_analysis_events
+Create Date: 2026-10-18 00:00:06
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '20261018_add_analysis_result_state'
+down_revision = '20261018_add_analysis_events'
+branch_labels = None
+depends_on = None
+
+# Clave con la que quantitative guardaba su estado incremental dentro de `resultado`
+LEGACY_STATE_KEY = '_estado_incremental'
+
+analysis_results = sa.table(
+    'analysis_results',
+    sa.column('id', sa.Integer),
+    sa.column('agente', sa.String),
+    sa.column('resultado', sa.JSON),
+    sa.column('estado', sa.JSON),
+)
+
+
+def upgrade() -> None:
+    op.add_column('analysis_results', sa.Column('estado', sa.JSON(), nullable=True))
+
+    # Mover el estado incremental de quantitative fuera del resultado (no debe llegar a prompts)
+    bind = op.get_bind()
+    rows = bind.execute(
+        sa.select(analysis_results.c.id, analysis_results.c.resultado)
+        .where(analysis_results.c.agente == 'quantitative')
+    ).fetchall()
+    for row in rows:
+        resultado = dict(row.resultado or {})
+        if LEGACY_STATE_KEY not in resultado:
+            continue
+        estado = resultado.pop(LEGACY_STATE_KEY)
+        bind.execute(
+            analysis_results.update()
+            .where(analysis_results.c.id == row.id)
+            .values(resultado=resultado, estado=estado)
+        )
+
+
+def downgrade() -> None:
+    # El estado se descarta: la siguiente ejecución de quantitative recalcula completo
+    op.drop_column('analysis_results', 'estado')
@@ -3,14 +3,14 @@ Database Models - SQLAlchemy ORM models for TwoLaps
 Todas las tablas del sistema con relaciones
 """
 
-from datetime import datetime
+from datetime import date, datetime
 from typing import Optional, Dict, List, Any
 from sqlalchemy import (
     String, Integer, Float, Boolean, Text, DateTime, 
-    ForeignKey, Index, CheckConstraint, JSON
+    ForeignKey, Index, CheckConstraint, JSON, Date
 )
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
-from pgvector.sqlalchemy import Vector
+from src.database.types import EmbeddingVector
 
 
 class Base(DeclarativeBase):
@@ -350,6 +350,12 @@ class AnalysisResult(Base):
         nullable=False
     )
     version_agente: Mapped[str] = mapped_column(String(20), nullable=False)
+    # Huella de las entradas (ejecuciones, resultados previos, prompts, versión):
+    # si coincide en la siguiente ejecución, el orquestador reutiliza el resultado
+    fingerprint: Mapped[Optional[str]] = mapped_column(String(64))
+    # Estado interno del agente para la siguiente ejecución (p. ej. conteos incrementales
+    # de quantitative): fuera de `resultado` para que no llegue a otros agentes ni a prompts
+    estado: Mapped[Optional[Dict[str, Any]]] = mapped_column(JSON)
     
     # Relationships
     categoria: Mapped["Categoria"] = relationship("Categoria", back_populates="analysis_results")
@@ -395,6 +401,7 @@ class Report(Base):
         nullable=False
     )
     metricas_calidad: Mapped[Optional[Dict[str, Any]]] = mapped_column(JSON)
+    fingerprint: Mapped[Optional[str]] = mapped_column(String(64))  # huella de entradas del agente ejecutivo
     
     # Relationships
     categoria: Mapped["Categoria"] = relationship("Categoria", back_populates="reports")
@@ -411,10 +418,53 @@ class Report(Base):
         return f"<Report(id={self.id}, periodo='{self.periodo}', estado='{self.estado}')>"
 
 
+class AnalysisRun(Base):
+    """
+    Ejecución del orquestador para una categoría y periodo (checkpoint reanudable)
+    agentes: {agente: {status, execution_time, cache, result_id, error}} actualizado
+    a medida que termina cada agente
+    """
+    __tablename__ = "analysis_runs"
+    
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    categoria_id: Mapped[int] = mapped_column(
+        Integer, 
+        ForeignKey("categorias.id", ondelete="CASCADE"), 
+        nullable=False,
+        index=True
+    )
+    periodo: Mapped[str] = mapped_column(String(32), nullable=False, index=True)
+    estado: Mapped[str] = mapped_column(
+        String(20), 
+        nullable=False, 
+        default="running"
+    )  # running, completed, failed
+    agentes: Mapped[Dict[str, Any]] = mapped_column(JSON, nullable=False, default=dict)
+    report_id: Mapped[Optional[int]] = mapped_column(
+        Integer, 
+        ForeignKey("reports.id", ondelete="SET NULL")
+    )
+    error: Mapped[Optional[str]] = mapped_column(Text)
+    reanudaciones: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    started_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+    finished_at: Mapped[Optional[datetime]] = mapped_column(DateTime)
+    
+    __table_args__ = (
+        Index('idx_analysis_run_categoria_periodo', 'categoria_id', 'periodo'),
+        CheckConstraint(
+            "estado IN ('running', 'completed', 'failed')",
+            name="check_estado_analysis_run_valido"
+        ),
+    )
+    
+    def __repr__(self):
+        return f"<AnalysisRun(id={self.id}, periodo='{self.periodo}', estado='{self.estado}')>"
+
+
 class Embedding(Base):
     """
     Embeddings para RAG (búsqueda de contexto histórico)
-    Usa pgvector para búsqueda de similitud
+    Usa pgvector para búsqueda de similitud (en SQLite: blob + índice NumPy)
     """
     __tablename__ = "embeddings"
     
@@ -435,7 +485,7 @@ class Embedding(Base):
         nullable=False
     )  # query_execution, analysis_result, report
     referencia_id: Mapped[int] = mapped_column(Integer, nullable=False)
-    vector: Mapped[Any] = mapped_column(Vector(1536))  # OpenAI embedding dimension
+    vector: Mapped[Any] = mapped_column(EmbeddingVector(1536))  # OpenAI embedding dimension
     metadata_json: Mapped[Optional[Dict[str, Any]]] = mapped_column("metadata", JSON)
     created_at: Mapped[datetime] = mapped_column(
         DateTime, 
@@ -455,3 +505,126 @@ class Embedding(Base):
     def __repr__(self):
         return f"<Embedding(id={self.id}, tipo='{self.tipo}', periodo='{self.periodo}')>"
 
+
+
+class BrandMentionDaily(Base):
+    """
+    Rollup diario de menciones (mantenido en la ingesta)
+    Una fila por categoría/marca/proveedor/query/día con el nº de ejecuciones que mencionan la marca
+    """
+    __tablename__ = "brand_mentions_daily"
+    
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    categoria_id: Mapped[int] = mapped_column(
+        Integer, 
+        ForeignKey("categorias.id", ondelete="CASCADE"), 
+        nullable=False
+    )
+    marca_id: Mapped[int] = mapped_column(
+        Integer, 
+        ForeignKey("marcas.id", ondelete="CASCADE"), 
+        nullable=False
+    )
+    proveedor_ia: Mapped[str] = mapped_column(String(50), nullable=False)
+    query_id: Mapped[int] = mapped_column(
+        Integer, 
+        ForeignKey("queries.id", ondelete="CASCADE"), 
+        nullable=False
+    )
+    day: Mapped[date] = mapped_column(Date, nullable=False)
+    executions_with_mention: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    
+    __table_args__ = (
+        Index(
+            'idx_mentions_daily_key',
+            'categoria_id', 'marca_id', 'proveedor_ia', 'query_id', 'day',
+            unique=True
+        ),
+        Index('idx_mentions_daily_categoria_day', 'categoria_id', 'day'),
+    )
+    
+    def __repr__(self):
+        return f"<BrandMentionDaily(categoria_id={self.categoria_id}, marca_id={self.marca_id}, day='{self.day}')>"
+
+
+class AnalysisEvent(Base):
+    """
+    Outbox de eventos de ingesta para el análisis incremental
+    Se inserta en la misma transacción que la QueryExecution que lo origina; el worker
+    incremental agrupa los pendientes por categoría/periodo y los marca procesados
+    """
+    __tablename__ = "analysis_events"
+    
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    categoria_id: Mapped[int] = mapped_column(
+        Integer, 
+        ForeignKey("categorias.id", ondelete="CASCADE"), 
+        nullable=False
+    )
+    periodo: Mapped[str] = mapped_column(String(32), nullable=False)
+    tipo: Mapped[str] = mapped_column(String(30), nullable=False, default="execution")
+    referencia_id: Mapped[Optional[int]] = mapped_column(Integer)  # query_executions.id
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+    processed_at: Mapped[Optional[datetime]] = mapped_column(DateTime)
+    
+    __table_args__ = (
+        Index('idx_analysis_event_pending', 'processed_at', 'categoria_id', 'periodo'),
+    )
+    
+    def __repr__(self):
+        return f"<AnalysisEvent(id={self.id}, categoria_id={self.categoria_id}, periodo='{self.periodo}')>"
+
+
+class BrandMentionRollupState(Base):
+    """
+    Estado del rollup de menciones (brand_mentions_daily + execution_mentions) por categoría
+    covered_from: desde cuándo el rollup es completo (NULL = todo el histórico)
+    aliases_fingerprint: huella de los aliases con los que se construyó (si cambian, hay que reconstruir)
+    """
+    __tablename__ = "brand_mentions_rollup_state"
+    
+    categoria_id: Mapped[int] = mapped_column(
+        Integer, 
+        ForeignKey("categorias.id", ondelete="CASCADE"), 
+        primary_key=True
+    )
+    covered_from: Mapped[Optional[datetime]] = mapped_column(DateTime)
+    aliases_fingerprint: Mapped[str] = mapped_column(String(64), nullable=False)
+    rebuilt_at: Mapped[Optional[datetime]] = mapped_column(DateTime)
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime, 
+        default=datetime.utcnow, 
+        onupdate=datetime.utcnow, 
+        nullable=False
+    )
+    
+    def __repr__(self):
+        return f"<BrandMentionRollupState(categoria_id={self.categoria_id}, covered_from='{self.covered_from}')>"
+
+
+class ExecutionMention(Base):
+    """
+    Índice de menciones por ejecución (extraído en la ingesta)
+    Una fila por ejecución y marca mencionada: primera posición y nº de apariciones
+    """
+    __tablename__ = "execution_mentions"
+    
+    execution_id: Mapped[int] = mapped_column(
+        Integer, 
+        ForeignKey("query_executions.id", ondelete="CASCADE"), 
+        primary_key=True
+    )
+    marca_id: Mapped[int] = mapped_column(
+        Integer, 
+        ForeignKey("marcas.id", ondelete="CASCADE"), 
+        primary_key=True
+    )
+    first_offset: Mapped[int] = mapped_column(Integer, nullable=False)
+    count: Mapped[int] = mapped_column(Integer, nullable=False, default=1)
+    
+    __table_args__ = (
+        Index('idx_execution_mentions_marca', 'marca_id', 'execution_id'),
+    )
+    
+    def __repr__(self):
+        return f"<ExecutionMention(execution_id={self.execution_id}, marca_id={self.marca_id}, count={self.count})>"
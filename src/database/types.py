@@ -0,0 +1,50 @@
+"""
+Database Types
+Tipos de columna portables entre PostgreSQL (pgvector) y SQLite
+"""
+
+from typing import Any, Optional
+import numpy as np
+from sqlalchemy.types import TypeDecorator, LargeBinary
+
+try:
+    from pgvector.sqlalchemy import Vector as PgVector
+except ImportError:  # pgvector es opcional fuera de PostgreSQL
+    PgVector = None
+
+
+class EmbeddingVector(TypeDecorator):
+    """
+    Vector de embedding portable
+
+    - PostgreSQL: columna pgvector `vector(dim)` (búsqueda con `<=>` en SQL)
+    - Otros dialectos (SQLite): blob float32 little-endian; la búsqueda la
+      sirve el índice NumPy en memoria (src/analytics/vector_index.py)
+    """
+
+    impl = LargeBinary
+    cache_ok = True
+
+    def __init__(self, dim: int):
+        super().__init__()
+        self.dim = dim
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == "postgresql":
+            if PgVector is None:
+                raise RuntimeError("pgvector no está instalado: pip install pgvector")
+            return dialect.type_descriptor(PgVector(self.dim))
+        return dialect.type_descriptor(LargeBinary())
+
+    def process_bind_param(self, value: Any, dialect) -> Any:
+        if value is None or dialect.name == "postgresql":
+            return value
+        arr = np.asarray(value, dtype="<f4").ravel()
+        if arr.shape[0] != self.dim:
+            raise ValueError(f"Vector de dimensión {arr.shape[0]}, se esperaba {self.dim}")
+        return arr.tobytes()
+
+    def process_result_value(self, value: Any, dialect) -> Optional[Any]:
+        if value is None or dialect.name == "postgresql":
+            return value
+        return np.frombuffer(value, dtype="<f4")
@@ -4,10 +4,13 @@ Cliente para Anthropic (Claude)
 """
 
 import os
+import time
 from typing import Dict, Optional, List
 from anthropic import Anthropic, NotFoundError
 from anthropic._exceptions import RateLimitError
 from src.query_executor.api_clients.base import BaseAIClient
+from src.query_executor.api_clients.rate_limiter import llm_slot
+from src.query_executor.api_clients.usage import record_usage, budget_max_tokens
 
 
 class AnthropicClient(BaseAIClient):
@@ -69,7 +72,7 @@ class AnthropicClient(BaseAIClient):
         Returns:
             Dict con respuesta y métricas
         """
-        max_tokens = max_tokens or 4096
+        max_tokens = budget_max_tokens(max_tokens or 4096, prompt)
         
         # Intento con fallback de modelos si el modelo configurado no existe (404)
         last_error: Optional[Exception] = None
@@ -94,27 +97,36 @@ class AnthropicClient(BaseAIClient):
                             pass
 
                     try:
-                        response = self.client.messages.create(**kwargs)
+                        with llm_slot(self.provider_name):
+                            start = time.monotonic()
+                            response = self.client.messages.create(**kwargs)
+                            seconds = time.monotonic() - start
                     except RateLimitError:
                         # Fallback inmediato a OpenAI si Anthropic limita por tasa
                         from src.query_executor.api_clients.openai_client import OpenAIClient
                         oc = OpenAIClient()
                         return oc.generate(prompt=prompt, temperature=temperature, max_tokens=min(max_tokens, 1500))
+                    tokens_input = getattr(getattr(response, 'usage', None), 'input_tokens', 0)
+                    tokens_output = getattr(getattr(response, 'usage', None), 'output_tokens', 0)
+                    record_usage(self.provider_name, candidate_model, tokens_input, tokens_output, seconds)
                     return {
                         'response_text': response.content[0].text if getattr(response, 'content', None) else '',
-                        'tokens_input': getattr(getattr(response, 'usage', None), 'input_tokens', 0),
-                        'tokens_output': getattr(getattr(response, 'usage', None), 'output_tokens', 0),
+                        'tokens_input': tokens_input,
+                        'tokens_output': tokens_output,
                         'model': candidate_model
                     }
                 else:
                     # Fallback a completions API
                     import anthropic as _anth
-                    resp = self.client.completions.create(
-                        model=candidate_model,
-                        max_tokens_to_sample=max_tokens,
-                        temperature=temperature,
-                        prompt=f"{_anth.HUMAN_PROMPT} {prompt}{_anth.AI_PROMPT}",
-                    )
+                    with llm_slot(self.provider_name):
+                        start = time.monotonic()
+                        resp = self.client.completions.create(
+                            model=candidate_model,
+                            max_tokens_to_sample=max_tokens,
+                            temperature=temperature,
+                            prompt=f"{_anth.HUMAN_PROMPT} {prompt}{_anth.AI_PROMPT}",
+                        )
+                    record_usage(self.provider_name, candidate_model, 0, 0, time.monotonic() - start)
                     text = getattr(resp, 'completion', '')
                     return {
                         'response_text': text,
@@ -4,9 +4,12 @@ Cliente para Google Generative AI (Gemini)
 """
 
 import os
+import time
 from typing import Dict, Optional
 import google.generativeai as genai
 from src.query_executor.api_clients.base import BaseAIClient
+from src.query_executor.api_clients.rate_limiter import llm_slot
+from src.query_executor.api_clients.usage import record_usage, budget_max_tokens
 
 
 class GoogleClient(BaseAIClient):
@@ -71,6 +74,7 @@ class GoogleClient(BaseAIClient):
         Returns:
             Dict con respuesta y métricas
         """
+        max_tokens = budget_max_tokens(max_tokens, prompt)
         generation_config = {
             "temperature": temperature,
         }
@@ -78,15 +82,19 @@ class GoogleClient(BaseAIClient):
         if max_tokens:
             generation_config["max_output_tokens"] = max_tokens
         
-        response = self.model_instance.generate_content(
-            prompt,
-            generation_config=generation_config
-        )
+        with llm_slot(self.provider_name):
+            start = time.monotonic()
+            response = self.model_instance.generate_content(
+                prompt,
+                generation_config=generation_config
+            )
+            seconds = time.monotonic() - start
         
         # Google no siempre provee token counts detallados
         # Estimamos basándonos en la longitud del texto
         tokens_input = len(prompt.split()) * 1.3  # Estimación aproximada
         tokens_output = len(response.text.split()) * 1.3 if response.text else 0
+        record_usage(self.provider_name, self.model, int(tokens_input), int(tokens_output), seconds)
         
         return {
             'response_text': response.text if response.text else '',
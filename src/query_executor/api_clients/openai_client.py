@@ -4,9 +4,12 @@ Cliente para OpenAI (GPT-4, GPT-4o, etc.)
 """
 
 import os
+import time
 from typing import Dict, Optional
 from openai import OpenAI
 from src.query_executor.api_clients.base import BaseAIClient
+from src.query_executor.api_clients.rate_limiter import llm_slot
+from src.query_executor.api_clients.usage import record_usage, budget_max_tokens
 
 
 class OpenAIClient(BaseAIClient):
@@ -46,6 +49,8 @@ class OpenAIClient(BaseAIClient):
         Returns:
             Dict con respuesta y métricas
         """
+        # Presupuesto del agente en curso (recorta max_tokens o lanza BudgetExceeded)
+        max_tokens = budget_max_tokens(max_tokens, prompt)
         kwargs = {
             "model": self.model,
             "messages": [
@@ -61,7 +66,14 @@ class OpenAIClient(BaseAIClient):
         if json_mode and self.model in ["gpt-4o", "gpt-4o-mini", "gpt-4-turbo", "gpt-3.5-turbo"]:
             kwargs["response_format"] = {"type": "json_object"}
         
-        response = self.client.chat.completions.create(**kwargs)
+        with llm_slot(self.provider_name):
+            start = time.monotonic()
+            response = self.client.chat.completions.create(**kwargs)
+            seconds = time.monotonic() - start
+        record_usage(
+            self.provider_name, self.model,
+            response.usage.prompt_tokens, response.usage.completion_tokens, seconds
+        )
         
         return {
             'response_text': response.choices[0].message.content,
@@ -83,10 +95,11 @@ class OpenAIClient(BaseAIClient):
         """
         model = model or os.getenv("OPENAI_EMBEDDING_MODEL", "text-embedding-3-small")
         
-        response = self.client.embeddings.create(
-            model=model,
-            input=text
-        )
+        with llm_slot(self.provider_name):
+            response = self.client.embeddings.create(
+                model=model,
+                input=text
+            )
         
         return response.data[0].embedding
 
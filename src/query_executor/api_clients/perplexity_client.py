@@ -9,6 +9,8 @@ from typing import Dict, Optional
 import requests
 
 from src.query_executor.api_clients.base import BaseAIClient
+from src.query_executor.api_clients.rate_limiter import llm_slot
+from src.query_executor.api_clients.usage import record_usage, budget_max_tokens
 
 
 class PerplexityClient(BaseAIClient):
@@ -52,6 +54,7 @@ class PerplexityClient(BaseAIClient):
         Returns:
             Dict con respuesta y métricas
         """
+        max_tokens = budget_max_tokens(max_tokens, prompt)
         url = f"{self.base_url}/chat/completions"
         headers = {
             "Authorization": f"Bearer {self.api_key}",
@@ -69,9 +72,10 @@ class PerplexityClient(BaseAIClient):
         if max_tokens:
             payload["max_tokens"] = max_tokens
 
-        start = time.time()
-        resp = requests.post(url, json=payload, headers=headers, timeout=self.timeout_seconds)
-        elapsed_ms = int((time.time() - start) * 1000)
+        with llm_slot(self.provider_name):
+            start = time.time()
+            resp = requests.post(url, json=payload, headers=headers, timeout=self.timeout_seconds)
+            elapsed_ms = int((time.time() - start) * 1000)
 
         if resp.status_code >= 400:
             raise RuntimeError(f"Perplexity API error {resp.status_code}: {resp.text}")
@@ -89,6 +93,7 @@ class PerplexityClient(BaseAIClient):
         usage = data.get("usage", {}) or {}
         tokens_input = int(usage.get("prompt_tokens", 0) or 0)
         tokens_output = int(usage.get("completion_tokens", 0) or 0)
+        record_usage(self.provider_name, self.model, tokens_input, tokens_output, elapsed_ms / 1000.0)
 
         return {
             "response_text": text,
@@ -0,0 +1,173 @@
+"""
+Rate Limiter
+Límites de llamadas LLM compartidos por todo el proceso
+
+- Tope global de llamadas simultáneas (todas las categorías y agentes de un batch)
+- Por proveedor: llamadas simultáneas y peticiones por minuto (token bucket)
+- Los clientes envuelven solo la llamada de red con `llm_slot(proveedor)`
+
+Parámetros en settings (llm_providers.rate_limits). LLM_MAX_CONCURRENT tiene
+prioridad sobre el tope global.
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+import yaml
+from src.utils import tracing
+
+DEFAULT_MAX_CONCURRENT_TOTAL = 16
+DEFAULT_PROVIDER_LIMITS = {
+    'max_concurrent': 8,        # llamadas simultáneas al proveedor
+    'requests_per_minute': 0,   # 0 = sin límite de tasa
+}
+
+
+def _load_rate_limits(config_path: str = "config/settings.yaml") -> Dict[str, object]:
+    """Lee llm_providers.rate_limits de settings"""
+    limits = {'max_concurrent_total': DEFAULT_MAX_CONCURRENT_TOTAL, 'providers': {}}
+    try:
+        with open(config_path, "r", encoding="utf-8") as f:
+            cfg = yaml.safe_load(f) or {}
+        block = ((cfg.get("llm_providers") or {}).get("rate_limits") or {})
+        limits['max_concurrent_total'] = int(block.get('max_concurrent_total', DEFAULT_MAX_CONCURRENT_TOTAL))
+        for provider, values in block.items():
+            if isinstance(values, dict):
+                limits['providers'][provider] = {
+                    k: int(values.get(k, default)) for k, default in DEFAULT_PROVIDER_LIMITS.items()
+                }
+    except Exception:
+        pass
+    try:
+        limits['max_concurrent_total'] = int(os.getenv("LLM_MAX_CONCURRENT", limits['max_concurrent_total']))
+    except ValueError:
+        pass
+    limits['max_concurrent_total'] = max(1, limits['max_concurrent_total'])
+    return limits
+
+
+class TokenBucket:
+    """Peticiones por minuto con ráfaga de hasta ~10 s de tasa"""
+
+    def __init__(self, requests_per_minute: int):
+        self.rate = requests_per_minute / 60.0
+        self.capacity = max(1.0, self.rate * 10)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Bloquea hasta disponer de un token; devuelve los segundos esperados"""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1.0:
+                    self.tokens -= 1.0
+                    return waited
+                delay = (1.0 - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+class _ProviderLimiter:
+    def __init__(self, max_concurrent: int, requests_per_minute: int):
+        self.max_concurrent = max(1, max_concurrent)
+        self.semaphore = threading.BoundedSemaphore(self.max_concurrent)
+        self.bucket = TokenBucket(requests_per_minute) if requests_per_minute > 0 else None
+        self.in_flight = 0
+        self.calls = 0
+        self.waited_seconds = 0.0
+
+
+class RateLimiter:
+    """Semáforo global + límites por proveedor"""
+
+    def __init__(self, limits: Optional[Dict[str, object]] = None):
+        limits = limits or _load_rate_limits()
+        self.max_concurrent_total = int(limits['max_concurrent_total'])
+        self._global = threading.BoundedSemaphore(self.max_concurrent_total)
+        self._config = dict(limits.get('providers') or {})
+        self._providers: Dict[str, _ProviderLimiter] = {}
+        self._lock = threading.Lock()
+        self.in_flight = 0
+
+    def _provider(self, provider: str) -> _ProviderLimiter:
+        with self._lock:
+            limiter = self._providers.get(provider)
+            if limiter is None:
+                cfg = {**DEFAULT_PROVIDER_LIMITS, **self._config.get(provider, {})}
+                limiter = _ProviderLimiter(cfg['max_concurrent'], cfg['requests_per_minute'])
+                self._providers[provider] = limiter
+            return limiter
+
+    @contextmanager
+    def slot(self, provider: str):
+        """
+        Reserva una llamada: primero el hueco del proveedor (no ocupa el global mientras
+        espera a un proveedor saturado), luego el global y por último la tasa
+        """
+        limiter = self._provider(provider)
+        start = time.monotonic()
+        limiter.semaphore.acquire()
+        try:
+            self._global.acquire()
+            try:
+                if limiter.bucket is not None:
+                    limiter.bucket.acquire()
+                waited = time.monotonic() - start
+                with self._lock:
+                    limiter.in_flight += 1
+                    limiter.calls += 1
+                    limiter.waited_seconds += waited
+                    self.in_flight += 1
+                tracing.record_span('llm.wait', waited, **{'llm.provider': provider})
+                try:
+                    yield
+                finally:
+                    with self._lock:
+                        limiter.in_flight -= 1
+                        self.in_flight -= 1
+            finally:
+                self._global.release()
+        finally:
+            limiter.semaphore.release()
+
+    def snapshot(self) -> Dict[str, object]:
+        """Llamadas en vuelo (global y por proveedor), totales y espera acumulada"""
+        with self._lock:
+            return {
+                'in_flight': self.in_flight,
+                'max_concurrent_total': self.max_concurrent_total,
+                'providers': {
+                    name: {
+                        'in_flight': p.in_flight,
+                        'max_concurrent': p.max_concurrent,
+                        'calls': p.calls,
+                        'waited_seconds': round(p.waited_seconds, 1),
+                    }
+                    for name, p in self._providers.items()
+                },
+            }
+
+
+_limiter: Optional[RateLimiter] = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> RateLimiter:
+    """Limitador del proceso (se crea al primer uso)"""
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = RateLimiter()
+        return _limiter
+
+
+def llm_slot(provider: str):
+    """Context manager para una llamada de red al proveedor"""
+    return get_rate_limiter().slot(provider)
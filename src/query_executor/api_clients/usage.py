@@ -0,0 +1,185 @@
+"""
+LLM Usage
+Consumo de llamadas LLM (llamadas, tokens, coste, segundos) acumulado por ámbito
+
+- El orquestador abre un ámbito por agente (`usage_scope`) en el hilo que lo ejecuta
+- Los clientes registran cada llamada de red con `record_usage`; sin ámbito activo no hace nada
+- El resumen se guarda con el checkpoint del agente (analysis_runs.agentes[agente]['llm'])
+  y es el histórico que usa `main.py estimate`
+- Un ámbito puede llevar presupuesto (tokens, hora límite, cancelación): antes de cada
+  llamada los clientes piden `budget_max_tokens`, que recorta max_tokens a lo que queda
+  o lanza BudgetExceeded si ya no queda
+- Cada llamada registrada es también un span llm.call de la traza activa (src/utils/tracing)
+- Los hilos auxiliares de un agente (p. ej. secciones del ejecutivo) no heredan los ámbitos:
+  los adoptan con `adopt_scopes(active_scopes())` para que sus llamadas cuenten y respeten
+  el presupuesto del agente
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Optional, Tuple
+from src.utils import tracing
+
+_local = threading.local()
+
+# Salida mínima que justifica lanzar una llamada más
+MIN_OUTPUT_TOKENS = 256
+
+
+class BudgetExceeded(Exception):
+    """Presupuesto del ámbito agotado ('tokens', 'tiempo' o 'abandonado'): no se lanzan más llamadas"""
+
+    def __init__(self, reason: str):
+        super().__init__(f"presupuesto agotado: {reason}")
+        self.reason = reason
+
+
+class LLMUsage:
+    """Acumulado de llamadas LLM de un ámbito"""
+
+    def __init__(
+        self,
+        max_tokens: Optional[int] = None,
+        deadline: Optional[float] = None,
+        cancelled: Optional[threading.Event] = None
+    ):
+        self.max_tokens = max_tokens or None   # tokens de entrada + salida
+        self.deadline = deadline               # time.monotonic()
+        self.cancelled = cancelled
+        self.exhausted: Optional[str] = None   # motivo del primer agotamiento
+        self.calls = 0
+        self.tokens_input = 0
+        self.tokens_output = 0
+        self.cost_usd = 0.0
+        self.seconds = 0.0
+        self.models: Dict[str, int] = {}   # 'proveedor/modelo' -> llamadas
+        self._lock = threading.Lock()      # el ámbito puede compartirse entre hilos
+
+    def add(self, provider: str, model: str, tokens_input: int, tokens_output: int, seconds: float) -> None:
+        from src.utils.cost_tracker import cost_tracker
+
+        cost = cost_tracker.calculate_cost(provider, model, int(tokens_input or 0), int(tokens_output or 0))
+        key = f"{provider}/{model}"
+        with self._lock:
+            self.calls += 1
+            self.tokens_input += int(tokens_input or 0)
+            self.tokens_output += int(tokens_output or 0)
+            self.cost_usd += cost
+            self.seconds += seconds
+            self.models[key] = self.models.get(key, 0) + 1
+
+    @property
+    def abandoned(self) -> bool:
+        return self.cancelled is not None and self.cancelled.is_set()
+
+    def remaining_output(self, prompt_tokens: int = 0) -> Optional[int]:
+        """
+        Tokens de salida disponibles para la siguiente llamada (None = sin límite)
+
+        Raises:
+            BudgetExceeded: ámbito abandonado, fuera de plazo o sin tokens para una llamada útil
+        """
+        reason = None
+        remaining = None
+        if self.abandoned:
+            reason = 'abandonado'
+        elif self.deadline is not None and time.monotonic() >= self.deadline:
+            reason = 'tiempo'
+        elif self.max_tokens:
+            remaining = self.max_tokens - self.tokens_input - self.tokens_output - prompt_tokens
+            if remaining < MIN_OUTPUT_TOKENS:
+                reason = 'tokens'
+        if reason:
+            self.exhausted = self.exhausted or reason
+            raise BudgetExceeded(reason)
+        return remaining
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            'calls': self.calls,
+            'tokens_input': self.tokens_input,
+            'tokens_output': self.tokens_output,
+            'cost_usd': round(self.cost_usd, 5),
+            'seconds': round(self.seconds, 2),
+            'models': dict(self.models),
+            **({'exhausted': self.exhausted} if self.exhausted else {}),
+        }
+
+
+@contextmanager
+def usage_scope(
+    max_tokens: Optional[int] = None,
+    deadline: Optional[float] = None,
+    cancelled: Optional[threading.Event] = None
+):
+    """
+    Acumula las llamadas LLM del hilo actual mientras dure el bloque (anidable)
+
+    Args:
+        max_tokens: Presupuesto de tokens (entrada + salida) del ámbito
+        deadline: Hora límite (time.monotonic()) para lanzar llamadas
+        cancelled: Evento que, activado, impide nuevas llamadas
+    """
+    usage = LLMUsage(max_tokens=max_tokens, deadline=deadline, cancelled=cancelled)
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    stack.append(usage)
+    try:
+        yield usage
+    finally:
+        stack.pop()
+
+
+def active_scopes() -> Tuple[LLMUsage, ...]:
+    """Ámbitos activos del hilo actual (para adoptarlos en otro hilo)"""
+    return tuple(getattr(_local, 'stack', None) or ())
+
+
+@contextmanager
+def adopt_scopes(scopes: Tuple[LLMUsage, ...]):
+    """
+    Activa en el hilo actual ámbitos abiertos en otro hilo mientras dure el bloque:
+    las llamadas se suman a ellos y respetan su presupuesto
+    """
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    depth = len(stack)
+    stack.extend(scopes)
+    try:
+        yield
+    finally:
+        del stack[depth:]
+
+
+def record_usage(provider: str, model: str, tokens_input: int, tokens_output: int, seconds: float) -> None:
+    """Registra una llamada en los ámbitos activos del hilo (y su span llm.call en la traza activa)"""
+    for usage in getattr(_local, 'stack', None) or ():
+        usage.add(provider, model, tokens_input, tokens_output, seconds)
+    tracing.record_span(
+        'llm.call',
+        seconds,
+        **{
+            'llm.provider': provider,
+            'llm.model': model,
+            'llm.tokens_input': int(tokens_input or 0),
+            'llm.tokens_output': int(tokens_output or 0),
+        }
+    )
+
+
+def budget_max_tokens(max_tokens: Optional[int], prompt: str = "") -> Optional[int]:
+    """
+    max_tokens de la siguiente llamada recortado al presupuesto de los ámbitos activos
+
+    Raises:
+        BudgetExceeded: algún ámbito activo está agotado
+    """
+    prompt_tokens = len(prompt or "") // 4
+    for usage in getattr(_local, 'stack', None) or ():
+        remaining = usage.remaining_output(prompt_tokens)
+        if remaining is not None:
+            max_tokens = min(max_tokens, remaining) if max_tokens else remaining
+    return max_tokens
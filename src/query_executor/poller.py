@@ -9,17 +9,37 @@ from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 from typing import List, Optional, Dict
 from sqlalchemy.orm import Session
-from src.database.connection import get_session
+from src.database.connection import get_session, get_pool_stats
 from src.database.models import Query, QueryExecution, Mercado, Categoria, Embedding
 from src.query_executor.scheduler import QueryScheduler
 from src.query_executor.api_clients import OpenAIClient, AnthropicClient, GoogleClient, PerplexityClient
 from src.utils.cost_tracker import cost_tracker
 from src.utils.logger import setup_logger, log_query_execution
 from src.analytics.competitor_discovery import discover_competitors_from_execution
+from src.analytics.mention_rollup import record_execution, invalidate_rollup
+from src.analytics.incremental import emit_execution_event
 
 logger = setup_logger(__name__)
 
 
+def _update_mention_rollup(session: Session, execution: QueryExecution, categoria_id: int) -> None:
+    """
+    Suma la ejecución al rollup de menciones (savepoint para no abortar la transacción).
+    Si falla, la ejecución no está en el rollup: se invalida para que los agentes no
+    cuenten de menos (vuelven a escanear texto hasta admin rebuild-mentions)
+    """
+    try:
+        with session.begin_nested():
+            record_execution(session, execution, categoria_id)
+    except Exception as e:
+        logger.warning("mention_rollup_update_failed", error=str(e))
+        try:
+            with session.begin_nested():
+                invalidate_rollup(session, categoria_id, reason=str(e))
+        except Exception as e2:
+            logger.error("mention_rollup_invalidate_failed", categoria_id=categoria_id, error=str(e2))
+
+
 def _generate_embedding_for_execution(execution: QueryExecution, query: Query, session: Session):
     """
     Genera embedding vectorial para una QueryExecution y lo guarda en la BD
@@ -162,6 +182,16 @@ def execute_query(query: Query, provider: str, session: Session) -> Dict:
         except Exception as e:
             logger.warning("embedding_generation_failed", error=str(e))
 
+        # Rollup diario de menciones (best-effort)
+        _update_mention_rollup(session, execution, query.categoria_id)
+
+        # Evento para el análisis incremental (outbox; best-effort con savepoint)
+        try:
+            with session.begin_nested():
+                emit_execution_event(session, execution, query.categoria_id)
+        except Exception as e:
+            logger.warning("analysis_event_emit_failed", error=str(e))
+
         # Descubrimiento de competidores (best-effort, no bloqueante)
         try:
             discover_competitors_from_execution(session, query.categoria_id, execution)
@@ -309,6 +339,7 @@ def execute_category_queries(
         logger.info(
             "category_execution_completed",
             categoria=category_path,
+            db_pool=get_pool_stats(),
             **stats
         )
         
@@ -408,7 +439,8 @@ def start_polling(interval: str = 'weekly', run_once: bool = False):
                         successful=successful,
                         failed=failed,
                         total_cost=total_cost,
-                        max_concurrent=max_workers
+                        max_concurrent=max_workers,
+                        db_pool=get_pool_stats()
                     )
                     
                     # Verificar presupuesto
@@ -369,7 +369,11 @@ class ChartGenerator:
         
         return self._fig_to_base64(fig)
     
-    def generate_sov_trend_chart(self, sov_trend_data: Dict[str, List[Dict[str, Any]]]) -> Optional[str]:
+    def generate_sov_trend_chart(
+        self,
+        sov_trend_data: Dict[str, List[Dict[str, Any]]],
+        trend_records: Optional[List[Dict[str, Any]]] = None
+    ) -> Optional[str]:
         """
         Genera gráfico de líneas con tendencias de SOV por marca a lo largo del tiempo
         FUNCIONA INCLUSO CON UN SOLO PUNTO DE DATOS (muestra como barra en ese caso)
@@ -377,6 +381,7 @@ class ChartGenerator:
         Args:
             sov_trend_data: Dict con marcas y sus datos temporales
                 Ej: {"Heineken": [{"periodo": "2025-09", "sov": 25.5}, {"periodo": "2025-10", "sov": 27.3}]}
+            trend_records: Tendencias detectadas (Trends); marca picos y puntos de cambio
         
         Returns:
             String base64 del gráfico
@@ -392,6 +397,12 @@ class ChartGenerator:
         
         # Verificar si todos tienen un solo punto
         all_single_point = all(len(datos) == 1 for datos in sov_trend_data.values() if datos)
+
+        # Registro más significativo por marca (vienen ordenados por score)
+        records_por_marca: Dict[str, Dict[str, Any]] = {}
+        for rec in trend_records or []:
+            if isinstance(rec, dict) and rec.get('marca'):
+                records_por_marca.setdefault(rec['marca'], rec)
         
         for idx, (marca, datos) in enumerate(sov_trend_data.items()):
             if not datos:
@@ -417,6 +428,17 @@ class ChartGenerator:
                     ax.text(len(periodos)-1, valores[-1], f'{valores[-1]:.1f}%', 
                            fontsize=9, fontweight='bold', 
                            ha='left', va='bottom', color=color)
+
+                # Picos y puntos de cambio detectados para la marca
+                rec = records_por_marca.get(marca)
+                if rec and valores:
+                    if rec.get('pico'):
+                        ax.scatter([len(periodos)-1], [valores[-1]], marker='*', s=320,
+                                   color=color, edgecolor='black', zorder=5)
+                    cambio = rec.get('punto_cambio') or {}
+                    if cambio.get('periodo') in periodos:
+                        ax.axvline(periodos.index(cambio['periodo']) - 0.5, color=color,
+                                   linestyle='--', linewidth=1.2, alpha=0.6)
         
         # Estilo
         ax.set_ylabel('Share of Voice (%)', fontsize=12, fontweight='bold')
@@ -448,6 +470,65 @@ class ChartGenerator:
         
         return self._fig_to_base64(fig)
     
+    def generate_sov_breakdown_chart(
+        self,
+        breakdown: Dict[str, Dict[str, float]],
+        dimension_label: str = 'Proveedor de IA',
+        max_brands: int = 8
+    ) -> Optional[str]:
+        """
+        Genera barras apiladas de SOV por valor de una dimensión (proveedor, query, día)
+        
+        Args:
+            breakdown: {valor_dimension: {marca: sov}} (p. ej. MentionCube.by('provider'))
+            dimension_label: Etiqueta del eje
+            max_brands: Marcas mostradas (el resto se agrupa en "Otras")
+        
+        Returns:
+            String base64 del gráfico
+        """
+        if not breakdown:
+            return None
+        
+        # Marcas con más SOV acumulado; resto agrupado
+        totales: Dict[str, float] = {}
+        for valores in breakdown.values():
+            for marca, v in (valores or {}).items():
+                totales[marca] = totales.get(marca, 0.0) + float(v or 0.0)
+        marcas = [m for m, _ in sorted(totales.items(), key=lambda x: x[1], reverse=True)[:max_brands]]
+        etiquetas = [str(k) for k in breakdown.keys()]
+        
+        fig, ax = plt.subplots(figsize=(self.fig_width, self.fig_height))
+        colors = [BRAND_COLOR, SUCCESS_COLOR, WARNING_COLOR, DANGER_COLOR, NEUTRAL_COLOR,
+                  '#ff6b6b', '#4ecdc4', '#45b7d1', '#f7b731', '#5f27cd']
+        left = [0.0] * len(etiquetas)
+        for idx, marca in enumerate(marcas + ['Otras']):
+            if marca == 'Otras':
+                valores = [max(0.0, 100.0 - l) if (breakdown[k] or {}) else 0.0 for k, l in zip(breakdown.keys(), left)]
+                if not any(v > 0.05 for v in valores):
+                    continue
+                color = '#cccccc'
+            else:
+                valores = [float((breakdown[k] or {}).get(marca, 0.0)) for k in breakdown.keys()]
+                color = colors[idx % len(colors)]
+            ax.barh(etiquetas, valores, left=left, color=color, label=marca, edgecolor='white', linewidth=1)
+            for i, v in enumerate(valores):
+                if v >= 8:
+                    ax.text(left[i] + v / 2, i, f'{v:.0f}%', ha='center', va='center', fontsize=9, color='white', fontweight='bold')
+            left = [l + v for l, v in zip(left, valores)]
+        
+        ax.set_xlabel('Share of Voice (%)', fontsize=12, fontweight='bold')
+        ax.set_ylabel(dimension_label, fontsize=12, fontweight='bold')
+        ax.set_title(f'Share of Voice por {dimension_label}', fontsize=14, fontweight='bold', pad=20)
+        ax.set_xlim(0, 100)
+        ax.legend(loc='upper center', bbox_to_anchor=(0.5, -0.12), ncol=min(5, len(marcas) + 1), framealpha=0.9)
+        ax.spines['top'].set_visible(False)
+        ax.spines['right'].set_visible(False)
+        
+        plt.tight_layout()
+        
+        return self._fig_to_base64(fig)
+    
     def generate_sentiment_trend_chart(self, sentiment_trend_data: Dict[str, List[Dict[str, Any]]]) -> Optional[str]:
         """
         Genera gráfico de líneas con evolución del sentimiento por marca
@@ -1183,7 +1264,13 @@ def generate_all_charts(report_data: Dict[str, Any]) -> Dict[str, str]:
             sov_trend_filtered = {k: v for k, v in sov_trend.items() if not top_brands or k in top_brands}
         else:
             sov_trend_filtered = sov_trend
-        charts['sov_trend_chart'] = generator.generate_sov_trend_chart(sov_trend_filtered)
+        charts['sov_trend_chart'] = generator.generate_sov_trend_chart(
+            sov_trend_filtered, competencia.get('trend_records')
+        )
+    
+    # SOV por proveedor de IA (cubo de menciones)
+    if competencia.get('sov_por_proveedor'):
+        charts['sov_provider_chart'] = generator.generate_sov_breakdown_chart(competencia['sov_por_proveedor'])
     
     # Sentiment Chart (snapshot actual)
     sentimiento = report_data.get('sentimiento_reputacion', {})
@@ -14,6 +14,7 @@ def _load_weasyprint():
     return HTML, CSS
 from src.database.connection import get_session
 from src.database.models import Report, Categoria, Mercado
+from src.utils import tracing
 from src.utils.logger import setup_logger, log_report_generation
 def _lazy_import_charts():
     # Import diferido para evitar cargar matplotlib al iniciar la app
@@ -43,6 +44,7 @@ class PDFGenerator:
         self.env.filters['format_percent'] = self._format_percent
         self.env.filters['format_score'] = self._format_score
     
+    @tracing.traced('pdf.generate', root=True)
     def generate(self, report_id: int, output_path: Optional[str] = None, agents_stats: dict = None) -> str:
         """
         Genera PDF desde un report
@@ -56,9 +58,10 @@ class PDFGenerator:
             Ruta del PDF generado
         """
         start_time = time.time()
+        tracing.set_attributes(**{'pdf.report_id': report_id})
         
-        with get_session() as session:
-            # Obtener report
+        with get_session(read_only=True) as session:
+            # Obtener report (lecturas vía réplica si está al día)
             report = session.query(Report).get(report_id)
             if not report:
                 raise ValueError(f"Report {report_id} no encontrado")
@@ -107,8 +110,9 @@ class PDFGenerator:
             )
             
             # Renderizar HTML
-            template = self.env.get_template('base_template.html')
-            html_content = template.render(**context)
+            with tracing.span('pdf.render_html'):
+                template = self.env.get_template('base_template.html')
+                html_content = template.render(**context)
             
             # Determinar ruta de salida
             if not output_path:
@@ -117,19 +121,21 @@ class PDFGenerator:
                 output_path = self.output_dir / filename
             
             # Generar PDF (import diferido)
-            HTML, CSS = _load_weasyprint()
-            HTML(string=html_content).write_pdf(
-                output_path,
-                stylesheets=[CSS(filename=str(self.templates_dir / 'styles.css'))]
-            )
+            with tracing.span('pdf.write'):
+                HTML, CSS = _load_weasyprint()
+                HTML(string=html_content).write_pdf(
+                    output_path,
+                    stylesheets=[CSS(filename=str(self.templates_dir / 'styles.css'))]
+                )
             
             # Calcular tamaño del PDF
             pdf_size_mb = os.path.getsize(output_path) / (1024 * 1024)
             
-            # Actualizar report con ruta
-            report.pdf_path = str(output_path)
-            report.estado = 'published'
-            session.commit()
+            # Actualizar report con ruta (escritura en el primario)
+            with get_session() as write_session:
+                write_session.query(Report).filter_by(id=report_id).update(
+                    {'pdf_path': str(output_path), 'estado': 'published'}
+                )
             
             # Log detallado
             generation_time = time.time() - start_time
@@ -156,7 +162,9 @@ class PDFGenerator:
         logger.info("Generando visualizaciones...", report_id=report.id)
         # Cargar generador de gráficos de forma perezosa
         generate_all_charts = _lazy_import_charts()
-        charts = generate_all_charts(contenido)
+        with tracing.span('pdf.charts') as span:
+            charts = generate_all_charts(contenido)
+            span.set_attributes(**{'pdf.charts': sum(1 for v in charts.values() if v is not None)})
         
         return {
             'titulo': f"Análisis Competitivo - {categoria.nombre}",
@@ -205,11 +213,13 @@ def generate_pdf(report_id: int, output_path: Optional[str] = None, agents_stats
     Args:
         report_id: ID del report
         output_path: Ruta de salida opcional
-        agents_stats: Estadísticas de agentes ejecutados (opcional)
+        agents_stats: Estadísticas de agentes ejecutados (opcional); con su 'trace'
+            los spans del PDF se añaden a la traza de la ejecución
     
     Returns:
         Ruta del PDF generado
     """
-    generator = PDFGenerator()
-    return generator.generate(report_id, output_path, agents_stats)
+    with tracing.attach((agents_stats or {}).get('trace')):
+        generator = PDFGenerator()
+        return generator.generate(report_id, output_path, agents_stats)
 
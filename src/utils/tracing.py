@@ -0,0 +1,489 @@
+"""
+Tracing
+Trazas de ejecución (spans) exportadas en OTLP/JSON a un fichero local, sin colector
+
+- `span(nombre, **atributos)` / `@traced(nombre)`: el span activo viaja en un ContextVar;
+  los pools que deban heredar el padre envían la tarea con `contextvars.copy_context().run`
+- Solo `root=True` abre una traza nueva; el resto de spans (consultas, llamadas LLM...)
+  se registran únicamente dentro de una traza activa, sin coste apreciable fuera de ella
+- `record_span` registra a posteriori un intervalo ya medido (llamada LLM, espera de hueco)
+- Al cerrarse el span raíz local, la traza se añade como una línea ExportTraceServiceRequest
+  (formato OTLP/JSON, el que lee el receptor otlpjsonfile del OpenTelemetry Collector) a
+  <dir>/run_<run_id>.jsonl, o a trace_<trace_id>.jsonl si no es una ejecución de análisis
+- `attach(ctx)` continúa una traza en otro hilo o más tarde (el PDF tras el análisis)
+
+Parámetros en settings (tracing). TRACING_ENABLED y TRACING_DIR tienen prioridad.
+"""
+
+import functools
+import json
+import os
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+import yaml
+
+DEFAULT_TRACING_SETTINGS = {
+    'enabled': True,
+    'dir': 'logs/traces',
+    'max_spans_per_trace': 20000,   # los spans que excedan se descartan (se cuentan)
+    'keep_files': 500,              # ficheros de traza conservados (los más antiguos se borran)
+    'statement_chars': 300,         # longitud máxima de db.statement
+}
+
+SERVICE_NAME = "twolaps"
+SCOPE_NAME = "twolaps.tracing"
+
+
+def _load_tracing_settings(config_path: str = "config/settings.yaml") -> Dict[str, Any]:
+    """Lee el bloque `tracing` de settings"""
+    settings = dict(DEFAULT_TRACING_SETTINGS)
+    try:
+        with open(config_path, "r", encoding="utf-8") as f:
+            cfg = yaml.safe_load(f) or {}
+        settings.update({
+            k: v for k, v in (cfg.get("tracing") or {}).items() if k in DEFAULT_TRACING_SETTINGS
+        })
+    except Exception:
+        pass
+    enabled = os.getenv("TRACING_ENABLED")
+    if enabled is not None:
+        settings['enabled'] = enabled.lower() in ("1", "true", "yes", "on")
+    settings['dir'] = os.getenv("TRACING_DIR", settings['dir'])
+    return settings
+
+
+TRACING_SETTINGS = _load_tracing_settings()
+
+_current: ContextVar[Optional["Span"]] = ContextVar("tracing_span", default=None)
+_export_lock = threading.Lock()
+
+
+class _Trace:
+    """Spans terminados de una traza local, pendientes de exportar"""
+
+    def __init__(self, trace_id: str, run_id: Optional[int] = None):
+        self.trace_id = trace_id
+        self.run_id = run_id
+        self.spans: List["Span"] = []
+        self.dropped = 0
+        self.exported = False
+        self._lock = threading.Lock()
+
+    def add(self, span: "Span") -> None:
+        with self._lock:
+            if self.exported:
+                return
+            if len(self.spans) >= int(TRACING_SETTINGS['max_spans_per_trace']):
+                self.dropped += 1
+                return
+            self.spans.append(span)
+
+
+class Span:
+    """Intervalo con nombre, atributos y estado dentro de una traza"""
+
+    __slots__ = ('name', 'trace', 'span_id', 'parent_id', 'start_ns', 'end_ns',
+                 'attributes', 'error', 'local_root')
+
+    def __init__(
+        self,
+        name: str,
+        trace: _Trace,
+        parent_id: Optional[str] = None,
+        attributes: Optional[Dict[str, Any]] = None,
+        start_ns: Optional[int] = None,
+        local_root: bool = False
+    ):
+        self.name = name
+        self.trace = trace
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.start_ns = start_ns or time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes: Dict[str, Any] = {}
+        self.error: Optional[str] = None
+        self.local_root = local_root
+        self.set_attributes(**(attributes or {}))
+
+    def set_attributes(self, **attributes: Any) -> None:
+        """Añade atributos (los None se ignoran)"""
+        self.attributes.update({k: v for k, v in attributes.items() if v is not None})
+
+    def set_error(self, message: str) -> None:
+        self.error = str(message)[:500]
+
+    def end(self, error: Optional[BaseException] = None, end_ns: Optional[int] = None) -> None:
+        if self.end_ns is not None:
+            return
+        if error is not None and self.error is None:
+            self.set_error(f"{type(error).__name__}: {error}")
+        self.end_ns = end_ns or time.time_ns()
+        self.trace.add(self)
+        if self.local_root:
+            _export(self.trace)
+
+    def context(self) -> Dict[str, Any]:
+        """Referencia serializable para continuar la traza con `attach`"""
+        return {'trace_id': self.trace.trace_id, 'span_id': self.span_id, 'run_id': self.trace.run_id}
+
+
+class _NoopSpan:
+    """Span descartado (tracing desactivado o sin traza activa)"""
+
+    def set_attributes(self, **attributes: Any) -> None:
+        pass
+
+    def set_error(self, message: str) -> None:
+        pass
+
+    def end(self, error: Optional[BaseException] = None, end_ns: Optional[int] = None) -> None:
+        pass
+
+    def context(self) -> None:
+        return None
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+def start_span(name: str, root: bool = False, **attributes: Any) -> Optional[Span]:
+    """
+    Crea un span hijo del activo sin activarlo (el llamador debe hacer `end()`)
+
+    Args:
+        name: Nombre del span
+        root: Abrir una traza nueva si no hay ninguna activa
+
+    Returns:
+        Span o None si no se registra
+    """
+    if not TRACING_SETTINGS['enabled']:
+        return None
+    parent = _current.get()
+    if parent is not None and parent.trace.exported:
+        parent = None
+    if parent is None:
+        if not root:
+            return None
+        return Span(name, _Trace(secrets.token_hex(16)), attributes=attributes, local_root=True)
+    return Span(name, parent.trace, parent_id=parent.span_id, attributes=attributes)
+
+
+@contextmanager
+def span(name: str, root: bool = False, **attributes: Any) -> Iterator[Any]:
+    """Span activo durante el bloque; una excepción lo marca como error y se propaga"""
+    current = start_span(name, root=root, **attributes)
+    if current is None:
+        yield NOOP_SPAN
+        return
+    token = _current.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.end(error=e)
+        raise
+    finally:
+        _current.reset(token)
+        current.end()
+
+
+def traced(name: str, root: bool = False, **attributes: Any):
+    """Decorador: ejecuta la función dentro de `span(name)`"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name, root=root, **attributes):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record_span(name: str, seconds: float, **attributes: Any) -> None:
+    """Registra un intervalo ya terminado (de duración `seconds`, acabado ahora) bajo el span activo"""
+    parent = _current.get()
+    if not TRACING_SETTINGS['enabled'] or parent is None or parent.trace.exported:
+        return
+    end_ns = time.time_ns()
+    current = Span(
+        name, parent.trace, parent_id=parent.span_id, attributes=attributes,
+        start_ns=end_ns - int(max(0.0, seconds) * 1e9)
+    )
+    current.end(end_ns=end_ns)
+
+
+def current_span() -> Any:
+    """Span activo (o uno nulo)"""
+    return _current.get() or NOOP_SPAN
+
+
+def set_attributes(**attributes: Any) -> None:
+    """Añade atributos al span activo"""
+    current_span().set_attributes(**attributes)
+
+
+def set_run_id(run_id: int) -> None:
+    """Asocia la traza activa a una ejecución de análisis (nombre del fichero exportado)"""
+    current = _current.get()
+    if current is not None:
+        current.trace.run_id = run_id
+        current.set_attributes(**{'analysis.run_id': run_id})
+
+
+def current_context() -> Optional[Dict[str, Any]]:
+    """Referencia a la traza activa para continuarla en otro hilo o momento (ver `attach`)"""
+    current = _current.get()
+    return current.context() if current is not None else None
+
+
+@contextmanager
+def attach(ctx: Optional[Dict[str, Any]]) -> Iterator[None]:
+    """
+    Los spans del bloque continúan la traza `ctx` (de `current_context`/stats['trace'])
+    como hijos de su span; se exportan al mismo fichero al cerrarse el bloque
+    """
+    if not ctx or not TRACING_SETTINGS['enabled'] or _current.get() is not None:
+        yield
+        return
+    trace = _Trace(ctx['trace_id'], run_id=ctx.get('run_id'))
+    anchor = Span('attach', trace, attributes={})
+    anchor.span_id = ctx['span_id']
+    token = _current.set(anchor)
+    try:
+        yield
+    finally:
+        _current.reset(token)
+        _export(trace)
+
+
+# =============================
+# Exportación OTLP/JSON
+# =============================
+
+def trace_path(run_id: Optional[int] = None, trace_id: Optional[str] = None) -> Path:
+    """Fichero de la traza de una ejecución (o de una traza suelta)"""
+    name = f"run_{run_id}.jsonl" if run_id is not None else f"trace_{trace_id}.jsonl"
+    return Path(TRACING_SETTINGS['dir']) / name
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+
+def _otlp_span(s: Span) -> Dict[str, Any]:
+    data = {
+        'traceId': s.trace.trace_id,
+        'spanId': s.span_id,
+        'name': s.name,
+        'kind': 1,  # SPAN_KIND_INTERNAL
+        'startTimeUnixNano': str(s.start_ns),
+        'endTimeUnixNano': str(s.end_ns),
+        'attributes': [{'key': k, 'value': _otlp_value(v)} for k, v in s.attributes.items()],
+        'status': {'code': 2, 'message': s.error} if s.error else {'code': 1},
+    }
+    if s.parent_id:
+        data['parentSpanId'] = s.parent_id
+    return data
+
+
+def _export(trace: _Trace) -> None:
+    """Añade la traza al fichero como una línea ExportTraceServiceRequest (nunca lanza)"""
+    with trace._lock:
+        if trace.exported:
+            return
+        trace.exported = True
+        spans = list(trace.spans)
+    if not spans:
+        return
+    resource = [{'key': 'service.name', 'value': {'stringValue': SERVICE_NAME}}]
+    if trace.dropped:
+        resource.append({'key': 'twolaps.dropped_spans', 'value': {'intValue': str(trace.dropped)}})
+    request = {
+        'resourceSpans': [{
+            'resource': {'attributes': resource},
+            'scopeSpans': [{'scope': {'name': SCOPE_NAME}, 'spans': [_otlp_span(s) for s in spans]}],
+        }]
+    }
+    try:
+        path = trace_path(trace.run_id, trace.trace_id)
+        with _export_lock:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(request, ensure_ascii=False, default=str) + "\n")
+            _prune(path.parent)
+    except Exception:
+        pass
+
+
+def _prune(directory: Path) -> None:
+    """Conserva solo los `keep_files` ficheros de traza más recientes"""
+    keep = int(TRACING_SETTINGS['keep_files'])
+    if keep <= 0:
+        return
+    files = sorted(directory.glob("*.jsonl"), key=lambda p: p.stat().st_mtime)
+    for old in files[:-keep]:
+        try:
+            old.unlink()
+        except OSError:
+            pass
+
+
+# =============================
+# Lectura
+# =============================
+
+def _attribute_value(value: Dict[str, Any]) -> Any:
+    if 'intValue' in value:
+        return int(value['intValue'])
+    for key in ('doubleValue', 'boolValue', 'stringValue'):
+        if key in value:
+            return value[key]
+    return None
+
+
+def load_trace(run_id: Optional[int] = None, path: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Spans de una ejecución (o de un fichero OTLP/JSON) como dicts planos:
+    {trace_id, span_id, parent_id, name, start, end (segundos epoch), attributes, error}
+
+    Raises:
+        FileNotFoundError: no hay traza de esa ejecución
+    """
+    source = Path(path) if path else trace_path(run_id)
+    spans = []
+    with open(source, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            for resource in json.loads(line).get('resourceSpans', []):
+                for scope in resource.get('scopeSpans', []):
+                    for s in scope.get('spans', []):
+                        status = s.get('status') or {}
+                        spans.append({
+                            'trace_id': s.get('traceId'),
+                            'span_id': s.get('spanId'),
+                            'parent_id': s.get('parentSpanId') or None,
+                            'name': s.get('name'),
+                            'start': int(s['startTimeUnixNano']) / 1e9,
+                            'end': int(s['endTimeUnixNano']) / 1e9,
+                            'attributes': {
+                                a['key']: _attribute_value(a.get('value') or {}) for a in s.get('attributes', [])
+                            },
+                            'error': status.get('message') if status.get('code') == 2 else None,
+                        })
+    return spans
+
+
+# =============================
+# Análisis (main.py trace-report)
+# =============================
+
+# Todo el tiempo bajo estos spans cuenta para su categoría (incluidas sus consultas)
+ABSORBING_BUCKETS = {
+    'rag.embedding': 'embedding',
+    'rag.vector_search': 'vector_search',
+    'llm.json_repair': 'json_repair',
+    'agent.save_results': 'save_results',
+    'extraction.parallel': 'extraction',
+}
+# Resto: categoría del propio span; lo no clasificado es tiempo del agente ('other')
+SPAN_BUCKETS = {'db.query': 'db', 'llm.call': 'llm', 'llm.wait': 'llm_wait'}
+BUCKETS = ('llm', 'llm_wait', 'db', 'embedding', 'vector_search', 'json_repair', 'save_results', 'extraction', 'other')
+
+
+def _children(spans: List[Dict[str, Any]]) -> Dict[Optional[str], List[Dict[str, Any]]]:
+    ids = {s['span_id'] for s in spans}
+    children: Dict[Optional[str], List[Dict[str, Any]]] = {}
+    for s in spans:
+        parent = s['parent_id'] if s['parent_id'] in ids else None
+        children.setdefault(parent, []).append(s)
+    return children
+
+
+def _extent(span: Dict[str, Any], children: Dict[Optional[str], List[Dict[str, Any]]], memo: Dict[str, float]) -> float:
+    """Fin del span o de su último descendiente (el PDF se engancha a la ejecución ya cerrada)"""
+    if span['span_id'] not in memo:
+        memo[span['span_id']] = max(
+            [span['end']] + [_extent(c, children, memo) for c in children.get(span['span_id'], [])]
+        )
+    return memo[span['span_id']]
+
+
+def _exclusive(span: Dict[str, Any], children: Dict[Optional[str], List[Dict[str, Any]]]) -> float:
+    """Duración del span no cubierta por ningún hijo"""
+    intervals = sorted(
+        (max(c['start'], span['start']), min(c['end'], span['end']))
+        for c in children.get(span['span_id'], [])
+    )
+    covered, cursor = 0.0, span['start']
+    for start, end in intervals:
+        start = max(start, cursor)
+        if end > start:
+            covered += end - start
+            cursor = end
+    return max(0.0, span['end'] - span['start'] - covered)
+
+
+def critical_path(spans: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Camino crítico desde la raíz: en cada span, recorriendo hacia atrás desde su fin,
+    el hijo que termina más tarde, luego el que termina antes de que ese empiece, etc.
+
+    Returns:
+        [{'span', 'depth', 'start', 'end'}] en orden cronológico (pre-orden)
+    """
+    children = _children(spans)
+    memo: Dict[str, float] = {}
+    path: List[Dict[str, Any]] = []
+
+    def walk(span: Dict[str, Any], depth: int, until: float) -> None:
+        path.append({'span': span, 'depth': depth, 'start': span['start'], 'end': until})
+        chosen, cursor = [], until
+        for child in sorted(children.get(span['span_id'], []), key=lambda c: _extent(c, children, memo), reverse=True):
+            if child['start'] < cursor:
+                chosen.append((child, min(cursor, _extent(child, children, memo))))
+                cursor = child['start']
+        for child, child_until in reversed(chosen):
+            walk(child, depth + 1, child_until)
+
+    roots = sorted(children.get(None, []), key=lambda s: s['start'])
+    if roots:
+        root = max(roots, key=lambda s: _extent(s, children, memo) - s['start'])
+        walk(root, 0, _extent(root, children, memo))
+    return path
+
+
+def time_breakdown(spans: List[Dict[str, Any]]) -> Dict[str, Dict[str, float]]:
+    """
+    Tiempo exclusivo de cada span 'agent' y sus descendientes por categoría (BUCKETS)
+
+    Returns:
+        {agente: {categoría: segundos, 'total': segundos}}
+    """
+    children = _children(spans)
+    breakdown: Dict[str, Dict[str, float]] = {}
+
+    def walk(span: Dict[str, Any], totals: Dict[str, float], absorbed: Optional[str]) -> None:
+        bucket = absorbed or ABSORBING_BUCKETS.get(span['name']) or SPAN_BUCKETS.get(span['name'], 'other')
+        totals[bucket] = totals.get(bucket, 0.0) + _exclusive(span, children)
+        for child in children.get(span['span_id'], []):
+            walk(child, totals, absorbed or ABSORBING_BUCKETS.get(span['name']))
+
+    for span in spans:
+        if span['name'] != 'agent':
+            continue
+        totals = {bucket: 0.0 for bucket in BUCKETS}
+        walk(span, totals, None)
+        totals['total'] = span['end'] - span['start']
+        breakdown[span['attributes'].get('agent.name', span['span_id'])] = totals
+    return breakdown
@@ -0,0 +1,85 @@
+"""
+Configuración común de los tests
+
+Los módulos de análisis importan src.database, que crea el engine al importarse: los tests
+usan siempre una base SQLite temporal (nunca la de DATABASE_URL del entorno) y escriben
+las trazas y los cubos de menciones en el mismo directorio temporal. Las claves de API son ficticias: ningún
+test llama a un LLM.
+"""
+
+import os
+import sys
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+_TMP = tempfile.mkdtemp(prefix="twolaps-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_TMP}/test.db"
+os.environ.pop("DATABASE_REPLICA_URL", None)
+os.environ["TRACING_DIR"] = os.path.join(_TMP, "traces")
+os.environ["MENTION_CUBE_DIR"] = os.path.join(_TMP, "cubes")
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ.setdefault("ANTHROPIC_API_KEY", "test")
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+os.chdir(ROOT)  # settings y prompts se leen con rutas relativas a la raíz
+
+
+@pytest.fixture
+def db():
+    """Esquema vacío por test; devuelve get_session"""
+    from src.database.connection import engine, get_session
+    from src.database.models import Base
+
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    return get_session
+
+
+@pytest.fixture
+def categoria(db):
+    """
+    Categoría con tres marcas y una query
+
+    Returns:
+        {'id', 'query_id', 'marcas': {nombre: id}}
+    """
+    from src.database.models import Categoria, Marca, Mercado, Query
+
+    with db() as session:
+        mercado = Mercado(nombre="Test", tipo_mercado="FMCG")
+        session.add(mercado)
+        session.flush()
+        cat = Categoria(mercado_id=mercado.id, nombre="Cervezas")
+        session.add(cat)
+        session.flush()
+        marcas = [
+            Marca(categoria_id=cat.id, nombre="Mahou", aliases=["Mahou"]),
+            Marca(categoria_id=cat.id, nombre="Estrella", aliases=["Estrella Galicia", "Estrella"]),
+            Marca(categoria_id=cat.id, nombre="Alhambra", aliases=["Alhambra"]),
+        ]
+        session.add_all(marcas)
+        query = Query(categoria_id=cat.id, pregunta="¿Qué cerveza recomiendas?", proveedores_ia=["openai"])
+        session.add(query)
+        session.commit()
+        return {'id': cat.id, 'query_id': query.id, 'marcas': {m.nombre: m.id for m in marcas}}
+
+
+@pytest.fixture
+def add_execution(db, categoria):
+    """Inserta una ejecución de la query de la categoría y devuelve su id"""
+    from src.database.models import QueryExecution
+
+    def _add(texto: str, timestamp: datetime, proveedor: str = "openai") -> int:
+        with db() as session:
+            execution = QueryExecution(
+                query_id=categoria['query_id'], proveedor_ia=proveedor, modelo="test",
+                respuesta_texto=texto, timestamp=timestamp
+            )
+            session.add(execution)
+            session.commit()
+            return execution.id
+
+    return _add
@@ -0,0 +1,29 @@
+"""Tests de la parte de settings de la huella de entradas de los agentes"""
+
+import yaml
+
+from src.analytics.agents.base_agent import _settings_digest
+
+
+def digest_with(tmp_path, section, key, value):
+    with open("config/settings.yaml", "r", encoding="utf-8") as f:
+        cfg = yaml.safe_load(f)
+    cfg[section][key] = value
+    path = tmp_path / "settings.yaml"
+    path.write_text(yaml.safe_dump(cfg), encoding="utf-8")
+    return _settings_digest(str(path))
+
+
+def test_operational_settings_do_not_change_digest(tmp_path):
+    base = _settings_digest()
+    assert base
+    assert digest_with(tmp_path, 'analytics', 'batch', {'max_parallel_categories': 1}) == base
+    assert digest_with(tmp_path, 'analytics', 'orchestrator', {'max_parallel_agents': 1}) == base
+    assert digest_with(tmp_path, 'database', 'pool_size', 5) == base
+
+
+def test_output_settings_change_digest(tmp_path):
+    base = _settings_digest()
+    assert digest_with(tmp_path, 'analytics', 'trends', {'z_threshold': 3.0}) != base
+    assert digest_with(tmp_path, 'analytics', 'significance', {'confidence': 0.9}) != base
+    assert digest_with(tmp_path, 'llm_providers', 'temperature', {'analysis': 0.0}) != base
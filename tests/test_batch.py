@@ -0,0 +1,24 @@
+"""Tests del límite de paralelismo de generate-batch frente al pool de BD"""
+
+import src.database.connection as connection
+from src.analytics.batch import BatchScheduler
+
+
+def test_analysis_connections_per_category_and_pdf():
+    assert connection.analysis_connections(4) == 9
+    assert connection.analysis_connections(4, 3, 1) == 29
+
+
+def test_batch_parallelism_clamped_to_pool_capacity(monkeypatch):
+    monkeypatch.setattr("src.analytics.orchestrator._load_max_parallel_agents", lambda: 4)
+    monkeypatch.setattr(connection, "pool_capacity", lambda: 24)
+    assert BatchScheduler(max_parallel=3, pdf_workers=1).max_parallel == 2
+    monkeypatch.setattr(connection, "pool_capacity", lambda: 29)
+    assert BatchScheduler(max_parallel=3, pdf_workers=1).max_parallel == 3
+    monkeypatch.setattr(connection, "pool_capacity", lambda: 5)
+    assert BatchScheduler(max_parallel=3, pdf_workers=1).max_parallel == 1
+
+
+def test_unbounded_pool_keeps_parallelism(monkeypatch):
+    monkeypatch.setattr(connection, "pool_capacity", lambda: 0)
+    assert BatchScheduler(max_parallel=6).max_parallel == 6
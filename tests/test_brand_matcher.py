@@ -0,0 +1,65 @@
+"""Tests de BrandMatcher: acentos, mayúsculas y límites de palabra"""
+
+from src.analytics.brand_matcher import BrandMatcher, aliases_fingerprint, canonical, fold
+
+
+def make_matcher():
+    return BrandMatcher(
+        {1: ['Mas', 'Más Cerveza'], 2: ['Mahou'], 3: ['Heineken®'], 4: ['Águila']},
+        {1: 'Cervezas Mas', 2: 'Mahou', 3: 'Heineken', 4: 'Águila'}
+    )
+
+
+def test_fold_keeps_offsets_into_original_text():
+    folded, offsets = fold("Ñandú Á")
+    assert folded == "nandu a"
+    assert len(offsets) == len(folded)
+    assert offsets[-1] == 6
+
+
+def test_accent_and_case_insensitive():
+    matcher = make_matcher()
+    assert matcher.brands_in("la AGUILA negra") == {4}
+    assert matcher.brands_in("mas cerveza, por favor") == {1}
+    assert matcher.brands_in("Probé MÁS anoche") == {1}
+
+
+def test_alias_does_not_match_inside_another_word():
+    matcher = make_matcher()
+    assert matcher.brands_in("Los Masters de Augusta") == set()
+    assert matcher.brands_in("Tomasa y Mahouu") == set()
+    assert matcher.brands_in("Mas, Mahou.") == {1, 2}
+
+
+def test_non_alphanumeric_edge_needs_no_boundary():
+    matcher = make_matcher()
+    assert matcher.brands_in("Heineken®Lager") == {3}
+
+
+def test_find_counts_overlapping_aliases_once():
+    matcher = make_matcher()
+    found = matcher.find("Más Cerveza es distinta. Mas otra vez")
+    assert found[1] == (0, 2)
+
+
+def test_match_offsets_point_into_original_text():
+    text = "Pedí Águila"
+    (marca_id, start, end), = make_matcher().iter_matches(text)
+    assert marca_id == 4
+    assert text[start:end] == "Águila"
+
+
+def test_brand_name_is_not_searched_in_text_but_resolves_in_lookup():
+    matcher = make_matcher()
+    # Solo se buscan los aliases: "Heineken" sin ® y "Cervezas" no son aliases
+    assert matcher.brands_in("Una Heineken") == set()
+    assert matcher.brands_in("Cervezas Mas") == {1}
+    assert matcher.lookup("cervezas más") == 1
+    assert matcher.lookup("Desconocida") is None
+
+
+def test_fingerprint_changes_with_aliases():
+    base = aliases_fingerprint({1: ['Mas']}, {1: 'Mas'})
+    assert base == aliases_fingerprint({1: ['mas']}, {1: 'Mas'})
+    assert base != aliases_fingerprint({1: ['Mas', 'Mas 0,0']}, {1: 'Mas'})
+    assert canonical("  Más   Cerveza! ") == "mas cerveza"
@@ -0,0 +1,71 @@
+"""Tests de MentionMatrix y MentionTallies: métricas, fusión y serialización"""
+
+import json
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+
+from src.analytics.brand_matcher import BrandMatcher
+from src.analytics.mention_matrix import MentionMatrix, MentionTallies
+
+MARCAS = [SimpleNamespace(id=1, nombre='Mahou'), SimpleNamespace(id=2, nombre='Estrella'),
+          SimpleNamespace(id=3, nombre='Alhambra')]
+MATCHER = BrandMatcher({1: ['Mahou'], 2: ['Estrella Galicia', 'Estrella'], 3: ['Alhambra']})
+
+
+def execution(id, texto, proveedor='openai', query_id=10, day=1):
+    return SimpleNamespace(id=id, respuesta_texto=texto, proveedor_ia=proveedor,
+                           query_id=query_id, timestamp=datetime(2025, 3, day, 12))
+
+
+def matrix(executions):
+    return MentionMatrix.from_texts(executions, MATCHER, MARCAS)
+
+
+FIRST = [
+    execution(1, "Mahou y Estrella Galicia"),
+    execution(2, "Solo Mahou, Mahou y más Mahou", proveedor='anthropic'),
+    execution(3, "Nada relevante", day=2),
+]
+SECOND = [
+    execution(4, "Alhambra frente a Estrella", query_id=11, day=3),
+    execution(5, "Mahou", proveedor='google', day=3),
+]
+
+
+def test_matrix_counts_each_brand_once_per_execution():
+    m = matrix(FIRST)
+    assert m.num_executions == 3
+    assert m.mentions() == {'Mahou': 2, 'Estrella': 1}
+    assert m.sov() == pytest.approx({'Mahou': 200 / 3, 'Estrella': 100 / 3})
+    assert m.cooccurrence() == {'Estrella + Mahou': 1}
+
+
+def test_tallies_to_dict_round_trip_through_json():
+    tallies = MentionTallies.from_matrix(matrix(FIRST))
+    restored = MentionTallies.from_dict(json.loads(json.dumps(tallies.to_dict())))
+    assert restored.to_dict() == tallies.to_dict()
+    assert restored.sov() == tallies.sov()
+    assert restored.sov_by_provider() == tallies.sov_by_provider()
+
+
+def test_merged_tallies_match_tallies_of_all_executions():
+    merged = MentionTallies.from_matrix(matrix(FIRST)).merge(MentionTallies.from_matrix(matrix(SECOND)))
+    full = MentionTallies.from_matrix(matrix(FIRST + SECOND))
+    assert merged.num_executions == full.num_executions == 5
+    assert merged.mentions() == full.mentions() == {'Mahou': 3, 'Estrella': 2, 'Alhambra': 1}
+    assert merged.cooccurrence() == full.cooccurrence()
+    assert merged.sov_by_provider() == full.sov_by_provider()
+    assert merged.sov_by_query() == full.sov_by_query()
+    assert sorted(merged.providers) == sorted(full.providers)
+    start, end = datetime(2025, 3, 1), datetime(2025, 3, 4)
+    assert merged.daily_sov_series(start, end) == full.daily_sov_series(start, end)
+
+
+def test_merge_with_empty_tallies_is_identity():
+    tallies = MentionTallies.from_matrix(matrix(FIRST))
+    before = json.loads(json.dumps(tallies.to_dict()))
+    tallies.merge(MentionTallies())
+    assert tallies.to_dict() == before
+    assert MentionTallies().sov() == {}
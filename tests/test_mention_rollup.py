@@ -0,0 +1,122 @@
+"""Tests del índice de menciones: cuándo se confía en el rollup y qué cuenta"""
+
+from datetime import date, datetime
+
+import pytest
+
+from src.analytics.brand_matcher import BrandMatcher
+from src.analytics.mention_rollup import (
+    daily_counts, executions_mentioning, rebuild_rollup, record_execution, rollup_available
+)
+from src.database.models import BrandMentionDaily, ExecutionMention, Marca, QueryExecution
+from src.query_executor.poller import _update_mention_rollup
+
+
+@pytest.fixture
+def ingest(db, categoria, add_execution):
+    """Inserta una ejecución y la registra en el rollup, como la ingesta"""
+    def _ingest(texto, timestamp, proveedor="openai"):
+        execution_id = add_execution(texto, timestamp, proveedor)
+        with db() as session:
+            _update_mention_rollup(session, session.get(QueryExecution, execution_id), categoria['id'])
+        return execution_id
+    return _ingest
+
+
+def daily_rows(db, categoria_id):
+    with db(read_only=True) as session:
+        return sorted(
+            (r.marca_id, r.proveedor_ia, r.day, r.executions_with_mention)
+            for r in session.query(BrandMentionDaily).filter_by(categoria_id=categoria_id)
+        )
+
+
+def test_repeated_key_accumulates(db, categoria, ingest):
+    mahou = categoria['marcas']['Mahou']
+    ingest("Mahou", datetime(2025, 3, 10, 9))
+    ingest("Mahou, Mahou y Estrella", datetime(2025, 3, 10, 18))
+    ingest("Mahou", datetime(2025, 3, 10, 20), proveedor="google")
+    rows = [r for r in daily_rows(db, categoria['id']) if r[0] == mahou]
+    assert rows == [(mahou, "google", date(2025, 3, 10), 1), (mahou, "openai", date(2025, 3, 10), 2)]
+    with db(read_only=True) as session:
+        counts = daily_counts(session, categoria['id'], datetime(2025, 3, 1), datetime(2025, 4, 1))
+    assert counts[date(2025, 3, 10)] == {mahou: 3, categoria['marcas']['Estrella']: 1}
+
+
+def test_covered_from_gates_earlier_windows(db, categoria, ingest, add_execution):
+    add_execution("Mahou antes del rollup", datetime(2025, 3, 2))
+    ingest("Mahou", datetime(2025, 3, 10))
+    with db(read_only=True) as session:
+        assert not rollup_available(session, categoria['id'], datetime(2025, 3, 1))
+        assert rollup_available(session, categoria['id'], datetime(2025, 3, 10))
+    with db() as session:
+        assert rebuild_rollup(session, categoria['id'])['executions'] == 2
+    with db(read_only=True) as session:
+        assert rollup_available(session, categoria['id'], datetime(2025, 3, 1))
+    assert sum(r[3] for r in daily_rows(db, categoria['id'])) == 2
+
+
+def test_stale_fingerprint_skips_updates_until_rebuild(db, categoria, ingest):
+    ingest("Mahou", datetime(2025, 3, 10))
+    with db() as session:
+        session.get(Marca, categoria['marcas']['Alhambra']).aliases = ["Alhambra", "La Alhambra"]
+    stale_id = ingest("Alhambra y Mahou", datetime(2025, 3, 11))
+    with db(read_only=True) as session:
+        assert not rollup_available(session, categoria['id'], datetime(2025, 3, 1))
+        assert session.query(ExecutionMention).filter_by(execution_id=stale_id).count() == 0
+        assert record_execution(session, session.get(QueryExecution, stale_id), categoria['id']) == []
+    with db() as session:
+        rebuild_rollup(session, categoria['id'])
+    with db(read_only=True) as session:
+        assert rollup_available(session, categoria['id'], datetime(2025, 3, 1))
+        assert session.query(ExecutionMention).filter_by(execution_id=stale_id).count() == 2
+
+
+def test_failed_update_invalidates_rollup(db, categoria, ingest, monkeypatch):
+    ingest("Mahou", datetime(2025, 3, 10))
+
+    def broken(self, text):
+        raise RuntimeError("fallo simulado")
+
+    monkeypatch.setattr(BrandMatcher, "find", broken)
+    failed_id = ingest("Mahou", datetime(2025, 3, 11))
+    with db(read_only=True) as session:
+        assert session.get(QueryExecution, failed_id) is not None  # la ingesta no se pierde
+        assert not rollup_available(session, categoria['id'], datetime(2025, 3, 1))
+        assert not rollup_available(session, categoria['id'], datetime(2025, 3, 10))
+
+    # La siguiente ejecución reinicia el estado con cobertura desde ella
+    monkeypatch.undo()
+    ingest("Mahou", datetime(2025, 3, 12))
+    with db(read_only=True) as session:
+        assert not rollup_available(session, categoria['id'], datetime(2025, 3, 10))
+        assert rollup_available(session, categoria['id'], datetime(2025, 3, 12))
+
+
+def test_invalidate_failure_is_logged_not_raised(db, categoria, ingest, monkeypatch):
+    ingest("Mahou", datetime(2025, 3, 10))
+    monkeypatch.setattr(BrandMatcher, "find", lambda self, text: 1 / 0)
+    monkeypatch.setattr("src.query_executor.poller.invalidate_rollup", lambda *a, **k: 1 / 0)
+    assert ingest("Mahou", datetime(2025, 3, 11))
+
+
+
+def test_executions_mentioning_limit_counts_latest_executions(db, categoria, ingest):
+    ids = [
+        ingest(texto, datetime(2025, 3, d))
+        for d, texto in enumerate(["Mahou", "Estrella", "Mahou y Estrella", "Nada", "Alhambra, Mahou"], start=1)
+    ]
+    start, end = datetime(2025, 3, 1), datetime(2025, 4, 1)
+    with db(read_only=True) as session:
+        everything = executions_mentioning(session, categoria['id'], start, end)
+        latest = executions_mentioning(session, categoria['id'], start, end, limit=2)
+        mahou_only = executions_mentioning(
+            session, categoria['id'], start, end, marca_ids=[categoria['marcas']['Mahou']], limit=2
+        )
+    assert len(everything) == 6
+    assert [eid for eid, _, _ in everything] == sorted((eid for eid, _, _ in everything), reverse=True)
+    # Las 2 ejecuciones más recientes con mención, con todas sus marcas (la de "Nada" no cuenta)
+    assert sorted({eid for eid, _, _ in latest}, reverse=True) == [ids[4], ids[2]]
+    assert len(latest) == 4
+    assert {eid for eid, _, _ in mahou_only} == {ids[4], ids[2]}
+    assert len(mahou_only) == 2
@@ -0,0 +1,155 @@
+"""Tests del orquestador con agentes stub: orden del DAG, abortos, reanudación y presupuestos"""
+
+import threading
+import time
+
+import pytest
+
+from src.analytics.agents.base_agent import BaseAgent
+from src.analytics.orchestrator import AnalysisOrchestrator, AnalysisRunFailed
+from src.database.models import AnalysisResult, AnalysisRun, Report
+
+PERIODO = '2025-03'
+
+# {agente: dependencias declaradas}; el orquestador añade los críticos a los no críticos
+GRAPH = {
+    'quantitative': (),
+    'qualitative': (),
+    'sentiment': ('quantitative',),
+    'trends': ('sentiment',),
+    'executive': ('trends',),
+}
+
+
+class Stubs:
+    """Agentes stub que registran inicio/fin y fallan o se bloquean a demanda"""
+
+    def __init__(self):
+        self.log = []
+        self.errors = set()      # devuelven {'error': ...}
+        self.raises = set()      # lanzan una excepción
+        self.blocks = set()      # esperan hasta ser abandonados
+        self.released = threading.Event()
+        self.agent_order = [(name, self._agent_class(name, deps)) for name, deps in GRAPH.items()]
+
+    def _agent_class(self, name, deps):
+        stubs = self
+
+        def analyze(agent, categoria_id, periodo):
+            stubs.log.append(('start', name))
+            try:
+                if name in stubs.raises:
+                    raise RuntimeError(f"{name} roto")
+                if name in stubs.errors:
+                    return {'error': f"{name} sin datos"}
+                if name in stubs.blocks:
+                    while not agent.budget.abandoned:
+                        time.sleep(0.01)
+                if name == 'executive':
+                    report = Report(
+                        categoria_id=categoria_id, periodo=periodo, contenido={}, generado_por='test'
+                    )
+                    agent.session.add(report)
+                    agent.session.flush()
+                    return {'report_id': report.id}
+                resultado = {'agente': name}
+                agent.save_results(categoria_id, periodo, resultado)
+                return resultado
+            finally:
+                stubs.log.append(('end', name))
+                if name in stubs.blocks:
+                    stubs.released.set()
+
+        return type(f"{name}Agent", (BaseAgent,), {'depends_on': deps, 'analyze': analyze})
+
+    def started(self):
+        return [name for event, name in self.log if event == 'start']
+
+
+@pytest.fixture
+def stubs():
+    return Stubs()
+
+
+@pytest.fixture
+def orchestrator(stubs):
+    orch = AnalysisOrchestrator(max_parallel=2)
+    orch.agent_order = stubs.agent_order
+    orch.budgets = {'grace_seconds': 0.1, 'default': {'seconds': 0.0, 'tokens': 0}, 'agents': {}}
+    return orch
+
+
+def get_run(db, run_id):
+    with db(read_only=True) as session:
+        run = session.get(AnalysisRun, run_id)
+        return {'estado': run.estado, 'agentes': dict(run.agentes), 'reanudaciones': run.reanudaciones}
+
+
+def test_agents_start_after_their_dependencies(db, categoria, orchestrator, stubs):
+    report_id, stats = orchestrator.run_analysis(categoria['id'], PERIODO, force=True)
+
+    assert report_id
+    assert stats['agents_executed']['successful'] == len(GRAPH)
+    position = {entry: i for i, entry in enumerate(stubs.log)}
+    for name, deps in orchestrator.dependency_graph().items():
+        for dep in deps:
+            assert position[('end', dep)] < position[('start', name)], (dep, name)
+    assert get_run(db, stats['run_id'])['estado'] == 'completed'
+
+
+def test_critical_failure_cancels_pending_agents(db, categoria, orchestrator, stubs):
+    stubs.errors.add('quantitative')
+
+    with pytest.raises(AnalysisRunFailed) as excinfo:
+        orchestrator.run_analysis(categoria['id'], PERIODO, force=True)
+
+    run = get_run(db, excinfo.value.run_id)
+    assert f"--resume {excinfo.value.run_id}" in str(excinfo.value)
+    assert run['estado'] == 'failed'
+    assert run['agentes']['quantitative']['status'] == 'error'
+    assert not {'sentiment', 'trends', 'executive'} & set(stubs.started())
+    assert not {'sentiment', 'trends', 'executive'} & set(run['agentes'])
+
+
+def test_resume_skips_successful_agents(db, categoria, orchestrator, stubs):
+    stubs.raises.update({'sentiment', 'executive'})
+    with pytest.raises(AnalysisRunFailed) as excinfo:
+        orchestrator.run_analysis(categoria['id'], PERIODO, force=True)
+    run_id = excinfo.value.run_id
+
+    stubs.raises.clear()
+    stubs.log.clear()
+    report_id, stats = orchestrator.run_analysis(categoria['id'], PERIODO, force=True, resume_run_id=run_id)
+
+    assert report_id
+    assert stats['run_id'] == run_id
+    # trends tuvo éxito, pero depende de sentiment, que se repite
+    assert sorted(stubs.started()) == ['executive', 'sentiment', 'trends']
+    assert stats['cache']['resumed'] == ['qualitative', 'quantitative']
+    run = get_run(db, run_id)
+    assert run['estado'] == 'completed'
+    assert run['reanudaciones'] == 1
+
+
+def test_deadline_overrun_abandons_agent(db, categoria, orchestrator, stubs):
+    orchestrator.budgets['agents']['trends'] = {'seconds': 0.2, 'tokens': 0}
+    stubs.blocks.add('trends')
+    with db() as session:
+        session.add(AnalysisResult(
+            categoria_id=categoria['id'], periodo='2025-02', agente='trends',
+            resultado={'agente': 'trends', 'periodo': '2025-02'}, version_agente='1.0.0'
+        ))
+
+    report_id, stats = orchestrator.run_analysis(categoria['id'], PERIODO, force=True)
+    assert stubs.released.wait(5)
+
+    assert report_id
+    assert stats['degraded'] == {'trends': 'periodo_anterior'}
+    assert stats['results_detail']['trends']['status'] == 'success'
+    assert get_run(db, stats['run_id'])['agentes']['trends']['degraded'] == 'periodo_anterior'
+    with db(read_only=True) as session:
+        resultado = session.query(AnalysisResult.resultado).filter_by(
+            categoria_id=categoria['id'], periodo=PERIODO, agente='trends'
+        ).scalar()
+    # El hilo abandonado no sobrescribe el resultado sustituto
+    assert resultado['_degradado']['periodo_origen'] == '2025-02'
@@ -0,0 +1,62 @@
+"""Tests de la extracción por procesos: mismo resultado que la secuencial y caída por timeout"""
+
+import threading
+from datetime import datetime
+
+import pytest
+
+import src.analytics.parallel_extraction as parallel_extraction
+from src.analytics.brand_matcher import matcher_for_marcas
+from src.analytics.mention_matrix import MentionMatrix
+from src.database.models import Marca, QueryExecution
+
+START, END = datetime(2025, 3, 1), datetime(2025, 4, 1)
+TEXTS = ["Mahou y Estrella Galicia", "Solo Alhambra", "Nada", "Estrella, Mahou", "Masters"] * 4
+
+
+@pytest.fixture
+def executions(db, categoria, add_execution):
+    for i, texto in enumerate(TEXTS):
+        add_execution(texto, datetime(2025, 3, 1 + i % 28, 12), proveedor=['openai', 'google'][i % 2])
+    with db(read_only=True) as session:
+        marcas = session.query(Marca).filter_by(categoria_id=categoria['id']).order_by(Marca.id).all()
+        sequential = MentionMatrix.from_texts(
+            session.query(QueryExecution).order_by(QueryExecution.id).all(),
+            matcher_for_marcas(categoria['id'], marcas), marcas
+        )
+        session.expunge_all()
+    return marcas, sequential
+
+
+def run_in_thread(fn):
+    """El pool se crea desde hilos del orquestador/batch: reproducirlo"""
+    out = {}
+    thread = threading.Thread(target=lambda: out.setdefault('result', fn()))
+    thread.start()
+    thread.join(120)
+    assert not thread.is_alive()
+    return out['result']
+
+
+def test_parallel_matches_sequential(db, categoria, executions, monkeypatch):
+    marcas, sequential = executions
+    monkeypatch.setitem(parallel_extraction.EXTRACTION_SETTINGS, 'workers', 2)
+    with db(read_only=True) as session:
+        matrix = run_in_thread(lambda: parallel_extraction.extract_parallel(
+            session, categoria['id'], START, END, marcas
+        ))
+    assert matrix is not None
+    assert matrix.num_executions == sequential.num_executions == len(TEXTS)
+    assert matrix.mentions() == sequential.mentions()
+    assert matrix.cooccurrence() == sequential.cooccurrence()
+    assert matrix.sov_by_provider() == sequential.sov_by_provider()
+
+
+def test_pool_timeout_falls_back(db, categoria, executions, monkeypatch):
+    marcas, _ = executions
+    monkeypatch.setitem(parallel_extraction.EXTRACTION_SETTINGS, 'workers', 2)
+    monkeypatch.setitem(parallel_extraction.EXTRACTION_SETTINGS, 'timeout_seconds', 0.001)
+    with db(read_only=True) as session:
+        assert run_in_thread(lambda: parallel_extraction.extract_parallel(
+            session, categoria['id'], START, END, marcas
+        )) is None
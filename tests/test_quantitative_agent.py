@@ -0,0 +1,90 @@
+"""Tests del cálculo incremental de menciones del agente cuantitativo (conteos + marca de agua)"""
+
+from datetime import datetime
+
+import pytest
+
+from src.analytics.agents.quantitative_agent import QuantitativeAgent
+from src.database.models import AnalysisResult, QueryExecution
+
+PERIODO = '2025-03'
+
+TEXTOS = [
+    "Mahou y Estrella Galicia son las más pedidas",
+    "Recomiendo Alhambra",
+    "Estrella, sin duda",
+    "Mahou para el día a día, Alhambra para ocasiones",
+]
+
+
+def analyze(db, categoria_id):
+    with db() as session:
+        agent = QuantitativeAgent(session)
+        agent.fingerprint = None
+        return agent.analyze(categoria_id, PERIODO)
+
+
+def full_recompute(db, categoria_id):
+    """Mismo periodo sin estado guardado: recálculo completo desde las ejecuciones"""
+    with db() as session:
+        session.query(AnalysisResult).filter_by(categoria_id=categoria_id, periodo=PERIODO).update(
+            {AnalysisResult.estado: None}
+        )
+    return analyze(db, categoria_id)
+
+
+def metrics(resultado):
+    return {k: v for k, v in resultado.items() if k not in ('metadata', 'ranking')}
+
+
+@pytest.fixture
+def seeded(categoria, add_execution):
+    for dia, texto in enumerate(TEXTOS[:2], start=1):
+        add_execution(texto, datetime(2025, 3, dia, 10))
+    return categoria['id']
+
+
+def test_incremental_merge_matches_full_recompute(db, seeded, add_execution):
+    assert analyze(db, seeded)['metadata']['modo_calculo'] == 'completo'
+    for dia, texto in enumerate(TEXTOS[2:], start=10):
+        add_execution(texto, datetime(2025, 3, dia, 10), proveedor="anthropic")
+
+    incremental = analyze(db, seeded)
+    assert incremental['metadata']['modo_calculo'] == 'incremental'
+    assert incremental['total_executions'] == len(TEXTOS)
+    assert incremental['menciones_por_marca'] == {'Mahou': 2, 'Estrella': 2, 'Alhambra': 2}
+
+    completo = full_recompute(db, seeded)
+    assert completo['metadata']['modo_calculo'] == 'completo'
+    assert metrics(incremental) == metrics(completo)
+
+
+def test_deleted_execution_forces_full_recompute(db, seeded, add_execution):
+    analyze(db, seeded)
+    with db() as session:
+        session.query(QueryExecution).filter_by(respuesta_texto=TEXTOS[0]).delete()
+    add_execution(TEXTOS[2], datetime(2025, 3, 10, 10))
+
+    resultado = analyze(db, seeded)
+    assert resultado['metadata']['modo_calculo'] == 'completo'
+    assert resultado['total_executions'] == 2
+    assert resultado['menciones_por_marca'] == {'Estrella': 1, 'Alhambra': 1}
+
+
+def test_execution_below_high_water_forces_full_recompute(db, categoria, add_execution):
+    hueco = add_execution("Mahou", datetime(2025, 3, 1, 10))
+    add_execution(TEXTOS[1], datetime(2025, 3, 2, 10))
+    with db() as session:
+        session.query(QueryExecution).filter_by(id=hueco).delete()
+    analyze(db, categoria['id'])
+
+    # Llega tarde una ejecución con id inferior a la marca de agua (p. ej. importada de un backup)
+    with db() as session:
+        session.add(QueryExecution(
+            id=hueco, query_id=categoria['query_id'], proveedor_ia="openai", modelo="test",
+            respuesta_texto=TEXTOS[2], timestamp=datetime(2025, 3, 5, 10)
+        ))
+
+    resultado = analyze(db, categoria['id'])
+    assert resultado['metadata']['modo_calculo'] == 'completo'
+    assert resultado['menciones_por_marca'] == {'Estrella': 1, 'Alhambra': 1}
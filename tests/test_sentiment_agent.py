@@ -0,0 +1,38 @@
+"""Tests de la referencia del contraste de sentimiento (periodo anterior y huella)"""
+
+import pytest
+
+from src.analytics.agents.sentiment_agent import SentimentAgent
+
+
+@pytest.fixture
+def agent(db):
+    with db() as session:
+        yield SentimentAgent(session)
+
+
+def save(agent, categoria_id, periodo, score):
+    agent.fingerprint = None
+    agent.save_results(categoria_id, periodo, {'sentimiento_por_marca': {'Mahou': {'scores': [score]}}})
+
+
+def test_previous_analysis_uses_same_granularity(agent, categoria):
+    cid = categoria['id']
+    save(agent, cid, '2025-09', 0.1)
+    save(agent, cid, '2025-09-29..2025-10-05', 0.9)
+    save(agent, cid, '2025-W40', 0.8)
+    previo = agent.get_previous_analysis(cid, '2025-10')
+    assert previo['sentimiento_por_marca']['Mahou']['scores'] == [0.1]
+    assert agent.get_previous_analysis(cid, '2025-W41')['sentimiento_por_marca']['Mahou']['scores'] == [0.8]
+    assert agent.get_previous_analysis(cid, '2025-09-29..2025-10-05') is None
+
+
+def test_fingerprint_tracks_previous_period_result(agent, categoria):
+    cid = categoria['id']
+    save(agent, cid, '2025-09', 0.1)
+    save(agent, cid, '2025-09-29..2025-10-05', 0.9)
+    base = agent.input_fingerprint(cid, '2025-10')
+    save(agent, cid, '2025-09-29..2025-10-05', -0.5)
+    assert agent.input_fingerprint(cid, '2025-10') == base
+    save(agent, cid, '2025-09', -0.5)
+    assert agent.input_fingerprint(cid, '2025-10') != base
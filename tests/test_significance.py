@@ -0,0 +1,35 @@
+"""Tests de los intervalos bootstrap de cambio de SOV"""
+
+from src.analytics.significance import sov_shift_test
+
+
+def test_identical_periods_show_no_significant_shift():
+    counts = {'A': 120, 'B': 80, 'C': 40}
+    result = sov_shift_test(counts, dict(counts), resamples=2000, seed=1)
+    assert set(result) == {'A', 'B', 'C'}
+    for stats in result.values():
+        assert stats['delta_pp'] == 0
+        assert stats['ic_inf'] < 0 < stats['ic_sup']
+        assert not stats['significativo']
+        assert stats['p_valor'] > 0.5
+
+
+def test_clearly_shifted_periods_are_significant():
+    result = sov_shift_test({'A': 300, 'B': 100}, {'A': 100, 'B': 300}, resamples=2000, seed=1)
+    assert result['A']['delta_pp'] == 50
+    assert result['B']['delta_pp'] == -50
+    assert result['A']['significativo'] and result['A']['ic_inf'] > 0
+    assert result['B']['significativo'] and result['B']['ic_sup'] < 0
+    assert result['A']['p_valor'] < 0.01
+
+
+def test_brand_missing_in_one_period_and_empty_inputs():
+    result = sov_shift_test({'A': 50, 'B': 50}, {'A': 100}, resamples=500, seed=1)
+    assert result['B']['delta_pp'] == 50
+    assert sov_shift_test({}, {'A': 10}) == {}
+    assert sov_shift_test({'A': 0}, {'A': 10}) == {}
+
+
+def test_fixed_seed_is_reproducible():
+    args = ({'A': 30, 'B': 20}, {'A': 25, 'B': 25})
+    assert sov_shift_test(*args, resamples=500, seed=7) == sov_shift_test(*args, resamples=500, seed=7)
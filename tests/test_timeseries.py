@@ -0,0 +1,83 @@
+"""Tests de detección de tendencias y atípicos entre marcas"""
+
+import numpy as np
+
+from src.analytics.timeseries import cross_section_outliers, detect_trends, robust_z
+
+
+def series(*values_by_brand, value_key='sov'):
+    return {
+        marca: [{'periodo': f"2025-{i + 1:02d}", value_key: v} for i, v in enumerate(values)]
+        for marca, values in values_by_brand
+    }
+
+
+def by_brand(records):
+    return {r['marca']: r for r in records}
+
+
+def test_too_short_or_empty_series_yield_nothing():
+    assert detect_trends({}) == []
+    assert detect_trends(series(('A', [10]))) == []
+
+
+def test_flat_series_has_no_trend():
+    assert detect_trends(series(('A', [10] * 8))) == []
+
+
+def test_sustained_level_is_not_a_peak():
+    record = by_brand(detect_trends(series(('A', [10, 10, 10, 10, 20, 20, 20, 20]))))['A']
+    assert record['pico'] is False
+    assert record['cambio_puntos'] == 0
+    assert 'punto_cambio' in record['motivos']
+    assert record['punto_cambio']['periodo'] == '2025-05'
+
+
+def test_spike_after_stable_history_is_a_peak():
+    record = by_brand(detect_trends(series(('A', [10, 11, 9, 10, 10, 11, 9, 30]))))['A']
+    assert record['pico'] is True
+    assert record['direccion'] == '↑'
+    assert {'cambio', 'z_robusto'} <= set(record['motivos'])
+
+
+def test_short_history_uses_mean_deviation_for_peaks():
+    record = by_brand(detect_trends(series(('A', [10, 10, 20]))))['A']
+    assert record['z_robusto'] is None
+    assert record['pico'] is True
+
+
+def test_missing_period_counts_as_zero_and_records_sort_by_score():
+    data = series(('A', [10, 10, 10, 40]), ('B', [20, 20, 20, 22]))
+    data['C'] = [{'periodo': '2025-01', 'sov': 30}, {'periodo': '2025-04', 'sov': 30}]
+    records = detect_trends(data)
+    assert [r['marca'] for r in records][0] == 'A'
+    assert by_brand(records)['C']['cambio_puntos'] == 30
+    scores = [r['score'] for r in records]
+    assert scores == sorted(scores, reverse=True)
+
+
+def test_compare_first_uses_first_period_as_reference():
+    record = by_brand(detect_trends(series(('A', [10, 30, 15])), compare='first'))['A']
+    assert record['periodo_inicio'] == '2025-01'
+    assert record['cambio_puntos'] == 5
+
+
+def test_robust_z_is_finite_on_constant_history():
+    X = np.array([[5.0, 5.0, 5.0, 5.0, 5.0], [0.0, 0.0, 0.0, 0.0, 0.0]])
+    z = robust_z(X, min_history=3, scale_floor=0.5, scale_floor_rel=0.1)
+    assert np.all(np.isfinite(z))
+    assert np.all(z == 0)
+    assert np.isnan(robust_z(X[:, :3], min_history=3, scale_floor=0.5)).all()
+
+
+def test_cross_section_outliers():
+    altos, bajos = cross_section_outliers({'A': 10, 'B': 11, 'C': 9, 'D': 10, 'E': 60})
+    assert [o['marca'] for o in altos] == ['E']
+    assert bajos == []
+
+
+def test_cross_section_outliers_edge_cases():
+    assert cross_section_outliers({'A': 10, 'B': 90}) == ([], [])
+    assert cross_section_outliers({'A': 10, 'B': 10, 'C': 10}) == ([], [])
+    altos, bajos = cross_section_outliers({'A': 10, 'B': 10, 'C': 10, 'D': None})
+    assert altos == [] and [o['marca'] for o in bajos] == ['D']